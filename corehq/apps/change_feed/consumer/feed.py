@@ -1,8 +1,12 @@
 import json
-from copy import copy
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from copy import copy, deepcopy
 from typing import Dict, Iterator, Optional
 
 from django.conf import settings
+from django.db import close_old_connections
 
 from kafka import KafkaConsumer
 from kafka.common import TopicPartition
@@ -11,6 +15,7 @@ from corehq.form_processor.document_stores import UnexpectedBackend
 from dimagi.utils.logging import notify_error
 from pillowtop.checkpoints.manager import PillowCheckpointEventHandler
 from pillowtop.feed.interface import Change, ChangeFeed, ChangeMeta
+from pillowtop.logger import pillow_logging
 from pillowtop.models import kafka_seq_to_str
 
 from corehq.apps.change_feed.data_sources import get_document_store
@@ -19,6 +24,8 @@ from corehq.apps.change_feed.topics import validate_offsets
 
 MIN_TIMEOUT = 500
 MAX_TIMEOUT = 1000 * 60 * 60 * 24  # 1 day in ms
+POLL_TIMEOUT = 1000  # ms
+PREFETCH_BATCH_SIZE = 100
 
 
 class KafkaChangeFeed(ChangeFeed):
@@ -28,11 +35,15 @@ class KafkaChangeFeed(ChangeFeed):
     sequence_format = 'json'
 
     def __init__(self, topics, client_id, strict=False, num_processes=1,
-                 process_num=0, dedicated_migration_process=False,):
+                 process_num=0, dedicated_migration_process=False, prefetch_workers=0):
         """
         Create a change feed listener for a list of kafka topics, a client ID, and partition.
 
         See http://kafka.apache.org/documentation.html#introduction for a description of what these are.
+
+        :param prefetch_workers: Number of threads used to decode messages
+        and fetch their documents ahead of processing. See
+        ``_iter_prefetched_changes``. Prefetching is disabled if zero.
         """
         self._topics = topics
         self._client_id = client_id
@@ -41,6 +52,7 @@ class KafkaChangeFeed(ChangeFeed):
         self.num_processes = num_processes
         self.process_num = process_num
         self.dedicated_migration_process = dedicated_migration_process
+        self.prefetch_workers = prefetch_workers
         self._consumer = None
 
     def __str__(self):
@@ -90,6 +102,10 @@ class KafkaChangeFeed(ChangeFeed):
             for topic_partition, offset in since.items():
                 self.consumer.seek(TopicPartition(topic_partition[0], topic_partition[1]), int(offset))
 
+        if self.prefetch_workers:
+            yield from self._iter_prefetched_changes(timeout)
+            return
+
         try:
             for message in self.consumer:
                 self._processed_topic_offsets[(message.topic, message.partition)] = message.offset
@@ -98,6 +114,39 @@ class KafkaChangeFeed(ChangeFeed):
             # no need to do anything since this is just telling us we've reached the end of the feed
             pass
 
+    def _iter_prefetched_changes(self, timeout):
+        """Iterate over changes with documents fetched ahead of processing
+
+        Messages are polled in batches. Batches are decoded and their
+        documents are fetched in a thread pool while the changes of an
+        earlier batch are being processed, with up to one batch per
+        worker fetched ahead. Changes are yielded in the order they were
+        polled, which preserves the order of each partition, and offsets
+        are recorded as changes are yielded, so checkpoints do not
+        include prefetched changes that have not been processed.
+        """
+        pending = deque()
+        last_message_time = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.prefetch_workers) as executor:
+            while True:
+                while len(pending) <= self.prefetch_workers:
+                    messages = self._poll_messages(0 if pending else min(timeout, POLL_TIMEOUT))
+                    if not messages:
+                        break
+                    pending.append((messages, executor.submit(_get_prefetched_changes, messages)))
+                if pending:
+                    messages, future = pending.popleft()
+                    for message, change in zip(messages, future.result()):
+                        self._processed_topic_offsets[(message.topic, message.partition)] = message.offset
+                        yield change
+                    last_message_time = time.monotonic()
+                elif (time.monotonic() - last_message_time) * 1000 > timeout:
+                    return
+
+    def _poll_messages(self, timeout_ms):
+        messages_by_partition = self.consumer.poll(timeout_ms=timeout_ms, max_records=PREFETCH_BATCH_SIZE)
+        return [message for messages in messages_by_partition.values() for message in messages]
+
     def get_current_checkpoint_offsets(self):
         # the way kafka works, the checkpoint should increment by 1 because
         # querying the feed is inclusive of the value passed in.
@@ -224,5 +273,34 @@ def change_from_kafka_message(message):
     )
 
 
+def _get_prefetched_changes(messages):
+    changes = [change_from_kafka_message(message) for message in messages]
+    close_old_connections()
+    changes_by_store = defaultdict(list)
+    for change in changes:
+        if change.document_store is not None:
+            meta = change.metadata
+            changes_by_store[(meta.data_source_type, meta.data_source_name, meta.domain)].append(change)
+    for store_changes in changes_by_store.values():
+        try:
+            _prefetch_documents(store_changes)
+        except Exception:
+            # changes without documents are fetched when they are processed
+            pillow_logging.exception("Error prefetching documents")
+    return changes
+
+
+def _prefetch_documents(changes):
+    doc_ids = list({change.id for change in changes})
+    docs_by_id = {doc.get('_id'): doc for doc in changes[0].document_store.iter_documents(doc_ids)}
+    fetched_ids = set()
+    for change in changes:
+        if change.id in docs_by_id:
+            doc = docs_by_id[change.id]
+            # do not share a document between changes that may modify it
+            change.set_document(deepcopy(doc) if change.id in fetched_ids else doc)
+            fetched_ids.add(change.id)
+
+
 def change_meta_from_kafka_message(message):
     return ChangeMeta.wrap(json.loads(message))
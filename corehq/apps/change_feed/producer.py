@@ -37,6 +37,32 @@ class ChangeProducer(object):
         return self._producer
 
     def send_change(self, topic, change_meta):
+        self.send_changes([(topic, change_meta)])
+
+    def send_changes(self, changes):
+        """Send a batch of changes
+
+        Unlike calling `send_change` for each change, this does not wait
+        for each change to be acknowledged before sending the next one.
+
+        :param changes: List of `(topic, change_meta)` tuples.
+        """
+        futures = []
+        try:
+            for topic, change_meta in changes:
+                futures.append((self._send(topic, change_meta), change_meta))
+            if self.auto_flush:
+                for future, change_meta in futures:
+                    future.get()
+        except Exception as e:
+            raise KafkaPublishingError(e)
+
+        if not self.auto_flush:
+            for future, change_meta in futures:
+                on_error = partial(_on_error, change_meta)
+                future.add_errback(on_error)
+
+    def _send(self, topic, change_meta):
         if settings.USE_KAFKA_SHORTEST_BACKLOG_PARTITIONER:
             from corehq.apps.change_feed.partitioners import choose_best_partition_for_topic
             partition = choose_best_partition_for_topic(topic)
@@ -46,16 +72,7 @@ class ChangeProducer(object):
         message = change_meta.to_json()
         message_json_dump = json.dumps(message).encode('utf-8')
         change_meta._transaction_id = uuid.uuid4().hex
-        try:
-            future = self.producer.send(topic, message_json_dump, key=change_meta.document_id, partition=partition)
-            if self.auto_flush:
-                future.get()
-        except Exception as e:
-            raise KafkaPublishingError(e)
-
-        if not self.auto_flush:
-            on_error = partial(_on_error, change_meta)
-            future.add_errback(on_error)
+        return self.producer.send(topic, message_json_dump, key=change_meta.document_id, partition=partition)
 
     def flush(self, timeout=None):
         self.producer.flush(timeout=timeout)
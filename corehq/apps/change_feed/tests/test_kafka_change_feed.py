@@ -1,10 +1,11 @@
 import uuid
 from copy import deepcopy
+from unittest.mock import Mock
 
 from django.test import SimpleTestCase, TestCase
 
 from pillowtop.checkpoints.manager import PillowCheckpoint
-from pillowtop.feed.interface import ChangeMeta
+from pillowtop.feed.interface import Change, ChangeMeta
 from pillowtop.pillow.interface import ConstructedPillow
 from pillowtop.processors.sample import CountingProcessor
 
@@ -12,6 +13,7 @@ from corehq.apps.change_feed import topics
 from corehq.apps.change_feed.consumer.feed import (
     KafkaChangeFeed,
     KafkaCheckpointEventHandler,
+    _prefetch_documents,
 )
 from corehq.apps.change_feed.exceptions import UnavailableKafkaOffset
 from corehq.apps.change_feed.producer import producer
@@ -35,6 +37,29 @@ class KafkaChangeFeedTest(SimpleTestCase):
         for unexpected in unexpected_metas:
             self.assertTrue(unexpected.document_id not in found_change_ids)
 
+    def test_prefetch(self):
+        feed = KafkaChangeFeed(topics=[topics.FORM_SQL, topics.CASE_SQL], client_id='test-kafka-feed',
+                               prefetch_workers=2)
+        offsets = feed.get_latest_offsets()
+        metas = [publish_stub_change(topics.FORM_SQL) for x in range(3)]
+        changes = list(feed.iter_changes(since=offsets, forever=False))
+        self.assertEqual([change.id for change in changes], [meta.document_id for meta in metas])
+        self.assertEqual(
+            feed.get_processed_offsets()[(topics.FORM_SQL, 0)],
+            offsets[(topics.FORM_SQL, 0)] + 2,
+        )
+
+    def test_prefetch_documents(self):
+        doc = {'_id': 'abc', 'name': 'one'}
+        store = Mock()
+        store.iter_documents.return_value = [doc]
+        changes = [Change(doc_id, seq, document_store=store) for seq, doc_id in enumerate(['abc', 'def', 'abc'])]
+        _prefetch_documents(changes)
+        self.assertIs(changes[0].document, doc)
+        self.assertIsNone(changes[1].document)
+        self.assertEqual(changes[2].document, doc)
+        self.assertIsNot(changes[2].document, doc)
+
     def test_expired_checkpoint_iteration_strict(self):
         feed = KafkaChangeFeed(topics=[topics.FORM_SQL, topics.CASE_SQL], client_id='test-kafka-feed', strict=True)
         first_available_offsets = get_multi_topic_first_available_offsets([topics.FORM_SQL, topics.CASE_SQL])
@@ -361,6 +361,10 @@ class Domain(QuickCachedDocumentMixin, BlobMixin, Document, SnapshotMixin):
     sms_conversation_times = SchemaListProperty(DayTimeWindow)
     # In minutes, see above.
     sms_conversation_length = IntegerProperty(default=10)
+    # Windows of time, usually off-peak hours, during which restores are
+    # pre-generated for recently synced users. PREWARM_RESTORES must be
+    # enabled for the domain for this to be considered.
+    restore_prewarm_times = SchemaListProperty(DayTimeWindow)
     # Set to True to prevent survey questions and answers form being seen in
     # SMS chat windows.
     filter_surveys_from_chat = BooleanProperty(default=False)
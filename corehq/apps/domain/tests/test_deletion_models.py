@@ -53,6 +53,7 @@ IGNORE_MODELS = {
     'domain.ProjectLimit',
     'domain.SuperuserProjectEntryRecord',
     'dropbox.DropboxUploadHelper',
+    'export.DailySavedExportPart',      # no domain; cached rows of an export instance
     'export.DefaultExportSettings',
     'field_audit.AuditEvent',
     'fixtures.UserLookupTableStatus',
@@ -64,6 +65,7 @@ IGNORE_MODELS = {
     'util.PermanentBounceMeta',
     'util.TransientBounceEmail',
     'registration.AsyncSignupRequest',
+    'userreports.UCRPillowAssignment',  # not domain specific
     'users.UserHistory',
 }
 
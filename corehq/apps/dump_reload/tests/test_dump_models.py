@@ -58,7 +58,9 @@ IGNORE_MODELS = {
     "dropbox.DropboxUploadHelper",
     "enterprise.EnterpriseMobileWorkerSettings",    # tied to an account, not a domain
     "enterprise.EnterprisePermissions",
+    "receiverwrapper.QueuedSubmission",     # transient, not processed after a reload
     "export.DefaultExportSettings",     # tied to an account, not a domain
+    "export.DailySavedExportPart",      # cached rows, rebuilt when missing
     "export.EmailExportWhenDoneRequest",   # temporary model
     "form_processor.DeprecatedXFormAttachmentSQL",
     "hqadmin.HistoricalPillowCheckpoint",
@@ -95,6 +97,7 @@ IGNORE_MODELS = {
     "userreports.ReportComparisonDiff",
     "userreports.ReportComparisonException",
     "userreports.ReportComparisonTiming",
+    "userreports.UCRPillowAssignment",     # not domain specific
     "util.BouncedEmail",
     "util.ComplaintBounceMeta",
     "util.PermanentBounceMeta",
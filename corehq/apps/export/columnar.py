@@ -0,0 +1,265 @@
+"""Column-wise row generation for exports
+
+`TableConfiguration.get_rows` builds the rows of one document at a time,
+and each cell resolves its column's path and transforms again.
+`CompiledTable` does that once for a table: the path of each selected
+column is compiled into an accessor function, and the rows of a page of
+documents are built one column at a time, so that the transforms of a
+column are applied to all of the values of the page in one loop.
+
+Columns whose values need more than the value at their path (row
+numbers, multimedia links, case indices and stock columns) are
+evaluated with their own `get_value`.
+
+`CompiledTable.get_rows` returns the same rows as calling
+`TableConfiguration.get_rows` for each document of the page.
+"""
+from couchexport.transforms import couch_to_excel_datetime
+
+from corehq.apps.export.const import (
+    DEID_TRANSFORM_FUNCTIONS,
+    EMPTY_VALUE,
+    MISSING_VALUE,
+    TRANSFORM_FUNCTIONS,
+)
+from corehq.apps.export.models.new import (
+    ExportColumn,
+    ExportRow,
+    RowNumberColumn,
+    SplitExportColumn,
+    SplitGPSExportColumn,
+    SplitUserDefinedExportColumn,
+    _serialize_list_value,
+)
+
+# Column types whose value is the transformed value at the column's path,
+# possibly split into several cells with `_split_value`
+COMPILED_COLUMN_TYPES = (
+    ExportColumn,
+    SplitExportColumn,
+    SplitGPSExportColumn,
+    SplitUserDefinedExportColumn,
+)
+
+
+class CompiledTable(object):
+    """The rows of a TableConfiguration, computed a page of documents at a time
+
+    :param table: A TableConfiguration
+    :param split_columns: Whether to split multiselect columns (see
+    `ExportInstance.split_multiselects`)
+    :param transform_dates: Whether to convert dates to be compatible
+    with Excel
+    """
+
+    def __init__(self, table, split_columns=False, transform_dates=False):
+        self.table = table
+        self.columns = [
+            _compile_column(column, table.path, split_columns, transform_dates)
+            for column in table.selected_columns
+        ]
+        self.hyperlink_column_indices = table.get_hyperlink_column_indices(split_columns)
+        # a row is the concatenation of its cells if every column has a single cell
+        self._has_single_cells = all(column.is_single_cell for column in self.columns)
+
+    @property
+    def num_compiled_columns(self):
+        return sum(1 for column in self.columns if column.is_compiled)
+
+    def get_rows(self, documents, first_row_number=0):
+        """
+        Return the ExportRows of a page of documents.
+        :param documents: A list of forms or cases
+        :param first_row_number: The index of the first document of the
+        page in the sequence of all documents in the export
+        :return: List of ExportRows
+        """
+        sub_documents = []
+        for row_number, document in enumerate(documents, first_row_number):
+            document_id = document.get('_id')
+            doc_rows = self.table._get_sub_documents(document, row_number, document_id=document_id)
+
+            domain = document.get('domain')
+            assert domain is not None, 'Form or Case must be associated with domain'
+            assert document_id is not None, 'Form or Case must have an id'
+
+            sub_documents.extend((domain, document_id, doc_row) for doc_row in doc_rows)
+
+        if not sub_documents:
+            return []
+
+        column_values = [column.get_values(sub_documents) for column in self.columns]
+        if self._has_single_cells:
+            return [
+                ExportRow(
+                    data=list(row_data),
+                    hyperlink_column_indices=self.hyperlink_column_indices,
+                )
+                for row_data in zip(*column_values)
+            ]
+        return [self._get_row(cells) for cells in zip(*column_values)]
+
+    def _get_row(self, cells):
+        row_data = []
+        skip_excel_formatting = []
+        for column, val in zip(self.columns, cells):
+            col_index = len(row_data)
+            if isinstance(val, list):
+                row_data.extend(val)
+            else:
+                row_data.append(val)
+            # we never want to auto-format RowNumberColumn
+            # (always treat as text)
+            if column.is_row_number:
+                skip_excel_formatting.extend(range(col_index, len(row_data)))
+        return ExportRow(
+            data=row_data,
+            hyperlink_column_indices=self.hyperlink_column_indices,
+            skip_excel_formatting=skip_excel_formatting,
+        )
+
+
+def _compile_column(column, base_path, split_columns, transform_dates):
+    if type(column) in COMPILED_COLUMN_TYPES:
+        return _CompiledColumn(column, base_path, split_columns, transform_dates)
+    return _ColumnWithGetValue(column, base_path, split_columns, transform_dates)
+
+
+class _ColumnWithGetValue(object):
+    """A column that is evaluated with its own `get_value`"""
+    is_compiled = False
+    is_single_cell = False
+
+    def __init__(self, column, base_path, split_columns, transform_dates):
+        self.column = column
+        self.base_path = base_path
+        self.split_columns = split_columns
+        self.transform_dates = transform_dates
+        self.is_row_number = isinstance(column, RowNumberColumn)
+
+    def get_values(self, sub_documents):
+        get_value = self.column.get_value
+        return [
+            get_value(
+                domain,
+                document_id,
+                doc_row.doc,
+                self.base_path,
+                row_index=doc_row.row,
+                split_column=self.split_columns,
+                transform_dates=self.transform_dates,
+            )
+            for domain, document_id, doc_row in sub_documents
+        ]
+
+
+class _CompiledColumn(object):
+    """A column whose value is the transformed value at its path
+
+    Applies `ExportColumn._transform` (and `_split_value` for split
+    columns) to all of the values of a page.
+    """
+    is_compiled = True
+    is_row_number = False
+
+    def __init__(self, column, base_path, split_columns, transform_dates):
+        assert base_path == column.item.path[:len(base_path)], \
+            "ExportItem's path doesn't start with the base_path"
+        self.column = column
+        self.get_path_value = get_path_accessor([node.name for node in column.item.path[len(base_path):]])
+        self.transform_dates = transform_dates
+        self.transform = TRANSFORM_FUNCTIONS[column.item.transform] if column.item.transform else None
+        self.deid_transform = DEID_TRANSFORM_FUNCTIONS[column.deid_transform] if column.deid_transform else None
+        self.split_columns = split_columns
+        if isinstance(column, SplitUserDefinedExportColumn):
+            self.split_value = column._split_value
+        elif isinstance(column, (SplitExportColumn, SplitGPSExportColumn)) and split_columns:
+            self.split_value = column._split_value
+        else:
+            self.split_value = None
+        # transformed values are never lists, so only split values can span several cells
+        self.is_single_cell = self.split_value is None
+
+    def get_values(self, sub_documents):
+        docs = [doc_row.doc for domain, document_id, doc_row in sub_documents]
+        get_path_value = self.get_path_value
+        values = self.transform_values([get_path_value(doc) for doc in docs], docs)
+        if self.split_value is not None:
+            split_value = self.split_value
+            split_columns = self.split_columns
+            values = [split_value(value, split_columns) for value in values]
+        return values
+
+    def transform_values(self, values, docs):
+        """Same as `ExportColumn._transform` for each value and doc"""
+        transform_dates = self.transform_dates
+        transform = self.transform
+        deid_transform = self.deid_transform
+        # couch_to_excel_datetime only depends on the value, and tries
+        # several date formats for values that are not dates
+        excel_values = {}
+        result = []
+        for value, doc in zip(values, docs):
+            if isinstance(value, dict):
+                if '#text' in value:
+                    value = value.get('#text')
+                else:
+                    result.append(EMPTY_VALUE)
+                    continue
+
+            if transform_dates:
+                if isinstance(value, (str, bytes)):
+                    try:
+                        value = excel_values[value]
+                    except KeyError:
+                        value = excel_values[value] = couch_to_excel_datetime(value, doc)
+                else:
+                    value = couch_to_excel_datetime(value, doc)
+            if transform is not None:
+                value = transform(value, doc)
+            if deid_transform is not None:
+                try:
+                    value = deid_transform(value, doc)
+                except ValueError:
+                    # Unable to convert the string to a date
+                    pass
+            if value is None:
+                value = MISSING_VALUE
+            elif isinstance(value, list):
+                value = _serialize_list_value(value)
+            result.append(value)
+        return result
+
+
+def get_path_accessor(path):
+    """
+    Return a function that gets the value at the given path of a document,
+    or None if the path does not exist. Equivalent to `NestedDictGetter`.
+    :param path: A list of property names
+    """
+    if not path:
+        return lambda doc: None
+
+    if len(path) == 1:
+        key = path[0]
+
+        def get_value(doc):
+            if isinstance(doc, dict):
+                return doc.get(key)
+            return None
+        return get_value
+
+    first_key = path[0]
+    keys = tuple(path[1:])
+
+    def get_value(doc):
+        if not isinstance(doc, dict):
+            return None
+        try:
+            value = doc[first_key]
+            for key in keys:
+                value = value[key]
+        except (KeyError, TypeError):
+            return None
+        return value
+    return get_value
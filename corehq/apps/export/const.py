@@ -100,6 +100,10 @@ CASE_EXPORT = 'case'
 SMS_EXPORT = 'sms'
 MAX_EXPORTABLE_ROWS = 100000
 CASE_SCROLL_SIZE = 10000
+# Number of documents whose rows are built together by columnar exports
+COLUMNAR_EXPORT_PAGE_SIZE = 1000
+# Exports are only built by several processes if each gets at least this many documents
+MIN_DOCS_PER_EXPORT_SLICE = 10000
 
 # When a question is missing completely from a form/case this should be the value
 MISSING_VALUE = '---'
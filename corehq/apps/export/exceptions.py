@@ -10,6 +10,10 @@ class BadExportConfiguration(ExportAppException):
     pass
 
 
+class ExportProcessMemoryError(ExportAppException):
+    pass
+
+
 class ExportFormValidationException(Exception):
     pass
 
@@ -9,10 +9,15 @@ from couchdbkit import ResourceConflict
 from corehq.util.metrics import metrics_counter, metrics_track_errors
 from couchexport.export import FormattedRow, get_writer
 from couchexport.models import Format
+from dimagi.utils.chunked import chunked
 from dimagi.utils.logging import notify_exception
 from soil import DownloadBase
 
-from corehq.apps.export.const import MAX_EXPORTABLE_ROWS
+from corehq.apps.export.columnar import CompiledTable
+from corehq.apps.export.const import (
+    COLUMNAR_EXPORT_PAGE_SIZE,
+    MAX_EXPORTABLE_ROWS,
+)
 from corehq.apps.export.dbaccessors import get_properly_wrapped_export_instance
 from corehq.apps.export.models.new import (
     CaseExportInstance,
@@ -20,7 +25,7 @@ from corehq.apps.export.models.new import (
     SMSExportInstance,
 )
 from corehq.elastic import iter_es_docs_from_query
-from corehq.toggles import PAGINATED_EXPORTS
+from corehq.toggles import COLUMNAR_EXPORTS, PAGINATED_EXPORTS, STREAMING_XLSX_EXPORTS
 from corehq.util.metrics.load_counters import load_counter
 from corehq.util.files import TransientTempfile, safe_filename
 from soil.progress import TaskProgressManager
@@ -74,11 +79,13 @@ class _ExportWriter(object):
             # open the ExportWriter
             headers = []
             table_titles = {}
+            column_types = {}
             for instance_index, instance in enumerate(export_instances):
                 headers += [
                     (t, (t.get_headers(split_columns=instance.split_multiselects),))
                     for t in instance.selected_tables
                 ]
+                column_types.update(self._get_column_types(instance))
                 for table_index, table in enumerate(instance.selected_tables):
                     sheet_name = table.label or "Sheet{}".format(table_index + 1)
                     # If it's a bulk export and the sheet has the same name as another sheet,
@@ -89,12 +96,26 @@ class _ExportWriter(object):
                             sheet_name
                         )
                     table_titles[table] = sheet_name
-            self.writer.open(headers, file, table_titles=table_titles, archive_basepath=name)
+            self.writer.open(
+                headers,
+                file,
+                table_titles=table_titles,
+                archive_basepath=name,
+                column_types=column_types,
+            )
             try:
                 yield
             finally:
                 self.writer.close()
 
+    def _get_column_types(self, instance):
+        if not self.writer.has_typed_columns:
+            return {}
+        return {
+            table: table.get_column_types(split_columns=instance.split_multiselects)
+            for table in instance.selected_tables
+        }
+
     def write(self, table, row):
         """
         Write the given row to the given table of the export.
@@ -111,6 +132,24 @@ class _ExportWriter(object):
             )])
         ])
 
+    def write_rows(self, table, rows):
+        """
+        Write the given rows to the given table of the export.
+        :param table: A TableConfiguration
+        :param rows: A list of ExportRows
+        """
+        return self.writer.write([
+            (table, [
+                FormattedRow(
+                    data=row.data,
+                    hyperlink_column_indices=row.hyperlink_column_indices,
+                    skip_excel_formatting=row.skip_excel_formatting
+                    if hasattr(row, 'skip_excel_formatting') else ()
+                )
+                for row in rows
+            ])
+        ])
+
     def get_preview(self):
         return self.writer.get_preview()
 
@@ -136,13 +175,18 @@ class _PaginatedExportWriter(object):
         self.name = self._get_name(export_instances)
         self.headers = self._get_headers(export_instances)
         self.table_names = self._get_table_names(export_instances)
+        self.column_types = self._get_column_types(export_instances)
 
         with open(self.path, 'wb') as file_handle:
             self.writer.open(
                 self._get_paginated_headers().items(),
                 file_handle,
                 table_titles=self._get_paginated_table_titles(),
-                archive_basepath=self.name
+                archive_basepath=self.name,
+                column_types={
+                    self._paged_table_index(table): column_types
+                    for table, column_types in self.column_types.items()
+                },
             )
             try:
                 yield
@@ -176,6 +220,19 @@ class _PaginatedExportWriter(object):
 
         return headers
 
+    def _get_column_types(self, export_instances):
+        '''
+        Returns a dictionary that maps all TableConfigurations in the list of ExportInstances to an
+        array of column types, if the writer uses column types
+        '''
+        if not self.writer.has_typed_columns:
+            return {}
+        return {
+            table: table.get_column_types(split_columns=instance.split_multiselects)
+            for instance in export_instances
+            for table in instance.selected_tables
+        }
+
     def _get_table_names(self, export_instances):
         '''
         Returns a dictionary that maps all TableConfigurations in the list of ExportInstances to a
@@ -257,11 +314,16 @@ class _PaginatedExportWriter(object):
                 self._paged_table_index(table),
                 self._get_paginated_headers()[self._paged_table_index(table)][0],
                 table_title=self._get_paginated_table_titles()[self._paged_table_index(table)],
+                column_types=self.column_types.get(table),
             )
 
         self.writer.write([(self._paged_table_index(table), [FormattedRow(data=row.data)])])
         self.rows_written[table] += 1
 
+    def write_rows(self, table, rows):
+        for row in rows:
+            self.write(table, row)
+
 
 def get_export_writer(export_instances, temp_path, allow_pagination=True):
     """
@@ -274,7 +336,11 @@ def get_export_writer(export_instances, temp_path, allow_pagination=True):
         format = export_instances[0].export_format
         format_data_in_excel = export_instances[0].format_data_in_excel
 
-    legacy_writer = get_writer(format, use_formatted_cells=format_data_in_excel)
+    legacy_writer = get_writer(
+        format,
+        use_formatted_cells=format_data_in_excel,
+        streaming_xlsx=STREAMING_XLSX_EXPORTS.enabled(export_instances[0].domain),
+    )
 
     if allow_pagination and PAGINATED_EXPORTS.enabled(export_instances[0].domain):
         writer = _PaginatedExportWriter(legacy_writer, temp_path)
@@ -305,11 +371,19 @@ def get_export_file(export_instances, es_filters, temp_path, progress_tracker=No
     """
     Return an export file for the given ExportInstance and list of filters
     """
+    from corehq.apps.export.multiprocess import (
+        get_export_slices,
+        write_export_instance_in_parallel,
+    )
     writer = get_export_writer(export_instances, temp_path)
     with writer.open(export_instances):
         for export_instance in export_instances:
-            docs = get_export_documents(export_instance, es_filters, are_filters_es_formatted=True)
-            write_export_instance(writer, export_instance, docs, progress_tracker)
+            slices = get_export_slices(export_instance, es_filters)
+            if slices:
+                write_export_instance_in_parallel(writer, export_instance, es_filters, slices, progress_tracker)
+            else:
+                docs = get_export_documents(export_instance, es_filters, are_filters_es_formatted=True)
+                write_export_instance(writer, export_instance, docs, progress_tracker)
 
     return ExportFile(writer.path, writer.format)
 
@@ -352,31 +426,63 @@ def write_export_instance(writer, export_instance, documents, progress_tracker=N
         if progress_tracker:
             progress_manager.set_progress(0, documents.count)
 
+            def set_progress(num_documents):
+                progress_manager.set_progress(num_documents, documents.count)
+        else:
+            set_progress = None
+
         start = _time_in_milliseconds()
-        total_bytes = 0
-        total_rows = 0
-        track_load = load_counter(export_instance.type, "export", export_instance.domain)
+        total_bytes, total_rows = write_export_rows(writer, export_instance, documents, set_progress)
 
-        for row_number, doc in enumerate(documents):
-            total_bytes += sys.getsizeof(doc)
-            for table in export_instance.selected_tables:
+    end = _time_in_milliseconds()
+    tags = {'format': writer.format}
+    _record_datadog_export_duration(end - start, total_bytes, total_rows, tags)
+    _record_export_duration(end - start, export_instance)
+
+
+def write_export_rows(writer, export_instance, documents, set_progress=None):
+    """
+    Write the rows of the given documents to the given open _Writer.
+    :param set_progress: Optional function that is called with the number
+    of documents written so far
+    :return: The size in bytes of the documents and the number of rows written
+    """
+    total_bytes = 0
+    total_rows = 0
+    track_load = load_counter(export_instance.type, "export", export_instance.domain)
+
+    if COLUMNAR_EXPORTS.enabled(export_instance.domain):
+        compiled_tables = [
+            (table, CompiledTable(
+                table,
+                split_columns=export_instance.split_multiselects,
+                transform_dates=export_instance.transform_dates,
+            ))
+            for table in export_instance.selected_tables
+        ]
+        row_number = 0
+        for page in chunked(documents, COLUMNAR_EXPORT_PAGE_SIZE, list):
+            total_bytes += sum(sys.getsizeof(doc) for doc in page)
+            for table, compiled_table in compiled_tables:
                 try:
-                    rows = table.get_rows(
-                        doc,
-                        row_number,
-                        split_columns=export_instance.split_multiselects,
-                        transform_dates=export_instance.transform_dates,
-                    )
-                except Exception as e:
-                    notify_exception(None, "Error exporting doc", details={
-                        'domain': export_instance.domain,
-                        'export_instance_id': export_instance.get_id,
-                        'export_table': table.label,
-                        'doc_id': doc.get('_id'),
-                    })
-                    e.sentry_capture = False
+                    rows = compiled_table.get_rows(page, row_number)
+                except Exception:
+                    # find the document that failed
+                    for page_row_number, doc in enumerate(page, row_number):
+                        _get_document_rows(export_instance, table, doc, page_row_number)
                     raise
+                writer.write_rows(table, rows)
+                total_rows += len(rows)
 
+            row_number += len(page)
+            track_load(len(page))
+            if set_progress:
+                set_progress(row_number)
+    else:
+        for row_number, doc in enumerate(documents):
+            total_bytes += sys.getsizeof(doc)
+            for table in export_instance.selected_tables:
+                rows = _get_document_rows(export_instance, table, doc, row_number)
                 for row in rows:
                     # It might be bad to write one row at a time from a performance perspective.
                     # Regardless, we should handle the batching of rows in the _Writer class, not here.
@@ -385,13 +491,28 @@ def write_export_instance(writer, export_instance, documents, progress_tracker=N
                 total_rows += len(rows)
 
             track_load()
-            if progress_tracker:
-                progress_manager.set_progress(row_number + 1, documents.count)
+            if set_progress:
+                set_progress(row_number + 1)
+    return total_bytes, total_rows
 
-    end = _time_in_milliseconds()
-    tags = {'format': writer.format}
-    _record_datadog_export_duration(end - start, total_bytes, total_rows, tags)
-    _record_export_duration(end - start, export_instance)
+
+def _get_document_rows(export_instance, table, doc, row_number):
+    try:
+        return table.get_rows(
+            doc,
+            row_number,
+            split_columns=export_instance.split_multiselects,
+            transform_dates=export_instance.transform_dates,
+        )
+    except Exception as e:
+        notify_exception(None, "Error exporting doc", details={
+            'domain': export_instance.domain,
+            'export_instance_id': export_instance.get_id,
+            'export_table': table.label,
+            'doc_id': doc.get('_id'),
+        })
+        e.sentry_capture = False
+        raise
 
 
 def _time_in_milliseconds():
@@ -434,6 +555,14 @@ def rebuild_export(export_instance, progress_tracker):
     """
     Rebuild the given daily saved ExportInstance
     """
+    from corehq.apps.export.models.incremental import (
+        rebuild_export_incrementally,
+        uses_incremental_rebuild,
+    )
+    if uses_incremental_rebuild(export_instance):
+        rebuild_export_incrementally(export_instance, progress_tracker)
+        return
+
     filters = export_instance.get_filters() or []
     es_filters = [f.to_es_filter() for f in filters]
     with TransientTempfile() as temp_path:
@@ -0,0 +1,203 @@
+import random
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+
+from dimagi.utils.chunked import chunked
+
+from corehq.apps.export.columnar import CompiledTable
+from corehq.apps.export.const import COLUMNAR_EXPORT_PAGE_SIZE
+from corehq.apps.export.models import (
+    ExportColumn,
+    GeopointItem,
+    MultipleChoiceItem,
+    Option,
+    PathNode,
+    RowNumberColumn,
+    ScalarItem,
+    SplitExportColumn,
+    SplitGPSExportColumn,
+    TableConfiguration,
+)
+
+DOMAIN = 'columnar-export-benchmark'
+OPTIONS = ['a', 'b', 'c', 'd']
+
+
+class Command(BaseCommand):
+    help = """Compare the rows/second of row by row and columnar export row generation
+
+    Generates synthetic form submissions with text, date, multiple choice
+    and GPS questions and a repeat group, and builds the rows of the main
+    and repeat tables of a form export with `TableConfiguration.get_rows`
+    and with `CompiledTable.get_rows`. Checks that both return the same
+    rows. Writing the rows to a file is not included.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--forms', type=int, default=10000,
+                            help="Number of forms to export (default 10000).")
+        parser.add_argument('--questions', type=int, default=20,
+                            help="Number of questions of each type in a form (default 20).")
+        parser.add_argument('--repeats', type=int, default=3,
+                            help="Number of repeat group iterations in a form (default 3).")
+        parser.add_argument('--page-size', type=int, default=COLUMNAR_EXPORT_PAGE_SIZE,
+                            help="Number of forms in a columnar page.")
+        parser.add_argument('--split-multiselects', action='store_true', default=False)
+        parser.add_argument('--transform-dates', action='store_true', default=False)
+        parser.add_argument('--repeat', type=int, default=3,
+                            help="Number of times to time each engine. The fastest time is reported.")
+
+    def handle(self, forms, questions, repeats, page_size, split_multiselects, transform_dates, repeat,
+               **options):
+        rng = random.Random(0)
+        docs = [get_synthetic_form(rng, questions, repeats) for _ in range(forms)]
+        tables = get_synthetic_tables(questions)
+        compiled_tables = [
+            CompiledTable(table, split_columns=split_multiselects, transform_dates=transform_dates)
+            for table in tables
+        ]
+
+        def get_rows_row_by_row():
+            return [
+                [
+                    row.data
+                    for row_number, doc in enumerate(docs)
+                    for row in table.get_rows(
+                        doc, row_number, split_columns=split_multiselects, transform_dates=transform_dates)
+                ]
+                for table in tables
+            ]
+
+        def get_rows_columnar():
+            all_rows = [[] for _ in compiled_tables]
+            row_number = 0
+            for page in chunked(docs, page_size, list):
+                for rows, compiled_table in zip(all_rows, compiled_tables):
+                    rows.extend(row.data for row in compiled_table.get_rows(page, row_number))
+                row_number += len(page)
+            return all_rows
+
+        row_by_row_rows = get_rows_row_by_row()
+        if get_rows_columnar() != row_by_row_rows:
+            print("Columnar rows differ from row by row rows")
+        num_rows = sum(len(rows) for rows in row_by_row_rows)
+
+        print("{:<12} {:>8} {:>10} {:>14}".format("engine", "rows", "seconds", "rows/second"))
+        results = {}
+        for name, get_rows in [('row by row', get_rows_row_by_row), ('columnar', get_rows_columnar)]:
+            results[name] = seconds = _time(get_rows, repeat)
+            print("{:<12} {:>8} {:>10.2f} {:>14.0f}".format(name, num_rows, seconds, num_rows / seconds))
+        print("\nSpeedup: {:.2f}x".format(results['row by row'] / results['columnar']))
+
+
+def get_synthetic_form(rng, questions, repeats):
+    form = {
+        '@xmlns': 'http://openrosa.org/formdesigner/columnar-export-benchmark',
+        'meta': {
+            'instanceID': uuid.UUID(int=rng.getrandbits(128)).hex,
+            'timeEnd': '2021-{:02d}-{:02d}T10:{:02d}:00.000000Z'.format(
+                rng.randint(1, 12), rng.randint(1, 28), rng.randint(0, 59)),
+            'username': 'user{}'.format(rng.randint(0, 50)),
+        },
+        'repeat': [
+            {'item': 'item{}'.format(rng.randint(0, 20)), 'quantity': str(rng.randint(0, 100))}
+            for _ in range(rng.randint(0, repeats))
+        ],
+    }
+    for index in range(questions):
+        # some questions are not answered
+        if rng.random() < 0.9:
+            form['text{}'.format(index)] = rng.choice(['yes', 'no', 'maybe', '', 'text {}'.format(index)])
+        if rng.random() < 0.9:
+            form['date{}'.format(index)] = '20{:02d}-{:02d}-{:02d}'.format(
+                rng.randint(0, 21), rng.randint(1, 12), rng.randint(1, 28))
+        if rng.random() < 0.9:
+            form['choice{}'.format(index)] = ' '.join(rng.sample(OPTIONS + ['e'], rng.randint(0, 3)))
+        if rng.random() < 0.9:
+            form['gps{}'.format(index)] = '{:.5f} {:.5f} 0.0 {}'.format(
+                rng.uniform(-90, 90), rng.uniform(-180, 180), rng.randint(1, 50))
+    return {
+        '_id': uuid.UUID(int=rng.getrandbits(128)).hex,
+        'domain': DOMAIN,
+        'doc_type': 'XFormInstance',
+        'received_on': form['meta']['timeEnd'],
+        'form': form,
+    }
+
+
+def get_synthetic_tables(questions):
+    """The main table and repeat table of a form export of `get_synthetic_form` forms"""
+    def path(*names, repeat=False):
+        return [PathNode(name='form')] + [
+            PathNode(name=name, is_repeat=repeat and index == 0) for index, name in enumerate(names)
+        ]
+
+    main_columns = [
+        RowNumberColumn(label='number', selected=True),
+        ExportColumn(label='formid', item=ScalarItem(path=[PathNode(name='_id')]), selected=True),
+        ExportColumn(
+            label='received_on',
+            item=ScalarItem(path=[PathNode(name='received_on')], datatype='datetime'),
+            selected=True,
+        ),
+        ExportColumn(label='username', item=ScalarItem(path=path('meta', 'username')), selected=True),
+    ]
+    for index in range(questions):
+        main_columns.extend([
+            ExportColumn(
+                label='text{}'.format(index),
+                item=ScalarItem(path=path('text{}'.format(index)), datatype='string'),
+                selected=True,
+            ),
+            ExportColumn(
+                label='date{}'.format(index),
+                item=ScalarItem(path=path('date{}'.format(index)), datatype='date'),
+                selected=True,
+            ),
+            SplitExportColumn(
+                label='choice{}'.format(index),
+                item=MultipleChoiceItem(
+                    path=path('choice{}'.format(index)),
+                    options=[Option(value=option) for option in OPTIONS],
+                ),
+                selected=True,
+            ),
+            SplitGPSExportColumn(
+                label='gps{}'.format(index),
+                item=GeopointItem(path=path('gps{}'.format(index))),
+                selected=True,
+            ),
+        ])
+    repeat_columns = [
+        RowNumberColumn(label='number', selected=True),
+        ExportColumn(
+            label='item',
+            item=ScalarItem(path=path('repeat', 'item', repeat=True)),
+            selected=True,
+        ),
+        ExportColumn(
+            label='quantity',
+            item=ScalarItem(path=path('repeat', 'quantity', repeat=True), datatype='integer'),
+            selected=True,
+        ),
+    ]
+    return [
+        TableConfiguration(label='Forms', path=[], columns=main_columns, selected=True),
+        TableConfiguration(
+            label='Repeat',
+            path=path('repeat', repeat=True),
+            columns=repeat_columns,
+            selected=True,
+        ),
+    ]
+
+
+def _time(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
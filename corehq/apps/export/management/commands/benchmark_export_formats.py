@@ -0,0 +1,76 @@
+import os
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from couchexport.export import get_writer
+from couchexport.models import Format
+from dimagi.utils.chunked import chunked
+
+from corehq.apps.export.columnar import CompiledTable
+from corehq.apps.export.const import COLUMNAR_EXPORT_PAGE_SIZE
+from corehq.apps.export.export import _ExportWriter
+from corehq.apps.export.management.commands.benchmark_columnar_exports import (
+    DOMAIN,
+    get_synthetic_form,
+    get_synthetic_tables,
+)
+from corehq.apps.export.models import FormExportInstance
+from corehq.util.files import TransientTempfile
+
+
+class Command(BaseCommand):
+    help = """Compare the size and build time of an export in several file formats
+
+    Writes a form export of synthetic form submissions (see
+    `benchmark_columnar_exports`) with text, date, multiple choice and GPS
+    questions and a repeat group to a file in each format, and reports the
+    time it took and the size of the file.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--forms', type=int, default=10000,
+                            help="Number of forms to export (default 10000).")
+        parser.add_argument('--questions', type=int, default=20,
+                            help="Number of questions of each type in a form (default 20).")
+        parser.add_argument('--repeats', type=int, default=3,
+                            help="Number of repeat group iterations in a form (default 3).")
+        parser.add_argument('--formats', nargs='+', default=[Format.CSV, Format.XLS_2007, Format.PARQUET])
+        parser.add_argument('--split-multiselects', action='store_true', default=False)
+
+    def handle(self, forms, questions, repeats, formats, split_multiselects, **options):
+        rng = random.Random(0)
+        docs = [get_synthetic_form(rng, questions, repeats) for _ in range(forms)]
+        export_instance = FormExportInstance(
+            domain=DOMAIN,
+            name='Benchmark',
+            tables=get_synthetic_tables(questions),
+            split_multiselects=split_multiselects,
+        )
+
+        print("{:<10} {:>10} {:>14}".format("format", "seconds", "size (bytes)"))
+        for format in formats:
+            with TransientTempfile() as path:
+                start = time.perf_counter()
+                _write_export(export_instance, docs, format, path)
+                seconds = time.perf_counter() - start
+                print("{:<10} {:>10.2f} {:>14}".format(format, seconds, os.path.getsize(path)))
+
+
+def _write_export(export_instance, docs, format, path):
+    writer = _ExportWriter(get_writer(format), path)
+    compiled_tables = [
+        (table, CompiledTable(
+            table,
+            split_columns=export_instance.split_multiselects,
+            transform_dates=export_instance.transform_dates,
+        ))
+        for table in export_instance.selected_tables
+    ]
+    with writer.open([export_instance]):
+        row_number = 0
+        for page in chunked(docs, COLUMNAR_EXPORT_PAGE_SIZE, list):
+            for table, compiled_table in compiled_tables:
+                writer.write_rows(table, compiled_table.get_rows(page, row_number))
+            row_number += len(page)
@@ -0,0 +1,92 @@
+import multiprocessing
+import os
+import random
+import resource
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+
+from couchexport.writers import Excel2007ExportWriter, Excel2007StreamingExportWriter
+from dimagi.utils.chunked import chunked
+
+from corehq.util.files import TransientTempfile
+
+WRITERS = {
+    'openpyxl': lambda use_formatted_cells: Excel2007ExportWriter(
+        use_formatted_cells=use_formatted_cells),
+    'streaming': lambda use_formatted_cells: Excel2007StreamingExportWriter(
+        use_formatted_cells=use_formatted_cells),
+    'streaming-shared-strings': lambda use_formatted_cells: Excel2007StreamingExportWriter(
+        use_formatted_cells=use_formatted_cells, use_shared_strings=True),
+}
+
+
+class Command(BaseCommand):
+    help = """Compare the peak memory use of the Excel 2007+ export writers
+
+    Writes a table of synthetic rows with each writer in a new process, and
+    reports the time it took, the size of the file and how much the peak
+    resident set size of the process grew while writing it.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[100000, 1000000],
+                            help="Numbers of rows to export (default 100000 1000000).")
+        parser.add_argument('--columns', type=int, default=30,
+                            help="Number of columns (default 30).")
+        parser.add_argument('--writers', nargs='+', choices=list(WRITERS), default=list(WRITERS))
+        parser.add_argument('--use-formatted-cells', action='store_true', default=False)
+
+    def handle(self, rows, columns, writers, use_formatted_cells, **options):
+        print("{:<26} {:>8} {:>10} {:>14} {:>16}".format(
+            "writer", "rows", "seconds", "size (bytes)", "peak RSS (MiB)"))
+        context = multiprocessing.get_context('fork')
+        for num_rows in rows:
+            for writer_name in writers:
+                with context.Pool(1) as pool:
+                    seconds, size, peak_rss = pool.apply(
+                        _benchmark_writer, (writer_name, num_rows, columns, use_formatted_cells))
+                print("{:<26} {:>8} {:>10.2f} {:>14} {:>16.1f}".format(
+                    writer_name, num_rows, seconds, size, peak_rss / 2 ** 20))
+
+
+def _benchmark_writer(writer_name, num_rows, num_columns, use_formatted_cells):
+    start_peak_rss = _get_peak_rss()
+    writer = WRITERS[writer_name](use_formatted_cells)
+    with TransientTempfile() as path:
+        start = time.perf_counter()
+        with open(path, 'wb') as file:
+            writer.open([('Rows', [['column{}'.format(index) for index in range(num_columns)]])], file)
+            for rows in chunked(_get_rows(num_rows, num_columns), 1000, list):
+                writer.write([('Rows', rows)])
+            writer.close()
+        seconds = time.perf_counter() - start
+        size = os.path.getsize(path)
+    return seconds, size, _get_peak_rss() - start_peak_rss
+
+
+def _get_peak_rss():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _get_rows(num_rows, num_columns):
+    """Rows with ids, choices, numbers, dates and free text, like form exports"""
+    rng = random.Random(0)
+    for row_number in range(num_rows):
+        row = []
+        for index in range(num_columns):
+            column_type = index % 5
+            if column_type == 0:
+                row.append(uuid.UUID(int=rng.getrandbits(128)).hex)
+            elif column_type == 1:
+                row.append(rng.choice(['yes', 'no', 'maybe', '---', '']))
+            elif column_type == 2:
+                row.append(str(rng.randint(0, 1000)))
+            elif column_type == 3:
+                row.append('20{:02d}-{:02d}-{:02d}'.format(
+                    rng.randint(0, 21), rng.randint(1, 12), rng.randint(1, 28)))
+            else:
+                row.append('text {} {}'.format(row_number, index))
+        yield row
@@ -0,0 +1,31 @@
+# Generated by Django 2.2.24 on 2026-10-18 12:00
+
+import uuid
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('export', '0012_defaultexportsettings_remove_duplicates_option'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySavedExportPart',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('export_instance_id', models.CharField(db_index=True, max_length=126)),
+                ('period', models.CharField(max_length=16)),
+                ('config_hash', models.CharField(max_length=32)),
+                ('doc_count', models.IntegerField()),
+                ('built_at', models.DateTimeField()),
+                ('blob_key', models.UUIDField(default=uuid.uuid4)),
+                ('date_modified', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'unique_together': {('export_instance_id', 'period')},
+            },
+        ),
+    ]
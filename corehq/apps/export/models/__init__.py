@@ -43,6 +43,7 @@ from .new import (
 )
 
 from .incremental import (
+    DailySavedExportPart,
     IncrementalExport,
     IncrementalExportCheckpoint
 )
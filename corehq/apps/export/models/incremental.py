@@ -1,21 +1,48 @@
+import gzip
+import hashlib
+import json
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
 from uuid import uuid4
 
 from django.db import models
 
 from couchexport.models import Format
-
+from soil.progress import TaskProgressManager
+
+from corehq import toggles
+from corehq.apps.es import filters as es_filters
+from corehq.apps.es.aggregations import (
+    DateHistogram,
+    MaxAggregation,
+    MissingAggregation,
+)
+from corehq.apps.export.const import (
+    CASE_EXPORT,
+    CASE_NAME_TRANSFORM,
+    CASE_OR_USER_ID_TRANSFORM,
+    FORM_EXPORT,
+    OWNER_ID_TRANSFORM,
+    USERNAME_TRANSFORM,
+)
 from corehq.apps.export.dbaccessors import get_properly_wrapped_export_instance
 from corehq.apps.export.export import (
     ExportFile,
+    _record_export_duration,
+    _time_in_milliseconds,
     get_export_query,
     get_export_writer,
+    save_export_payload,
     write_export_instance,
+    write_export_rows,
 )
 from corehq.apps.export.filters import ServerModifiedOnRangeFilter
+from corehq.apps.export.models.new import ExportRow, StockExportColumn
 from corehq.blobs import CODES, get_blob_db
+from corehq.elastic import iter_es_docs_from_query
 from corehq.motech.models import RequestLog
 from corehq.util.files import TransientTempfile
-from corehq.util.metrics import metrics_track_errors
+from corehq.util.metrics import metrics_counter, metrics_track_errors
 
 
 class IncrementalExport(models.Model):
@@ -163,3 +190,350 @@ def _send_incremental_export(export, checkpoint):
 
 def _get_requests(checkpoint, export):
     return export.connection_settings.get_requests(checkpoint.id, checkpoint.log_request)
+
+
+# The date field that the documents of incremental daily saved exports are partitioned by.
+# These are the fields that the exports are sorted by, so the parts are in export order.
+PARTITION_FIELDS = {
+    FORM_EXPORT: 'received_on',
+    CASE_EXPORT: 'opened_on',
+}
+MISSING_PERIOD = 'missing'
+# Documents can be indexed in Elasticsearch some time after they are modified
+ES_INDEXING_MARGIN = timedelta(hours=1)
+
+
+class DailySavedExportPart(models.Model):
+    """
+    The rows of a daily saved export for the documents of one month.
+
+    Incremental daily saved exports are stitched together from their parts,
+    and each part is the checkpoint of its month: it is only rebuilt when a
+    document of the month was modified after it was built, or the number of
+    documents in the month changed (for example when a form is archived or
+    deleted), or the export's configuration changed. If a rebuild fails, the
+    parts that were completed are not rebuilt again.
+    """
+    export_instance_id = models.CharField(max_length=126, db_index=True)
+    period = models.CharField(max_length=16)
+    config_hash = models.CharField(max_length=32)
+    doc_count = models.IntegerField()
+    # documents modified after this are not included in the part
+    built_at = models.DateTimeField()
+    blob_key = models.UUIDField(default=uuid4)
+    date_modified = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('export_instance_id', 'period')
+
+    def is_stale(self, doc_count, last_modified, config_hash):
+        return (
+            self.config_hash != config_hash
+            or self.doc_count != doc_count
+            or (last_modified is not None and last_modified > self.built_at)
+        )
+
+    def get_blob(self):
+        db = get_blob_db()
+        return db.get(key=str(self.blob_key), type_code=CODES.data_export)
+
+    def delete(self, *args, **kwargs):
+        get_blob_db().delete(key=str(self.blob_key))
+        return super().delete(*args, **kwargs)
+
+
+# transforms that look up other users, owners or cases, which can be
+# renamed without the exported documents being modified
+RELATED_DOC_TRANSFORMS = {
+    CASE_NAME_TRANSFORM,
+    CASE_OR_USER_ID_TRANSFORM,
+    OWNER_ID_TRANSFORM,
+    USERNAME_TRANSFORM,
+}
+
+
+def uses_incremental_rebuild(export_instance):
+    return (
+        export_instance.type in PARTITION_FIELDS
+        and toggles.INCREMENTAL_DAILY_SAVED_EXPORTS.enabled(export_instance.domain)
+        and not any(
+            _uses_other_documents(column)
+            for table in export_instance.selected_tables
+            for column in table.selected_columns
+        )
+    )
+
+
+def _uses_other_documents(column):
+    """Check if the values of a column can change without the exported
+    document being modified, in which case parts that were not rebuilt
+    would have stale values
+    """
+    # ledger values change without their case being modified
+    if isinstance(column, StockExportColumn):
+        return True
+    return column.item.transform in RELATED_DOC_TRANSFORMS
+
+
+def rebuild_export_incrementally(export_instance, progress_tracker=None):
+    """
+    Rebuild the parts of a daily saved export whose documents changed,
+    and save the export of all of its parts as its payload.
+    """
+    start = _time_in_milliseconds()
+    partition_field = PARTITION_FIELDS[export_instance.type]
+    query = get_export_query(export_instance, export_instance.get_filters() or [])
+    config_hash = get_export_config_hash(export_instance)
+    periods = _get_periods(query, partition_field)
+
+    parts = {
+        part.period: part
+        for part in DailySavedExportPart.objects.filter(export_instance_id=export_instance.get_id)
+    }
+    for period in list(parts):
+        if period not in periods:
+            parts.pop(period).delete()
+    stale_periods = [
+        period for period, (doc_count, last_modified) in periods.items()
+        if period not in parts or parts[period].is_stale(doc_count, last_modified, config_hash)
+    ]
+
+    tags = {'domain': export_instance.domain, 'type': export_instance.type}
+    metrics_counter('commcare.export.incremental.parts_rebuilt', len(stale_periods), tags=tags)
+    metrics_counter('commcare.export.incremental.parts_reused', len(periods) - len(stale_periods), tags=tags)
+
+    with TaskProgressManager(progress_tracker, src="export") as progress_manager:
+        total_docs = sum(periods[period][0] for period in stale_periods)
+        docs_done = 0
+        for period in sorted(stale_periods, key=_period_sort_key):
+            part = parts.get(period) or DailySavedExportPart(
+                export_instance_id=export_instance.get_id,
+                period=period,
+            )
+
+            def set_progress(num_documents):
+                if progress_tracker:
+                    progress_manager.set_progress(docs_done + num_documents, total_docs)
+
+            parts[period] = _build_part(
+                part, export_instance, _filter_period(query, partition_field, period), config_hash, set_progress
+            )
+            docs_done += periods[period][0]
+
+    with TransientTempfile() as temp_path:
+        export_file = _stitch_parts(
+            export_instance, [parts[period] for period in sorted(parts, key=_period_sort_key)], temp_path
+        )
+        with export_file as payload:
+            save_export_payload(export_instance, payload)
+    _record_export_duration(_time_in_milliseconds() - start, export_instance)
+
+
+def get_export_config_hash(export_instance):
+    """A hash of the settings of an export that the rows of its parts depend on"""
+    config = {
+        'tables': [table.to_json() for table in export_instance.selected_tables],
+        'split_multiselects': export_instance.split_multiselects,
+        'transform_dates': export_instance.transform_dates,
+        'filters': export_instance.filters.to_json(),
+        'identifier': export_instance.identifier,
+        'app_id': export_instance.app_id,
+        'include_errors': getattr(export_instance, 'include_errors', None),
+    }
+    return hashlib.md5(json.dumps(config, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def _get_periods(query, partition_field):
+    """
+    :return: A dict of the months of the documents of the query to
+    their number of documents and the time the last one was modified
+    """
+    results = (
+        query
+        .aggregation(
+            DateHistogram('periods', partition_field, DateHistogram.Interval.MONTH)
+            .aggregation(MaxAggregation('last_modified', 'server_modified_on'))
+        )
+        .aggregation(
+            MissingAggregation('missing_period', partition_field)
+            .aggregation(MaxAggregation('last_modified', 'server_modified_on'))
+        )
+        .size(0)
+        .run()
+    )
+    buckets = [
+        (bucket['key_as_string'], bucket)
+        for bucket in results.aggregations.periods.raw_buckets
+    ]
+    buckets.append((MISSING_PERIOD, results.aggregations.missing_period.result))
+    return {
+        period: (bucket['doc_count'], _from_es_timestamp(bucket['last_modified']['value']))
+        for period, bucket in buckets
+        if bucket.get('doc_count')
+    }
+
+
+def _from_es_timestamp(value):
+    if value is None:
+        return None
+    return datetime.utcfromtimestamp(value / 1000)
+
+
+def _period_sort_key(period):
+    # documents without a date are sorted last
+    return (period == MISSING_PERIOD, period)
+
+
+def _filter_period(query, partition_field, period):
+    if period == MISSING_PERIOD:
+        return query.filter(es_filters.missing(partition_field))
+    start = datetime.strptime(period, '%Y-%m')
+    end = (start + timedelta(days=31)).replace(day=1)
+    return query.filter(es_filters.date_range(partition_field, gte=start, lt=end))
+
+
+def _build_part(part, export_instance, query, config_hash, set_progress):
+    built_at = datetime.utcnow() - ES_INDEXING_MARGIN
+    doc_count = 0
+
+    def count_documents(num_documents):
+        nonlocal doc_count
+        doc_count = num_documents
+        set_progress(num_documents)
+
+    old_blob_key = part.blob_key if part.pk else None
+    part.blob_key = uuid4()
+    with TransientTempfile() as temp_path:
+        with gzip.open(temp_path, 'wt', encoding='utf-8') as file_:
+            writer = PartWriter(file_, export_instance)
+            write_export_rows(writer, export_instance, iter_es_docs_from_query(query), count_documents)
+        with open(temp_path, 'rb') as file_:
+            get_blob_db().put(
+                file_,
+                domain=export_instance.domain,
+                parent_id=export_instance.get_id,
+                type_code=CODES.data_export,
+                key=str(part.blob_key),
+            )
+
+    part.config_hash = config_hash
+    part.doc_count = doc_count
+    part.built_at = built_at
+    part.save()
+    if old_blob_key is not None:
+        get_blob_db().delete(key=str(old_blob_key))
+    return part
+
+
+def _stitch_parts(export_instance, parts, temp_path):
+    writer = get_export_writer([export_instance], temp_path)
+    with writer.open([export_instance]):
+        first_row_number = 0
+        for part in parts:
+            with part.get_blob() as blob, gzip.open(blob, 'rt', encoding='utf-8') as file_:
+                write_part_rows(writer, export_instance, file_, first_row_number)
+            first_row_number += part.doc_count
+    return ExportFile(writer.path, writer.format)
+
+
+def write_part_rows(writer, export_instance, file_, first_row_number):
+    """
+    Write the rows of a file written by a PartWriter to an open _Writer
+    :param first_row_number: The number of the first document of the part
+    in the export
+    :return: The number of rows written
+    """
+    tables = export_instance.selected_tables
+    hyperlink_column_indices = [
+        table.get_hyperlink_column_indices(export_instance.split_multiselects)
+        for table in tables
+    ]
+    num_rows = 0
+    for table_index, row_data, skip_excel_formatting in iter_part_rows(file_):
+        offset_row_numbers(row_data, skip_excel_formatting, first_row_number)
+        writer.write(tables[table_index], ExportRow(
+            data=row_data,
+            hyperlink_column_indices=hyperlink_column_indices[table_index],
+            skip_excel_formatting=skip_excel_formatting,
+        ))
+        num_rows += 1
+    return num_rows
+
+
+class PartWriter(object):
+    """Writes the rows of an export to a file of JSON lines
+
+    Each line is the index of the row's table in the export's selected
+    tables, the row's data and its `skip_excel_formatting` indices, which
+    are the indices of the row number cells. Values of types that JSON
+    does not have (see `PART_VALUE_TYPES`) are written as objects with
+    their type, so they are read back as the same type.
+    """
+    def __init__(self, file_, export_instance):
+        self.file = file_
+        self.table_indices = {
+            id(table): index for index, table in enumerate(export_instance.selected_tables)
+        }
+
+    def write(self, table, row):
+        self.write_rows(table, [row])
+
+    def write_rows(self, table, rows):
+        table_index = self.table_indices[id(table)]
+        for row in rows:
+            self.file.write(json.dumps(
+                [table_index, row.data, list(row.skip_excel_formatting)],
+                default=_encode_part_value,
+            ))
+            self.file.write('\n')
+
+
+def iter_part_rows(file_):
+    for line in file_:
+        yield json.loads(line, object_hook=_decode_part_value)
+
+
+# Types of export values that are not JSON types, with their names and
+# functions to convert them to and from strings. datetime is before date
+# because it is a subclass of date.
+PART_VALUE_TYPES = [
+    (datetime, 'datetime', datetime.isoformat, datetime.fromisoformat),
+    (date, 'date', date.isoformat, date.fromisoformat),
+    (time, 'time', time.isoformat, time.fromisoformat),
+    (Decimal, 'decimal', str, Decimal),
+]
+PART_VALUE_DECODERS = {name: from_string for type_, name, to_string, from_string in PART_VALUE_TYPES}
+
+
+def _encode_part_value(value):
+    for type_, name, to_string, from_string in PART_VALUE_TYPES:
+        if isinstance(value, type_):
+            return {'__type__': name, 'value': to_string(value)}
+    raise TypeError('Object of type {} is not JSON serializable'.format(type(value).__name__))
+
+
+def _decode_part_value(obj):
+    if '__type__' in obj:
+        return PART_VALUE_DECODERS[obj['__type__']](obj['value'])
+    return obj
+
+
+def offset_row_numbers(row_data, skip_excel_formatting, offset):
+    """
+    Add offset to the document numbers in the row number cells of a row.
+
+    The cells of a RowNumberColumn are its row index joined with '.'
+    (e.g. "3.0.1"), followed by the numbers of the row index for repeat
+    tables (3, 0, 1), where the first number is the document's number.
+    """
+    if not offset:
+        return
+    previous_index = previous_value = None
+    for index in skip_excel_formatting:
+        value = row_data[index]
+        if isinstance(value, str):
+            number, separator, rest = value.partition('.')
+            row_data[index] = str(int(number) + offset) + separator + rest
+        elif isinstance(previous_value, str) and index == previous_index + 1:
+            row_data[index] = value + offset
+        previous_index, previous_value = index, value
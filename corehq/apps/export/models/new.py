@@ -22,7 +22,7 @@ from couchdbkit import (
 from memoized import memoized
 
 from casexml.apps.case.const import DEFAULT_CASE_INDEX_IDENTIFIERS
-from couchexport.models import Format
+from couchexport.models import ColumnType, Format
 from couchexport.transforms import couch_to_excel_datetime
 from dimagi.ext.couchdbkit import (
     DateProperty,
@@ -182,7 +182,8 @@ class ExportItem(DocumentSchema, ReadablePathMixin):
     tag = StringProperty()
     last_occurrences = DictProperty()
     transform = StringProperty(choices=list(TRANSFORM_FUNCTIONS))
-    # this is not used by exports, but other things that use this schema (e.g. app-based UCRs)
+    # used by other things that use this schema (e.g. app-based UCRs), and
+    # for the column types of export formats with typed columns
     datatype = StringProperty()
 
     # True if this item was inferred from different actions in HQ (i.e. case upload)
@@ -321,18 +322,7 @@ class ExportColumn(DocumentSchema):
             value = MISSING_VALUE
 
         if isinstance(value, list):
-            def _serialize(str_or_dict):
-                """
-                Serialize old data for scalar questions that were previously a repeat
-
-                This is a total edge case. See https://manage.dimagi.com/default.asp?280549.
-                """
-                if isinstance(str_or_dict, dict):
-                    return ','.join('{}={}'.format(k, v) for k, v in str_or_dict.items())
-                else:
-                    return str_or_dict
-
-            value = ' '.join(_serialize(elem) for elem in value)
+            value = _serialize_list_value(value)
         return value
 
     @staticmethod
@@ -417,6 +407,17 @@ class ExportColumn(DocumentSchema):
         else:
             return [self.label]
 
+    def get_column_types(self, split_column=False):
+        """
+        Return the ColumnType of each of the headers of the column, for
+        export formats with typed columns.
+        """
+        num_columns = len(self.get_headers(split_column=split_column))
+        if (num_columns == 1 and self.item.datatype in ColumnType.ALL
+                and not self.item.transform and not self.deid_transform):
+            return [self.item.datatype]
+        return [ColumnType.STRING] * num_columns
+
     @classmethod
     def wrap(cls, data):
         if cls is ExportColumn:
@@ -447,6 +448,21 @@ class ExportColumn(DocumentSchema):
             return super(ExportColumn, cls).wrap(data)
 
 
+def _serialize_list_value(value):
+    """
+    Serialize old data for scalar questions that were previously a repeat
+
+    This is a total edge case. See https://manage.dimagi.com/default.asp?280549.
+    """
+    def _serialize(str_or_dict):
+        if isinstance(str_or_dict, dict):
+            return ','.join('{}={}'.format(k, v) for k, v in str_or_dict.items())
+        else:
+            return str_or_dict
+
+    return ' '.join(_serialize(elem) for elem in value)
+
+
 class DocRow(namedtuple("DocRow", ["doc", "row"])):
     """
     DocRow represents a document and its row index.
@@ -489,6 +505,15 @@ class TableConfiguration(DocumentSchema, ReadablePathMixin):
             headers.extend(column.get_headers(split_column=split_columns))
         return headers
 
+    def get_column_types(self, split_columns=False):
+        """
+        Return a list of the ColumnType of each header
+        """
+        column_types = []
+        for column in self.selected_columns:
+            column_types.extend(column.get_column_types(split_column=split_columns))
+        return column_types
+
     def get_rows(self, document, row_number, split_columns=False,
                  transform_dates=False, as_json=False):
         """
@@ -2486,6 +2511,9 @@ class SplitUserDefinedExportColumn(ExportColumn):
             base_path,
             transform_dates=transform_dates
         )
+        return self._split_value(value)
+
+    def _split_value(self, value, split_column=False):
         if self.split_type == PLAIN_USER_DEFINED_SPLIT_TYPE:
             return value
 
@@ -2558,6 +2586,11 @@ class SplitGPSExportColumn(ExportColumn):
         ]
         return [header_template.format(header) for header_template in header_templates]
 
+    def get_column_types(self, split_column=False):
+        if not split_column:
+            return [ColumnType.STRING]
+        return [ColumnType.DECIMAL] * 4
+
     def get_value(self, domain, doc_id, doc, base_path, split_column=False, **kwargs):
         value = super(SplitGPSExportColumn, self).get_value(
             domain,
@@ -2566,6 +2599,9 @@ class SplitGPSExportColumn(ExportColumn):
             base_path,
             **kwargs
         )
+        return self._split_value(value, split_column)
+
+    def _split_value(self, value, split_column):
         if not split_column:
             return value
 
@@ -2615,6 +2651,9 @@ class SplitExportColumn(ExportColumn):
         doc is a form submission or instance of a repeat group in a submission or case
         """
         value = super(SplitExportColumn, self).get_value(domain, doc_id, doc, base_path, **kwargs)
+        return self._split_value(value, split_column)
+
+    def _split_value(self, value, split_column):
         if not split_column:
             return value
 
@@ -2671,6 +2710,10 @@ class RowNumberColumn(ExportColumn):
             headers += ["{}__{}".format(self.label, i) for i in range(self.repeat + 1)]
         return headers
 
+    def get_column_types(self, **kwargs):
+        num_columns = len(self.get_headers())
+        return [ColumnType.STRING] + [ColumnType.INTEGER] * (num_columns - 1)
+
     def get_value(self, domain, doc_id, doc, base_path, transform_dates=False, row_index=None, **kwargs):
         assert row_index, 'There must be a row_index for number column'
         return (
@@ -2792,6 +2835,9 @@ class StockExportColumn(ExportColumn):
             for product_id, section in self._column_tuples
         ]
 
+    def get_column_types(self, **kwargs):
+        return [ColumnType.DECIMAL] * len(self._column_tuples)
+
     def get_value(self, domain, doc_id, doc, base_path, **kwargs):
         states = self.accessor.get_ledger_values_for_case(doc_id)
 
@@ -17,32 +17,62 @@ The export works as follows:
     * Unsuccessful results can be retried
   * Add successful pages to final ZIP archive
   * Add raw data dumps for unsuccessful pages to final ZIP archive
+
+Exports requested from the UI and daily saved exports of domains in
+settings.EXPORT_PROCESSES_BY_DOMAIN are also built by several processes
+(see `write_export_instance_in_parallel`):
+  * Split the documents into disjoint date ranges of about the same number of docs
+  * Pool of X processes query ES for the docs of each range and write their rows to files
+  * The main process writes the rows of the ranges to the export in order
 """
 import gzip
 import json
 import logging
 import multiprocessing
 import os
+import resource
 import tempfile
 import time
 import zipfile
 from collections import namedtuple
-from datetime import timedelta
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import connections
 
+import billiard
+from billiard.exceptions import WorkerLostError
 from six.moves.queue import Empty
 
 from couchexport.export import get_writer
 from couchexport.writers import ZippedExportWriter
+from dimagi.utils.logging import notify_exception
+from soil.progress import TaskProgressManager
 
+from corehq.apps.es import filters as es_filters
+from corehq.apps.es.aggregations import DateHistogram, MissingAggregation
+from corehq.apps.es.client import _client_default, _client_for_export
+from corehq.apps.export.const import MIN_DOCS_PER_EXPORT_SLICE
 from corehq.apps.export.dbaccessors import get_properly_wrapped_export_instance
+from corehq.apps.export.exceptions import ExportProcessMemoryError
 from corehq.apps.export.export import (
+    _record_datadog_export_duration,
+    _record_export_duration,
+    _time_in_milliseconds,
     get_export_documents,
+    get_export_query,
     get_export_size,
     get_export_writer,
     save_export_payload,
     write_export_instance,
+    write_export_rows,
 )
-from corehq.elastic import ScanResult
+from corehq.apps.export.models.incremental import (
+    PARTITION_FIELDS,
+    PartWriter,
+    write_part_rows,
+)
+from corehq.elastic import ScanResult, iter_es_docs_from_query
 from corehq.util.files import safe_filename
 
 TEMP_FILE_PREFIX = 'cchq_export_dump_'
@@ -420,3 +450,166 @@ def _output_progress(queue, total_docs):
                     remaining=time_remaining,
                     rate=int(docs_per_second)
                 ))
+
+
+def get_export_process_count(domain):
+    return settings.EXPORT_PROCESSES_BY_DOMAIN.get(domain, 1)
+
+
+def get_export_slices(export_instance, filters):
+    """
+    Split the documents of an export into date ranges of about the same
+    number of documents, one for each of the domain's export processes.
+
+    :param filters: ES formatted filters of the export
+    :return: ES filters of the ranges, in export order, or an empty list
+    if the export is not split
+    """
+    num_processes = get_export_process_count(export_instance.domain)
+    if num_processes < 2 or export_instance.type not in PARTITION_FIELDS:
+        return []
+
+    partition_field = PARTITION_FIELDS[export_instance.type]
+    results = (
+        get_export_query(export_instance, filters, are_filters_es_formatted=True)
+        .aggregation(DateHistogram('days', partition_field, DateHistogram.Interval.DAY))
+        .aggregation(MissingAggregation('missing_day', partition_field))
+        .size(0)
+        .run()
+    )
+    counts_by_day = sorted(results.aggregations.days.counts_by_bucket().items())
+    total_docs = sum(count for day, count in counts_by_day) + results.aggregations.missing_day.bucket.doc_count
+    num_slices = min(num_processes, total_docs // MIN_DOCS_PER_EXPORT_SLICE)
+    if num_slices < 2:
+        return []
+
+    boundaries = _get_slice_boundaries(counts_by_day, total_docs, num_slices)
+    if not boundaries:
+        return []
+
+    slices = [es_filters.date_range(partition_field, lt=boundaries[0])]
+    for start, end in zip(boundaries, boundaries[1:]):
+        slices.append(es_filters.date_range(partition_field, gte=start, lt=end))
+    # documents without a date are sorted last
+    slices.append(es_filters.OR(
+        es_filters.date_range(partition_field, gte=boundaries[-1]),
+        es_filters.missing(partition_field),
+    ))
+    return slices
+
+
+def _get_slice_boundaries(counts_by_day, total_docs, num_slices):
+    """
+    :param counts_by_day: Sorted list of days ("YYYY-MM-DD") and their number of documents
+    :return: The first day of each slice after the first one
+    """
+    boundaries = []
+    docs_before = 0
+    for day, count in counts_by_day:
+        if docs_before >= total_docs * (len(boundaries) + 1) / num_slices:
+            boundaries.append(datetime.strptime(day, '%Y-%m-%d'))
+        docs_before += count
+    return boundaries
+
+
+def write_export_instance_in_parallel(writer, export_instance, filters, slices, progress_tracker=None):
+    """
+    Write the rows of an export to the given open _Writer, building the
+    rows of each slice of its documents in a separate process.
+
+    :param filters: ES formatted filters of the export
+    :param slices: ES filters that split the documents of the export, from
+    `get_export_slices`
+    :raises ExportProcessMemoryError: if a process building the rows of a
+    slice exceeds settings.EXPORT_PROCESS_MAX_MEMORY
+    """
+    start = _time_in_milliseconds()
+    total_bytes = total_rows = docs_done = 0
+    num_processes = min(len(slices), get_export_process_count(export_instance.domain))
+    paths = [_get_slice_path(export_instance) for _ in slices]
+
+    # the worker processes must not share the database connections of this process
+    connections.close_all()
+    # billiard, unlike multiprocessing, can start processes from celery workers
+    pool = billiard.Pool(
+        processes=num_processes,
+        initializer=_init_export_worker,
+        initargs=[settings.EXPORT_PROCESS_MAX_MEMORY],
+    )
+    try:
+        results = [
+            pool.apply_async(_write_slice_rows, args=(export_instance, filters + [slice_filter], path))
+            for slice_filter, path in zip(slices, paths)
+        ]
+        pool.close()
+
+        with TaskProgressManager(progress_tracker, src="export") as progress_manager:
+            for slice_number, (path, result) in enumerate(zip(paths, results)):
+                try:
+                    doc_count, doc_bytes = result.get()
+                except (MemoryError, WorkerLostError) as e:
+                    notify_exception(None, "Export process ran out of memory", details={
+                        'domain': export_instance.domain,
+                        'export_instance_id': export_instance.get_id,
+                        'slice': slice_number,
+                    })
+                    # don't retry in this process, which has no memory limit
+                    raise ExportProcessMemoryError(
+                        "Export process ran out of memory building slice {} of export {}".format(
+                            slice_number, export_instance.get_id)
+                    ) from e
+
+                with gzip.open(path, 'rt', encoding='utf-8') as file_:
+                    total_rows += write_part_rows(writer, export_instance, file_, docs_done)
+                os.remove(path)
+                docs_done += doc_count
+                total_bytes += doc_bytes
+                if progress_tracker:
+                    progress_manager.set_progress(slice_number + 1, len(slices))
+    finally:
+        pool.terminate()
+        pool.join()
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
+
+    end = _time_in_milliseconds()
+    tags = {'format': writer.format}
+    _record_datadog_export_duration(end - start, total_bytes, total_rows, tags)
+    _record_export_duration(end - start, export_instance)
+
+
+def _get_slice_path(export_instance):
+    prefix = '{}{}_slice_'.format(TEMP_FILE_PREFIX, export_instance.get_id)
+    fd, path = tempfile.mkstemp(prefix=prefix)
+    os.close(fd)
+    return path
+
+
+def _init_export_worker(max_memory):
+    # Elasticsearch clients can't be shared with the parent process
+    _client_default.reset_cache()
+    _client_for_export.reset_cache()
+    if max_memory:
+        resource.setrlimit(resource.RLIMIT_AS, (max_memory, max_memory))
+
+
+def _write_slice_rows(export_instance, filters, path):
+    """
+    Write the rows of the documents matching the given filters to a
+    file of JSON lines (see PartWriter)
+
+    :return: The number of documents and their size in bytes
+    """
+    query = get_export_query(export_instance, filters, are_filters_es_formatted=True)
+    doc_count = 0
+
+    def count_documents(num_documents):
+        nonlocal doc_count
+        doc_count = num_documents
+
+    with gzip.open(path, 'wt', encoding='utf-8') as file_:
+        doc_bytes, _ = write_export_rows(
+            PartWriter(file_, export_instance), export_instance, iter_es_docs_from_query(query), count_documents
+        )
+    return doc_count, doc_bytes
@@ -0,0 +1,166 @@
+import random
+
+from django.test import SimpleTestCase
+
+from corehq.apps.export.columnar import CompiledTable, get_path_accessor
+from corehq.apps.export.const import MULTISELCT_USER_DEFINED_SPLIT_TYPE
+from corehq.apps.export.management.commands.benchmark_columnar_exports import (
+    get_synthetic_form,
+    get_synthetic_tables,
+)
+from corehq.apps.export.models import (
+    ExportColumn,
+    MultipleChoiceItem,
+    Option,
+    PathNode,
+    RowNumberColumn,
+    ScalarItem,
+    SplitExportColumn,
+    SplitUserDefinedExportColumn,
+    TableConfiguration,
+    UserDefinedExportColumn,
+)
+from corehq.apps.userreports.expressions.getters import NestedDictGetter
+
+
+class GetPathAccessorTest(SimpleTestCase):
+
+    def test_same_as_nested_dict_getter(self):
+        docs = [
+            {},
+            {'a': 'x'},
+            {'a': {'b': 'y'}},
+            {'a': {'b': {'c': 'z'}}},
+            {'a': ['x', 'y']},
+            {'a': {'b': None}},
+            'not a dict',
+            None,
+        ]
+        for path in [[], ['a'], ['a', 'b'], ['a', 'b', 'c']]:
+            accessor = get_path_accessor(path)
+            for doc in docs:
+                self.assertEqual(accessor(doc), NestedDictGetter(path)(doc), (path, doc))
+
+
+class CompiledTableTest(SimpleTestCase):
+
+    def assertSameRows(self, table, docs, split_columns=False, transform_dates=False):
+        expected = [
+            (row.data, row.hyperlink_column_indices, list(row.skip_excel_formatting))
+            for row_number, doc in enumerate(docs)
+            for row in table.get_rows(
+                doc, row_number, split_columns=split_columns, transform_dates=transform_dates)
+        ]
+        compiled_table = CompiledTable(table, split_columns=split_columns, transform_dates=transform_dates)
+        self.assertEqual(
+            [
+                (row.data, row.hyperlink_column_indices, list(row.skip_excel_formatting))
+                for row in compiled_table.get_rows(docs)
+            ],
+            expected
+        )
+
+    def test_columns(self):
+        table = TableConfiguration(
+            path=[PathNode(name='form'), PathNode(name='repeat', is_repeat=True)],
+            columns=[
+                RowNumberColumn(selected=True),
+                ExportColumn(
+                    item=ScalarItem(path=[
+                        PathNode(name='form'),
+                        PathNode(name='repeat', is_repeat=True),
+                        PathNode(name='q1'),
+                    ]),
+                    selected=True,
+                ),
+                SplitExportColumn(
+                    item=MultipleChoiceItem(
+                        path=[
+                            PathNode(name='form'),
+                            PathNode(name='repeat', is_repeat=True),
+                            PathNode(name='q2'),
+                        ],
+                        options=[Option(value='a'), Option(value='b')],
+                    ),
+                    selected=True,
+                ),
+                SplitUserDefinedExportColumn(
+                    item=ScalarItem(path=[
+                        PathNode(name='form'),
+                        PathNode(name='repeat', is_repeat=True),
+                        PathNode(name='q2'),
+                    ]),
+                    split_type=MULTISELCT_USER_DEFINED_SPLIT_TYPE,
+                    user_defined_options=['a'],
+                    selected=True,
+                ),
+                UserDefinedExportColumn(
+                    custom_path=[
+                        PathNode(name='form'),
+                        PathNode(name='repeat', is_repeat=True),
+                        PathNode(name='q3'),
+                    ],
+                    selected=True,
+                ),
+                ExportColumn(
+                    item=ScalarItem(path=[
+                        PathNode(name='form'),
+                        PathNode(name='repeat', is_repeat=True),
+                        PathNode(name='q4'),
+                    ]),
+                    selected=False,
+                ),
+            ]
+        )
+        docs = [
+            {
+                'domain': 'my-domain',
+                '_id': '1',
+                'form': {
+                    'repeat': [
+                        {'q1': 'foo', 'q2': 'a c', 'q3': ['x', 'y']},
+                        {'q1': {'#text': 'bar', '@id': 'q1'}, 'q2': 'b', 'q3': 'z'},
+                        {'q1': {'@id': 'q1'}, 'q2': {'#text': 'a'}},
+                    ]
+                }
+            },
+            {'domain': 'my-domain', '_id': '2', 'form': {}},
+            {
+                'domain': 'my-domain',
+                '_id': '3',
+                'form': {'repeat': {'q1': ['one', {'two': 2}], 'q2': 7, 'q4': 'not selected'}},
+            },
+        ]
+        for split_columns in [True, False]:
+            self.assertSameRows(table, docs, split_columns=split_columns)
+
+    def test_transform_dates(self):
+        table = TableConfiguration(
+            path=[],
+            columns=[
+                ExportColumn(item=ScalarItem(path=[PathNode(name='received_on')]), selected=True),
+                ExportColumn(item=ScalarItem(path=[PathNode(name='form'), PathNode(name='q1')]), selected=True),
+            ]
+        )
+        docs = [
+            {'domain': 'my-domain', '_id': '1', 'received_on': '2021-01-01T10:00:00.000000Z',
+             'form': {'q1': '2020-02-03'}},
+            {'domain': 'my-domain', '_id': '2', 'received_on': '2021-01-01T10:00:00.000000Z',
+             'form': {'q1': 'not a date'}},
+            {'domain': 'my-domain', '_id': '3', 'received_on': b'2021-01-02', 'form': {'q1': 3}},
+        ]
+        self.assertSameRows(table, docs, transform_dates=True)
+
+    def test_synthetic_forms(self):
+        rng = random.Random(0)
+        docs = [get_synthetic_form(rng, questions=3, repeats=3) for _ in range(50)]
+        for table in get_synthetic_tables(questions=3):
+            for split_columns in [True, False]:
+                self.assertSameRows(table, docs, split_columns=split_columns, transform_dates=True)
+
+    def test_no_documents(self):
+        table = TableConfiguration(
+            path=[],
+            columns=[ExportColumn(item=ScalarItem(path=[PathNode(name='_id')]), selected=True)],
+        )
+        self.assertEqual(CompiledTable(table).get_rows([]), [])
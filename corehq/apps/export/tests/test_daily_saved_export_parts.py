@@ -0,0 +1,209 @@
+import io
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.test import SimpleTestCase
+
+from corehq.apps.es import FormES
+from corehq.apps.export.const import DEID_DATE_TRANSFORM, USERNAME_TRANSFORM
+from corehq.apps.export.export import write_export_rows
+from corehq.apps.export.models import (
+    ExportColumn,
+    ExportRow,
+    FormExportInstance,
+    PathNode,
+    RowNumberColumn,
+    ScalarItem,
+    TableConfiguration,
+)
+from corehq.apps.export.models.incremental import (
+    MISSING_PERIOD,
+    DailySavedExportPart,
+    PartWriter,
+    _filter_period,
+    _period_sort_key,
+    get_export_config_hash,
+    iter_part_rows,
+    offset_row_numbers,
+    uses_incremental_rebuild,
+    write_part_rows,
+)
+from corehq.util.test_utils import flag_disabled, flag_enabled
+
+
+def _export_instance():
+    return FormExportInstance(
+        domain='my-domain',
+        xmlns='http://openrosa.org/formdesigner/my-form',
+        tables=[
+            TableConfiguration(
+                path=[],
+                selected=True,
+                columns=[
+                    RowNumberColumn(selected=True),
+                    ExportColumn(item=ScalarItem(path=[PathNode(name='_id')]), selected=True),
+                ],
+            ),
+            TableConfiguration(
+                path=[PathNode(name='form'), PathNode(name='repeat', is_repeat=True)],
+                selected=True,
+                columns=[RowNumberColumn(selected=True)],
+            ),
+        ],
+    )
+
+
+class OffsetRowNumbersTest(SimpleTestCase):
+
+    def test_main_table(self):
+        row_data = ['3', 'form-id']
+        offset_row_numbers(row_data, [0], 10)
+        self.assertEqual(row_data, ['13', 'form-id'])
+
+    def test_repeat_table(self):
+        row_data = ['value', '3.0.1', 3, 0, 1]
+        offset_row_numbers(row_data, [1, 2, 3, 4], 10)
+        self.assertEqual(row_data, ['value', '13.0.1', 13, 0, 1])
+
+    def test_no_offset(self):
+        row_data = ['3.0', 3, 0]
+        offset_row_numbers(row_data, [0, 1, 2], 0)
+        self.assertEqual(row_data, ['3.0', 3, 0])
+
+
+class DailySavedExportPartTest(SimpleTestCase):
+
+    def test_is_stale(self):
+        part = DailySavedExportPart(
+            period='2021-01', config_hash='abc', doc_count=10, built_at=datetime(2021, 2, 1))
+        self.assertFalse(part.is_stale(10, datetime(2021, 1, 31), 'abc'))
+        self.assertTrue(part.is_stale(10, datetime(2021, 2, 2), 'abc'))
+        self.assertTrue(part.is_stale(9, datetime(2021, 1, 31), 'abc'))
+        self.assertTrue(part.is_stale(10, datetime(2021, 1, 31), 'def'))
+
+    def test_part_rows(self):
+        export_instance = _export_instance()
+        main_table, repeat_table = export_instance.selected_tables
+        file_ = io.StringIO()
+        writer = PartWriter(file_, export_instance)
+        writer.write(main_table, ExportRow(['0', 'form-id'], skip_excel_formatting=[0]))
+        writer.write_rows(repeat_table, [
+            ExportRow(['0.0', 0, 0], skip_excel_formatting=[0, 1, 2]),
+            ExportRow(['0.1', 0, 1], skip_excel_formatting=[0, 1, 2]),
+        ])
+        file_.seek(0)
+        self.assertEqual(list(iter_part_rows(file_)), [
+            [0, ['0', 'form-id'], [0]],
+            [1, ['0.0', 0, 0], [0, 1, 2]],
+            [1, ['0.1', 0, 1], [0, 1, 2]],
+        ])
+
+    def test_part_value_types(self):
+        export_instance = _export_instance()
+        main_table, repeat_table = export_instance.selected_tables
+        row_data = ['0', 1, 1.5, None, date(2021, 1, 2), datetime(2021, 1, 2, 3, 4, 5), Decimal('1.50')]
+        file_ = io.StringIO()
+        PartWriter(file_, export_instance).write(main_table, ExportRow(row_data, skip_excel_formatting=[0]))
+        file_.seek(0)
+        (table_index, part_row_data, skip_excel_formatting), = iter_part_rows(file_)
+        self.assertEqual(part_row_data, row_data)
+        self.assertEqual([type(value) for value in part_row_data], [type(value) for value in row_data])
+
+    @flag_disabled('COLUMNAR_EXPORTS')
+    def test_deid_date_column(self):
+        export_instance = FormExportInstance(
+            domain='my-domain',
+            xmlns='http://openrosa.org/formdesigner/my-form',
+            tables=[
+                TableConfiguration(
+                    path=[],
+                    selected=True,
+                    columns=[
+                        RowNumberColumn(selected=True),
+                        ExportColumn(
+                            item=ScalarItem(path=[PathNode(name='form'), PathNode(name='dob')]),
+                            selected=True,
+                            deid_transform=DEID_DATE_TRANSFORM,
+                        ),
+                    ],
+                ),
+            ],
+        )
+        docs = [
+            {'_id': 'form-1', 'domain': 'my-domain', 'form': {'dob': '2001-02-03'}},
+            {'_id': 'form-2', 'domain': 'my-domain', 'form': {'dob': '2004-05-06'}},
+        ]
+        rebuilt = _RowCollector()
+        write_export_rows(rebuilt, export_instance, docs)
+
+        file_ = io.StringIO()
+        write_export_rows(PartWriter(file_, export_instance), export_instance, docs)
+        file_.seek(0)
+        stitched = _RowCollector()
+        write_part_rows(stitched, export_instance, file_, 0)
+
+        self.assertEqual(stitched.rows, rebuilt.rows)
+        self.assertIsInstance(stitched.rows[0][1], date)
+
+    def test_config_hash(self):
+        export_instance = _export_instance()
+        config_hash = get_export_config_hash(export_instance)
+        self.assertEqual(get_export_config_hash(_export_instance()), config_hash)
+        export_instance.last_updated = datetime.utcnow()
+        self.assertEqual(get_export_config_hash(export_instance), config_hash)
+        export_instance.split_multiselects = True
+        self.assertNotEqual(get_export_config_hash(export_instance), config_hash)
+
+
+@flag_enabled('INCREMENTAL_DAILY_SAVED_EXPORTS')
+class UsesIncrementalRebuildTest(SimpleTestCase):
+
+    def test_uses_incremental_rebuild(self):
+        self.assertTrue(uses_incremental_rebuild(_export_instance()))
+
+    def test_not_with_transform_of_other_documents(self):
+        export_instance = _export_instance()
+        export_instance.tables[0].columns.append(ExportColumn(
+            item=ScalarItem(path=[PathNode(name='form'), PathNode(name='meta'), PathNode(name='userID')],
+                            transform=USERNAME_TRANSFORM),
+            selected=True,
+        ))
+        self.assertFalse(uses_incremental_rebuild(export_instance))
+
+    def test_unselected_column_with_transform(self):
+        export_instance = _export_instance()
+        export_instance.tables[0].columns.append(ExportColumn(
+            item=ScalarItem(path=[PathNode(name='form'), PathNode(name='meta'), PathNode(name='userID')],
+                            transform=USERNAME_TRANSFORM),
+            selected=False,
+        ))
+        self.assertTrue(uses_incremental_rebuild(export_instance))
+
+
+class PeriodTest(SimpleTestCase):
+
+    def test_sort_key(self):
+        self.assertEqual(
+            sorted([MISSING_PERIOD, '2021-02', '2020-12'], key=_period_sort_key),
+            ['2020-12', '2021-02', MISSING_PERIOD]
+        )
+
+    def test_filter_period(self):
+        query = _filter_period(FormES(), 'received_on', '2020-12')
+        self.assertIn(
+            {'range': {'received_on': {'gte': '2020-12-01T00:00:00', 'lt': '2021-01-01T00:00:00'}}},
+            query.filters
+        )
+
+
+class _RowCollector(object):
+
+    def __init__(self):
+        self.rows = []
+
+    def write(self, table, row):
+        self.rows.append(row.data)
+
+    def write_rows(self, table, rows):
+        for row in rows:
+            self.write(table, row)
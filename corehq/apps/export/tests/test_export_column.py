@@ -4,11 +4,15 @@ from django.test import SimpleTestCase
 
 from unittest.mock import patch
 
+from couchexport.models import ColumnType
+
 from corehq.apps.export.const import (
+    DEID_DATE_TRANSFORM,
     EMPTY_VALUE,
     MISSING_VALUE,
     MULTISELCT_USER_DEFINED_SPLIT_TYPE,
     PLAIN_USER_DEFINED_SPLIT_TYPE,
+    USERNAME_TRANSFORM,
 )
 from corehq.apps.export.models import (
     CaseIndexExportColumn,
@@ -63,6 +67,18 @@ class TestExportColumn(SimpleTestCase):
             "answer",
         )
 
+    def test_get_column_types(self):
+        column = ExportColumn(item=ExportItem(datatype='integer'))
+        self.assertEqual(column.get_column_types(), [ColumnType.INTEGER])
+
+        for column in [
+            ExportColumn(item=ExportItem()),
+            ExportColumn(item=ExportItem(datatype='unknown')),
+            ExportColumn(item=ExportItem(datatype='string', transform=USERNAME_TRANSFORM)),
+            ExportColumn(item=ExportItem(datatype='date'), deid_transform=DEID_DATE_TRANSFORM),
+        ]:
+            self.assertEqual(column.get_column_types(), [ColumnType.STRING])
+
 
 class SplitColumnTest(SimpleTestCase):
 
@@ -207,6 +223,13 @@ class TestRowNumberColumn(SimpleTestCase):
             ['row number', 'row number__0', 'row number__1', 'row number__2']
         )
 
+    def test_get_column_types(self):
+        col = RowNumberColumn(label="row number", repeat=2)
+        self.assertEqual(
+            col.get_column_types(),
+            [ColumnType.STRING, ColumnType.INTEGER, ColumnType.INTEGER, ColumnType.INTEGER]
+        )
+
     def test_get_value_with_simple_index(self):
         col = RowNumberColumn()
         self.assertEqual(
@@ -284,6 +307,13 @@ class TestGeopointExportColumn(SimpleTestCase):
         result = column.get_headers(split_column=False)
         self.assertEqual(result, ['geo-label'])
 
+    def test_get_column_types(self):
+        column = SplitGPSExportColumn(
+            item=GeopointItem(path=[PathNode(name='form'), PathNode(name='geo')]),
+        )
+        self.assertEqual(column.get_column_types(split_column=True), [ColumnType.DECIMAL] * 4)
+        self.assertEqual(column.get_column_types(split_column=False), [ColumnType.STRING])
+
 
 class TestSplitUserDefinedExportColumn(SimpleTestCase):
 
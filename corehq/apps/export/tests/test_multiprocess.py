@@ -0,0 +1,157 @@
+import gzip
+from datetime import date, datetime
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from billiard.exceptions import WorkerLostError
+
+from corehq.apps.export.const import DEID_DATE_TRANSFORM
+from corehq.apps.export.exceptions import ExportProcessMemoryError
+from corehq.apps.export.models import (
+    ExportColumn,
+    FormExportInstance,
+    PathNode,
+    RowNumberColumn,
+    ScalarItem,
+    TableConfiguration,
+)
+from corehq.apps.export.models.incremental import write_part_rows
+from corehq.apps.export.multiprocess import (
+    _get_slice_boundaries,
+    _write_slice_rows,
+    write_export_instance_in_parallel,
+)
+from corehq.util.files import TransientTempfile
+from corehq.util.test_utils import flag_disabled
+
+
+class GetSliceBoundariesTest(SimpleTestCase):
+
+    def test_even(self):
+        counts_by_day = [('2021-01-01', 10), ('2021-01-02', 10), ('2021-01-03', 10), ('2021-01-04', 10)]
+        self.assertEqual(
+            _get_slice_boundaries(counts_by_day, 40, 2),
+            [datetime(2021, 1, 3)]
+        )
+
+    def test_uneven(self):
+        counts_by_day = [('2021-01-01', 50), ('2021-01-02', 5), ('2021-01-03', 5), ('2021-01-04', 40)]
+        self.assertEqual(
+            _get_slice_boundaries(counts_by_day, 100, 3),
+            [datetime(2021, 1, 2)]
+        )
+
+    def test_single_day(self):
+        self.assertEqual(_get_slice_boundaries([('2021-01-01', 100)], 100, 4), [])
+
+    def test_missing_dates_are_in_last_slice(self):
+        counts_by_day = [('2021-01-01', 10), ('2021-01-02', 10)]
+        self.assertEqual(
+            _get_slice_boundaries(counts_by_day, 40, 2),
+            []
+        )
+
+
+class WriteSliceRowsTest(SimpleTestCase):
+
+    @flag_disabled('COLUMNAR_EXPORTS')
+    @patch('corehq.apps.export.multiprocess.get_export_query')
+    @patch('corehq.apps.export.multiprocess.iter_es_docs_from_query')
+    def test_value_types(self, iter_es_docs_from_query, get_export_query):
+        export_instance = FormExportInstance(
+            domain='my-domain',
+            xmlns='http://openrosa.org/formdesigner/my-form',
+            tables=[
+                TableConfiguration(
+                    path=[],
+                    selected=True,
+                    columns=[
+                        RowNumberColumn(selected=True),
+                        ExportColumn(
+                            item=ScalarItem(path=[PathNode(name='form'), PathNode(name='dob')]),
+                            selected=True,
+                            deid_transform=DEID_DATE_TRANSFORM,
+                        ),
+                        ExportColumn(
+                            item=ScalarItem(path=[PathNode(name='form'), PathNode(name='amount')]),
+                            selected=True,
+                        ),
+                    ],
+                ),
+            ],
+        )
+        iter_es_docs_from_query.return_value = iter([
+            {'_id': 'form-1', 'domain': 'my-domain', 'form': {'dob': '2001-02-03', 'amount': Decimal('1.50')}},
+            {'_id': 'form-2', 'domain': 'my-domain', 'form': {'dob': '2004-05-06', 'amount': Decimal('2')}},
+        ])
+        writer = _RowCollector()
+        with TransientTempfile() as path:
+            doc_count, doc_bytes = _write_slice_rows(export_instance, [], path)
+            with gzip.open(path, 'rt', encoding='utf-8') as file_:
+                num_rows = write_part_rows(writer, export_instance, file_, 10)
+
+        self.assertEqual((doc_count, num_rows), (2, 2))
+        (first_row_number, first_dob, first_amount), (second_row_number, second_dob, second_amount) = writer.rows
+        self.assertEqual((first_row_number, second_row_number), ('10', '11'))
+        self.assertIsInstance(first_dob, date)
+        self.assertIsInstance(second_dob, date)
+        self.assertEqual((first_amount, second_amount), (Decimal('1.50'), Decimal('2')))
+        self.assertIsInstance(first_amount, Decimal)
+
+
+@patch('corehq.apps.export.multiprocess.connections')
+@patch('corehq.apps.export.multiprocess.notify_exception')
+class WriteExportInstanceInParallelTest(SimpleTestCase):
+
+    def test_memory_error_fails_export(self, notify_exception, connections):
+        self._assert_export_fails(MemoryError())
+
+    def test_lost_worker_fails_export(self, notify_exception, connections):
+        self._assert_export_fails(WorkerLostError())
+
+    def _assert_export_fails(self, error):
+        export_instance = FormExportInstance(domain='my-domain', xmlns='http://openrosa.org/formdesigner/my-form')
+        with patch('corehq.apps.export.multiprocess.billiard.Pool', return_value=_FailingPool(error)), \
+                patch('corehq.apps.export.multiprocess._write_slice_rows') as write_slice_rows, \
+                self.assertRaises(ExportProcessMemoryError):
+            write_export_instance_in_parallel(_RowCollector(), export_instance, [], [{'slice': 1}, {'slice': 2}])
+        # the slice is not built again by this process, which has no memory limit
+        write_slice_rows.assert_not_called()
+
+
+class _FailingPool(object):
+
+    def __init__(self, error):
+        self.error = error
+
+    def apply_async(self, func, args):
+        return _FailedResult(self.error)
+
+    def close(self):
+        pass
+
+    def terminate(self):
+        pass
+
+    def join(self):
+        pass
+
+
+class _FailedResult(object):
+
+    def __init__(self, error):
+        self.error = error
+
+    def get(self):
+        raise self.error
+
+
+class _RowCollector(object):
+
+    def __init__(self):
+        self.rows = []
+
+    def write(self, table, row):
+        self.rows.append(row.data)
@@ -16,6 +16,7 @@ from corehq.apps.hqadmin.views.system import (
     SystemInfoView,
     branches_on_staging,
     GlobalThresholds,
+    PillowStatusView,
     check_services,
     pillow_operation_api,
     system_ajax,
@@ -27,6 +28,7 @@ from corehq.apps.hqadmin.views.users import (
     DisableUserView,
     SuperuserManagement,
     OffboardingUserList,
+    RestoreProfilesView,
     WebUserDataView,
     superuser_table,
     web_user_lookup,
@@ -40,6 +42,7 @@ urlpatterns = [
     url(r'^system/system_ajax$', system_ajax, name="system_ajax"),
     url(r'^system/check_services$', check_services, name="check_services"),
     url(r'^system/autostaging/$', branches_on_staging, name="branches_on_staging"),
+    url(r'^system/pillows/$', PillowStatusView.as_view(), name=PillowStatusView.urlname),
     url(r'^global_thresholds/$', GlobalThresholds.as_view(), name=GlobalThresholds.urlname),
     url(r'^mass_email/$', mass_email, name="mass_email"),
     # Same view supported with three possible urls to support tracking
@@ -51,6 +54,7 @@ urlpatterns = [
     url(r'^create_tombstone/$', create_tombstone, name='create_tombstone'),
     url(r'^phone/restore/$', AdminRestoreView.as_view(), name="admin_restore"),
     url(r'^phone/restore/(?P<app_id>[\w-]+)/$', AdminRestoreView.as_view(), name='app_aware_admin_restore'),
+    url(r'^phone/restore_profiles/$', RestoreProfilesView.as_view(), name=RestoreProfilesView.urlname),
     url(r'^app_build_timings/$', AppBuildTimingsView.as_view(), name="app_build_timings"),
     url(r'^do_pillow_op/$', pillow_operation_api, name="pillow_operation_api"),
     url(r'^web_user_lookup/$', web_user_lookup, name='web_user_lookup'),
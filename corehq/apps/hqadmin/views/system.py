@@ -18,6 +18,7 @@ from dimagi.utils.couch.database import is_bigcouch
 from pillowtop.exceptions import PillowNotFoundError
 from pillowtop.utils import (
     get_all_pillows_json,
+    get_all_pillows_status,
     get_pillow_config_by_name,
     get_pillow_json,
 )
@@ -262,6 +263,22 @@ def _get_submodules():
     ]
 
 
+class PillowStatusView(BaseAdminSectionView):
+    urlname = 'pillow_status'
+    page_title = gettext_lazy("Pillow Status")
+    template_name = 'hqadmin/pillow_status.html'
+
+    @method_decorator(require_superuser_or_contractor)
+    def dispatch(self, request, *args, **kwargs):
+        return super().dispatch(request, *args, **kwargs)
+
+    @property
+    def page_context(self):
+        return {
+            'pillows': sorted(get_all_pillows_status(), key=lambda pillow: pillow['name'].lower()),
+        }
+
+
 @method_decorator(require_superuser, name='dispatch')
 class GlobalThresholds(BaseAdminSectionView):
     urlname = 'global_thresholds'
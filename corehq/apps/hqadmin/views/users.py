@@ -34,6 +34,7 @@ from lxml import etree
 from lxml.builder import E
 from two_factor.utils import default_device
 
+from casexml.apps.phone.restore_profiling import flatten_timing, get_restore_profiles
 from casexml.apps.phone.xml import SYNC_XMLNS
 from casexml.apps.stock.const import COMMTRACK_REPORT_XMLNS
 from corehq.apps.hqadmin.utils import unset_password
@@ -340,6 +341,50 @@ class AdminRestoreView(TemplateView):
         return context
 
 
+class RestoreProfilesView(TemplateView):
+    """Show the most recent restore profiles of a user
+
+    Profiles are recorded for domains with the RESTORE_PROFILING toggle
+    or for restores requested by a superuser with ``?profile=true``.
+    """
+    template_name = 'hqadmin/restore_profiles.html'
+    urlname = 'restore_profiles'
+
+    @method_decorator(require_superuser)
+    def dispatch(self, request, *args, **kwargs):
+        return super(RestoreProfilesView, self).dispatch(request, *args, **kwargs)
+
+    def get(self, request, *args, **kwargs):
+        username = request.GET.get('as', '')
+        if not username:
+            return HttpResponseBadRequest('Please specify a user using ?as=username')
+        self.user = CouchUser.get_by_username(username)
+        if not self.user:
+            return HttpResponseNotFound('User %s not found.' % username)
+        self.domain = request.GET.get('domain') or self.user.domain
+        if not self.domain:
+            return HttpResponseBadRequest('Please specify domain for web-user using ?as=email&domain=domain')
+        return super(RestoreProfilesView, self).get(request, *args, **kwargs)
+
+    def get_context_data(self, **kwargs):
+        context = super(RestoreProfilesView, self).get_context_data(**kwargs)
+        profiles = get_restore_profiles(self.domain, self.user.user_id)
+        try:
+            selected = int(self.request.GET.get('profile', 0))
+        except ValueError:
+            selected = 0
+        profile = profiles[selected] if 0 <= selected < len(profiles) else None
+        context.update({
+            'username': self.user.username,
+            'domain': self.domain,
+            'profiles': profiles,
+            'selected': selected,
+            'profile': profile,
+            'timing_data': flatten_timing(profile['timing']) if profile else [],
+        })
+        return context
+
+
 class DomainAdminRestoreView(AdminRestoreView):
     urlname = 'domain_admin_restore'
 
@@ -1,5 +1,9 @@
+import sys
+
 from django.core.management import BaseCommand
 
+from pillowtop.reindexer.reindexer import ParallelResumableReindexer
+
 from corehq.pillows.app_submission_tracker import (
     SqlAppFormSubmissionTrackerReindexerFactory,
     UserAppFormSubmissionReindexerFactory,
@@ -131,10 +135,69 @@ class Command(SubCommand):
         def confirm():
             return input("Are you sure you want to delete the current index (if it exists)? y/n\n") == 'y'
 
-        factory = FACTORIES_BY_SLUG[self.subcommand](**options)
-        reindexer = factory.build()
+        processes = options.pop('processes', None)
+        if options.pop('status', False):
+            self.print_status(self.build_parallel_reindexer(options, processes))
+            return
+
+        if processes:
+            reindexer = self.build_parallel_reindexer(options, processes)
+        else:
+            factory = FACTORIES_BY_SLUG[self.subcommand](**options)
+            reindexer = factory.build()
 
         if cleanup and (noinput or confirm()):
             reindexer.clean()
 
         reindexer.reindex()
+
+    def build_parallel_reindexer(self, options, processes):
+        factory_class = FACTORIES_BY_SLUG[self.subcommand]
+        reindexer = factory_class(**dict(options)).build()
+        db_aliases = reindexer.doc_provider.reindex_accessor.sql_db_aliases
+        reindexers = {
+            db_alias: factory_class(**dict(options, limit_to_db=db_alias)).build()
+            for db_alias in db_aliases
+        }
+        worker_options = dict(options, skip_index_setup=True)
+        if options.get('max_docs_per_second') and processes:
+            worker_options['max_docs_per_second'] = options['max_docs_per_second'] / processes
+        parser = self.create_parser(sys.argv[0], 'ptop_reindexer_v2')
+
+        def get_worker_command(db_alias, reset):
+            return (
+                [sys.executable, sys.argv[0], 'ptop_reindexer_v2', self.subcommand]
+                + _get_command_args(parser, dict(worker_options, limit_to_db=db_alias, reset=reset))
+            )
+
+        return ParallelResumableReindexer(
+            reindexers,
+            get_worker_command,
+            processes or 1,
+            reset=options.get('reset', False),
+            in_place=options.get('in_place', False),
+        )
+
+    @staticmethod
+    def print_status(reindexer):
+        progress = reindexer.get_progress()
+        for db_alias, db_progress in sorted(progress['iterations'].items()):
+            print("{:<20} {:>12} of ~{:<12} last updated {}".format(
+                db_alias, db_progress['visited'], db_progress['total'], db_progress['updated'] or 'never'))
+        print("{:<20} {:>12} of ~{:<12}".format('total', progress['visited'], progress['total']))
+
+
+def _get_command_args(parser, options):
+    """Get command line arguments for the given option values"""
+    args = []
+    for action in parser._actions:
+        if not action.option_strings or action.dest not in options:
+            continue
+        value = options[action.dest]
+        if value is None or value is False or value == action.default:
+            continue
+        if value is True:
+            args.append(action.option_strings[0])
+        else:
+            args.extend([action.option_strings[0], str(value)])
+    return args
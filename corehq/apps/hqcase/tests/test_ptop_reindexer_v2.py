@@ -0,0 +1,95 @@
+from unittest.mock import Mock, patch
+
+from django.test import SimpleTestCase
+
+from corehq.apps.hqcase.management.commands.ptop_reindexer_v2 import (
+    FACTORIES_BY_SLUG,
+    Command,
+    _get_command_args,
+)
+from corehq.pillows.case import SqlCaseReindexerFactory
+
+
+class GetCommandArgsTest(SimpleTestCase):
+
+    def setUp(self):
+        super().setUp()
+        command = Command()
+        command.subcommand = 'sql-case'
+        self.parser = command.create_parser('manage.py', 'ptop_reindexer_v2')
+
+    def test_command_args(self):
+        args = _get_command_args(self.parser, {
+            'reset': True,
+            'chunk_size': 500,
+            'in_place': False,
+            'limit_to_db': 'p1',
+            'processes': None,
+            'max_docs_per_second': 2.5,
+            'skip_index_setup': True,
+        })
+        self.assertEqual(sorted(args), sorted([
+            '--reset',
+            '--chunksize', '500',
+            '--limit-to-db', 'p1',
+            '--max-docs-per-second', '2.5',
+            '--skip-index-setup',
+        ]))
+        options = vars(self.parser.parse_args(args))
+        self.assertEqual(
+            {name: options[name] for name in [
+                'reset', 'chunk_size', 'in_place', 'limit_to_db', 'processes', 'max_docs_per_second',
+                'skip_index_setup',
+            ]},
+            {
+                'reset': True,
+                'chunk_size': 500,
+                'in_place': False,
+                'limit_to_db': 'p1',
+                'processes': None,
+                'max_docs_per_second': 2.5,
+                'skip_index_setup': True,
+            }
+        )
+
+    def test_defaults_are_omitted(self):
+        args = _get_command_args(self.parser, {'reset': False, 'chunk_size': 1000, 'domain': None})
+        self.assertEqual(args, [])
+
+    def test_unknown_options_are_omitted(self):
+        self.assertEqual(_get_command_args(self.parser, {'status': False, 'not_an_option': 'value'}), [])
+
+
+class _MockSqlCaseReindexerFactory(SqlCaseReindexerFactory):
+
+    def build(self):
+        reindexer = Mock()
+        reindexer.doc_provider.reindex_accessor.sql_db_aliases = ['p1', 'p2']
+        return reindexer
+
+
+@patch.dict(FACTORIES_BY_SLUG, {'sql-case': _MockSqlCaseReindexerFactory})
+class ParallelReindexerCommandTest(SimpleTestCase):
+
+    def get_worker_args(self, options, reset):
+        command = Command()
+        command.subcommand = 'sql-case'
+        reindexer = command.build_parallel_reindexer(options, 2)
+        self.assertEqual(set(reindexer.reindexers), {'p1', 'p2'})
+        worker_command = reindexer.get_worker_command('p1', reset)
+        self.assertEqual(worker_command[2:4], ['ptop_reindexer_v2', 'sql-case'])
+        return worker_command[4:]
+
+    def test_worker_command(self):
+        args = self.get_worker_args({'reset': False, 'max_docs_per_second': 10, 'in_place': True}, reset=False)
+        self.assertEqual(sorted(args), sorted([
+            '--in-place',
+            '--limit-to-db', 'p1',
+            '--max-docs-per-second', '5.0',
+            '--skip-index-setup',
+        ]))
+
+    def test_worker_command_with_reset(self):
+        # the reindex is reset when the index is missing, even without --reset
+        args = self.get_worker_args({'reset': False}, reset=True)
+        self.assertIn('--reset', args)
@@ -11,7 +11,7 @@ from dimagi.utils.parsing import json_format_datetime
 
 from corehq.apps.es import filters
 from corehq.apps.es.cases import CaseES
-from corehq.apps.receiverwrapper.util import submit_form_locally
+from corehq.apps.receiverwrapper.util import submit_form_locally, submit_forms_locally
 from corehq.apps.users.util import SYSTEM_USER_ID
 from corehq.form_processor.exceptions import CaseNotFound, MissingFormXml
 from corehq.form_processor.models import CommCareCase
@@ -60,20 +60,7 @@ def submit_case_blocks(case_blocks, domain, username="system", user_id=None,
     """
     submission_extras = submission_extras or {}
     attachments = attachments or {}
-    now = json_format_datetime(datetime.datetime.utcnow())
-    if not isinstance(case_blocks, str):
-        case_blocks = ''.join(case_blocks)
-    form_id = form_id or uuid.uuid4().hex
-    form_xml = render_to_string('hqcase/xml/case_block.xml', {
-        'xmlns': xmlns or SYSTEM_FORM_XMLNS,
-        'name': form_name,
-        'case_block': case_blocks,
-        'time': now,
-        'uid': form_id,
-        'username': username,
-        'user_id': user_id or "",
-        'device_id': device_id or "",
-    })
+    form_xml = _get_case_block_form_xml(case_blocks, username, user_id, xmlns, form_id, device_id, form_name)
 
     result = submit_form_locally(
         instance=form_xml,
@@ -86,6 +73,41 @@ def submit_case_blocks(case_blocks, domain, username="system", user_id=None,
     return result.xform, result.cases
 
 
+def submit_case_block_batch(case_block_lists, domain, username="system", user_id=None,
+                            xmlns=None, device_id=None, form_name=None, max_wait=...):
+    """
+    Submits a form for each list of case blocks. The forms are processed
+    together as a batch, which is faster than calling `submit_case_blocks`
+    for each list. See `submit_case_blocks` for the meaning of the arguments.
+
+    returns a list of `(xform, cases)` tuples, one for each form.
+    """
+    results = submit_forms_locally(
+        instances=[
+            _get_case_block_form_xml(case_blocks, username, user_id, xmlns, None, device_id, form_name)
+            for case_blocks in case_block_lists
+        ],
+        domain=domain,
+        max_wait=max_wait,
+    )
+    return [(result.xform, result.cases) for result in results]
+
+
+def _get_case_block_form_xml(case_blocks, username, user_id, xmlns, form_id, device_id, form_name):
+    if not isinstance(case_blocks, str):
+        case_blocks = ''.join(case_blocks)
+    return render_to_string('hqcase/xml/case_block.xml', {
+        'xmlns': xmlns or SYSTEM_FORM_XMLNS,
+        'name': form_name,
+        'case_block': case_blocks,
+        'time': json_format_datetime(datetime.datetime.utcnow()),
+        'uid': form_id or uuid.uuid4().hex,
+        'username': username,
+        'user_id': user_id or "",
+        'device_id': device_id or "",
+    })
+
+
 def get_case_by_identifier(domain, identifier):
     # Try by any of the allowed identifiers
     for identifier_type in ALLOWED_CASE_IDENTIFIER_TYPES:
@@ -206,16 +206,22 @@ def get_restore_params(request, domain):
         'user_id': request.GET.get('user_id'),
         'skip_fixtures': skip_fixtures,
         'auth_type': getattr(request, 'auth_type', None),
+        'profile': request.GET.get('profile') == 'true' and _is_superuser(request),
     }
 
 
+def _is_superuser(request):
+    couch_user = getattr(request, 'couch_user', None)
+    return bool(couch_user and couch_user.is_superuser)
+
+
 @profile_dump('commcare_ota_get_restore_response.prof', probability=PROFILE_PROBABILITY, limit=PROFILE_LIMIT)
 def get_restore_response(domain, couch_user, app_id=None, since=None, version='1.0',
                          state=None, items=False, force_cache=False,
                          cache_timeout=None, overwrite_cache=False,
                          as_user=None, device_id=None, user_id=None,
                          openrosa_version=None,
-                         skip_fixtures=False, auth_type=None):
+                         skip_fixtures=False, auth_type=None, profile=False):
     """
     :param domain: Domain being restored from
     :param couch_user: User performing restore
@@ -234,6 +240,7 @@ def get_restore_response(domain, couch_user, app_id=None, since=None, version='1
     :param skip_fixtures: Do not include fixtures in sync payload
     :param auth_type: The type of auth that was used to authenticate the request.
         Used to determine if the request is coming from an actual user or as part of some automation.
+    :param profile: Record a profile of the restore, viewable in the restore profiles admin view
     :return: Tuple of (http response, timing context or None)
     """
 
@@ -305,7 +312,8 @@ def get_restore_response(domain, couch_user, app_id=None, since=None, version='1
         ),
         is_async=async_restore_enabled,
         skip_fixtures=skip_fixtures,
-        auth_type=auth_type
+        auth_type=auth_type,
+        profile=profile,
     )
     return restore_config.get_response(), restore_config.timing_context
 
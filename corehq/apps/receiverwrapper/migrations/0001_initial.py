@@ -0,0 +1,22 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QueuedSubmission',
+            fields=[
+                ('receipt_id', models.CharField(max_length=32, primary_key=True, serialize=False)),
+                ('domain', models.CharField(max_length=126)),
+                ('user_id', models.CharField(max_length=126, null=True)),
+                ('created_on', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('claimed_until', models.DateTimeField(null=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('receiverwrapper', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='queuedsubmission',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='queuedsubmission',
+            name='failed_on',
+            field=models.DateTimeField(null=True),
+        ),
+    ]
@@ -0,0 +1,19 @@
+from django.db import models
+
+
+class QueuedSubmission(models.Model):
+    """A form submission that was accepted but not yet processed
+
+    The form XML and attachments are in the blob db, with the receipt id
+    as their parent id. See `corehq.apps.receiverwrapper.submission_queue`.
+    """
+    receipt_id = models.CharField(max_length=32, primary_key=True)
+    domain = models.CharField(max_length=126)
+    user_id = models.CharField(max_length=126, null=True)
+    created_on = models.DateTimeField(auto_now_add=True, db_index=True)
+    # a worker is processing the submission until this time
+    claimed_until = models.DateTimeField(null=True)
+    # number of times a worker has claimed the submission
+    attempts = models.PositiveIntegerField(default=0)
+    # processing failed and will not be attempted again
+    failed_on = models.DateTimeField(null=True)
@@ -0,0 +1,361 @@
+"""Accept form submissions now and process them later
+
+When a domain has the QUEUE_FORM_SUBMISSIONS toggle enabled, the
+receiver saves each submission (form XML, attachments and request
+details) to the blob db, records it as a `QueuedSubmission`, and
+responds with a receipt id without processing the form. Queued
+submissions are processed by celery workers on the submission queue,
+so a flood of submissions fills the queue rather than tying up web
+workers.
+
+Each domain has its own queue in redis, and workers take submissions
+from the domain queues in turn. A domain with a large backlog does not
+delay submissions to other domains by more than one submission per
+domain with queued submissions.
+
+The redis queues only schedule the work. A worker claims a submission
+by updating its `QueuedSubmission` before processing it, so a
+submission that is queued more than once is processed only once. The
+`QueuedSubmission` and the blobs of a submission are deleted once it is
+processed, so a submission that was not processed (because its queue
+entry was lost or its worker died) is found by
+`requeue_stale_submissions` and queued again. The result of processing
+a submission can be checked with `get_submission_status` for
+`RESULT_TIMEOUT` after it is processed.
+
+A submission is claimed at most `MAX_ATTEMPTS` times. If processing it
+raises an error on the last attempt, or its worker dies, it is marked as
+failed and its `QueuedSubmission` and blobs are kept so that it can be
+investigated. Failed submissions are not queued again.
+
+Queued submissions are rate limited like other submissions, before they
+are queued.
+"""
+import json
+import logging
+from datetime import datetime, timedelta
+from io import BytesIO
+from uuid import uuid4
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db.models import F, Q
+
+from couchforms.openrosa_response import parse_openrosa_response
+from dimagi.utils.couch import get_redis_client
+from dimagi.utils.logging import notify_exception
+from dimagi.utils.parsing import json_format_datetime, string_to_utc_datetime
+
+from corehq.apps.receiverwrapper.auth import AuthContext, WaivedAuthContext
+from corehq.apps.receiverwrapper.models import QueuedSubmission
+from corehq.apps.receiverwrapper.util import get_app_and_build_ids
+from corehq.blobs import CODES, get_blob_db
+from corehq.blobs.atomic import AtomicBlobs
+from corehq.form_processor.exceptions import XFormLockError
+from corehq.form_processor.submission_post import SubmissionPost
+from corehq.util.metrics import metrics_counter, metrics_histogram
+from corehq.util.timer import TimingContext
+
+FORM_XML = 'form.xml'
+# processing results can be checked for this long (in seconds)
+RESULT_TIMEOUT = 7 * 24 * 60 * 60
+# unprocessed submissions older than this are queued again
+# if they are not waiting in a queue
+STALE_SUBMISSION_AGE = timedelta(minutes=30)
+# a worker's claim on a queued submission expires after this long
+PROCESSING_TIMEOUT = timedelta(minutes=15)
+# a queued submission is marked as failed after this many attempts
+MAX_ATTEMPTS = 3
+
+DOMAINS_KEY = 'submission-queue:domains'
+WAITING_KEY = 'submission-queue:waiting'
+
+log = logging.getLogger(__name__)
+
+
+def queue_submission(domain, instance, attachments, **kwargs):
+    """Save a submission to be processed later
+
+    The submission is saved before this returns, so it will be processed
+    even if it cannot be queued in redis now.
+
+    :param instance: Form XML.
+    :param attachments: Dict of uploaded files, as returned by
+    `couchforms.get_instance_and_attachment`.
+    :param kwargs: Other `SubmissionPost` arguments, except `auth_context`
+    which is replaced by `user_id`, `authenticated` and `auth_waived`.
+    :returns: Receipt id.
+    """
+    from corehq.apps.receiverwrapper.tasks import process_queued_submission
+    receipt_id = uuid4().hex
+    if kwargs.get('received_on') is None:
+        kwargs['received_on'] = datetime.utcnow()
+    kwargs['received_on'] = json_format_datetime(kwargs['received_on'])
+    with AtomicBlobs(get_blob_db()) as db:
+        db.put(
+            BytesIO(instance),
+            domain=domain,
+            parent_id=receipt_id,
+            type_code=CODES.queued_submission,
+            name=FORM_XML,
+            content_type='text/xml',
+            properties=kwargs,
+        )
+        for name, attachment in attachments.items():
+            db.put(
+                attachment,
+                domain=domain,
+                parent_id=receipt_id,
+                type_code=CODES.queued_submission,
+                name=name,
+                content_type=attachment.content_type,
+            )
+        QueuedSubmission.objects.create(receipt_id=receipt_id, domain=domain, user_id=kwargs.get('user_id'))
+    metrics_counter('commcare.submission_queue.queued', tags={'domain': domain})
+    try:
+        _enqueue(domain, receipt_id)
+        process_queued_submission.delay()
+    except Exception:
+        # requeue_stale_submissions will queue it
+        notify_exception(None, 'Unable to queue submission', details={
+            'domain': domain,
+            'receipt_id': receipt_id,
+        })
+    return receipt_id
+
+
+def process_next_submission():
+    """Process the next queued submission of the next domain in turn
+
+    :returns: True if a submission was taken from the queue.
+    """
+    next_submission = _pop_next_submission()
+    if next_submission is None:
+        return False
+    process_submission(*next_submission)
+    return True
+
+
+def process_submission(domain, receipt_id):
+    attempt = _claim(receipt_id)
+    if not attempt:
+        return  # already processed, or being processed by another worker
+    if attempt > MAX_ATTEMPTS:
+        # workers processing it died
+        _set_failed(domain, receipt_id)
+        return
+    try:
+        _process_submission(domain, receipt_id)
+    except Exception:
+        notify_exception(None, 'Error processing queued submission', details={
+            'domain': domain,
+            'receipt_id': receipt_id,
+            'attempt': attempt,
+        })
+        if attempt >= MAX_ATTEMPTS:
+            _set_failed(domain, receipt_id)
+        # otherwise it is queued again by requeue_stale_submissions
+
+
+def _claim(receipt_id):
+    """Claim a queued submission for processing
+
+    Only one worker can claim a submission until the claim expires.
+    Failed submissions cannot be claimed.
+
+    :returns: The number of times the submission has been claimed,
+    including this time, or None if it was not claimed.
+    """
+    now = datetime.utcnow()
+    queued = QueuedSubmission.objects.filter(receipt_id=receipt_id, failed_on__isnull=True)
+    claimed = queued.filter(
+        Q(claimed_until__isnull=True) | Q(claimed_until__lt=now),
+    ).update(claimed_until=now + PROCESSING_TIMEOUT, attempts=F('attempts') + 1)
+    if not claimed:
+        return None
+    return queued.values_list('attempts', flat=True).first()
+
+
+def _set_failed(domain, receipt_id):
+    log.error('Queued submission %s failed after %s attempts', receipt_id, MAX_ATTEMPTS)
+    QueuedSubmission.objects.filter(receipt_id=receipt_id).update(
+        failed_on=datetime.utcnow(), claimed_until=None)
+    metrics_counter('commcare.submission_queue.failed', tags={'domain': domain})
+
+
+def _process_submission(domain, receipt_id):
+    metas = get_blob_db().metadb.get_for_parent(receipt_id, CODES.queued_submission)
+    form_meta = [meta for meta in metas if meta.name == FORM_XML]
+    if not form_meta:
+        # processed by a worker that stopped before it was done
+        QueuedSubmission.objects.filter(receipt_id=receipt_id).delete()
+        return
+    form_meta, = form_meta
+    submission_post = _get_submission_post(form_meta, [meta for meta in metas if meta.name != FORM_XML])
+    try:
+        result = submission_post.run()
+    except XFormLockError:
+        # the form is being processed by another submission
+        log.info('Form of queued submission %s is locked, queuing it again', receipt_id)
+        QueuedSubmission.objects.filter(receipt_id=receipt_id).update(
+            claimed_until=None, attempts=F('attempts') - 1)
+        _enqueue(domain, receipt_id)
+        return
+
+    response = parse_openrosa_response(result.response.content)
+    _set_result(receipt_id, {
+        'domain': domain,
+        'user_id': form_meta.properties.get('user_id'),
+        'status': 'processed',
+        'form_id': result.xform.form_id if result.xform else None,
+        'submission_type': result.submission_type,
+        'status_code': result.response.status_code,
+        'message': response.message if response else None,
+    })
+    get_blob_db().bulk_delete(metas=metas)
+    QueuedSubmission.objects.filter(receipt_id=receipt_id).delete()
+    metrics_counter('commcare.submission_queue.processed', tags={
+        'domain': domain,
+        'submission_type': result.submission_type,
+    })
+    metrics_histogram(
+        'commcare.submission_queue.wait_time', (datetime.utcnow() - form_meta.created_on).total_seconds(),
+        bucket_tag='duration', buckets=[1, 10, 60, 300, 900, 3600, 4 * 3600], bucket_unit='s',
+        tags={'domain': domain},
+    )
+
+
+def get_submission_status(domain, receipt_id, user_id=None):
+    """Get the status of a queued submission
+
+    :param user_id: If given, only the status of submissions by this
+    user is returned. Submissions by other users are 'unknown'.
+    :returns: Dict with a 'status' of 'queued', 'processed', 'failed' or
+    'unknown'. Processed submissions also have 'form_id',
+    'submission_type', 'status_code' and 'message' items.
+    """
+    unknown = {'status': 'unknown'}
+    result = _get_client().get(_get_result_key(receipt_id))
+    if result is not None:
+        result = json.loads(result)
+        submitted_by = result.pop('user_id')
+        if result.pop('domain') == domain and user_id in (None, submitted_by):
+            return result
+        return unknown
+    queued = QueuedSubmission.objects.filter(receipt_id=receipt_id, domain=domain)
+    if user_id is not None:
+        queued = queued.filter(user_id=user_id)
+    queued = queued.values_list('failed_on', flat=True)
+    if not queued.exists():
+        return unknown
+    return {'status': 'failed' if queued.first() else 'queued'}
+
+
+def requeue_stale_submissions():
+    """Queue unprocessed submissions that are no longer in a queue
+
+    :returns: Number of submissions queued again.
+    """
+    client = _get_client()
+    count = 0
+    now = datetime.utcnow()
+    stale = QueuedSubmission.objects.filter(
+        Q(claimed_until__isnull=True) | Q(claimed_until__lt=now),
+        created_on__lt=now - STALE_SUBMISSION_AGE,
+        failed_on__isnull=True,
+    ).values_list('domain', 'receipt_id')
+    for domain, receipt_id in stale.iterator():
+        if not client.sismember(WAITING_KEY, receipt_id):
+            _enqueue(domain, receipt_id)
+            count += 1
+    if count:
+        metrics_counter('commcare.submission_queue.requeued', count)
+    return count
+
+
+def get_queue_length():
+    return _get_client().scard(WAITING_KEY)
+
+
+def _get_submission_post(form_meta, attachment_metas):
+    db = get_blob_db()
+    kwargs = dict(form_meta.properties)
+    domain = form_meta.domain
+    auth_cls = WaivedAuthContext if kwargs.pop('auth_waived', False) else AuthContext
+    auth_context = auth_cls(
+        domain=domain,
+        user_id=kwargs.pop('user_id', None),
+        authenticated=kwargs.pop('authenticated', False),
+    )
+    app_id, build_id = get_app_and_build_ids(domain, kwargs.pop('app_id', None))
+    kwargs['received_on'] = string_to_utc_datetime(kwargs['received_on'])
+    with db.get(meta=form_meta) as fileobj:
+        instance = fileobj.read()
+    attachments = {}
+    for meta in attachment_metas:
+        with db.get(meta=meta) as fileobj:
+            attachments[meta.name] = SimpleUploadedFile(meta.name, fileobj.read(), meta.content_type)
+    return SubmissionPost(
+        instance=instance,
+        attachments=attachments,
+        domain=domain,
+        app_id=app_id,
+        build_id=build_id,
+        auth_context=auth_context,
+        timing_context=TimingContext(),
+        **kwargs
+    )
+
+
+def _enqueue(domain, receipt_id):
+    client = _get_client()
+    pipeline = client.pipeline()
+    pipeline.sadd(WAITING_KEY, receipt_id)
+    pipeline.rpush(_get_domain_key(domain), receipt_id)
+    added, length = pipeline.execute()
+    if length == 1:
+        # the domain queue was empty so the domain is not in the rotation
+        client.lpush(DOMAINS_KEY, domain)
+
+
+def _pop_next_submission():
+    """Take a submission from the queue of the next domain in turn
+
+    A submission can be taken more than once if it was queued again
+    while a worker was taking it. See `_claim`.
+
+    :returns: `(domain, receipt_id)` or None if no submissions are queued.
+    """
+    client = _get_client()
+    for attempt in range(client.llen(DOMAINS_KEY)):
+        # the next domain is at the tail of the list, move it to the head
+        domain = client.rpoplpush(DOMAINS_KEY, DOMAINS_KEY)
+        if domain is None:
+            return None
+        domain = domain.decode('utf-8')
+        domain_key = _get_domain_key(domain)
+        receipt_id = client.lpop(domain_key)
+        if receipt_id is not None:
+            receipt_id = receipt_id.decode('utf-8')
+            client.srem(WAITING_KEY, receipt_id)
+            return domain, receipt_id
+        client.lrem(DOMAINS_KEY, 0, domain)
+        if client.llen(domain_key):
+            # a submission was queued after the domain was found to be empty
+            client.lpush(DOMAINS_KEY, domain)
+    return None
+
+
+def _set_result(receipt_id, result):
+    _get_client().set(_get_result_key(receipt_id), json.dumps(result), ex=RESULT_TIMEOUT)
+
+
+def _get_domain_key(domain):
+    return 'submission-queue:domain:{}'.format(domain)
+
+
+def _get_result_key(receipt_id):
+    return 'submission-queue:result:{}'.format(receipt_id)
+
+
+def _get_client():
+    return get_redis_client().client.get_client()
@@ -0,0 +1,36 @@
+from django.conf import settings
+
+from celery.schedules import crontab
+
+from corehq.apps.celery import periodic_task
+from corehq.apps.receiverwrapper import submission_queue
+from corehq.util.celery_utils import no_result_task
+from corehq.util.decorators import serial_task
+from corehq.util.metrics import metrics_gauge
+from corehq.util.metrics.const import MPM_MAX
+
+SUBMISSION_QUEUE = 'submission_queue'
+
+
+@no_result_task(queue=SUBMISSION_QUEUE, acks_late=True)
+def process_queued_submission():
+    """Process one queued submission
+
+    One task is queued for each queued submission, but a task does not
+    necessarily process the submission it was queued for. See
+    `submission_queue.process_next_submission`.
+    """
+    submission_queue.process_next_submission()
+
+
+@periodic_task(run_every=crontab(minute='*/5'), queue=settings.CELERY_PERIODIC_QUEUE)
+def _requeue_stale_submissions():
+    requeue_stale_submissions.delay()
+
+
+@serial_task("requeue_stale_submissions", queue=settings.CELERY_PERIODIC_QUEUE)
+def requeue_stale_submissions():
+    for x in range(submission_queue.requeue_stale_submissions()):
+        process_queued_submission.delay()
+    metrics_gauge('commcare.submission_queue.length', submission_queue.get_queue_length(),
+        multiprocess_mode=MPM_MAX)
@@ -0,0 +1,181 @@
+from datetime import datetime
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from dimagi.utils.couch import get_redis_client
+
+from corehq.apps.receiverwrapper.models import QueuedSubmission
+from corehq.apps.receiverwrapper.submission_queue import (
+    DOMAINS_KEY,
+    MAX_ATTEMPTS,
+    STALE_SUBMISSION_AGE,
+    WAITING_KEY,
+    _claim,
+    _enqueue,
+    _get_domain_key,
+    _pop_next_submission,
+    get_submission_status,
+    process_next_submission,
+    process_submission,
+    requeue_stale_submissions,
+)
+from corehq.apps.receiverwrapper.tests.test_submissions import BaseSubmissionTest
+from corehq.apps.receiverwrapper.views import SUBMISSION_RECEIPT_HEADER
+from corehq.form_processor.models import XFormInstance
+from corehq.form_processor.tests.utils import sharded
+from corehq.util.test_utils import flag_enabled
+
+
+def _clear_queues(*domains):
+    client = get_redis_client().client.get_client()
+    client.delete(DOMAINS_KEY, WAITING_KEY, *[_get_domain_key(domain) for domain in domains])
+
+
+class SubmissionQueueSchedulingTest(SimpleTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(_clear_queues, 'a', 'b', 'c')
+        _clear_queues('a', 'b', 'c')
+
+    def pop_all(self):
+        popped = []
+        while True:
+            next_submission = _pop_next_submission()
+            if next_submission is None:
+                return popped
+            popped.append(next_submission)
+
+    def test_domains_take_turns(self):
+        for receipt_id in ['a1', 'a2', 'a3', 'a4']:
+            _enqueue('a', receipt_id)
+        _enqueue('b', 'b1')
+        _enqueue('c', 'c1')
+        _enqueue('c', 'c2')
+        self.assertEqual(
+            [receipt_id for domain, receipt_id in self.pop_all()],
+            ['a1', 'b1', 'c1', 'a2', 'c2', 'a3', 'a4'],
+        )
+
+    def test_domain_queued_again_after_empty(self):
+        _enqueue('a', 'a1')
+        self.assertEqual(self.pop_all(), [('a', 'a1')])
+        _enqueue('a', 'a2')
+        self.assertEqual(self.pop_all(), [('a', 'a2')])
+
+
+@sharded
+@flag_enabled('QUEUE_FORM_SUBMISSIONS')
+class QueuedSubmissionTest(BaseSubmissionTest):
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(_clear_queues, self.domain.name)
+        patcher = patch('corehq.apps.receiverwrapper.tasks.process_queued_submission.delay')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_queued_submission(self):
+        response = self._submit('simple_form.xml')
+        self.assertEqual(response.status_code, 201)
+        receipt_id = response[SUBMISSION_RECEIPT_HEADER]
+        self.assertEqual(XFormInstance.objects.get_form_ids_in_domain(self.domain.name), [])
+        self.assertEqual(get_submission_status(self.domain.name, receipt_id), {'status': 'queued'})
+
+        self.assertTrue(process_next_submission())
+        form_id, = XFormInstance.objects.get_form_ids_in_domain(self.domain.name)
+        status = get_submission_status(self.domain.name, receipt_id)
+        self.assertEqual(status['status'], 'processed')
+        self.assertEqual(status['form_id'], form_id)
+        self.assertEqual(status['submission_type'], 'normal')
+        self.assertEqual(status['status_code'], 201)
+        self.assertFalse(process_next_submission())
+        self.assertFalse(QueuedSubmission.objects.filter(receipt_id=receipt_id).exists())
+
+    def test_status_of_other_domain(self):
+        response = self._submit('simple_form.xml')
+        receipt_id = response[SUBMISSION_RECEIPT_HEADER]
+        self.assertEqual(get_submission_status('other-domain', receipt_id), {'status': 'unknown'})
+
+    def test_status_of_other_user(self):
+        response = self._submit('simple_form.xml')
+        receipt_id = response[SUBMISSION_RECEIPT_HEADER]
+        self.assertEqual(get_submission_status(self.domain.name, receipt_id, user_id='other-user'),
+                         {'status': 'unknown'})
+        process_next_submission()
+        self.assertEqual(get_submission_status(self.domain.name, receipt_id, user_id='other-user'),
+                         {'status': 'unknown'})
+
+    def test_submission_is_claimed_once(self):
+        response = self._submit('simple_form.xml')
+        receipt_id = response[SUBMISSION_RECEIPT_HEADER]
+        self.assertTrue(_claim(receipt_id))
+        self.assertFalse(_claim(receipt_id))
+
+        # claimed by another worker
+        process_submission(self.domain.name, receipt_id)
+        self.assertEqual(XFormInstance.objects.get_form_ids_in_domain(self.domain.name), [])
+        self.assertEqual(get_submission_status(self.domain.name, receipt_id), {'status': 'queued'})
+
+    def test_submission_saved_when_queue_is_unavailable(self):
+        with patch('corehq.apps.receiverwrapper.submission_queue._enqueue', side_effect=ConnectionError):
+            response = self._submit('simple_form.xml')
+        self.assertEqual(response.status_code, 201)
+        receipt_id = response[SUBMISSION_RECEIPT_HEADER]
+        self.assertFalse(process_next_submission())
+
+        QueuedSubmission.objects.filter(receipt_id=receipt_id).update(
+            created_on=datetime.utcnow() - STALE_SUBMISSION_AGE)
+        self.assertEqual(requeue_stale_submissions(), 1)
+        self.assertEqual(requeue_stale_submissions(), 0)  # waiting in the queue
+        self.assertTrue(process_next_submission())
+        self.assertEqual(len(XFormInstance.objects.get_form_ids_in_domain(self.domain.name)), 1)
+
+    def test_claimed_submission_not_requeued(self):
+        response = self._submit('simple_form.xml')
+        receipt_id = response[SUBMISSION_RECEIPT_HEADER]
+        _pop_next_submission()
+        QueuedSubmission.objects.filter(receipt_id=receipt_id).update(
+            created_on=datetime.utcnow() - STALE_SUBMISSION_AGE)
+        self.assertTrue(_claim(receipt_id))
+        self.assertEqual(requeue_stale_submissions(), 0)
+
+        # the claim expired
+        QueuedSubmission.objects.filter(receipt_id=receipt_id).update(claimed_until=datetime.utcnow())
+        self.assertEqual(requeue_stale_submissions(), 1)
+
+    def test_rate_limited_submission_is_not_queued(self):
+        with patch('corehq.apps.receiverwrapper.views.rate_limit_submission', return_value=True):
+            response = self._submit('simple_form.xml')
+        self.assertEqual(response.status_code, 429)
+        self.assertFalse(QueuedSubmission.objects.filter(domain=self.domain.name).exists())
+
+    @patch('corehq.apps.receiverwrapper.submission_queue.notify_exception')
+    def test_failed_after_max_attempts(self, notify_exception):
+        response = self._submit('simple_form.xml')
+        receipt_id = response[SUBMISSION_RECEIPT_HEADER]
+        _pop_next_submission()
+        with patch('corehq.apps.receiverwrapper.submission_queue._process_submission',
+                   side_effect=Exception('boom')):
+            for attempt in range(MAX_ATTEMPTS):
+                self.assertEqual(get_submission_status(self.domain.name, receipt_id), {'status': 'queued'})
+                process_submission(self.domain.name, receipt_id)
+                # the claim expired
+                QueuedSubmission.objects.filter(receipt_id=receipt_id).update(claimed_until=None)
+        self.assertEqual(notify_exception.call_count, MAX_ATTEMPTS)
+        self.assertEqual(get_submission_status(self.domain.name, receipt_id), {'status': 'failed'})
+
+        QueuedSubmission.objects.filter(receipt_id=receipt_id).update(
+            created_on=datetime.utcnow() - STALE_SUBMISSION_AGE)
+        self.assertEqual(requeue_stale_submissions(), 0)
+        self.assertIsNone(_claim(receipt_id))
+
+    def test_failed_when_workers_die(self):
+        response = self._submit('simple_form.xml')
+        receipt_id = response[SUBMISSION_RECEIPT_HEADER]
+        _pop_next_submission()
+        QueuedSubmission.objects.filter(receipt_id=receipt_id).update(attempts=MAX_ATTEMPTS)
+        process_submission(self.domain.name, receipt_id)
+        self.assertEqual(XFormInstance.objects.get_form_ids_in_domain(self.domain.name), [])
+        self.assertEqual(get_submission_status(self.domain.name, receipt_id), {'status': 'failed'})
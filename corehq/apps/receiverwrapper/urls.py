@@ -1,10 +1,11 @@
 from django.conf.urls import re_path as url
 
-from corehq.apps.receiverwrapper.views import post, post_api, secure_post
+from corehq.apps.receiverwrapper.views import post, post_api, secure_post, submission_status
 
 urlpatterns = [
     url(r'^$', post, name='receiver_post'),
     url(r'^api/$', post_api, name='receiver_post_api'),
+    url(r'^status/(?P<receipt_id>[\w-]+)/$', submission_status, name='receiver_submission_status'),
     url(r'^secure/(?P<app_id>[\w-]+)/$', secure_post, name='receiver_secure_post_with_app_id'),
     url(r'^secure/$', secure_post, name='receiver_secure_post'),
 
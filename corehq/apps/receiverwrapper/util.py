@@ -58,6 +58,33 @@ def submit_form_locally(instance, domain, max_wait=..., **kwargs):
     return result
 
 
+def submit_forms_locally(instances, domain, max_wait=..., **kwargs):
+    """Submit a batch of forms, processing them together
+
+    See `SubmissionBatch` for how the batch is processed.
+
+    :param instances: List of XML instances (as strings) to submit
+    :param max_wait: See `submit_form_locally`. The delay applies to the
+    batch as a whole.
+    :returns: List of `FormProcessingResult` in submission order.
+    """
+    from corehq.form_processor.submission_batch import SubmissionBatch
+
+    if max_wait is ...:
+        max_wait = 0.1
+    if max_wait is not None:
+        rate_limit_submission(domain, delay_rather_than_reject=True, max_wait=max_wait)
+    kwargs['auth_context'] = kwargs.get('auth_context') or DefaultAuthContext()
+    results = SubmissionBatch(domain=domain, instances=instances, **kwargs).run()
+    for result in results:
+        if not 200 <= result.response.status_code < 300:
+            raise LocalSubmissionError('Error submitting (status code %s): %s' % (
+                result.response.status_code,
+                result.response.content.decode('utf-8', errors='backslashreplace'),
+            ))
+    return results
+
+
 def get_meta_appversion_text(form_metadata):
     try:
         text = form_metadata['appVersion']
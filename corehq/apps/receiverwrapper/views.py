@@ -1,9 +1,9 @@
 import os
 import logging
 
-from django.http import HttpResponse, HttpResponseBadRequest, HttpResponseForbidden
+from django.http import HttpResponse, HttpResponseBadRequest, HttpResponseForbidden, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_POST
+from django.views.decorators.http import require_GET, require_POST
 
 import couchforms
 from casexml.apps.case.xform import get_case_updates, is_device_report
@@ -41,6 +41,7 @@ from corehq.apps.receiverwrapper.auth import (
     domain_requires_auth,
 )
 from corehq.apps.receiverwrapper.rate_limiter import rate_limit_submission
+from corehq.apps.receiverwrapper.submission_queue import get_submission_status, queue_submission
 from corehq.apps.receiverwrapper.util import (
     DEMO_SUBMIT_MODE,
     from_demo_user,
@@ -60,6 +61,8 @@ PROFILE_PROBABILITY = float(os.getenv('COMMCARE_PROFILE_SUBMISSION_PROBABILITY',
 PROFILE_LIMIT = os.getenv('COMMCARE_PROFILE_SUBMISSION_LIMIT')
 PROFILE_LIMIT = int(PROFILE_LIMIT) if PROFILE_LIMIT is not None else 1
 
+SUBMISSION_RECEIPT_HEADER = 'X-CommCareHQ-Submission-Receipt'
+
 
 @profile_dump('commcare_receiverwapper_process_form.prof', probability=PROFILE_PROBABILITY, limit=PROFILE_LIMIT)
 def _process_form(request, domain, app_id, user_id, authenticated,
@@ -111,6 +114,10 @@ def _process_form(request, domain, app_id, user_id, authenticated,
         _record_metrics(metric_tags, 'blacklisted', response)
         return response
 
+    if toggles.QUEUE_FORM_SUBMISSIONS.enabled(domain):
+        return _queue_form(request, instance, attachments, metric_tags,
+                           domain, app_id, user_id, authenticated, auth_cls)
+
     with TimingContext() as timer:
         app_id, build_id = get_app_and_build_ids(domain, app_id)
         submission_post = SubmissionPost(
@@ -156,6 +163,39 @@ def _process_form(request, domain, app_id, user_id, authenticated,
     return response
 
 
+def _queue_form(request, instance, attachments, metric_tags,
+                domain, app_id, user_id, authenticated, auth_cls):
+    """Save the submission to be processed later and respond with a receipt
+
+    See corehq.apps.receiverwrapper.submission_queue
+    """
+    receipt_id = queue_submission(
+        domain,
+        instance,
+        attachments,
+        app_id=app_id,
+        user_id=user_id,
+        authenticated=authenticated,
+        auth_waived=issubclass(auth_cls, WaivedAuthContext),
+        location=couchforms.get_location(request),
+        received_on=couchforms.get_received_on(request),
+        date_header=couchforms.get_date_header(request),
+        path=couchforms.get_path(request),
+        submit_ip=couchforms.get_submit_ip(request),
+        last_sync_token=couchforms.get_last_sync_token(request),
+        openrosa_headers=couchforms.get_openrosa_headers(request),
+        force_logs=request.GET.get('force_logs', 'false') == 'true',
+    )
+    response = openrosa_response.get_openrosa_reponse(
+        '√ (received, processing is pending: {})'.format(receipt_id),
+        openrosa_response.ResponseNature.SUBMIT_SUCCESS,
+        201,
+    )
+    response[SUBMISSION_RECEIPT_HEADER] = receipt_id
+    _record_metrics(metric_tags, 'queued', response)
+    return response
+
+
 def _submission_error(request, message, metric_tags,
         domain, app_id, user_id, authenticated, meta=None, status=400,
         notify=True):
@@ -224,6 +264,21 @@ def post_api(request, domain):
     )
 
 
+@login_or_digest_ex(allow_cc_users=True)
+@two_factor_exempt
+@require_GET
+def submission_status(request, domain, receipt_id):
+    """Get the processing status of a queued submission
+
+    The receipt id is in the X-CommCareHQ-Submission-Receipt header of the
+    response to the submission. Users can only check the status of their
+    own submissions, except domain admins who can check any submission.
+    """
+    couch_user = request.couch_user
+    user_id = None if couch_user.is_domain_admin(domain) else couch_user.get_id
+    return JsonResponse(get_submission_status(domain, receipt_id, user_id=user_id))
+
+
 @waf_allow('XSS_BODY')
 @location_safe
 @csrf_exempt
@@ -0,0 +1,532 @@
+"""Compiled evaluation of data source filters and indicators
+
+`CompiledDataSource` compiles the filter, base item expression and
+indicators of a data source into closures of `(item, context, memo)`.
+Expressions and filters are compiled bottom up, and identical subtrees
+(including references to the same named expression or named filter) are
+compiled into a single node. Nodes that are used more than once, and that
+are not trivial lookups, save their value in the `memo` dict, so they are
+only evaluated once for each item of each row.
+
+Expression and filter types that the compiler does not know about are
+evaluated by calling them, as they are when interpreted, so compiled data
+sources return the same rows as interpreted ones. `get_engine_differences`
+checks that on a set of documents.
+"""
+import functools
+import json
+
+from jsonobject import JsonObject
+
+from corehq.apps.userreports.expressions.getters import (
+    DictGetter,
+    NestedDictGetter,
+    TransformedGetter,
+    evaluate_lazy_args,
+    safe_recursive_lookup,
+    transform_for_datatype,
+)
+from corehq.apps.userreports.expressions.specs import (
+    ArrayIndexExpressionSpec,
+    CoalesceExpressionSpec,
+    ConditionalExpressionSpec,
+    ConstantGetterSpec,
+    IdentityExpressionSpec,
+    IterationNumberExpressionSpec,
+    NamedExpressionSpec,
+    NestedExpressionSpec,
+    PropertyNameGetterSpec,
+    PropertyPathGetterSpec,
+    RootDocExpressionSpec,
+    SwitchExpressionSpec,
+)
+from corehq.apps.userreports.filters import (
+    ANDFilter,
+    Filter,
+    NamedFilter,
+    NOTFilter,
+    ORFilter,
+    SinglePropertyValueFilter,
+)
+from corehq.apps.userreports.indicators import (
+    BooleanIndicator,
+    ColumnValue,
+    CompoundIndicator,
+    RawIndicator,
+)
+from corehq.apps.userreports.specs import EvaluationContext
+
+# column ids whose values differ between evaluations of the same document
+NON_DETERMINISTIC_COLUMNS = ('inserted_at',)
+
+
+class CompiledDataSource(object):
+
+    def __init__(self, config):
+        compiler = _Compiler()
+        filter_node = compiler.filter(config._get_main_filter())
+        base_item_node = (
+            compiler.expression(config.parsed_expression)
+            if config.base_item_expression else None
+        )
+        indicator_nodes = [
+            (indicator, compiler.indicator(indicator))
+            for indicator in _flatten_indicators(config.indicators)
+        ]
+        self.num_expressions = len(compiler.nodes)
+        self.num_shared_expressions = len([node for node in compiler.nodes.values() if node.memoized])
+
+        self._filter = filter_node.build()
+        self._base_item = base_item_node.build() if base_item_node else None
+        self._indicators = [
+            _get_indicator_fn(indicator, node.build() if node else None)
+            for indicator, node in indicator_nodes
+        ]
+
+    def filter(self, document, eval_context=None):
+        if eval_context is None:
+            eval_context = EvaluationContext(document)
+        return self._filter(document, eval_context, {})
+
+    def get_items(self, document, eval_context=None):
+        if eval_context is None:
+            eval_context = EvaluationContext(document)
+        memo = {}
+        if not self._filter(document, eval_context, memo):
+            return []
+        if self._base_item is None:
+            return [document]
+        result = self._base_item(document, eval_context, memo)
+        if result is None:
+            return []
+        elif isinstance(result, list):
+            return result
+        else:
+            return [result]
+
+    def get_all_values(self, doc, eval_context=None):
+        if eval_context is None:
+            eval_context = EvaluationContext(doc)
+        rows = []
+        for item in self.get_items(doc, eval_context):
+            memo = {}
+            values = []
+            for get_values in self._indicators:
+                get_values(item, eval_context, memo, values)
+            rows.append(values)
+            eval_context.increment_iteration()
+        return rows
+
+
+def get_engine_differences(config, docs):
+    """Evaluate documents with interpreted and compiled expressions
+
+    :returns: List of `(doc_id, interpreted_rows, compiled_rows)` for the
+    documents whose rows differ. Rows are lists of `(column_id, value)`,
+    without `NON_DETERMINISTIC_COLUMNS`.
+    """
+    compiled = config.compiled_data_source
+    differences = []
+    for doc in docs:
+        interpreted_rows = _get_comparable_rows(config.get_interpreted_values(doc, EvaluationContext(doc)))
+        compiled_rows = _get_comparable_rows(compiled.get_all_values(doc, EvaluationContext(doc)))
+        if interpreted_rows != compiled_rows:
+            differences.append((doc.get('_id'), interpreted_rows, compiled_rows))
+    return differences
+
+
+def _get_comparable_rows(rows):
+    return [
+        [(value.column.id, value.value) for value in row if value.column.id not in NON_DETERMINISTIC_COLUMNS]
+        for row in rows
+    ]
+
+
+def _flatten_indicators(indicator):
+    if isinstance(indicator, CompoundIndicator):
+        return [leaf for child in indicator.indicators for leaf in _flatten_indicators(child)]
+    return [indicator]
+
+
+def _get_indicator_fn(indicator, fn):
+    if fn is None:
+        def get_values(item, context, memo, values):
+            values.extend(indicator.get_values(item, context))
+    elif isinstance(indicator, BooleanIndicator):
+        column = indicator.column
+
+        def get_values(item, context, memo, values):
+            values.append(ColumnValue(column, 1 if fn(item, context, memo) else 0))
+    else:
+        column = indicator.column
+
+        def get_values(item, context, memo, values):
+            values.append(ColumnValue(column, fn(item, context, memo)))
+    return get_values
+
+
+class _Node(object):
+    """A compiled expression or filter
+
+    :param make: Function of the built children that returns the closure
+    of the node.
+    :param cheap: Whether the node is cheaper to evaluate than to look up
+    in the memo.
+    """
+
+    def __init__(self, index, key, make, children, cheap):
+        self.index = index
+        self.key = key
+        self.make = make
+        self.children = children
+        self.cheap = cheap
+        self.uses = 1
+        self._fn = None
+
+    @property
+    def memoized(self):
+        return self.uses > 1 and not self.cheap
+
+    def build(self):
+        if self._fn is None:
+            fn = self.make(*[child.build() for child in self.children])
+            if self.memoized:
+                fn = _memoize(fn, self.index)
+            self._fn = fn
+        return self._fn
+
+
+def _memoize(fn, index):
+    def memoized(item, context, memo):
+        entry = memo.get(index)
+        if entry is not None and entry[0] is item:
+            return entry[1]
+        value = fn(item, context, memo)
+        memo[index] = (item, value)
+        return value
+    return memoized
+
+
+class _Compiler(object):
+
+    def __init__(self):
+        self.nodes = {}
+
+    def _node(self, key, make, children=(), cheap=False):
+        children = list(children)
+        node = self.nodes.get(key)
+        if node is not None:
+            # the children were only compiled again for this use of the node
+            for child in children:
+                child.uses -= 1
+            node.uses += 1
+            return node
+        node = _Node(len(self.nodes), key, make, children, cheap)
+        self.nodes[key] = node
+        return node
+
+    def _opaque(self, fn, cheap=False):
+        return self._node(_get_callable_key(fn), lambda: _call_opaque(fn), cheap=cheap)
+
+    def indicator(self, indicator):
+        """:returns: Node of the value of a single column indicator, or None"""
+        if isinstance(indicator, BooleanIndicator):
+            return self.filter(indicator.filter)
+        elif isinstance(indicator, RawIndicator):
+            return self.expression(indicator.getter)
+        return None
+
+    def filter(self, filter):
+        filter_type = type(filter)
+        if filter_type is Filter:
+            return self._node(('true',), lambda: _true, cheap=True)
+        elif filter_type is NamedFilter:
+            return self.filter(filter.filter)
+        elif filter_type is NOTFilter:
+            child = self.filter(filter._filter)
+            return self._node(('not', child.key), _make_not, [child])
+        elif filter_type is ANDFilter:
+            children = [self.filter(child) for child in filter.filters]
+            return self._node(('and',) + _keys(children), _make_and, children)
+        elif filter_type is ORFilter:
+            children = [self.filter(child) for child in filter.filters]
+            return self._node(('or',) + _keys(children), _make_or, children)
+        elif filter_type is SinglePropertyValueFilter:
+            operator = filter.operator
+            children = [self.expression(filter.expression), self.expression(filter.reference_expression)]
+            return self._node(
+                ('compare', _get_operator_key(operator)) + _keys(children),
+                functools.partial(_make_compare, operator),
+                children,
+            )
+        return self._opaque(filter)
+
+    def expression(self, expression):
+        expression_type = type(expression)
+        if expression_type is NamedExpressionSpec:
+            return self.expression(expression._factory_context.named_expressions[expression.name])
+        elif expression_type is IdentityExpressionSpec:
+            return self._node(('identity',), lambda: _identity, cheap=True)
+        elif expression_type is ConstantGetterSpec:
+            constant = expression.constant
+            return self._node(('constant', _get_json_key(constant)), lambda: _make_constant(constant), cheap=True)
+        elif expression_type is IterationNumberExpressionSpec:
+            return self._node(('iteration',), lambda: _iteration, cheap=True)
+        elif expression_type is PropertyNameGetterSpec:
+            return self._property_name(expression)
+        elif expression_type is PropertyPathGetterSpec:
+            path = list(expression.property_path)
+            datatype = expression.datatype
+            return self._node(
+                ('property_path', tuple(path), datatype),
+                lambda: _make_property_path(path, datatype),
+                cheap=True,
+            )
+        elif expression_type is TransformedGetter:
+            child = self.expression(expression.getter)
+            transform = expression.transform
+            if not transform:
+                return child
+            return self._node(
+                ('transform', _get_callable_key(transform), child.key),
+                functools.partial(_make_transform, transform),
+                [child],
+            )
+        elif expression_type is ConditionalExpressionSpec:
+            children = [
+                self.filter(expression._test_function),
+                self.expression(expression._true_expression),
+                self.expression(expression._false_expression),
+            ]
+            return self._node(('conditional',) + _keys(children), _make_conditional, children)
+        elif expression_type is SwitchExpressionSpec:
+            return self._switch(expression)
+        elif expression_type is CoalesceExpressionSpec:
+            children = [self.expression(expression._expression), self.expression(expression._default_expression)]
+            return self._node(('coalesce',) + _keys(children), _make_coalesce, children)
+        elif expression_type is NestedExpressionSpec:
+            children = [
+                self.expression(expression._argument_expression),
+                self.expression(expression._value_expression),
+            ]
+            return self._node(('nested',) + _keys(children), _make_nested, children)
+        elif expression_type is RootDocExpressionSpec:
+            child = self.expression(expression._expression_fn)
+            return self._node(('root_doc', child.key), _make_root_doc, [child])
+        elif expression_type is ArrayIndexExpressionSpec:
+            children = [
+                self.expression(expression._array_expression),
+                self.expression(expression._index_expression),
+            ]
+            return self._node(('array_index',) + _keys(children), _make_array_index, children)
+        elif (isinstance(expression, functools.partial) and expression.func is evaluate_lazy_args
+                and isinstance(expression.args[0], (DictGetter, NestedDictGetter))):
+            # property getters of raw and choice list indicators
+            return self._opaque(expression, cheap=True)
+        return self._opaque(expression)
+
+    def _property_name(self, expression):
+        name_expression = expression._property_name_expression
+        datatype = expression.datatype
+        if type(name_expression) is ConstantGetterSpec:
+            property_name = name_expression.constant
+            return self._node(
+                ('property_name', _get_json_key(property_name), datatype),
+                lambda: _make_property_name(property_name, datatype),
+                cheap=True,
+            )
+        child = self.expression(name_expression)
+        return self._node(
+            ('property_name', child.key, datatype),
+            functools.partial(_make_dynamic_property_name, datatype),
+            [child],
+        )
+
+    def _switch(self, expression):
+        cases = list(expression.cases)
+        children = [
+            self.expression(expression._switch_on_expression),
+            self.expression(expression._default_expression),
+        ] + [self.expression(expression._case_expressions[case]) for case in cases]
+        return self._node(
+            ('switch', tuple(cases)) + _keys(children),
+            functools.partial(_make_switch, cases),
+            children,
+        )
+
+
+def _keys(nodes):
+    return tuple(node.key for node in nodes)
+
+
+def _get_json_key(value):
+    return json.dumps(value, sort_keys=True, default=repr)
+
+
+def _get_callable_key(fn):
+    """A key that is equal for callables that return the same values"""
+    if isinstance(fn, functools.partial) and fn.func is evaluate_lazy_args and not fn.keywords:
+        return ('lazy',) + tuple(_get_callable_key(arg) for arg in fn.args)
+    elif type(fn) is DictGetter:
+        return ('dict_getter', _get_json_key(fn.property_name))
+    elif type(fn) is NestedDictGetter:
+        return ('nested_dict_getter', _get_json_key(fn.property_path))
+    elif isinstance(fn, JsonObject):
+        # specs built by the same factory context from the same JSON are equivalent
+        return ('spec', type(fn), _get_json_key(fn.to_json()))
+    # the node keeps a reference to fn, so its id is not reused
+    return ('object', id(fn))
+
+
+def _get_operator_key(operator):
+    if hasattr(operator, '__wrapped__'):
+        # operators from get_operator are wrapped to return False on TypeErrors
+        return ('safe', operator.__wrapped__)
+    return ('unsafe', operator)
+
+
+def _call_opaque(fn):
+    def call(item, context, memo):
+        return fn(item, context)
+    return call
+
+
+def _true(item, context, memo):
+    return True
+
+
+def _identity(item, context, memo):
+    return item
+
+
+def _iteration(item, context, memo):
+    return context.iteration
+
+
+def _make_constant(constant):
+    def constant_fn(item, context, memo):
+        return constant
+    return constant_fn
+
+
+def _make_property_name(property_name, datatype):
+    transform = transform_for_datatype(datatype)
+
+    def property_name_fn(item, context, memo):
+        if isinstance(item, dict):
+            return transform(item.get(property_name))
+        return transform(None)
+    return property_name_fn
+
+
+def _make_dynamic_property_name(datatype, name_fn):
+    transform = transform_for_datatype(datatype)
+
+    def property_name_fn(item, context, memo):
+        raw_value = None
+        if isinstance(item, dict):
+            raw_value = item.get(name_fn(item, context, memo))
+        return transform(raw_value)
+    return property_name_fn
+
+
+def _make_property_path(path, datatype):
+    transform = transform_for_datatype(datatype)
+
+    def property_path_fn(item, context, memo):
+        return transform(safe_recursive_lookup(item, path))
+    return property_path_fn
+
+
+def _make_transform(transform, fn):
+    def transform_fn(item, context, memo):
+        return transform(fn(item, context, memo))
+    return transform_fn
+
+
+def _make_not(fn):
+    def not_fn(item, context, memo):
+        return not fn(item, context, memo)
+    return not_fn
+
+
+def _make_and(*fns):
+    def and_fn(item, context, memo):
+        for fn in fns:
+            if not fn(item, context, memo):
+                return False
+        return True
+    return and_fn
+
+
+def _make_or(*fns):
+    def or_fn(item, context, memo):
+        for fn in fns:
+            if fn(item, context, memo):
+                return True
+        return False
+    return or_fn
+
+
+def _make_compare(operator, expression_fn, reference_fn):
+    def compare_fn(item, context, memo):
+        return operator(expression_fn(item, context, memo), reference_fn(item, context, memo))
+    return compare_fn
+
+
+def _make_conditional(test_fn, true_fn, false_fn):
+    def conditional_fn(item, context, memo):
+        if test_fn(item, context, memo):
+            return true_fn(item, context, memo)
+        return false_fn(item, context, memo)
+    return conditional_fn
+
+
+def _make_switch(cases, switch_on_fn, default_fn, *case_fns):
+    case_pairs = list(zip(cases, case_fns))
+
+    def switch_fn(item, context, memo):
+        switch_value = switch_on_fn(item, context, memo)
+        for case, case_fn in case_pairs:
+            if switch_value == case:
+                return case_fn(item, context, memo)
+        return default_fn(item, context, memo)
+    return switch_fn
+
+
+def _make_coalesce(fn, default_fn):
+    def coalesce_fn(item, context, memo):
+        value = fn(item, context, memo)
+        if value is None or value == '':
+            return default_fn(item, context, memo)
+        return value
+    return coalesce_fn
+
+
+def _make_nested(argument_fn, value_fn):
+    def nested_fn(item, context, memo):
+        return value_fn(argument_fn(item, context, memo), context, memo)
+    return nested_fn
+
+
+def _make_root_doc(fn):
+    def root_doc_fn(item, context, memo):
+        if context is None:
+            return None
+        return fn(context.root_doc, context, memo)
+    return root_doc_fn
+
+
+def _make_array_index(array_fn, index_fn):
+    def array_index_fn(item, context, memo):
+        array_value = array_fn(item, context, memo)
+        if not isinstance(array_value, list):
+            return None
+        index_value = index_fn(item, context, memo)
+        if not isinstance(index_value, int):
+            return None
+        try:
+            return array_value[index_value]
+        except IndexError:
+            return None
+    return array_index_fn
@@ -54,6 +54,12 @@ ASYNC_INDICATOR_MAX_RETRIES = 20
 
 XFORM_CACHE_KEY_PREFIX = 'xform_to_json_cache'
 
+# keys of lookups that are cached for a batch of documents (see BatchEvaluationCache)
+RELATED_DOC_BATCH_KEY = 'related_doc'
+SUBCASES_BATCH_KEY = 'subcases'
+CASE_FORMS_BATCH_KEY = 'case_forms'
+GROUPS_BATCH_KEY = 'groups'
+
 NAMED_EXPRESSION_PREFIX = 'NamedExpression'
 NAMED_FILTER_PREFIX = 'NamedFilter'
 
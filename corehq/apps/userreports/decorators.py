@@ -30,11 +30,16 @@ def catch_and_raise_exceptions(func):
     return _inner
 
 
-def ucr_context_cache(vary_on=()):
+def ucr_context_cache(vary_on=(), batch_key=None):
     """
     Decorator which caches calculations performed during a UCR EvaluationContext
     The decorated function or method must have a parameter called 'evaluation_context'
     which will be used by this decorator to store the cache.
+
+    If `batch_key` is given, results are also cached in the evaluation context's
+    `batch_cache` (if it has one) under `(batch_key, domain) + vary_on values`, so
+    they are shared by all the documents in the batch. The result must then only
+    depend on the domain of the root doc and the `vary_on` arguments.
     """
     def decorator(fn):
         assert 'evaluation_context' in fn.__code__.co_varnames
@@ -52,7 +57,14 @@ def ucr_context_cache(vary_on=()):
             cache_key = (prefix,) + tuple(callargs[arg_name] for arg_name in vary_on)
             if evaluation_context.exists_in_cache(cache_key):
                 return evaluation_context.get_cache_value(cache_key)
-            res = fn(*args, **kwargs)
+            if batch_key and evaluation_context.batch_cache is not None:
+                batch_cache_key = (
+                    (batch_key, evaluation_context.root_doc['domain'])
+                    + tuple(callargs[arg_name] for arg_name in vary_on)
+                )
+                res = evaluation_context.batch_cache.get(batch_cache_key, lambda: fn(*args, **kwargs))
+            else:
+                res = fn(*args, **kwargs)
             evaluation_context.set_cache_value(cache_key, res)
             return res
         return _inner
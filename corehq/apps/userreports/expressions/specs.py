@@ -18,7 +18,11 @@ from corehq.apps.change_feed.data_sources import (
 )
 from corehq.apps.locations.document_store import LOCATION_DOC_TYPE
 from corehq.apps.userreports.const import (
+    CASE_FORMS_BATCH_KEY,
+    GROUPS_BATCH_KEY,
     NAMED_EXPRESSION_PREFIX,
+    RELATED_DOC_BATCH_KEY,
+    SUBCASES_BATCH_KEY,
     XFORM_CACHE_KEY_PREFIX,
 )
 from corehq.apps.userreports.datatypes import DataTypeProperty
@@ -594,7 +598,7 @@ class RelatedDocExpressionSpec(JsonObject):
             return self.get_value(doc_id, evaluation_context)
 
     @staticmethod
-    @ucr_context_cache(vary_on=('related_doc_type', 'doc_id',))
+    @ucr_context_cache(vary_on=('related_doc_type', 'doc_id',), batch_key=RELATED_DOC_BATCH_KEY)
     def _get_document(related_doc_type, doc_id, evaluation_context):
         document_store = get_document_store_for_doc_type(
             evaluation_context.root_doc['domain'], related_doc_type,
@@ -611,7 +615,7 @@ class RelatedDocExpressionSpec(JsonObject):
         assert evaluation_context.root_doc['domain']
         doc = self._get_document(self.related_doc_type, doc_id, evaluation_context)
         # explicitly use a new evaluation context since this is a new document
-        return self._value_expression(doc, EvaluationContext(doc, 0))
+        return self._value_expression(doc, EvaluationContext(doc, 0, evaluation_context.batch_cache))
 
     def __str__(self):
         return "{}[{}]/{}".format(self.related_doc_type,
@@ -864,7 +868,7 @@ class FormsExpressionSpec(JsonObject):
         evaluation_context.set_cache_value(cache_key, xforms)
         return xforms
 
-    @ucr_context_cache(vary_on=('case_id',))
+    @ucr_context_cache(vary_on=('case_id',), batch_key=CASE_FORMS_BATCH_KEY)
     def _get_case_forms(self, case_id, evaluation_context):
         domain = evaluation_context.root_doc['domain']
         return FormProcessorInterface(domain).get_case_forms(case_id)
@@ -902,7 +906,7 @@ class SubcasesExpressionSpec(JsonObject):
         assert evaluation_context.root_doc['domain']
         return self._get_subcases(case_id, evaluation_context)
 
-    @ucr_context_cache(vary_on=('case_id',))
+    @ucr_context_cache(vary_on=('case_id',), batch_key=SUBCASES_BATCH_KEY)
     def _get_subcases(self, case_id, evaluation_context):
         domain = evaluation_context.root_doc['domain']
         return [c.to_json() for c in CommCareCase.objects.get_reverse_indexed_cases(domain, [case_id])]
@@ -923,10 +927,10 @@ class _GroupsExpressionSpec(JsonObject):
             return []
 
         assert evaluation_context.root_doc['domain']
-        return self._get_groups(user_id, evaluation_context)
+        return self._get_groups(self.type, user_id, evaluation_context)
 
-    @ucr_context_cache(vary_on=('user_id',))
-    def _get_groups(self, user_id, evaluation_context):
+    @ucr_context_cache(vary_on=('group_type', 'user_id',), batch_key=GROUPS_BATCH_KEY)
+    def _get_groups(self, group_type, user_id, evaluation_context):
         domain = evaluation_context.root_doc['domain']
         try:
             user = CommCareUser.get_by_user_id(user_id, domain)
@@ -0,0 +1,64 @@
+from django.core.management import BaseCommand, CommandError
+
+from corehq.apps.userreports.pillow_assignment import (
+    get_balanced_assignment,
+    get_data_source_costs,
+    get_hash_index,
+    get_projected_loads,
+    get_saved_assignment,
+    save_assignment,
+)
+
+
+class Command(BaseCommand):
+    help = """Show and balance the assignment of data sources to UCR pillows by cost
+
+    Shows the projected load of each of the `num_pillows` pillows named
+    `pillow_name` configured with a `ucr_cost_division` of
+    "<index>/<num_pillows>", as the seconds per hour spent processing the
+    data sources assigned to it, with the current assignment and with an
+    assignment balanced by measured cost. Use --save to save the balanced
+    assignment, then restart the pillows.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('pillow_name')
+        parser.add_argument('num_pillows', type=int)
+        parser.add_argument('--hours', type=int, default=24,
+                            help="Hours of measured costs to balance (default 24).")
+        parser.add_argument('--save', action='store_true', default=False,
+                            help="Save the balanced assignment.")
+        parser.add_argument('--verbose', action='store_true', default=False,
+                            help="List the data sources of each pillow.")
+
+    def handle(self, pillow_name, num_pillows, hours, save, verbose, **options):
+        if num_pillows < 1:
+            raise CommandError("num_pillows must be at least 1")
+        costs = get_data_source_costs(pillow_name, hours)
+        if not costs:
+            raise CommandError("No data source costs have been measured by {} in the last {} hours".format(
+                pillow_name, hours))
+        hourly_costs = {config_id: seconds / hours for config_id, seconds in costs.items()}
+
+        current = get_saved_assignment(pillow_name, num_pillows)
+        balanced = get_balanced_assignment(hourly_costs, num_pillows)
+        print("{} data sources with measured costs, {:.1f}s of processing per hour".format(
+            len(costs), sum(hourly_costs.values())))
+        self._print_loads("Current assignment", hourly_costs, num_pillows, current, verbose)
+        self._print_loads("Balanced assignment", hourly_costs, num_pillows, balanced, verbose)
+
+        if save:
+            save_assignment(pillow_name, balanced, num_pillows)
+            print("Saved the balanced assignment. Restart the pillows to use it.")
+
+    def _print_loads(self, title, hourly_costs, num_pillows, assignment, verbose):
+        loads = get_projected_loads(hourly_costs, num_pillows, assignment)
+        print("\n{} (seconds per hour):".format(title))
+        for index, load in enumerate(loads):
+            print("  {}/{}: {:10.1f}".format(index, num_pillows, load))
+            if verbose:
+                for config_id, cost in sorted(hourly_costs.items(), key=lambda item: -item[1]):
+                    if assignment.get(config_id, get_hash_index(config_id, num_pillows)) == index:
+                        print("        {:10.1f} {}".format(cost, config_id))
+        if loads and sum(loads):
+            print("  max / mean: {:.2f}".format(max(loads) / (sum(loads) / len(loads))))
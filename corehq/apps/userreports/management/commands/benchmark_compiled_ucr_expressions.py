@@ -0,0 +1,86 @@
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+
+from corehq.apps.change_feed.data_sources import (
+    get_document_store_for_doc_type,
+)
+from corehq.apps.userreports.compiler import get_engine_differences
+from corehq.apps.userreports.models import StaticDataSourceConfiguration
+from corehq.apps.userreports.specs import EvaluationContext
+
+
+class Command(BaseCommand):
+    help = """Compare interpreted and compiled expressions on static data sources
+
+    For each static data source, evaluates up to --docs documents of the
+    data source's domain with interpreted and with compiled expressions,
+    checks that both return the same rows, and prints the time each takes.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--domain', help="Only benchmark data sources of this domain.")
+        parser.add_argument('--data-source-id', dest='data_source_ids', action='append',
+                            help="Only benchmark these static data source ids.")
+        parser.add_argument('--docs', type=int, default=100,
+                            help="Number of documents to evaluate per data source (default 100).")
+        parser.add_argument('--repeat', type=int, default=3,
+                            help="Number of times to time each engine. The fastest time is reported.")
+        parser.add_argument('--verbose', action='store_true', default=False,
+                            help="Print the rows of documents that differ.")
+
+    def handle(self, domain, data_source_ids, docs, repeat, verbose, **options):
+        num_docs = docs
+        total_interpreted = total_compiled = 0
+        print("{:<60} {:>5} {:>6} {:>7} {:>12} {:>12} {:>8} {:>6}".format(
+            "data source", "docs", "nodes", "shared", "interpreted", "compiled", "speedup", "diffs"))
+        for config in StaticDataSourceConfiguration.all():
+            if domain and config.domain != domain:
+                continue
+            if data_source_ids and config._id not in data_source_ids:
+                continue
+            docs = _get_docs(config, num_docs)
+            if not docs:
+                continue
+
+            differences = get_engine_differences(config, docs)
+            interpreted = _time(config.get_interpreted_values, docs, repeat)
+            compiled = _time(config.compiled_data_source.get_all_values, docs, repeat)
+            total_interpreted += interpreted
+            total_compiled += compiled
+            print("{:<60} {:>5} {:>6} {:>7} {:>11.2f}ms {:>11.2f}ms {:>7.2f}x {:>6}".format(
+                config._id[:60],
+                len(docs),
+                config.compiled_data_source.num_expressions,
+                config.compiled_data_source.num_shared_expressions,
+                interpreted / len(docs) * 1000,
+                compiled / len(docs) * 1000,
+                interpreted / compiled if compiled else 0,
+                len(differences),
+            ))
+            if verbose:
+                for doc_id, interpreted_rows, compiled_rows in differences:
+                    print("  {}\n    interpreted: {}\n    compiled:    {}".format(
+                        doc_id, interpreted_rows, compiled_rows))
+
+        if total_compiled:
+            print("\nTotal: interpreted {:.2f}s, compiled {:.2f}s, {:.2f}x".format(
+                total_interpreted, total_compiled, total_interpreted / total_compiled))
+
+
+def _get_docs(config, num_docs):
+    document_store = get_document_store_for_doc_type(
+        config.domain, config.referenced_doc_type, load_source="benchmark_compiled_ucr_expressions")
+    doc_ids = list(islice(document_store.iter_document_ids(), num_docs))
+    return list(document_store.iter_documents(doc_ids))
+
+
+def _time(get_all_values, docs, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for doc in docs:
+            get_all_values(doc, EvaluationContext(doc))
+        times.append(time.perf_counter() - start)
+    return min(times)
@@ -0,0 +1,24 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('userreports', '0019_ucrexpression_upstream_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UCRPillowAssignment',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('num_pillows', models.IntegerField()),
+                ('config_id', models.CharField(max_length=126)),
+                ('pillow_index', models.IntegerField()),
+                ('date_assigned', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'unique_together': {('num_pillows', 'config_id')},
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('userreports', '0020_ucrpillowassignment'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ucrpillowassignment',
+            name='pillow_name',
+            field=models.CharField(default='', max_length=126),
+            preserve_default=False,
+        ),
+        migrations.AlterUniqueTogether(
+            name='ucrpillowassignment',
+            unique_together={('pillow_name', 'num_pillows', 'config_id')},
+        ),
+    ]
@@ -53,6 +53,7 @@ from corehq.apps.userreports.app_manager.data_source_meta import (
     REPORT_BUILDER_DATA_SOURCE_TYPE_VALUES,
 )
 from corehq.apps.userreports.columns import get_expanded_column_config
+from corehq.apps.userreports.compiler import CompiledDataSource
 from corehq.apps.userreports.const import (
     ALL_EXPRESSION_TYPES,
     DATA_SOURCE_TYPE_AGGREGATE,
@@ -89,6 +90,7 @@ from corehq.apps.userreports.extension_points import (
 from corehq.apps.userreports.filters.factory import FilterFactory
 from corehq.apps.userreports.indicators import CompoundIndicator
 from corehq.apps.userreports.indicators.factory import IndicatorFactory
+from corehq.apps.userreports.prefetch import get_related_doc_references
 from corehq.apps.userreports.reports.factory import (
     ChartFactory,
     ReportColumnFactory,
@@ -286,6 +288,8 @@ class DataSourceConfiguration(CachedCouchDocumentMixin, Document, AbstractUCRDat
         if eval_context is None:
             eval_context = EvaluationContext(document)
 
+        if self.uses_compiled_expressions:
+            return self.compiled_data_source.filter(document, eval_context)
         filter_fn = self._get_main_filter()
         return filter_fn(document, eval_context)
 
@@ -471,8 +475,22 @@ class DataSourceConfiguration(CachedCouchDocumentMixin, Document, AbstractUCRDat
     def get_column_by_id(self, column_id):
         return self.columns_by_id.get(column_id)
 
+    @property
+    def uses_compiled_expressions(self):
+        return toggles.COMPILED_UCR_EXPRESSIONS.enabled(self.domain)
+
+    @property
+    @memoized
+    def compiled_data_source(self):
+        return CompiledDataSource(self)
+
+    @property
+    @memoized
+    def related_doc_references(self):
+        return get_related_doc_references(self)
+
     def get_items(self, document, eval_context=None):
-        if self.filter(document, eval_context):
+        if self._get_main_filter()(document, eval_context or EvaluationContext(document)):
             if not self.base_item_expression:
                 return [document]
             else:
@@ -507,6 +525,12 @@ class DataSourceConfiguration(CachedCouchDocumentMixin, Document, AbstractUCRDat
                     )
                 return []
 
+        if self.uses_compiled_expressions:
+            return self.compiled_data_source.get_all_values(doc, eval_context)
+        return self.get_interpreted_values(doc, eval_context)
+
+    def get_interpreted_values(self, doc, eval_context):
+        """Get the rows of a document without compiling the expressions of the data source"""
         rows = []
         for item in self.get_items(doc, eval_context):
             values = self.indicators.get_values(item, eval_context)
@@ -1351,6 +1375,21 @@ class InvalidUCRData(models.Model):
         unique_together = ('doc_id', 'indicator_config_id', 'validation_name')
 
 
+class UCRPillowAssignment(models.Model):
+    """Assignment of a data source to one of `num_pillows` UCR pillows named `pillow_name`
+
+    See `corehq.apps.userreports.pillow_assignment`.
+    """
+    pillow_name = models.CharField(max_length=126)
+    num_pillows = models.IntegerField()
+    config_id = models.CharField(max_length=126)
+    pillow_index = models.IntegerField()
+    date_assigned = models.DateTimeField(auto_now_add=True)
+
+    class Meta(object):
+        unique_together = ('pillow_name', 'num_pillows', 'config_id')
+
+
 class UCRExpressionManager(models.Manager):
     def get_expressions_for_domain(self, domain):
         return self.filter(domain=domain, expression_type=UCR_NAMED_EXPRESSION)
@@ -22,8 +22,15 @@ from corehq.apps.userreports.exceptions import (
     UserReportsWarning,
 )
 from corehq.apps.userreports.models import AsyncIndicator
+from corehq.apps.userreports.pillow_assignment import (
+    filter_by_cost,
+    get_saved_assignment,
+    parse_cost_division,
+    record_data_source_costs,
+)
 from corehq.apps.userreports.pillow_utils import rebuild_sql_tables
-from corehq.apps.userreports.specs import EvaluationContext
+from corehq.apps.userreports.prefetch import prefetch_related_docs
+from corehq.apps.userreports.specs import BatchEvaluationCache, EvaluationContext
 from corehq.apps.userreports.util import get_indicator_adapter
 from corehq.pillows.base import is_couch_change_for_sql_domain
 from corehq.util.metrics import metrics_counter, metrics_histogram_timer
@@ -63,6 +70,7 @@ def time_ucr_process_change(method):
         result = method(*args, **kw)
         te = datetime.now()
         seconds = (te - ts).total_seconds()
+        args[0].data_source_costs[args[2].config._id] += seconds
         if seconds > LONG_UCR_LOGGING_THRESHOLD:
             table = args[2]
             doc = args[3]
@@ -158,6 +166,13 @@ class UcrTableManager(ABC):
         """Override this method to actually perform the bootstrapping"""
         pass
 
+    def record_data_source_costs(self, costs):
+        """Override this method to record the processing time of each data source
+
+        :param costs: Dict of config id: seconds.
+        """
+        pass
+
     def _update_modified_data_sources(self):
         """Update the manager with any data sources that have been modified since the last call."""
         new_last_imported = datetime.utcnow()
@@ -196,7 +211,7 @@ class ConfigurableReportTableManager(UcrTableManager):
 
     def __init__(self, data_source_providers, ucr_division=None,
                  include_ucrs=None, exclude_ucrs=None, bootstrap_interval=None,
-                 run_migrations=True):
+                 run_migrations=True, ucr_cost_division=None, pillow_name=None):
         """Initializes the processor for UCRs
 
         Keyword Arguments:
@@ -205,14 +220,26 @@ class ConfigurableReportTableManager(UcrTableManager):
                         first
         include_ucrs -- list of ucr 'table_ids' to be included in this processor
         exclude_ucrs -- list of ucr 'table_ids' to be excluded in this processor
+        ucr_cost_division -- "<index>/<count>": process the datasources assigned to
+                        pillow <index> of <count> by their measured cost. See
+                        `corehq.apps.userreports.pillow_assignment`
+        pillow_name -- name of the pillow, required with ucr_cost_division
         """
         super().__init__(bootstrap_interval, run_migrations)
         self.data_source_providers = data_source_providers
         self.ucr_division = ucr_division
         self.include_ucrs = include_ucrs
         self.exclude_ucrs = exclude_ucrs
+        self.cost_division = parse_cost_division(ucr_cost_division) if ucr_cost_division else None
+        self.pillow_name = pillow_name
+        # loaded once so that it does not change until the pillow is restarted
+        self.cost_assignment = None
         if self.include_ucrs and self.ucr_division:
             raise PillowConfigError("You can't have include_ucrs and ucr_division")
+        if self.cost_division and (self.include_ucrs or self.ucr_division):
+            raise PillowConfigError("You can't have ucr_cost_division and include_ucrs or ucr_division")
+        if self.cost_division and not self.pillow_name:
+            raise PillowConfigError("ucr_cost_division requires pillow_name")
 
     def get_all_configs(self):
         return [
@@ -234,6 +261,11 @@ class ConfigurableReportTableManager(UcrTableManager):
                 configs = [config for config in configs if config.table_id in self.include_ucrs]
             elif self.ucr_division:
                 configs = _filter_by_hash(configs, self.ucr_division)
+            elif self.cost_division:
+                index, count = self.cost_division
+                if self.cost_assignment is None:
+                    self.cost_assignment = get_saved_assignment(self.pillow_name, count)
+                configs = filter_by_cost(configs, index, count, self.cost_assignment)
 
             configs = _filter_domains_to_skip(configs)
             configs = _filter_invalid_config(configs)
@@ -269,6 +301,10 @@ class ConfigurableReportTableManager(UcrTableManager):
     def remove_adapter(self, domain, adapter):
         self.table_adapters_by_domain[domain].remove(adapter)
 
+    def record_data_source_costs(self, costs):
+        if self.cost_division:
+            record_data_source_costs(self.pillow_name, costs)
+
     def _update_modified_since(self, timestamp):
         """
         Find any data sources that have been modified since the last time this was bootstrapped
@@ -398,6 +434,8 @@ class ConfigurableReportPillowProcessor(BulkPillowProcessor):
 
     def __init__(self, table_manager):
         self.table_manager = table_manager
+        # seconds spent processing each data source since the last checkpoint
+        self.data_source_costs = Counter()
 
     domain_timing_context = Counter()
 
@@ -443,15 +481,24 @@ class ConfigurableReportPillowProcessor(BulkPillowProcessor):
         rows_to_save_by_adapter = defaultdict(list)
         async_configs_by_doc_id = defaultdict(list)
         to_update = {change for change in changes_chunk if not change.deleted}
-        with self._metrics_timer('extract'):
+        with self._metrics_timer('extract'), self.time_stage('extract'):
             retry_changes, docs = bulk_fetch_changes_docs(to_update, domain)
         change_exceptions = []
 
-        with self._metrics_timer('single_batch_transform'):
-            for doc in docs:
+        # related documents and lookups are shared by all the documents in the chunk
+        batch_cache = BatchEvaluationCache()
+        eval_contexts = [EvaluationContext(doc, batch_cache=batch_cache) for doc in docs]
+        with self._metrics_timer('prefetch_related_docs'), self.time_stage('extract'):
+            prefetch_related_docs(
+                domain,
+                [adapter.config for adapter in adapters if not adapter.run_asynchronous],
+                eval_contexts,
+            )
+
+        with self._metrics_timer('single_batch_transform'), self.time_stage('transform'):
+            for doc, eval_context in zip(docs, eval_contexts):
                 change = changes_by_id[doc['_id']]
                 doc_subtype = change.metadata.document_subtype
-                eval_context = EvaluationContext(doc)
                 with self._metrics_timer('single_doc_transform'):
                     for adapter in adapters:
                         with self._per_config_metrics_timer('transform', adapter.config._id):
@@ -469,8 +516,9 @@ class ConfigurableReportPillowProcessor(BulkPillowProcessor):
                                 # Delete if the subtype is unknown or
                                 # if the subtype matches our filters, but the full filter no longer applies
                                 to_delete_by_adapter[adapter].append(doc)
+        self._record_batch_cache_metrics(batch_cache)
 
-        with self._metrics_timer('single_batch_delete'):
+        with self._metrics_timer('single_batch_delete'), self.time_stage('delete'):
             # bulk delete by adapter
             to_delete = [{'_id': c.id} for c in changes_chunk if c.deleted]
             for adapter in adapters:
@@ -484,7 +532,7 @@ class ConfigurableReportPillowProcessor(BulkPillowProcessor):
                         delete_ids = [doc['_id'] for doc in delete_docs]
                         retry_changes.update([c for c in changes_chunk if c.id in delete_ids])
 
-        with self._metrics_timer('single_batch_load'):
+        with self._metrics_timer('single_batch_load'), self.time_stage('load'):
             # bulk update by adapter
             for adapter, rows in rows_to_save_by_adapter.items():
                 with self._per_config_metrics_timer('load', adapter.config._id):
@@ -494,7 +542,7 @@ class ConfigurableReportPillowProcessor(BulkPillowProcessor):
                         retry_changes.update(to_update)
 
         if async_configs_by_doc_id:
-            with self._metrics_timer('async_config_load'):
+            with self._metrics_timer('async_config_load'), self.time_stage('load'):
                 doc_type_by_id = {
                     _id: changes_by_id[_id].metadata.document_type
                     for _id in async_configs_by_doc_id.keys()
@@ -503,6 +551,15 @@ class ConfigurableReportPillowProcessor(BulkPillowProcessor):
 
         return retry_changes, change_exceptions
 
+    def _record_batch_cache_metrics(self, batch_cache):
+        for metric, counts in [
+            ('commcare.ucr.batch_cache.hits', batch_cache.hits),
+            ('commcare.ucr.batch_cache.misses', batch_cache.misses),
+            ('commcare.ucr.batch_cache.prefetched', batch_cache.prefetched),
+        ]:
+            for lookup, count in counts.items():
+                metrics_counter(metric, count, tags={'lookup': lookup})
+
     def _metrics_timer(self, step, config_id=None):
         tags = {
             'action': step,
@@ -521,9 +578,13 @@ class ConfigurableReportPillowProcessor(BulkPillowProcessor):
         }
         if settings.ENTERPRISE_MODE:
             tags['config_id'] = config_id
+
+        def add_cost(seconds):
+            self.data_source_costs[config_id] += seconds
+
         return metrics_histogram_timer(
             'commcare.change_feed.urc.timing',
-            timing_buckets=(.03, .1, .3, 1, 3, 10), tags=tags
+            timing_buckets=(.03, .1, .3, 1, 3, 10), tags=tags, callback=add_cost,
         )
 
     def process_change(self, change):
@@ -540,14 +601,15 @@ class ConfigurableReportPillowProcessor(BulkPillowProcessor):
                 table.delete({'_id': change.metadata.document_id})
 
         async_tables = []
-        doc = change.get_document()
-        ensure_document_exists(change)
-        ensure_matched_revisions(change, doc)
+        with self.time_stage('extract'):
+            doc = change.get_document()
+            ensure_document_exists(change)
+            ensure_matched_revisions(change, doc)
 
         if doc is None:
             return
 
-        with TimingContext() as timer:
+        with TimingContext() as timer, self.time_stage('transform_load'):
             eval_context = EvaluationContext(doc)
             # make copy to avoid modifying list during iteration
             adapters = self.table_manager.get_adapters(domain)
@@ -586,6 +648,9 @@ class ConfigurableReportPillowProcessor(BulkPillowProcessor):
             })
         self.domain_timing_context.clear()
 
+        self.table_manager.record_data_source_costs(self.data_source_costs)
+        self.data_source_costs.clear()
+
     def bootstrap_if_needed(self):
         self.table_manager.bootstrap_if_needed()
 
@@ -594,7 +659,7 @@ class ConfigurableReportKafkaPillow(ConstructedPillow):
     # todo; To remove after full rollout of https://github.com/dimagi/commcare-hq/pull/21329/
 
     def __init__(self, processor, pillow_name, topics, num_processes, process_num, retry_errors=False,
-            is_dedicated_migration_process=False, processor_chunk_size=0):
+            is_dedicated_migration_process=False, processor_chunk_size=0, max_processor_chunk_size=None):
         change_feed = KafkaChangeFeed(
             topics, client_id=pillow_name, num_processes=num_processes, process_num=process_num
         )
@@ -609,7 +674,8 @@ class ConfigurableReportKafkaPillow(ConstructedPillow):
             processor=processor,
             checkpoint=checkpoint,
             change_processed_event_handler=event_handler,
-            processor_chunk_size=processor_chunk_size
+            processor_chunk_size=processor_chunk_size,
+            max_processor_chunk_size=max_processor_chunk_size
         )
         # set by the superclass constructor
         assert self.processors is not None
@@ -624,14 +690,18 @@ class ConfigurableReportKafkaPillow(ConstructedPillow):
 
 def get_ucr_processor(data_source_providers,
                       ucr_division=None,
+                      ucr_cost_division=None,
                       include_ucrs=None,
                       exclude_ucrs=None,
                       bootstrap_interval=None,
                       run_migrations=True,
-                      ucr_configs=None):
+                      ucr_configs=None,
+                      pillow_name=None):
     table_manager = ConfigurableReportTableManager(
         data_source_providers=data_source_providers,
         ucr_division=ucr_division,
+        ucr_cost_division=ucr_cost_division,
+        pillow_name=pillow_name,
         include_ucrs=include_ucrs,
         exclude_ucrs=exclude_ucrs,
         bootstrap_interval=bootstrap_interval,
@@ -657,10 +727,11 @@ def get_data_registry_ucr_processor(run_migrations, ucr_configs):
     return ConfigurableReportPillowProcessor(table_manager)
 
 
-def get_kafka_ucr_pillow(pillow_id='kafka-ucr-main', ucr_division=None,
+def get_kafka_ucr_pillow(pillow_id='kafka-ucr-main', ucr_division=None, ucr_cost_division=None,
                          include_ucrs=None, exclude_ucrs=None, topics=None,
                          num_processes=1, process_num=0, dedicated_migration_process=False,
-                         processor_chunk_size=DEFAULT_PROCESSOR_CHUNK_SIZE, **kwargs):
+                         processor_chunk_size=DEFAULT_PROCESSOR_CHUNK_SIZE, max_processor_chunk_size=None,
+                         **kwargs):
     """UCR pillow that reads from all Kafka topics and writes data into the UCR database tables.
 
         Processors:
@@ -672,6 +743,8 @@ def get_kafka_ucr_pillow(pillow_id='kafka-ucr-main', ucr_division=None,
     table_manager = ConfigurableReportTableManager(
         data_source_providers=[DynamicDataSourceProvider()],
         ucr_division=ucr_division,
+        ucr_cost_division=ucr_cost_division,
+        pillow_name=pillow_id,
         include_ucrs=include_ucrs,
         exclude_ucrs=exclude_ucrs,
         run_migrations=(process_num == 0)  # only first process runs migrations
@@ -684,13 +757,15 @@ def get_kafka_ucr_pillow(pillow_id='kafka-ucr-main', ucr_division=None,
         process_num=process_num,
         is_dedicated_migration_process=dedicated_migration_process and (process_num == 0),
         processor_chunk_size=processor_chunk_size,
+        max_processor_chunk_size=max_processor_chunk_size,
     )
 
 
-def get_kafka_ucr_static_pillow(pillow_id='kafka-ucr-static', ucr_division=None,
+def get_kafka_ucr_static_pillow(pillow_id='kafka-ucr-static', ucr_division=None, ucr_cost_division=None,
                                 include_ucrs=None, exclude_ucrs=None, topics=None,
                                 num_processes=1, process_num=0, dedicated_migration_process=False,
-                                processor_chunk_size=DEFAULT_PROCESSOR_CHUNK_SIZE, **kwargs):
+                                processor_chunk_size=DEFAULT_PROCESSOR_CHUNK_SIZE, max_processor_chunk_size=None,
+                                **kwargs):
     """UCR pillow that reads from all Kafka topics and writes data into the UCR database tables.
 
     Only processes `static` UCR datasources (configuration lives in the codebase instead of the database).
@@ -704,6 +779,8 @@ def get_kafka_ucr_static_pillow(pillow_id='kafka-ucr-static', ucr_division=None,
     table_manager = ConfigurableReportTableManager(
         data_source_providers=[StaticDataSourceProvider()],
         ucr_division=ucr_division,
+        ucr_cost_division=ucr_cost_division,
+        pillow_name=pillow_id,
         include_ucrs=include_ucrs,
         exclude_ucrs=exclude_ucrs,
         bootstrap_interval=7 * 24 * 60 * 60,  # 1 week
@@ -718,6 +795,7 @@ def get_kafka_ucr_static_pillow(pillow_id='kafka-ucr-static', ucr_division=None,
         retry_errors=True,
         is_dedicated_migration_process=dedicated_migration_process and (process_num == 0),
         processor_chunk_size=processor_chunk_size,
+        max_processor_chunk_size=max_processor_chunk_size,
     )
 
 
@@ -760,7 +838,8 @@ def get_location_pillow(pillow_id='location-ucr-pillow', include_ucrs=None,
 def get_kafka_ucr_registry_pillow(
     pillow_id='kafka-ucr-registry',
     num_processes=1, process_num=0, dedicated_migration_process=False,
-    processor_chunk_size=DEFAULT_PROCESSOR_CHUNK_SIZE, ucr_configs=None, **kwargs):
+    processor_chunk_size=DEFAULT_PROCESSOR_CHUNK_SIZE, max_processor_chunk_size=None, ucr_configs=None,
+    **kwargs):
     """UCR pillow that reads from all 'case' Kafka topics and writes data into the UCR database tables
 
     Only UCRs backed by Data Registries are processed in this pillow.
@@ -781,4 +860,5 @@ def get_kafka_ucr_registry_pillow(
         process_num=process_num,
         is_dedicated_migration_process=dedicated_migration_process and (process_num == 0),
         processor_chunk_size=processor_chunk_size,
+        max_processor_chunk_size=max_processor_chunk_size,
     )
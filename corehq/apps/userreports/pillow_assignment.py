@@ -0,0 +1,142 @@
+"""Assign data sources to UCR pillows by their measured processing cost
+
+UCR pillows configured with a `ucr_cost_division` of "<index>/<count>"
+share data sources between `count` pillows. Data sources are assigned
+to pillows by `balance_ucr_pillows`, which balances the processing time
+measured by the pillows over the previous day, and saves the assignment
+in `UCRPillowAssignment`. Data sources without a saved assignment are
+assigned by the hash of their id.
+
+Costs and assignments are saved by pillow name, so each pillow (e.g.
+case-pillow and xform-pillow) is balanced separately.
+
+Pillow processes load the assignment once, when they first bootstrap,
+so they should all be restarted after it is saved, so they all use the
+same assignment.
+"""
+import hashlib
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.db import transaction
+
+from dimagi.utils.couch import get_redis_client
+from pillowtop.exceptions import PillowConfigError
+
+from corehq.apps.userreports.models import UCRPillowAssignment
+
+# measured costs are discarded after this many hours
+COST_TIMEOUT_HOURS = 7 * 24
+
+
+def parse_cost_division(ucr_cost_division):
+    """Parse a cost division of "<index>/<count>"
+
+    :returns: `(index, count)`
+    """
+    try:
+        index, count = [int(value) for value in ucr_cost_division.split('/')]
+    except (AttributeError, ValueError):
+        raise PillowConfigError("Invalid ucr_cost_division: {!r}".format(ucr_cost_division))
+    if not 0 <= index < count:
+        raise PillowConfigError("Invalid ucr_cost_division: {!r}".format(ucr_cost_division))
+    return index, count
+
+
+def filter_by_cost(configs, index, count, assignment):
+    """Get the configs assigned to pillow `index` of `count`
+
+    :param assignment: Dict of config id: pillow index.
+    """
+    return [
+        config for config in configs
+        if assignment.get(config._id, get_hash_index(config._id, count)) == index
+    ]
+
+
+def get_hash_index(config_id, count):
+    return int(hashlib.md5(config_id.encode('utf-8')).hexdigest(), 16) % count
+
+
+def record_data_source_costs(pillow_name, costs):
+    """Add processing times to the current hour's costs
+
+    :param costs: Dict of config id: seconds.
+    """
+    if not costs:
+        return
+    client = _get_client()
+    key = _get_cost_key(pillow_name, datetime.utcnow())
+    pipeline = client.pipeline()
+    for config_id, seconds in costs.items():
+        pipeline.hincrbyfloat(key, config_id, seconds)
+    pipeline.expire(key, COST_TIMEOUT_HOURS * 60 * 60)
+    pipeline.execute()
+
+
+def get_data_source_costs(pillow_name, hours=24):
+    """Get the processing time of each data source by a pillow over the last `hours`
+
+    :returns: Dict of config id: seconds.
+    """
+    now = datetime.utcnow()
+    pipeline = _get_client().pipeline()
+    for hour in range(hours):
+        pipeline.hgetall(_get_cost_key(pillow_name, now - timedelta(hours=hour)))
+    costs = defaultdict(float)
+    for hour_costs in pipeline.execute():
+        for config_id, seconds in hour_costs.items():
+            costs[config_id.decode('utf-8')] += float(seconds)
+    return dict(costs)
+
+
+def get_balanced_assignment(costs, count):
+    """Assign data sources to pillows so that their costs are balanced
+
+    Each data source, most costly first, is assigned to the pillow with
+    the lowest total cost so far.
+
+    :param costs: Dict of config id: cost.
+    :returns: Dict of config id: pillow index.
+    """
+    loads = [0] * count
+    assignment = {}
+    for config_id, cost in sorted(costs.items(), key=lambda item: (-item[1], item[0])):
+        index = loads.index(min(loads))
+        assignment[config_id] = index
+        loads[index] += cost
+    return assignment
+
+
+def get_projected_loads(costs, count, assignment):
+    """Get the total cost of the data sources assigned to each pillow"""
+    loads = [0] * count
+    for config_id, cost in costs.items():
+        loads[assignment.get(config_id, get_hash_index(config_id, count))] += cost
+    return loads
+
+
+def get_saved_assignment(pillow_name, count):
+    return dict(
+        UCRPillowAssignment.objects
+        .filter(pillow_name=pillow_name, num_pillows=count)
+        .values_list('config_id', 'pillow_index')
+    )
+
+
+def save_assignment(pillow_name, assignment, count):
+    with transaction.atomic():
+        UCRPillowAssignment.objects.filter(pillow_name=pillow_name, num_pillows=count).delete()
+        UCRPillowAssignment.objects.bulk_create([
+            UCRPillowAssignment(
+                pillow_name=pillow_name, num_pillows=count, config_id=config_id, pillow_index=index)
+            for config_id, index in assignment.items()
+        ])
+
+
+def _get_cost_key(pillow_name, hour):
+    return 'ucr-data-source-costs:{}:{}'.format(pillow_name, hour.strftime('%Y%m%d%H'))
+
+
+def _get_client():
+    return get_redis_client().client.get_client()
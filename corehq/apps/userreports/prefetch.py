@@ -0,0 +1,163 @@
+"""Bulk fetching of the related documents of a batch of documents
+
+Data sources that look up related documents (with `related_doc` or
+`indexed_case` expressions) by an id from the document being processed
+would otherwise fetch them one at a time. `prefetch_related_docs` finds
+those ids for all the documents in a batch and fetches the related
+documents in bulk into the batch's `BatchEvaluationCache`, where
+`RelatedDocExpressionSpec` finds them.
+
+Only lookups that are evaluated for every row of a document are
+prefetched, so documents are not fetched for conditional branches that
+are not taken.
+"""
+from collections import defaultdict
+
+from corehq.apps.change_feed.data_sources import (
+    get_document_store_for_doc_type,
+)
+from corehq.apps.userreports.const import RELATED_DOC_BATCH_KEY
+from corehq.apps.userreports.expressions.extension_expressions import (
+    IndexedCaseExpressionSpec,
+)
+from corehq.apps.userreports.expressions.getters import TransformedGetter
+from corehq.apps.userreports.expressions.specs import (
+    ArrayIndexExpressionSpec,
+    CoalesceExpressionSpec,
+    ConditionalExpressionSpec,
+    NamedExpressionSpec,
+    NestedExpressionSpec,
+    RelatedDocExpressionSpec,
+    RootDocExpressionSpec,
+    SwitchExpressionSpec,
+)
+from corehq.apps.userreports.filters import (
+    ANDFilter,
+    NamedFilter,
+    NOTFilter,
+    ORFilter,
+    SinglePropertyValueFilter,
+)
+from corehq.apps.userreports.indicators import (
+    BooleanIndicator,
+    CompoundIndicator,
+    RawIndicator,
+)
+
+
+def get_related_doc_references(config):
+    """Get the related document lookups of a data source that are made
+    by an id from the root document for every row
+
+    :returns: List of `(related_doc_type, doc_id_expression)`.
+    """
+    finder = _ReferenceFinder()
+    finder.indicator(config.indicators, is_root=not config.base_item_expression)
+    return finder.references
+
+
+def prefetch_related_docs(domain, configs, eval_contexts):
+    """Fetch the related documents of a batch of documents in bulk
+
+    :param eval_contexts: Evaluation contexts of the documents of the
+    batch, which all have the same `batch_cache`.
+    """
+    if not eval_contexts:
+        return
+    batch_cache = eval_contexts[0].batch_cache
+    ids_by_doc_type = defaultdict(set)
+    for config in configs:
+        references = config.related_doc_references
+        if not references:
+            continue
+        for eval_context in eval_contexts:
+            doc = eval_context.root_doc
+            try:
+                if not config.filter(doc, eval_context):
+                    continue
+                for related_doc_type, doc_id_expression in references:
+                    doc_id = doc_id_expression(doc, eval_context)
+                    if doc_id and isinstance(doc_id, str):
+                        ids_by_doc_type[related_doc_type].add(doc_id)
+            except Exception:
+                # errors are handled when the document is processed
+                continue
+
+    for related_doc_type, doc_ids in ids_by_doc_type.items():
+        keys_by_id = {
+            doc_id: (RELATED_DOC_BATCH_KEY, domain, related_doc_type, doc_id)
+            for doc_id in doc_ids
+        }
+        doc_ids = [doc_id for doc_id, key in keys_by_id.items() if key not in batch_cache.cache]
+        if not doc_ids:
+            continue
+        document_store = get_document_store_for_doc_type(
+            domain, related_doc_type, load_source="related_doc_prefetch")
+        docs_by_id = {doc['_id']: doc for doc in document_store.iter_documents(doc_ids)}
+        for doc_id in doc_ids:
+            doc = docs_by_id.get(doc_id)
+            if doc is not None and doc.get('domain') != domain:
+                doc = None
+            batch_cache.prefetch(keys_by_id[doc_id], doc)
+
+
+class _ReferenceFinder(object):
+    """Finds the related doc lookups that are always evaluated
+
+    `is_root` is whether the expression being visited is evaluated on
+    the root document.
+    """
+
+    def __init__(self):
+        self.references = []
+        self._visited = set()
+
+    def indicator(self, indicator, is_root):
+        if isinstance(indicator, CompoundIndicator):
+            for child in indicator.indicators:
+                self.indicator(child, is_root)
+        elif isinstance(indicator, BooleanIndicator):
+            self.filter(indicator.filter, is_root)
+        elif isinstance(indicator, RawIndicator):
+            self.expression(indicator.getter, is_root)
+
+    def filter(self, filter, is_root):
+        if isinstance(filter, NamedFilter):
+            self.filter(filter.filter, is_root)
+        elif isinstance(filter, NOTFilter):
+            self.filter(filter._filter, is_root)
+        elif isinstance(filter, (ANDFilter, ORFilter)):
+            # later filters are only evaluated depending on the first
+            self.filter(filter.filters[0], is_root)
+        elif isinstance(filter, SinglePropertyValueFilter):
+            self.expression(filter.expression, is_root)
+            self.expression(filter.reference_expression, is_root)
+
+    def expression(self, expression, is_root):
+        if (id(expression), is_root) in self._visited:
+            return
+        self._visited.add((id(expression), is_root))
+
+        if isinstance(expression, NamedExpressionSpec):
+            self.expression(expression._factory_context.named_expressions[expression.name], is_root)
+        elif isinstance(expression, TransformedGetter):
+            self.expression(expression.getter, is_root)
+        elif isinstance(expression, RootDocExpressionSpec):
+            self.expression(expression._expression_fn, True)
+        elif isinstance(expression, ConditionalExpressionSpec):
+            self.filter(expression._test_function, is_root)
+        elif isinstance(expression, SwitchExpressionSpec):
+            self.expression(expression._switch_on_expression, is_root)
+        elif isinstance(expression, CoalesceExpressionSpec):
+            self.expression(expression._expression, is_root)
+        elif isinstance(expression, ArrayIndexExpressionSpec):
+            self.expression(expression._array_expression, is_root)
+        elif isinstance(expression, NestedExpressionSpec):
+            self.expression(expression._argument_expression, is_root)
+            self.expression(expression._value_expression, False)
+        elif isinstance(expression, IndexedCaseExpressionSpec):
+            self.expression(expression._expression, is_root)
+        elif isinstance(expression, RelatedDocExpressionSpec):
+            self.expression(expression._doc_id_expression, is_root)
+            if is_root:
+                self.references.append((expression.related_doc_type, expression._doc_id_expression))
@@ -1,3 +1,4 @@
+from collections import Counter
 from dataclasses import dataclass, field
 from datetime import datetime
 from typing import Optional
@@ -65,12 +66,13 @@ class EvaluationContext(object):
     as the root document and the iteration number.
     """
 
-    def __init__(self, root_doc, iteration=0):
+    def __init__(self, root_doc, iteration=0, batch_cache=None):
         self.root_doc = root_doc
         self.iteration = iteration
         self.inserted_timestamp = datetime.utcnow()
         self.cache = {}
         self.iteration_cache = {}
+        self.batch_cache = batch_cache
 
     def exists_in_cache(self, key):
         return key in self.cache or key in self.iteration_cache
@@ -97,3 +99,30 @@ class EvaluationContext(object):
     def reset_iteration(self):
         self.iteration_cache = {}
         self.iteration = 0
+
+
+class BatchEvaluationCache(object):
+    """
+    A cache of related documents and other lookups that is shared by the
+    evaluation contexts of all the documents in a batch, so lookups that are
+    common to many documents (like a parent case or a user's groups) are only
+    done once per batch. Keys are `(lookup type, domain, ...)`.
+    """
+
+    def __init__(self):
+        self.cache = {}
+        self.hits = Counter()
+        self.misses = Counter()
+        self.prefetched = Counter()
+
+    def get(self, key, get_value):
+        if key in self.cache:
+            self.hits[key[0]] += 1
+            return self.cache[key]
+        self.misses[key[0]] += 1
+        value = self.cache[key] = get_value()
+        return value
+
+    def prefetch(self, key, value):
+        self.prefetched[key[0]] += 1
+        self.cache[key] = value
@@ -0,0 +1,289 @@
+from datetime import datetime, timedelta
+
+from django.test import SimpleTestCase
+
+from corehq.apps.userreports.compiler import get_engine_differences
+from corehq.apps.userreports.models import DataSourceConfiguration
+from corehq.apps.userreports.tests.utils import (
+    get_data_source_with_repeat,
+    get_sample_data_source,
+    get_sample_doc_and_indicators,
+)
+from corehq.util.test_utils import flag_enabled
+
+DOMAIN = 'compiled-test'
+
+
+def _visit_data_source():
+    return DataSourceConfiguration.wrap({
+        'display_name': 'Visits',
+        'doc_type': 'DataSourceConfiguration',
+        'domain': DOMAIN,
+        'referenced_doc_type': 'XFormInstance',
+        'table_id': 'visits',
+        'named_expressions': {
+            'visit_type': {
+                'type': 'coalesce',
+                'expression': {'type': 'property_path', 'property_path': ['form', 'visit_type']},
+                'default_expression': 'routine',
+            },
+            'is_urgent': {
+                'type': 'conditional',
+                'test': {
+                    'type': 'boolean_expression',
+                    'expression': {'type': 'named', 'name': 'visit_type'},
+                    'operator': 'in',
+                    'property_value': ['emergency', 'referral'],
+                },
+                'expression_if_true': 1,
+                'expression_if_false': 0,
+            },
+        },
+        'named_filters': {
+            'has_patient': {
+                'type': 'not',
+                'filter': {
+                    'type': 'boolean_expression',
+                    'expression': {'type': 'property_path', 'property_path': ['form', 'patient_id']},
+                    'operator': 'eq',
+                    'property_value': None,
+                },
+            },
+        },
+        'configured_filter': {
+            'type': 'and',
+            'filters': [
+                {'type': 'named', 'name': 'has_patient'},
+                {
+                    'type': 'or',
+                    'filters': [
+                        {
+                            'type': 'boolean_expression',
+                            'expression': {'type': 'named', 'name': 'is_urgent'},
+                            'operator': 'eq',
+                            'property_value': 1,
+                        },
+                        {
+                            'type': 'property_match',
+                            'property_path': ['form', 'followup'],
+                            'property_value': 'yes',
+                        },
+                    ],
+                },
+            ],
+        },
+        'base_item_expression': {
+            'type': 'property_path',
+            'property_path': ['form', 'medicines'],
+        },
+        'configured_indicators': [
+            {
+                'type': 'expression',
+                'column_id': 'visit_type',
+                'datatype': 'string',
+                'expression': {'type': 'root_doc', 'expression': {'type': 'named', 'name': 'visit_type'}},
+            },
+            {
+                'type': 'expression',
+                'column_id': 'priority',
+                'datatype': 'integer',
+                'expression': {
+                    'type': 'switch',
+                    'switch_on': {'type': 'root_doc', 'expression': {'type': 'named', 'name': 'visit_type'}},
+                    'cases': {'emergency': 3, 'referral': 2},
+                    'default': 1,
+                },
+            },
+            {
+                'type': 'boolean',
+                'column_id': 'urgent',
+                'filter': {
+                    'type': 'boolean_expression',
+                    'expression': {'type': 'root_doc', 'expression': {'type': 'named', 'name': 'is_urgent'}},
+                    'operator': 'eq',
+                    'property_value': 1,
+                },
+            },
+            {
+                'type': 'expression',
+                'column_id': 'medicine',
+                'datatype': 'string',
+                'expression': {'type': 'property_name', 'property_name': 'name'},
+            },
+            {
+                'type': 'expression',
+                'column_id': 'first_dose',
+                'datatype': 'decimal',
+                'expression': {
+                    'type': 'array_index',
+                    'array_expression': {'type': 'property_name', 'property_name': 'doses'},
+                    'index_expression': 0,
+                },
+            },
+            {
+                'type': 'expression',
+                'column_id': 'first_dose_date',
+                'datatype': 'date',
+                'expression': {
+                    'type': 'nested',
+                    'argument_expression': {'type': 'property_name', 'property_name': 'schedule'},
+                    'value_expression': {'type': 'property_name', 'property_name': 'start'},
+                },
+            },
+            {
+                'type': 'expression',
+                'column_id': 'dose_number',
+                'datatype': 'integer',
+                'expression': {'type': 'base_iteration_number'},
+            },
+            {
+                'type': 'expression',
+                'column_id': 'dose_label',
+                'datatype': 'integer',
+                'expression': {
+                    'type': 'evaluator',
+                    'statement': 'iteration + 1',
+                    'context_variables': {
+                        'iteration': {'type': 'base_iteration_number'},
+                    },
+                },
+            },
+            {
+                'type': 'choice_list',
+                'column_id': 'route',
+                'property_name': 'route',
+                'choices': ['oral', 'injection'],
+                'select_style': 'single',
+            },
+        ],
+    })
+
+
+def _visit_doc(doc_id, **form):
+    return {
+        '_id': doc_id,
+        'doc_type': 'XFormInstance',
+        'domain': DOMAIN,
+        'form': form,
+    }
+
+
+def _visit_docs():
+    medicines = [
+        {'name': 'amoxicillin', 'doses': [250, 500], 'schedule': {'start': '2022-03-01'}, 'route': 'oral'},
+        {'name': 'ceftriaxone', 'doses': '1g', 'schedule': None, 'route': 'injection'},
+        {'name': 'zinc', 'doses': [], 'schedule': {'start': 'soon'}},
+    ]
+    return [
+        _visit_doc('emergency', patient_id='p1', visit_type='emergency', medicines=medicines),
+        _visit_doc('referral', patient_id='p2', visit_type='referral', medicines=medicines[0]),
+        _visit_doc('followup', patient_id='p3', followup='yes', medicines=medicines),
+        _visit_doc('blank-type', patient_id='p4', visit_type='', followup='yes', medicines=medicines[1:]),
+        _visit_doc('routine', patient_id='p5', visit_type='routine', medicines=medicines),
+        _visit_doc('no-patient', visit_type='emergency', medicines=medicines),
+        _visit_doc('no-medicines', patient_id='p6', visit_type='emergency'),
+        _visit_doc('other-domain', patient_id='p6', visit_type='emergency', medicines=medicines) | {
+            'domain': 'other',
+        },
+        _visit_doc('other-type', patient_id='p6', visit_type='emergency', medicines=medicines) | {
+            'doc_type': 'CommCareCase',
+        },
+    ]
+
+
+class CompiledDataSourceTest(SimpleTestCase):
+
+    def test_same_values(self):
+        config = _visit_data_source()
+        docs = _visit_docs()
+        self.assertEqual(get_engine_differences(config, docs), [])
+        self.assertEqual(
+            [len(config.compiled_data_source.get_all_values(doc)) for doc in docs],
+            [3, 1, 3, 2, 0, 0, 0, 0, 0],
+        )
+
+    def test_values(self):
+        config = _visit_data_source()
+        rows = config.compiled_data_source.get_all_values(_visit_docs()[0])
+        self.assertEqual(
+            [
+                {value.column.id: value.value for value in row if value.column.id != 'inserted_at'}
+                for row in rows
+            ][0],
+            {
+                'doc_id': 'emergency',
+                'repeat_iteration': 0,
+                'visit_type': 'emergency',
+                'priority': 3,
+                'urgent': 1,
+                'medicine': 'amoxicillin',
+                'first_dose': 250,
+                'first_dose_date': datetime(2022, 3, 1).date(),
+                'dose_number': 0,
+                'dose_label': 1,
+                'route_oral': 1,
+                'route_injection': 0,
+            },
+        )
+
+    def test_shared_expressions(self):
+        compiled = _visit_data_source().compiled_data_source
+        # visit_type and is_urgent are each used in more than one place
+        self.assertGreaterEqual(compiled.num_shared_expressions, 2)
+
+    def test_filter(self):
+        config = _visit_data_source()
+        for doc in _visit_docs():
+            self.assertEqual(config.compiled_data_source.filter(doc), config._get_main_filter()(doc))
+
+    def test_different_not_filters(self):
+        config = _visit_data_source()
+        config.configured_indicators.append({
+            'type': 'boolean',
+            'column_id': 'not_routine',
+            'filter': {
+                'type': 'not',
+                'filter': {
+                    'type': 'boolean_expression',
+                    'expression': {'type': 'root_doc', 'expression': {'type': 'named', 'name': 'visit_type'}},
+                    'operator': 'eq',
+                    'property_value': 'routine',
+                },
+            },
+        })
+        docs = _visit_docs()
+        self.assertEqual(get_engine_differences(config, docs), [])
+        # has a patient (the NOT in configured_filter) but is a routine visit
+        rows = config.compiled_data_source.get_all_values(
+            _visit_doc('followup', patient_id='p3', followup='yes', medicines={'name': 'zinc'}))
+        self.assertEqual([value.value for row in rows for value in row if value.column.id == 'not_routine'], [0])
+
+    def test_sample_data_source(self):
+        config = get_sample_data_source()
+        doc, _ = get_sample_doc_and_indicators()
+        other_doc = doc | {'type': 'other'}
+        self.assertEqual(get_engine_differences(config, [doc, other_doc]), [])
+
+    def test_data_source_with_repeat(self):
+        config = get_data_source_with_repeat()
+        start = datetime.utcnow()
+        logs = [
+            {'start_time': start + timedelta(hours=hour), 'end_time': start, 'person': name}
+            for hour, name in enumerate(['al', 'chris', 'katie'])
+        ]
+        docs = [
+            {'_id': 'logs', 'domain': config.domain, 'doc_type': 'XFormInstance', 'created': 'Monday',
+             'form': {'time_logs': logs}},
+            {'_id': 'log', 'domain': config.domain, 'doc_type': 'XFormInstance', 'created': 'Tuesday',
+             'form': {'time_logs': logs[0]}},
+            {'_id': 'none', 'domain': config.domain, 'doc_type': 'XFormInstance', 'form': {}},
+        ]
+        self.assertEqual(get_engine_differences(config, docs), [])
+
+    @flag_enabled('COMPILED_UCR_EXPRESSIONS')
+    def test_get_all_values_with_toggle(self):
+        config = _visit_data_source()
+        doc = _visit_docs()[0]
+        self.assertTrue(config.uses_compiled_expressions)
+        self.assertTrue(config.filter(doc))
+        self.assertEqual(len(config.get_all_values(doc)), 3)
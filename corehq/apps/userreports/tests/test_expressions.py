@@ -23,7 +23,11 @@ from corehq.apps.userreports.expressions.specs import (
     PropertyPathGetterSpec,
     eval_statements,
 )
-from corehq.apps.userreports.specs import EvaluationContext, FactoryContext
+from corehq.apps.userreports.specs import (
+    BatchEvaluationCache,
+    EvaluationContext,
+    FactoryContext,
+)
 from corehq.apps.users.models import CommCareUser, WebUser
 from corehq.form_processor.exceptions import CaseNotFound
 from corehq.form_processor.models import CommCareCase, XFormInstance
@@ -1007,6 +1011,22 @@ class RelatedDocExpressionTest(SimpleTestCase):
         self.database.clear()
         self.assertEqual('foo', self.expression(my_doc, context))
 
+    def test_batch_caching(self):
+        self.test_simple_lookup()
+        my_doc = self.database.get('my-id')
+        other_doc = {'domain': 'test-domain', 'parent_id': 'related-id'}
+        batch_cache = BatchEvaluationCache()
+        self.assertEqual('foo', self.expression(my_doc, EvaluationContext(my_doc, 0, batch_cache)))
+
+        self.database.clear()
+        self.assertEqual('foo', self.expression(other_doc, EvaluationContext(other_doc, 0, batch_cache)))
+        self.assertEqual(batch_cache.misses, {'related_doc': 1})
+        self.assertEqual(batch_cache.hits, {'related_doc': 1})
+
+        # other domains do not share the cached document
+        other_domain_doc = {'domain': 'other-domain', 'parent_id': 'related-id'}
+        self.assertIsNone(self.expression(other_domain_doc, EvaluationContext(other_domain_doc, 0, batch_cache)))
+
 
 class RelatedDocExpressionDbTest(TestCase):
     domain = 'related-doc-db-test-domain'
@@ -0,0 +1,105 @@
+from datetime import datetime
+from unittest.mock import patch
+from uuid import uuid4
+
+from django.test import SimpleTestCase, TestCase
+
+from pillowtop.exceptions import PillowConfigError
+
+from corehq.apps.userreports.data_source_providers import MockDataSourceProvider
+from corehq.apps.userreports.models import DataSourceConfiguration
+from corehq.apps.userreports.pillow import ConfigurableReportTableManager
+from corehq.apps.userreports.pillow_assignment import (
+    _get_client,
+    _get_cost_key,
+    filter_by_cost,
+    get_balanced_assignment,
+    get_data_source_costs,
+    get_hash_index,
+    get_projected_loads,
+    get_saved_assignment,
+    parse_cost_division,
+    record_data_source_costs,
+    save_assignment,
+)
+
+
+class TestPillowAssignment(SimpleTestCase):
+
+    def test_parse_cost_division(self):
+        self.assertEqual(parse_cost_division('1/3'), (1, 3))
+
+    def test_parse_invalid_cost_division(self):
+        for division in [None, '', '3', '3/3', '-1/3', 'a/b', '1/2/3']:
+            with self.assertRaises(PillowConfigError):
+                parse_cost_division(division)
+
+    def test_balanced_assignment(self):
+        costs = {'a': 10, 'b': 6, 'c': 5, 'd': 4, 'e': 1}
+        assignment = get_balanced_assignment(costs, 2)
+        self.assertEqual(assignment, {'a': 0, 'b': 1, 'c': 1, 'd': 0, 'e': 1})
+        self.assertEqual(get_projected_loads(costs, 2, assignment), [14, 12])
+
+    def test_balanced_assignment_more_pillows_than_data_sources(self):
+        assignment = get_balanced_assignment({'a': 2, 'b': 1}, 4)
+        self.assertEqual(assignment, {'a': 0, 'b': 1})
+        self.assertEqual(get_projected_loads({'a': 2, 'b': 1}, 4, assignment), [2, 1, 0, 0])
+
+    def test_filter_by_cost(self):
+        configs = [DataSourceConfiguration(_id=config_id) for config_id in ['a', 'b', 'c']]
+        assignment = {'a': 1, 'b': 0}
+        filtered = [
+            [config._id for config in filter_by_cost(configs, index, 2, assignment)]
+            for index in range(2)
+        ]
+        unassigned_index = get_hash_index('c', 2)
+        expected = [['b'], ['a']]
+        expected[unassigned_index].append('c')
+        self.assertEqual(filtered, [sorted(ids) for ids in expected])
+
+    def test_cost_division_requires_pillow_name(self):
+        with self.assertRaises(PillowConfigError):
+            ConfigurableReportTableManager([MockDataSourceProvider()], ucr_cost_division='0/2')
+
+    @patch('corehq.apps.userreports.pillow._filter_invalid_config', lambda configs: configs)
+    @patch('corehq.apps.userreports.pillow._filter_domains_to_skip', lambda configs: configs)
+    def test_assignment_is_loaded_once(self):
+        configs = [DataSourceConfiguration(_id=config_id) for config_id in ['a', 'b']]
+        for run_migrations in [True, False]:
+            table_manager = ConfigurableReportTableManager(
+                [MockDataSourceProvider()],
+                ucr_cost_division='0/2',
+                pillow_name='case-pillow',
+                run_migrations=run_migrations,
+            )
+            with patch('corehq.apps.userreports.pillow.get_saved_assignment',
+                       return_value={'a': 0, 'b': 1}) as get_saved_assignment:
+                self.assertEqual([c._id for c in table_manager.get_filtered_configs(configs)], ['a'])
+                self.assertEqual([c._id for c in table_manager.get_filtered_configs(configs)], ['a'])
+            get_saved_assignment.assert_called_once_with('case-pillow', 2)
+
+
+class TestPillowAssignmentByPillowName(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.case_pillow = 'case-pillow-{}'.format(uuid4().hex)
+        self.xform_pillow = 'xform-pillow-{}'.format(uuid4().hex)
+
+    def test_saved_assignment(self):
+        save_assignment(self.case_pillow, {'a': 1, 'b': 0}, 2)
+        save_assignment(self.xform_pillow, {'a': 0}, 2)
+        save_assignment(self.case_pillow, {'a': 0, 'b': 1}, 2)
+        self.assertEqual(get_saved_assignment(self.case_pillow, 2), {'a': 0, 'b': 1})
+        self.assertEqual(get_saved_assignment(self.xform_pillow, 2), {'a': 0})
+        self.assertEqual(get_saved_assignment(self.xform_pillow, 3), {})
+
+    def test_data_source_costs(self):
+        now = datetime.utcnow()
+        self.addCleanup(_get_client().delete, _get_cost_key(self.case_pillow, now))
+        self.addCleanup(_get_client().delete, _get_cost_key(self.xform_pillow, now))
+        record_data_source_costs(self.case_pillow, {'a': 1.5})
+        record_data_source_costs(self.case_pillow, {'a': 1, 'b': 2})
+        record_data_source_costs(self.xform_pillow, {'a': 4})
+        self.assertEqual(get_data_source_costs(self.case_pillow), {'a': 2.5, 'b': 2})
+        self.assertEqual(get_data_source_costs(self.xform_pillow), {'a': 4})
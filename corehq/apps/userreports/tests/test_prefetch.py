@@ -0,0 +1,114 @@
+from django.test import SimpleTestCase
+
+from unittest.mock import patch
+
+from corehq.apps.userreports.models import DataSourceConfiguration
+from corehq.apps.userreports.prefetch import prefetch_related_docs
+from corehq.apps.userreports.specs import BatchEvaluationCache, EvaluationContext
+
+DOMAIN = 'prefetch-test'
+
+
+def _parent_data_source():
+    return DataSourceConfiguration.wrap({
+        'display_name': 'Children',
+        'doc_type': 'DataSourceConfiguration',
+        'domain': DOMAIN,
+        'referenced_doc_type': 'CommCareCase',
+        'table_id': 'children',
+        'configured_filter': {
+            'type': 'boolean_expression',
+            'expression': {'type': 'property_name', 'property_name': 'type'},
+            'operator': 'eq',
+            'property_value': 'child',
+        },
+        'named_expressions': {
+            'parent_name': {
+                'type': 'related_doc',
+                'related_doc_type': 'CommCareCase',
+                'doc_id_expression': {'type': 'property_name', 'property_name': 'parent_id'},
+                'value_expression': {'type': 'property_name', 'property_name': 'name'},
+            },
+        },
+        'configured_indicators': [
+            {
+                'type': 'expression',
+                'column_id': 'parent_name',
+                'datatype': 'string',
+                'expression': {'type': 'named', 'name': 'parent_name'},
+            },
+            {
+                'type': 'expression',
+                'column_id': 'guardian_name',
+                'datatype': 'string',
+                'expression': {
+                    'type': 'conditional',
+                    'test': {
+                        'type': 'boolean_expression',
+                        'expression': {'type': 'property_name', 'property_name': 'has_guardian'},
+                        'operator': 'eq',
+                        'property_value': 'yes',
+                    },
+                    'expression_if_true': {
+                        'type': 'related_doc',
+                        'related_doc_type': 'CommCareCase',
+                        'doc_id_expression': {'type': 'property_name', 'property_name': 'guardian_id'},
+                        'value_expression': {'type': 'property_name', 'property_name': 'name'},
+                    },
+                    'expression_if_false': None,
+                },
+            },
+        ],
+    })
+
+
+def _case(case_id, case_type, **properties):
+    return {'_id': case_id, 'domain': DOMAIN, 'doc_type': 'CommCareCase', 'type': case_type, **properties}
+
+
+class FakeDocumentStore(object):
+
+    def __init__(self, docs):
+        self.docs = docs
+        self.fetched_ids = []
+
+    def iter_documents(self, ids):
+        self.fetched_ids.extend(ids)
+        for doc_id in ids:
+            if doc_id in self.docs:
+                yield self.docs[doc_id]
+
+
+class PrefetchRelatedDocsTest(SimpleTestCase):
+
+    def test_related_doc_references(self):
+        references = _parent_data_source().related_doc_references
+        # the guardian lookup is conditional, so it is not prefetched
+        self.assertEqual([doc_type for doc_type, expression in references], ['CommCareCase'])
+
+    def test_prefetch(self):
+        config = _parent_data_source()
+        store = FakeDocumentStore({
+            'mother': {'_id': 'mother', 'domain': DOMAIN, 'name': 'Mother'},
+            'other-domain': {'_id': 'other-domain', 'domain': 'other', 'name': 'Other'},
+        })
+        docs = [
+            _case('child1', 'child', parent_id='mother'),
+            _case('child2', 'child', parent_id='mother'),
+            _case('child3', 'child', parent_id='other-domain'),
+            _case('child4', 'child', parent_id='missing'),
+            _case('adult', 'adult', parent_id='skipped'),
+        ]
+        batch_cache = BatchEvaluationCache()
+        eval_contexts = [EvaluationContext(doc, batch_cache=batch_cache) for doc in docs]
+        with patch('corehq.apps.userreports.prefetch.get_document_store_for_doc_type', return_value=store):
+            prefetch_related_docs(DOMAIN, [config], eval_contexts)
+        self.assertEqual(sorted(store.fetched_ids), ['missing', 'mother', 'other-domain'])
+        self.assertEqual(batch_cache.prefetched, {'related_doc': 3})
+
+        parent_names = [
+            config.get_all_values(doc, eval_context)[0][2].value
+            for doc, eval_context in zip(docs[:4], eval_contexts)
+        ]
+        self.assertEqual(parent_names, ['Mother', 'Mother', None, None])
+        self.assertEqual(batch_cache.misses, {})
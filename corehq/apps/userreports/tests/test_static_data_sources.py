@@ -68,6 +68,11 @@ class TestStaticDataSource(SimpleTestCase, TestFileMixin):
         for data_source in StaticDataSourceConfiguration.all():
             data_source.validate()
 
+    @timelimit(60)
+    def test_production_config_compiles(self):
+        for data_source in StaticDataSourceConfiguration.all():
+            data_source.compiled_data_source
+
     def test_for_table_id_conflicts(self):
         counts = Counter((ds.table_id, ds.domain) for ds in
                          StaticDataSourceConfiguration.all())
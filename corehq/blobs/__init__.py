@@ -82,6 +82,7 @@ class CODES:
     demo_user_restore = 14  # DemoUserRestore
     data_file = 15      # domain data file (see DataFile class)
     form_multimedia = 16     # form submission multimedia zip
+    queued_submission = 17   # form submission queued for processing
 
 
 CODES.name_of = {code: name
@@ -194,12 +194,22 @@ def extract_case_blocks(doc, include_path=False):
 
     Repeat nodes will all share the same path.
     """
+    path = [] if include_path else None
     if isinstance(doc, dict):
         form = doc
     else:
         form = doc.form_data
-
-    return list(_extract_case_blocks(form, [] if include_path else None))
+        case_block_keys = getattr(doc, '_case_block_keys', None)
+        if case_block_keys is not None and not is_device_report(form):
+            # found while parsing the form (see corehq.form_processor.parsers.iterparse)
+            from corehq.form_processor.utils import extract_meta_instance_id
+            return list(_extract_case_blocks(
+                {key: form[key] for key in case_block_keys if key in form},
+                path,
+                form_id=extract_meta_instance_id(form),
+            ))
+
+    return list(_extract_case_blocks(form, path))
 
 
 def _extract_case_blocks(data, path=None, form_id=Ellipsis):
@@ -1,3 +1,5 @@
+from datetime import timedelta
+
 # how long a cached payload sits around for (in seconds).
 INITIAL_SYNC_CACHE_TIMEOUT = 60 * 60  # 1 hour
 
@@ -9,12 +11,32 @@ INITIAL_SYNC_CACHE_THRESHOLD = 60  # 1 minute
 # if a sync is happening asynchronously, we wait for this long for a result to
 # initially be returned, otherwise we return a 202
 INITIAL_ASYNC_TIMEOUT_THRESHOLD = 10
+# streaming restores send content to the client each time at least this
+# many bytes have been generated
+STREAMING_RESTORE_CHUNK_SIZE = 256 * 1024  # 256 KB
+
+# number of restore profiles kept per user and for how long (in seconds)
+RESTORE_PROFILE_LIMIT = 20
+RESTORE_PROFILE_TIMEOUT = 7 * 24 * 60 * 60  # 1 week
+
 # The Retry-After header parameter. Ask the phone to retry in this many seconds
 # to see if the task is done.
 ASYNC_RETRY_AFTER = 5
 
 ASYNC_RESTORE_CACHE_KEY_PREFIX = "async-restore-task"
 RESTORE_CACHE_KEY_PREFIX = "ota-restore"
+CASE_FRAGMENT_CACHE_KEY_PREFIX = "ota-case-fragment"
+PREWARMED_RESTORE_CACHE_KEY_PREFIX = "ota-restore-prewarmed"
+
+# how long a serialized case XML fragment sits around for (in seconds).
+CASE_FRAGMENT_CACHE_TIMEOUT = 7 * 24 * 60 * 60  # 1 week
+
+# how long a pre-generated restore payload sits around for (in seconds).
+RESTORE_PREWARM_CACHE_TIMEOUT = 12 * 60 * 60  # 12 hours
+# restores are only pre-generated for users who synced within this time
+RESTORE_PREWARM_SYNC_AGE = timedelta(days=7)
+# restores are queued to be prewarmed this often
+PREWARM_INTERVAL_MINUTES = 15
 
 # case sync algorithms
 LIVEQUERY = 'livequery'
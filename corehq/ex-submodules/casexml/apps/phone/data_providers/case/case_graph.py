@@ -0,0 +1,187 @@
+"""Bulk live case graph engine
+
+Alternative to the incremental graph walk in
+`livequery.get_live_case_ids_and_indices`. Rather than classifying each
+index as it is fetched, the engine:
+
+1. loads the index graph reachable from the owned cases (one query per
+   hop since indices are stored on the shard of their case),
+2. fetches the closed/deleted status of all cases in the graph in bulk,
+   rather than once per hop, and
+3. computes the live set over a compact integer-id adjacency graph with
+   flag arrays instead of recursive closures over case id sets.
+
+Liveness rules are the same as those of the graph walk:
+
+- A case is available if
+    - it is open and not an extension case, or
+    - it is open and is the extension of an available case.
+- A case is live if it is owned and available.
+- The parents of a live case and the hosts of a live extension are live.
+- The open extensions of a live case are live.
+
+Since the rules are applied to the complete graph, the result does not
+depend on the order in which indices are fetched, and every case
+referenced by a live case is also live.
+
+This is a change from the graph walk, which ignores the index of a
+closed extension unless the extension is already live when the index is
+fetched. If the closed extension becomes live later (as the parent of a
+live case, for example) its host is not synced by the graph walk, but
+is synced by this engine. Otherwise both return the same cases.
+"""
+import logging
+from collections import defaultdict
+from itertools import chain
+
+from casexml.apps.case.const import CASE_INDEX_EXTENSION as EXTENSION
+from dimagi.utils.chunked import chunked
+
+from corehq.form_processor.models import CommCareCase, CommCareCaseIndex
+
+STATUS_CHUNK_SIZE = 5000
+
+
+def get_live_case_ids_and_indices(domain, owned_ids, timing_context):
+    with timing_context("load_case_graph"):
+        graph = CaseGraph.load(domain, owned_ids, timing_context)
+    with timing_context("get_live_case_ids ({} cases)".format(len(graph))):
+        live_ids = graph.get_live_case_ids()
+    logging.getLogger(__name__).debug('live: %r', live_ids)
+    return live_ids, graph.indices
+
+
+class CaseGraph:
+    """Index graph of a set of owned cases with integer case ids
+
+    :param owned_ids: Owned, open case ids.
+    :param indices: Iterable of CommCareCaseIndex-like objects.
+    :param closed_ids: Set of closed case ids.
+    :param deleted_ids: Set of deleted case ids. Indices referencing
+    deleted cases are discarded.
+    """
+
+    def __init__(self, owned_ids, indices, closed_ids, deleted_ids):
+        self.indices = by_case = defaultdict(list)  # case_id -> list of CommCareCaseIndex-like
+        self.numbers = numbers = {case_id: num for num, case_id in enumerate(owned_ids)}
+        number = numbers.setdefault
+        edges = []  # (sub, ref, is_extension)
+        for index in indices:
+            sub_id = index.case_id
+            ref_id = index.referenced_id
+            if sub_id in deleted_ids or ref_id in deleted_ids:
+                continue
+            by_case[sub_id].append(index)
+            edges.append((
+                number(sub_id, len(numbers)),
+                number(ref_id, len(numbers)),
+                index.relationship == EXTENSION,
+            ))
+        self.case_ids = list(numbers)
+
+        size = len(numbers)
+        self.owned = bytearray(b'\x01') * len(owned_ids) + bytearray(size - len(owned_ids))
+        self.open = is_open = bytearray(b'\x01') * size
+        self.extension = extension = bytearray(size)
+        self.refs = refs = [[] for x in range(size)]    # child/extension -> parents and hosts
+        self.exts = exts = [[] for x in range(size)]    # host -> open extensions
+        self.hosts = hosts = [[] for x in range(size)]  # open extension -> hosts
+        has_parent = bytearray(size)
+        for case_id in closed_ids:
+            if case_id in numbers:
+                is_open[numbers[case_id]] = 0
+        for sub, ref, is_extension in edges:
+            refs[sub].append(ref)
+            if is_extension:
+                if is_open[sub]:
+                    exts[ref].append(sub)
+                    hosts[sub].append(ref)
+                    extension[sub] = 1
+                # a closed extension is not available
+            else:
+                has_parent[sub] = 1
+        # a case that is both a child and an extension is not an extension
+        for num in range(size):
+            if has_parent[num]:
+                extension[num] = 0
+
+    def __len__(self):
+        return len(self.case_ids)
+
+    @classmethod
+    def load(cls, domain, owned_ids, timing_context):
+        owned_ids = set(owned_ids)
+        indices = list(_iter_related_indices(domain, owned_ids, timing_context))
+        # Reverse extension indices are only fetched for open cases, but
+        # forward indices of closed cases are fetched too, so the status
+        # of all cases other than owned (open) cases must be checked.
+        check_ids = {case_id
+            for index in indices
+            for case_id in [index.case_id, index.referenced_id]
+            if case_id not in owned_ids}
+        closed_ids = set()
+        deleted_ids = set()
+        with timing_context("get_closed_and_deleted_ids ({} cases)".format(len(check_ids))):
+            for chunk in chunked(check_ids, STATUS_CHUNK_SIZE, list):
+                for case_id, closed, deleted in CommCareCase.objects.get_closed_and_deleted_ids(domain, chunk):
+                    if deleted:
+                        deleted_ids.add(case_id)
+                    if closed or deleted:
+                        closed_ids.add(case_id)
+        return cls(owned_ids, indices, closed_ids, deleted_ids)
+
+    def get_live_case_ids(self):
+        owned = self.owned
+        is_open = self.open
+        extension = self.extension
+        size = len(self)
+
+        # hosts of owned (and therefore available if their host is)
+        # extensions, and their hosts, recursively
+        has_owned_extension = bytearray(size)
+        stack = [num for num in range(size) if owned[num] and extension[num]]
+        while stack:
+            for host in self.hosts[stack.pop()]:
+                if not has_owned_extension[host]:
+                    has_owned_extension[host] = 1
+                    stack.append(host)
+
+        live = bytearray(size)
+        stack = [num for num in range(size)
+            if not extension[num] and (owned[num] or (is_open[num] and has_owned_extension[num]))]
+        for num in stack:
+            live[num] = 1
+        while stack:
+            num = stack.pop()
+            for related in chain(self.refs[num], self.exts[num]):
+                if not live[related]:
+                    live[related] = 1
+                    stack.append(related)
+        case_ids = self.case_ids
+        return {case_ids[num] for num in range(size) if live[num]}
+
+
+def _iter_related_indices(domain, owned_ids, timing_context):
+    """Iterate over all indices reachable from the given case ids
+
+    Each index is yielded once.
+    """
+    seen_ix = defaultdict(set)  # case_id -> set of '<index.case_id> <index.identifier>'
+    next_ids = all_ids = set(owned_ids)
+    while next_ids:
+        exclude = set(chain.from_iterable(seen_ix[id] for id in next_ids))
+        with timing_context("get_related_indices({} cases, {} seen)".format(len(next_ids), len(exclude))):
+            related = CommCareCaseIndex.objects.get_related_indices(domain, list(next_ids), exclude)
+        next_ids = set()
+        for index in related:
+            ix_key = index.case_id + ' ' + index.identifier
+            sub_seen = seen_ix[index.case_id]
+            if ix_key in sub_seen:
+                continue
+            sub_seen.add(ix_key)
+            seen_ix[index.referenced_id].add(ix_key)
+            next_ids.add(index.case_id)
+            next_ids.add(index.referenced_id)
+            yield index
+        next_ids -= all_ids
+        all_ids.update(next_ids)
@@ -28,15 +28,23 @@ from itertools import chain, islice
 
 from casexml.apps.case.const import CASE_INDEX_EXTENSION as EXTENSION
 from casexml.apps.phone.const import ASYNC_RETRY_AFTER
+from casexml.apps.phone.restore_caching import CaseFragmentCache
 from casexml.apps.phone.tasks import ASYNC_RESTORE_SENT
 
 from corehq.form_processor.models import CommCareCase, CommCareCaseIndex
 from corehq.sql_db.routers import read_from_plproxy_standbys
-from corehq.toggles import LIVEQUERY_READ_FROM_STANDBYS, NAMESPACE_USER
+from corehq.toggles import (
+    LIVEQUERY_BULK_CASE_GRAPH,
+    LIVEQUERY_READ_FROM_STANDBYS,
+    NAMESPACE_DOMAIN,
+    NAMESPACE_USER,
+    RESTORE_CASE_FRAGMENT_CACHE,
+)
 from corehq.util.metrics import metrics_counter, metrics_histogram
 from corehq.util.metrics.load_counters import case_load_counter
 from corehq.util.timer import TimingContext
 
+from . import case_graph
 from .load_testing import get_xml_for_response
 from .stock import get_stock_payload
 from .utils import get_case_sync_updates
@@ -45,16 +53,24 @@ from .utils import get_case_sync_updates
 def livequery_read_from_standbys(func):
     @wraps(func)
     def _inner(timing_context, restore_state, response, async_task=None):
-        if LIVEQUERY_READ_FROM_STANDBYS.enabled(restore_state.restore_user.user_id, NAMESPACE_USER):
+        items = func(timing_context, restore_state, response, async_task)
+        if not LIVEQUERY_READ_FROM_STANDBYS.enabled(restore_state.restore_user.user_id, NAMESPACE_USER):
+            yield from items
+            return
+        # Read from standbys only while the restore is being generated, not
+        # while the caller is sending what has been generated so far, which
+        # can take as long as the phone takes to download it.
+        while True:
             with read_from_plproxy_standbys():
-                return func(timing_context, restore_state, response, async_task)
-        else:
-            return func(timing_context, restore_state, response, async_task)
+                try:
+                    item = next(items)
+                except StopIteration:
+                    return
+            yield item
 
     return _inner
 
 
-@livequery_read_from_standbys
 def do_livequery(timing_context, restore_state, response, async_task=None):
     """Get case sync restore response
 
@@ -62,6 +78,18 @@ def do_livequery(timing_context, restore_state, response, async_task=None):
     the `restore_state.current_sync_log` and progress of `async_task`.
     Extends `response` with restore elements.
     """
+    for __ in iter_livequery(timing_context, restore_state, response, async_task):
+        pass
+
+
+@livequery_read_from_standbys
+def iter_livequery(timing_context, restore_state, response, async_task=None):
+    """Get case sync restore response incrementally
+
+    Same as `do_livequery`, but yields each time a batch of cases has
+    been added to `response` so the caller can send the content that
+    has been generated so far before the next batch is loaded.
+    """
 
     debug = logging.getLogger(__name__).debug
     domain = restore_state.domain
@@ -74,7 +102,10 @@ def do_livequery(timing_context, restore_state, response, async_task=None):
                 domain, owner_ids, closed=False)
             debug("owned: %r", owned_ids)
 
-        live_ids, indices = get_live_case_ids_and_indices(domain, owned_ids, timing_context)
+        if LIVEQUERY_BULK_CASE_GRAPH.enabled(domain, NAMESPACE_DOMAIN):
+            live_ids, indices = case_graph.get_live_case_ids_and_indices(domain, owned_ids, timing_context)
+        else:
+            live_ids, indices = get_live_case_ids_and_indices(domain, owned_ids, timing_context)
 
         if restore_state.last_sync_log:
             with timing_context("discard_already_synced_cases"):
@@ -102,7 +133,7 @@ def do_livequery(timing_context, restore_state, response, async_task=None):
                 }
             )
             metrics_counter('commcare.restore.case_load.count', total_cases, {'domain': domain})
-            compile_response(
+            yield from iter_compile_response(
                 timing_context,
                 restore_state,
                 response,
@@ -382,6 +413,29 @@ def compile_response(
     update_progress,
     total_cases,
 ):
+    for __ in iter_compile_response(
+        timing_context,
+        restore_state,
+        response,
+        batches,
+        update_progress,
+        total_cases,
+    ):
+        pass
+
+
+def iter_compile_response(
+    timing_context,
+    restore_state,
+    response,
+    batches,
+    update_progress,
+    total_cases,
+):
+    """Extend `response` with case and stock elements
+
+    Yields after each batch of cases has been added to `response`.
+    """
     done = 0
     for cases in batches:
         with timing_context("get_stock_payload"):
@@ -396,15 +450,44 @@ def compile_response(
                 restore_state.domain, cases, restore_state.last_sync_log)
 
         with timing_context("get_xml_for_response (%s updates)" % len(updates)):
-            response.extend(
-                item for update in updates
-                for item in get_xml_for_response(
-                    update, restore_state, total_cases
-                )
-            )
+            response.extend(get_xml_for_updates(updates, restore_state, total_cases))
 
         done += len(cases)
         update_progress(done)
+        yield
+
+
+def get_xml_for_updates(updates, restore_state, total_cases):
+    """Get serialized case XML for a batch of case sync updates
+
+    Uses cached fragments for cases that have not been modified since
+    they were last serialized if the fragment cache is enabled for the
+    domain. Load test restores are never cached since their elements
+    are transformed copies of the original case.
+    """
+    def render(update):
+        return get_xml_for_response(update, restore_state, total_cases)
+
+    if not (RESTORE_CASE_FRAGMENT_CACHE.enabled(restore_state.domain)
+            and restore_state.get_safe_loadtest_factor(total_cases) == 1):
+        return [item for update in updates for item in render(update)]
+
+    cache = CaseFragmentCache(restore_state.domain, restore_state.version)
+    cached = cache.get_many(updates)
+    elements = []
+    rendered = []
+    for update in updates:
+        fragment = cached.get(update.case.case_id)
+        if fragment is None:
+            fragment, = render(update)
+            rendered.append((update, fragment))
+        elements.append(fragment)
+    cache.set_many(rendered)
+
+    tags = {'domain': restore_state.domain}
+    metrics_counter('commcare.restore.case_fragment_cache.hit', len(updates) - len(rendered), tags=tags)
+    metrics_counter('commcare.restore.case_fragment_cache.miss', len(rendered), tags=tags)
+    return elements
 
 
 RESTORE_CASE_LOAD_BUCKETS = [100, 200, 500, 1000, 2000, 5000, 10000, 20000, 50000, 100000, 200000, 500000, 1000000]
@@ -1,5 +1,5 @@
 from casexml.apps.phone.data_providers import AsyncDataProvider
-from casexml.apps.phone.data_providers.case.livequery import do_livequery
+from casexml.apps.phone.data_providers.case.livequery import do_livequery, iter_livequery
 
 
 class CasePayloadProvider(AsyncDataProvider):
@@ -14,3 +14,11 @@ class CasePayloadProvider(AsyncDataProvider):
             response,
             self.async_task,
         )
+
+    def iter_response(self, restore_state, response):
+        yield from iter_livequery(
+            self.timing_context,
+            restore_state,
+            response,
+            self.async_task,
+        )
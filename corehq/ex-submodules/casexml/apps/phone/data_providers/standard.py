@@ -26,6 +26,16 @@ class AsyncDataProvider(TimedProvider):
     def extend_response(self, restore_state, response):
         raise NotImplementedError('Need to implement this method')
 
+    def iter_response(self, restore_state, response):
+        """Extend the response incrementally
+
+        Yields each time a chunk of elements has been added to the
+        response. Providers that cannot generate their elements in
+        chunks extend the response all at once.
+        """
+        self.extend_response(restore_state, response)
+        yield
+
 
 class SyncElementProvider(RestoreDataProvider):
     """
@@ -0,0 +1,48 @@
+import time
+
+from django.core.management import BaseCommand
+
+from casexml.apps.phone.data_providers.case import case_graph, livequery
+from casexml.apps.phone.tests.synthetic_case_db import generate_hierarchies
+
+from corehq.util.timer import TimingContext
+
+DOMAIN = 'livequery-benchmark'
+
+ENGINES = {
+    'walk': livequery.get_live_case_ids_and_indices,
+    'bulk': case_graph.get_live_case_ids_and_indices,
+}
+
+
+class Command(BaseCommand):
+    """Compare live case graph engines on synthetic case hierarchies
+
+    Usage: ./manage.py benchmark_livequery --households 10000
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--households', type=int, nargs='+', default=[1000, 10000])
+        parser.add_argument('--members', type=int, default=5)
+        parser.add_argument('--extensions', type=int, default=2)
+        parser.add_argument('--closed-ratio', type=float, default=0.1)
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, households, members, extensions, closed_ratio, repeat, **options):
+        for count in households:
+            db, owned_ids = generate_hierarchies(count, members, extensions, closed_ratio)
+            print("{} households, {} owned cases".format(count, len(owned_ids)))
+            results = {}
+            for name, engine in ENGINES.items():
+                durations = []
+                with db.patch():
+                    for x in range(repeat):
+                        db.queries = 0
+                        start = time.perf_counter()
+                        live_ids, indices = engine(DOMAIN, owned_ids, TimingContext())
+                        durations.append(time.perf_counter() - start)
+                results[name] = live_ids
+                print("  {:<5} {:>8.3f}s (best of {}), {} queries, {} live cases".format(
+                    name, min(durations), repeat, db.queries, len(live_ids)))
+            if results['walk'] != results['bulk']:
+                print("  MISMATCH: {} cases differ".format(len(results['walk'] ^ results['bulk'])))
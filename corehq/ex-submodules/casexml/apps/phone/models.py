@@ -421,6 +421,7 @@ def synclog_to_sql_object(synclog_json_object):
             case_count=synclog_json_object.case_count(),
             request_user_id=synclog_json_object.request_user_id,
             auth_type=synclog_json_object.auth_type,
+            is_prewarmed=synclog_json_object.is_prewarmed,
         )
     field_mapping = [
         ('previous_log_id', 'previous_synclog_id'),
@@ -461,6 +462,7 @@ class SyncLogSQL(models.Model):
     case_count = models.IntegerField(null=True)
     request_user_id = models.CharField(max_length=255, null=True)
     auth_type = models.CharField(max_length=128, null=True)
+    is_prewarmed = models.BooleanField(null=True)
 
     def save(self, *args, **kwargs):
         super(SyncLogSQL, self).save(*args, **kwargs)
@@ -614,6 +616,7 @@ class SimplifiedSyncLog(AbstractSyncLog):
     extensions_checked = BooleanProperty(default=False)
     device_id = StringProperty()
     auth_type = StringProperty()
+    is_prewarmed = BooleanProperty(default=False)  # generated ahead of a sync, see restore_prewarm
 
     _purged_cases = None
 
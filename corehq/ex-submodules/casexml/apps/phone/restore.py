@@ -3,6 +3,7 @@ import os
 import shutil
 import tempfile
 import uuid
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 from distutils.version import LooseVersion
 from io import BytesIO
@@ -30,7 +31,12 @@ from corehq.apps.domain.models import Domain
 from corehq.blobs import CODES, get_blob_db
 from corehq.blobs.exceptions import NotFound
 from corehq.const import LOADTEST_HARD_LIMIT
-from corehq.toggles import EXTENSION_CASES_SYNC_ENABLED
+from corehq.toggles import (
+    EXTENSION_CASES_SYNC_ENABLED,
+    PREWARM_RESTORES,
+    RESTORE_PROFILING,
+    STREAMING_RESTORE,
+)
 from corehq.util.metrics import metrics_counter, metrics_histogram
 from corehq.util.timer import TimingContext
 from dimagi.utils.logging import notify_error
@@ -41,6 +47,7 @@ from .const import (
     INITIAL_ASYNC_TIMEOUT_THRESHOLD,
     INITIAL_SYNC_CACHE_THRESHOLD,
     INITIAL_SYNC_CACHE_TIMEOUT,
+    STREAMING_RESTORE_CHUNK_SIZE,
 )
 from .data_providers import get_async_providers, get_element_providers
 from .exceptions import (
@@ -55,7 +62,12 @@ from .models import (
     SimplifiedSyncLog,
     get_properly_wrapped_sync_log,
 )
-from .restore_caching import AsyncRestoreTaskIdCache, RestorePayloadPathCache
+from .restore_caching import (
+    AsyncRestoreTaskIdCache,
+    PrewarmedRestoreCache,
+    RestorePayloadPathCache,
+)
+from .restore_profiling import RestoreProfile, save_restore_profile
 from .tasks import ASYNC_RESTORE_SENT, get_async_restore_payload
 from .utils import get_cached_items_with_count
 from .xml import get_progress_element, get_sync_element
@@ -110,6 +122,7 @@ class RestoreContent(object):
         self.username = username
         self.items = items
         self.num_items = 0
+        self.num_bytes = 0
 
     def __enter__(self):
         self.response_body = tempfile.TemporaryFile('w+b')
@@ -123,22 +136,26 @@ class RestoreContent(object):
         if isinstance(xml_element, bytes):
             xml_element, num = get_cached_items_with_count(xml_element)
             self.num_items += num - 1
-            self.response_body.write(xml_element)
         else:
-            self.response_body.write(ElementTree.tostring(xml_element, encoding='utf-8'))
+            xml_element = ElementTree.tostring(xml_element, encoding='utf-8')
+        self.num_bytes += len(xml_element)
+        self.response_body.write(xml_element)
 
     def extend(self, iterable):
         for element in iterable:
             self.append(element)
 
-    def _write_to_file(self, fileobj):
+    def get_start_tag(self):
         # Add 1 to num_items to account for message element
         items = (self.items_template % ('%s' % (self.num_items + 1)).encode('utf-8')) if self.items else b''
-        fileobj.write(self.start_tag_template % {
+        return self.start_tag_template % {
             b"items": items,
             b"username": self.username.encode("utf8"),
             b"nature": ResponseNature.OTA_RESTORE_SUCCESS.encode("utf8"),
-        })
+        }
+
+    def _write_to_file(self, fileobj):
+        fileobj.write(self.get_start_tag())
 
         self.response_body.seek(0)
         shutil.copyfileobj(self.response_body, fileobj)
@@ -156,6 +173,36 @@ class RestoreContent(object):
             raise
 
 
+class StreamingRestoreContent(RestoreContent):
+    """Restore content that is sent to the client as it is generated
+
+    Elements are buffered in memory only until they are flushed, so
+    memory use is bounded by the size of the largest chunk of elements
+    added between flushes rather than by the size of the restore.
+
+    The number of items is not known until all content has been
+    generated, so it cannot be included in the start tag.
+    """
+
+    def __init__(self, username=None):
+        super().__init__(username, items=False)
+
+    def __enter__(self):
+        self.response_body = BytesIO()
+        return self
+
+    @property
+    def buffered_size(self):
+        return self.response_body.tell()
+
+    def flush(self):
+        """Get buffered content as utf8-encoded bytes and clear the buffer"""
+        value = self.response_body.getvalue()
+        self.response_body.seek(0)
+        self.response_body.truncate()
+        return value
+
+
 class RestoreResponse(object):
 
     def __init__(self, fileobj):
@@ -181,6 +228,27 @@ class RestoreResponse(object):
         return stream_response(self.fileobj, headers)
 
 
+class StreamingRestoreResponse(object):
+    """Restore response whose content is generated while it is sent
+
+    :param content: An iterable of utf8-encoded bytes.
+    """
+
+    def __init__(self, content):
+        self.content = content
+
+    def as_string(self):
+        """Get content as utf8-encoded bytes
+
+        NOTE: This method is only used in tests.
+        Cannot be called more than once.
+        """
+        return b''.join(self.content)
+
+    def get_http_response(self):
+        return StreamingHttpResponse(self.content, content_type="text/xml; charset=utf-8")
+
+
 class AsyncRestoreResponse(object):
 
     def __init__(self, task, username):
@@ -359,6 +427,7 @@ class RestoreState:
             is_async: bool = False,
             overwrite_cache: bool = False,
             auth_type: Optional[str] = None,
+            is_prewarm: bool = False,
     ):
         if not project or not project.name:
             raise Exception('you are not allowed to make a RestoreState without a domain!')
@@ -376,6 +445,7 @@ class RestoreState:
         self.is_async = is_async
         self.overwrite_cache = overwrite_cache
         self.auth_type = auth_type
+        self.is_prewarm = is_prewarm
         self._last_sync_log = Ellipsis
 
     def validate_state(self):
@@ -477,7 +547,8 @@ class RestoreState:
             extensions_checked=True,
             device_id=self.params.device_id,
             request_user_id=self.restore_user.request_user_id,
-            auth_type=self.auth_type
+            auth_type=self.auth_type,
+            is_prewarmed=self.is_prewarm,
         )
         if self.params.app:
             new_synclog.app_id = self.params.app.copy_of or self.params.app_id
@@ -515,11 +586,13 @@ class RestoreConfig(object):
     :param cache_settings:  The RestoreCacheSettings associated with this (see above).
     :param is_async:           Whether to get the restore response using a celery task
     :param skip_fixtures:   Whether to include fixtures in the restore payload
+    :param profile:         Whether to record a profile of the restore (see `restore_profiling`)
+    :param is_prewarm:      Whether the restore is generated ahead of a sync (see `restore_prewarm`)
     """
 
     def __init__(self, project=None, restore_user=None, params=None,
                  cache_settings=None, is_async=False,
-                 skip_fixtures=False, auth_type=None):
+                 skip_fixtures=False, auth_type=None, profile=False, is_prewarm=False):
         assert isinstance(restore_user, OTARestoreUser)
         self.project = project
         self.domain = project.name if project else ''
@@ -528,13 +601,16 @@ class RestoreConfig(object):
         self.cache_settings = cache_settings or RestoreCacheSettings()
         self.is_async = is_async
         self.skip_fixtures = skip_fixtures
+        self.is_profiling = profile or RESTORE_PROFILING.enabled(self.domain)
+        self.profile = None
 
         self.restore_state = RestoreState(
             self.project,
             self.restore_user,
             self.params, is_async,
             self.cache_settings.overwrite_cache,
-            auth_type=auth_type
+            auth_type=auth_type,
+            is_prewarm=is_prewarm,
         )
 
         self.force_cache = self.cache_settings.force_cache
@@ -566,6 +642,15 @@ class RestoreConfig(object):
             device_id=self.params.device_id,
         )
 
+    @property
+    def prewarmed_restore_cache(self):
+        return PrewarmedRestoreCache(
+            domain=self.domain,
+            user_id=self.restore_user.user_id,
+            sync_log_id=self.sync_log._id if self.sync_log else '',
+            device_id=self.params.device_id,
+        )
+
     @property
     def initial_restore_payload_path_cache(self):
         return RestorePayloadPathCache(
@@ -577,9 +662,12 @@ class RestoreConfig(object):
 
     def get_response(self):
         is_async = self.is_async
+        is_streaming = False
         try:
             with self.timing_context:
                 payload = self.get_payload()
+            # streaming restores record timing when generation completes
+            is_streaming = isinstance(payload, StreamingRestoreResponse)
             response = payload.get_http_response()
         except RestoreException as e:
             logger.exception("%s error during restore submitted by %s: %s" %
@@ -591,7 +679,7 @@ class RestoreConfig(object):
             )
             response = HttpResponse(response, content_type="text/xml; charset=utf-8",
                                     status=412)  # precondition failed
-        if not is_async:
+        if not (is_async or is_streaming):
             self._record_timing(response.status_code)
         return response
 
@@ -605,6 +693,8 @@ class RestoreConfig(object):
             'domain': self.domain,
             'is_async': bool(self.is_async),
         }
+        if PREWARM_RESTORES.enabled(self.domain):
+            cached_response = self._check_prewarmed_response(cached_response)
         if cached_response:
             metrics_counter('commcare.restores.cache_hits.count', tags=tags)
             return cached_response
@@ -613,11 +703,38 @@ class RestoreConfig(object):
         # Start new sync
         if self.is_async:
             response = self._get_asynchronous_payload()
+        elif self.is_streaming:
+            response = self.generate_streaming_payload()
         else:
             response = self.generate_payload()
 
         return response
 
+    def _check_prewarmed_response(self, cached_response):
+        """Discard a pre-generated payload if the user's cases have changed
+        since it was generated (see `restore_prewarm`)
+
+        :returns: The cached response, or None if there is none or it was
+        discarded.
+        """
+        from .restore_prewarm import get_cases_fingerprint
+        fingerprint = self.prewarmed_restore_cache.get_value() if cached_response else None
+        if fingerprint is None:
+            result = 'cached' if cached_response else 'miss'
+        else:
+            self.prewarmed_restore_cache.invalidate()
+            if fingerprint == get_cases_fingerprint(self):
+                result = 'prewarmed'
+            else:
+                self.restore_payload_path_cache.invalidate()
+                cached_response = None
+                result = 'stale'
+        metrics_counter('commcare.restores.prewarm.usage', tags={
+            'domain': self.domain,
+            'result': result,
+        })
+        return cached_response
+
     def validate(self):
         try:
             self.restore_state.validate_state()
@@ -656,6 +773,83 @@ class RestoreConfig(object):
             raise
         return response
 
+    @property
+    def is_streaming(self):
+        """Whether the restore should be sent to the client as it is generated
+
+        Streaming is not possible if the response must include an item
+        count or be cached before it is sent, since both need the
+        complete payload first. Streamed restores that take long enough
+        to need caching are cached once they have been sent.
+        """
+        return (
+            not self.is_async
+            and not self.force_cache
+            and not self.params.include_item_count
+            and STREAMING_RESTORE.enabled(self.domain)
+        )
+
+    def generate_streaming_payload(self):
+        self.restore_state.start_sync()
+        return StreamingRestoreResponse(self._iter_restore_content())
+
+    def _iter_restore_content(self):
+        """Generate restore content in chunks of utf8-encoded bytes
+
+        Content is also written to a temporary file so that it can be
+        cached like a restore that was not streamed. If the client stops
+        downloading the restore (because it timed out, for example) the
+        rest of the content is generated so that the restore is cached
+        for the client's next attempt rather than generated again.
+        """
+        chunks = self._iter_restore_chunks()
+        with tempfile.TemporaryFile('w+b') as fileobj:
+            try:
+                for chunk in chunks:
+                    fileobj.write(chunk)
+                    yield chunk
+            except GeneratorExit:
+                for chunk in chunks:
+                    fileobj.write(chunk)
+            fileobj.seek(0)
+            self.set_cached_payload_if_necessary(fileobj, self.restore_state.duration, is_async=False)
+
+    def _iter_restore_chunks(self):
+        """Generate restore content in chunks of utf8-encoded bytes
+
+        The sync element (the sync token) is the first element in the
+        payload, but the sync log is only saved once all content has
+        been generated. A restore that fails part way through will
+        leave the client with a truncated payload and a sync token that
+        does not exist, which it will resolve with a fresh restore.
+
+        Content is generated lazily while the response is being sent,
+        after the timing context of the request has finished, so a new
+        timing context is used to time content generation.
+        """
+        self.timing_context = TimingContext(self.timing_context.root.name)
+        username = self.restore_user.username
+        if self.is_profiling:
+            self.profile = RestoreProfile(self.restore_state)
+        with self.timing_context, StreamingRestoreContent(username) as content:
+            yield content.get_start_tag()
+            for provider in get_element_providers(self.timing_context, skip_fixtures=self.skip_fixtures):
+                with self._time_provider(provider, content):
+                    for element in provider.get_elements(self.restore_state):
+                        content.append(element)
+                        if content.buffered_size >= STREAMING_RESTORE_CHUNK_SIZE:
+                            yield content.flush()
+
+            for provider in get_async_providers(self.timing_context):
+                with self._time_provider(provider, content):
+                    for __ in provider.iter_response(self.restore_state, content):
+                        if content.buffered_size >= STREAMING_RESTORE_CHUNK_SIZE:
+                            yield content.flush()
+
+            yield content.flush() + content.closing_tag
+            self.restore_state.finish_sync()
+        self._record_timing(200)
+
     def _get_asynchronous_payload(self):
         new_task = False
         # fetch the task from celery
@@ -709,17 +903,29 @@ class RestoreConfig(object):
         """
         username = self.restore_user.username
         count_items = self.params.include_item_count
+        if self.is_profiling:
+            self.profile = RestoreProfile(self.restore_state)
         with RestoreContent(username, count_items) as content:
             for provider in get_element_providers(self.timing_context, skip_fixtures=self.skip_fixtures):
-                with self.timing_context(provider.__class__.__name__):
+                with self._time_provider(provider, content):
                     content.extend(provider.get_elements(self.restore_state))
 
             for provider in get_async_providers(self.timing_context, async_task):
-                with self.timing_context(provider.__class__.__name__):
+                with self._time_provider(provider, content):
                     provider.extend_response(self.restore_state, content)
 
             return content.get_fileobj()
 
+    @contextmanager
+    def _time_provider(self, provider, content):
+        name = provider.__class__.__name__
+        with self.timing_context(name):
+            if self.profile is None:
+                yield
+            else:
+                with self.profile.record(name, content):
+                    yield
+
     def set_cached_payload_if_necessary(self, fileobj, duration, is_async):
         # must cache if the duration was longer than the threshold
         is_long_restore = duration > timedelta(seconds=INITIAL_SYNC_CACHE_THRESHOLD)
@@ -821,6 +1027,9 @@ class RestoreConfig(object):
             tags=tags
         )
 
+        if self.profile is not None:
+            save_restore_profile(self.profile.to_json(timing, status))
+
     def __repr__(self):
         return \
             "RestoreConfig(project='{}', domain={}, restore_user={}, cache_settings='{}', " \
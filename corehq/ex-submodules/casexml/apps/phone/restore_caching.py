@@ -6,7 +6,14 @@ from dimagi.utils.couch.cache.cache_core import get_redis_default_cache
 
 from corehq.util.quickcache import quickcache
 
-from .const import ASYNC_RESTORE_CACHE_KEY_PREFIX, RESTORE_CACHE_KEY_PREFIX
+from .const import (
+    ASYNC_RESTORE_CACHE_KEY_PREFIX,
+    CASE_FRAGMENT_CACHE_KEY_PREFIX,
+    CASE_FRAGMENT_CACHE_TIMEOUT,
+    PREWARMED_RESTORE_CACHE_KEY_PREFIX,
+    RESTORE_CACHE_KEY_PREFIX,
+    RESTORE_PREWARM_CACHE_TIMEOUT,
+)
 from .models import loadtest_users_enabled
 
 logger = logging.getLogger(__name__)
@@ -101,3 +108,77 @@ class RestorePayloadPathCache(_RestoreCache):
 class AsyncRestoreTaskIdCache(_RestoreCache):
     timeout = 24 * 60 * 60
     prefix = ASYNC_RESTORE_CACHE_KEY_PREFIX
+
+
+class PrewarmedRestoreCache(_RestoreCache):
+    """Marks a cached restore payload as pre-generated
+
+    The value is the fingerprint of the cases that the payload was
+    generated from (see `restore_prewarm.get_cases_fingerprint`).
+    """
+    timeout = RESTORE_PREWARM_CACHE_TIMEOUT
+    prefix = PREWARMED_RESTORE_CACHE_KEY_PREFIX
+
+
+class CaseFragmentCache(object):
+    """Cache of serialized case XML fragments for restore payloads
+
+    Fragments are keyed by case id and ``server_modified_on``, so a
+    case that has not been modified since it was last serialized can be
+    spliced into a new restore without being rendered again. The actions
+    (create/update/close) and restore version are part of the key since
+    they change the rendered XML. Invalidating the domain restore cache
+    also invalidates all fragments in the domain.
+    """
+    timeout = CASE_FRAGMENT_CACHE_TIMEOUT
+    prefix = CASE_FRAGMENT_CACHE_KEY_PREFIX
+
+    def __init__(self, domain, version):
+        self.domain = domain
+        self.version = version
+
+    def _make_cache_key(self, case_sync_update):
+        case = case_sync_update.case
+        hashable_key = ','.join([str(part) for part in [
+            self.domain,
+            self.prefix,
+            self.version,
+            case.case_id,
+            case.server_modified_on.isoformat() if case.server_modified_on else '',
+            '|'.join(case_sync_update.required_updates),
+            _get_domain_freshness_token(self.domain),
+        ]])
+        return hashlib.md5(hashable_key.encode('utf-8')).hexdigest()
+
+    def get_many(self, case_sync_updates):
+        """Get cached fragments
+
+        :returns: Dict of ``{case_id: fragment_bytes}`` for updates
+        that have a cached fragment.
+        """
+        keys_by_case_id = {
+            update.case.case_id: self._make_cache_key(update)
+            for update in case_sync_updates
+        }
+        if not keys_by_case_id:
+            return {}
+        logger.debug('getting %s %s fragments', self.__class__.__name__, len(keys_by_case_id))
+        cached = get_redis_default_cache().get_many(list(keys_by_case_id.values()))
+        return {
+            case_id: cached[key]
+            for case_id, key in keys_by_case_id.items()
+            if key in cached
+        }
+
+    def set_many(self, fragments):
+        """Cache fragments
+
+        :param fragments: List of ``(case_sync_update, fragment_bytes)``
+        """
+        if not fragments:
+            return
+        logger.debug('setting %s %s fragments', self.__class__.__name__, len(fragments))
+        get_redis_default_cache().set_many({
+            self._make_cache_key(update): fragment
+            for update, fragment in fragments
+        }, timeout=self.timeout)
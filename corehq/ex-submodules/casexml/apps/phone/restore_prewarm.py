@@ -0,0 +1,156 @@
+"""Pre-generate restores during off-peak windows
+
+For domains with the PREWARM_RESTORES toggle, restores are generated
+ahead of time, during the domain's ``restore_prewarm_times``, for users
+whose cases have changed since their last sync. The payload is saved
+with `RestorePayloadPathCache` under the user's last sync log and
+device, so the user's next sync is served from the cache.
+
+The payload is only served if the cases that it depends on have not
+changed since it was generated. See `get_cases_fingerprint`.
+
+Generating a restore saves a new sync log, which is marked with
+``is_prewarmed``. The phone has not received it, so it is not used as
+the user's last sync when restores are next prewarmed.
+
+The number of restores queued for each domain is limited by the
+'restore_prewarm' dynamic rate definition. Restores are queued every
+`PREWARM_INTERVAL_MINUTES`, all within a minute, so the default allows a
+quarter of the hourly limit to be queued at each interval.
+"""
+import hashlib
+from datetime import datetime
+
+from casexml.apps.case.xml import V2
+
+from corehq.apps.app_manager.dbaccessors import get_app_cached
+from corehq.apps.sms.tasks import time_within_windows
+from corehq.apps.users.models import CouchUser
+from corehq.form_processor.models import CommCareCase
+from corehq.project_limits.rate_limiter import RateDefinition, RateLimiter, get_dynamic_rate_definition
+from corehq.util.metrics import metrics_counter
+from corehq.util.timezones.conversions import ServerTime
+
+from .const import PREWARM_INTERVAL_MINUTES, RESTORE_PREWARM_CACHE_TIMEOUT, RESTORE_PREWARM_SYNC_AGE
+from .models import SyncLogSQL, get_properly_wrapped_sync_log
+from .restore import RestoreCacheSettings, RestoreConfig, RestoreParams
+from .restore_caching import RestorePayloadPathCache
+
+PREWARM_PER_HOUR = 2000
+
+prewarm_rate_limiter = RateLimiter(
+    feature_key='restore_prewarm',
+    get_rate_limits=lambda scope: get_dynamic_rate_definition(
+        'restore_prewarm',
+        default=RateDefinition(
+            per_hour=PREWARM_PER_HOUR,
+            per_minute=PREWARM_PER_HOUR * PREWARM_INTERVAL_MINUTES // 60,
+        ),
+    ).get_rate_limits(scope),
+)
+
+
+def is_prewarm_time(domain_obj, utcnow=None):
+    """Check if the domain is in one of its restore prewarm windows
+
+    Windows are interpreted in the domain's timezone.
+    """
+    if not domain_obj.restore_prewarm_times:
+        return False
+    domain_now = ServerTime(utcnow or datetime.utcnow()).user_time(domain_obj.get_default_timezone()).done()
+    return time_within_windows(domain_now, domain_obj.restore_prewarm_times)
+
+
+def iter_restores_to_prewarm(domain):
+    """Iterate over the last sync of each user who synced recently
+
+    Syncs that were generated by prewarming are ignored, and syncs that
+    already have a cached payload are skipped.
+
+    :yields: `(synclog_id, user_id)` tuples.
+    """
+    since = datetime.utcnow() - RESTORE_PREWARM_SYNC_AGE
+    last_syncs = (
+        SyncLogSQL.objects
+        .filter(domain=domain, date__gte=since, is_formplayer=False)
+        .exclude(is_prewarmed=True)
+        .order_by('user_id', '-date')
+        .distinct('user_id')
+        .values_list('synclog_id', 'user_id', 'device_id')
+    )
+    for synclog_id, user_id, device_id in last_syncs.iterator():
+        synclog_id = synclog_id.hex
+        cache = RestorePayloadPathCache(domain, user_id, synclog_id, device_id)
+        if not cache.exists():
+            yield synclog_id, user_id
+
+
+def prewarm_restore(domain, user_id, synclog_id):
+    """Generate and cache a restore for the given user's last sync
+
+    Nothing is generated if no cases have changed since the last sync.
+
+    :returns: True if a restore was generated, otherwise False.
+    """
+    couch_user = CouchUser.get_by_user_id(user_id, domain)
+    if not couch_user or not couch_user.is_active:
+        return False
+    sync_log = get_properly_wrapped_sync_log(synclog_id)
+    restore_config = RestoreConfig(
+        project=couch_user.project,
+        restore_user=couch_user.to_ota_restore_user(domain),
+        params=RestoreParams(
+            sync_log_id=synclog_id,
+            version=V2,
+            device_id=sync_log.device_id,
+            app=get_app_cached(domain, sync_log.build_id) if sync_log.build_id else None,
+        ),
+        cache_settings=RestoreCacheSettings(
+            force_cache=True,
+            cache_timeout=RESTORE_PREWARM_CACHE_TIMEOUT,
+        ),
+        is_prewarm=True,
+    )
+    if restore_config.restore_payload_path_cache.exists() or not has_changed_cases(restore_config):
+        metrics_counter('commcare.restores.prewarm.skipped', tags={'domain': domain})
+        return False
+
+    # cases that change while the payload is generated make it stale
+    fingerprint = get_cases_fingerprint(restore_config)
+    with restore_config.timing_context:
+        response = restore_config.generate_payload()
+    response.as_file().close()  # the payload has been saved to the cache
+    restore_config.prewarmed_restore_cache.set_value(fingerprint)
+    metrics_counter('commcare.restores.prewarm.generated', tags={'domain': domain})
+    return True
+
+
+def has_changed_cases(restore_config):
+    """Check if the next sync would include cases
+
+    Cases are included if they were modified since the last sync or if
+    the user owns open cases that are not on the phone.
+    """
+    domain = restore_config.domain
+    sync_log = restore_config.sync_log
+    phone_ids = sync_log.case_ids_on_phone
+    owned_ids = CommCareCase.objects.get_case_ids_in_domain_by_owners(
+        domain, list(restore_config.restore_state.owner_ids), closed=False)
+    if set(owned_ids) - phone_ids:
+        return True
+    return bool(CommCareCase.objects.get_modified_case_ids(domain, list(phone_ids), sync_log))
+
+
+def get_cases_fingerprint(restore_config):
+    """A hash of the ids and modification times of the cases that the next
+    sync of a restore depends on: the cases on the phone and the open
+    cases of the user's owner ids
+    """
+    domain = restore_config.domain
+    case_ids = set(restore_config.sync_log.case_ids_on_phone)
+    case_ids.update(CommCareCase.objects.get_case_ids_in_domain_by_owners(
+        domain, list(restore_config.restore_state.owner_ids), closed=False))
+    case_ids = sorted(case_ids)
+    modified_dates = CommCareCase.objects.get_last_modified_dates(domain, case_ids) if case_ids else {}
+    hashable = ','.join('{}:{}'.format(case_id, modified_dates.get(case_id)) for case_id in case_ids)
+    return hashlib.md5(hashable.encode('utf-8')).hexdigest()
@@ -0,0 +1,133 @@
+"""Restore profiling
+
+Records per-provider wall time, SQL query count, rows fetched and bytes
+emitted for restores of domains with the RESTORE_PROFILING toggle, or
+restores requested by a superuser with ``?profile=true``. The last few
+profiles of each user are kept in redis and can be viewed in the
+restore profiles admin view.
+"""
+import json
+import time
+from contextlib import ExitStack, contextmanager
+from datetime import datetime
+
+from django.db import connections
+
+from dimagi.utils.couch import get_redis_client
+
+from .const import RESTORE_PROFILE_LIMIT, RESTORE_PROFILE_TIMEOUT
+
+
+class QueryCounter(object):
+    """Count SQL queries and rows fetched on all database connections"""
+
+    def __init__(self):
+        self.queries = 0
+        self.rows = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        result = execute(sql, params, many, context)
+        self.queries += 1
+        rowcount = getattr(context['cursor'], 'rowcount', -1)
+        if rowcount > 0:
+            self.rows += rowcount
+        return result
+
+    @contextmanager
+    def count(self):
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(self))
+            yield self
+
+
+class RestoreProfile(object):
+
+    def __init__(self, restore_state):
+        self.restore_state = restore_state
+        self.date = datetime.utcnow()
+        self.providers = []
+
+    @contextmanager
+    def record(self, name, content):
+        """Record profile data for a provider
+
+        :param name: Provider name.
+        :param content: `RestoreContent` to which the provider adds elements.
+        """
+        counter = QueryCounter()
+        start_bytes = content.num_bytes
+        start = time.time()
+        try:
+            with counter.count():
+                yield
+        finally:
+            self.providers.append({
+                'name': name,
+                'duration': time.time() - start,
+                'queries': counter.queries,
+                'rows': counter.rows,
+                'bytes': content.num_bytes - start_bytes,
+            })
+
+    def to_json(self, timing_context, status):
+        state = self.restore_state
+        sync_log = state.current_sync_log
+        return {
+            'date': self.date.isoformat(),
+            'domain': state.domain,
+            'user_id': state.restore_user.user_id,
+            'username': state.restore_user.username,
+            'sync_log_id': sync_log._id if sync_log else None,
+            'restore_type': 'fresh' if state.is_initial else 'incremental',
+            'status': status,
+            'duration': timing_context.duration,
+            'providers': self.providers,
+            'timing': timing_context.to_dict(),
+        }
+
+
+def _get_profiles_key(domain, user_id):
+    return 'restore-profiles:{}:{}'.format(domain, user_id)
+
+
+def save_restore_profile(profile_json):
+    """Save restore profile, keeping only the most recent profiles for the user"""
+    client = get_redis_client().client.get_client()
+    key = _get_profiles_key(profile_json['domain'], profile_json['user_id'])
+    client.lpush(key, json.dumps(profile_json).encode('utf-8'))
+    client.ltrim(key, 0, RESTORE_PROFILE_LIMIT - 1)
+    client.expire(key, RESTORE_PROFILE_TIMEOUT)
+
+
+def get_restore_profiles(domain, user_id):
+    """Get restore profiles for the user, most recent first"""
+    client = get_redis_client().client.get_client()
+    return [
+        json.loads(value.decode('utf-8'))
+        for value in client.lrange(_get_profiles_key(domain, user_id), 0, -1)
+    ]
+
+
+def flatten_timing(timing, parent=None):
+    """Flatten timing dict (see `TimingContext.to_dict`) into a list of
+    timers in hierarchy order
+
+    Each timer has a generated `uuid` and a reference to its `parent`
+    so it can be displayed like `TimingContext.to_list()`.
+    """
+    timer = {
+        'uuid': '{}-{}'.format(parent['uuid'], len(parent['subs'])) if parent else 'timer',
+        'name': timing['name'],
+        'duration': timing['duration'],
+        'percent_of_parent': timing['percent_parent'],
+        'percent_of_total': timing['percent_total'],
+        'parent': parent,
+        'subs': [],
+    }
+    if parent is not None:
+        parent['subs'].append(timer)
+    timers = [timer]
+    for sub in timing['subs']:
+        timers.extend(flatten_timing(sub, timer))
+    return timers
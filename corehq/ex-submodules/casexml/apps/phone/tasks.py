@@ -9,11 +9,12 @@ from celery import current_app, current_task
 from celery.schedules import crontab
 from celery.signals import after_task_publish
 
+from casexml.apps.phone.const import PREWARM_INTERVAL_MINUTES
 from casexml.apps.phone.models import SyncLogSQL
 from dimagi.utils.logging import notify_exception
 
 from corehq.apps.celery import periodic_task, task
-from corehq.util.metrics import metrics_gauge
+from corehq.util.metrics import metrics_counter, metrics_gauge
 
 log = logging.getLogger(__name__)
 
@@ -95,3 +96,39 @@ def prune_synclogs():
         cursor.execute("select count(*) from only phone_synclogsql")
         orphaned_synclogs = cursor.fetchone()[0]
         metrics_gauge('commcare.orphaned_synclogs', orphaned_synclogs)
+
+
+@periodic_task(
+    run_every=crontab(minute="*/{}".format(PREWARM_INTERVAL_MINUTES)),
+    queue=getattr(settings, 'CELERY_PERIODIC_QUEUE', 'celery')
+)
+def queue_prewarm_restores():
+    """Queue restores to be pre-generated for domains in a prewarm window"""
+    from corehq.apps.domain.models import Domain
+    from corehq.toggles import PREWARM_RESTORES
+    from .restore_prewarm import (
+        is_prewarm_time,
+        iter_restores_to_prewarm,
+        prewarm_rate_limiter,
+    )
+
+    utcnow = datetime.utcnow()
+    for domain in PREWARM_RESTORES.get_enabled_domains():
+        domain_obj = Domain.get_by_name(domain)
+        if not domain_obj or not is_prewarm_time(domain_obj, utcnow):
+            continue
+        queued = 0
+        for synclog_id, user_id in iter_restores_to_prewarm(domain):
+            if not prewarm_rate_limiter.allow_usage(domain):
+                metrics_counter('commcare.restores.prewarm.rate_limited', tags={'domain': domain})
+                break
+            prewarm_rate_limiter.report_usage(domain)
+            prewarm_restore_task.delay(domain, user_id, synclog_id)
+            queued += 1
+        metrics_counter('commcare.restores.prewarm.queued', queued, tags={'domain': domain})
+
+
+@task(queue=ASYNC_RESTORE_QUEUE, ignore_result=True)
+def prewarm_restore_task(domain, user_id, synclog_id):
+    from .restore_prewarm import prewarm_restore
+    prewarm_restore(domain, user_id, synclog_id)
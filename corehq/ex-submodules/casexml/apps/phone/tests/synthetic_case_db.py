@@ -0,0 +1,99 @@
+"""In-memory case index graphs to compare live case graph engines
+
+Used by test_case_graph and the benchmark_livequery management command.
+"""
+import random
+from collections import defaultdict, namedtuple
+from contextlib import contextmanager
+from unittest.mock import patch
+
+from casexml.apps.case.const import CASE_INDEX_CHILD as CHILD
+from casexml.apps.case.const import CASE_INDEX_EXTENSION as EXTENSION
+
+from corehq.form_processor.models import CommCareCase, CommCareCaseIndex
+
+
+Index = namedtuple('Index', 'case_id identifier referenced_id relationship')
+Status = namedtuple('Status', 'case_id closed deleted')
+
+
+class SyntheticCaseDB:
+    """In-memory case index graph with the same query semantics as the
+    `get_related_indices` and `get_closed_and_deleted_ids` SQL functions
+    """
+
+    def __init__(self):
+        self.forward = defaultdict(list)  # case_id -> indices
+        self.reverse = defaultdict(list)  # referenced_id -> indices
+        self.closed = set()
+        self.deleted = set()
+        self.queries = 0
+
+    def add_index(self, case_id, identifier, referenced_id, relationship):
+        index = Index(case_id, identifier, referenced_id, relationship)
+        self.forward[case_id].append(index)
+        self.reverse[referenced_id].append(index)
+
+    def get_related_indices(self, domain, case_ids, exclude_indices):
+        self.queries += 1
+        exclude = set(exclude_indices)
+
+        def include(index):
+            return '{} {}'.format(index.case_id, index.identifier) not in exclude
+
+        result = {ix for case_id in case_ids for ix in self.forward[case_id] if include(ix)}
+        result.update(
+            ix for case_id in case_ids for ix in self.reverse[case_id]
+            if include(ix)
+            and ix.relationship == EXTENSION
+            and ix.case_id not in self.closed
+            and ix.case_id not in self.deleted
+        )
+        return list(result)
+
+    def get_closed_and_deleted_ids(self, domain, case_ids):
+        self.queries += 1
+        return [
+            Status(case_id, case_id in self.closed, case_id in self.deleted)
+            for case_id in case_ids
+            if case_id in self.closed or case_id in self.deleted
+        ]
+
+    @contextmanager
+    def patch(self):
+        """Use this graph in place of the database"""
+        with patch.object(CommCareCaseIndex.objects, 'get_related_indices', self.get_related_indices), \
+                patch.object(CommCareCase.objects, 'get_closed_and_deleted_ids', self.get_closed_and_deleted_ids):
+            yield
+
+
+def generate_hierarchies(households, members=5, extensions=2, closed_ratio=0.1, seed=0):
+    """Generate household -> member (child) -> visit (extension) cases
+
+    Household and member cases are owned. Extension cases are not
+    owned, so they are only synced with their host.
+
+    :returns: `(db, owned_ids)`
+    """
+    rand = random.Random(seed)
+    db = SyntheticCaseDB()
+    owned_ids = []
+    for h in range(households):
+        household_id = 'h{}'.format(h)
+        if rand.random() < closed_ratio:
+            db.closed.add(household_id)
+        else:
+            owned_ids.append(household_id)
+        for m in range(members):
+            member_id = '{}-m{}'.format(household_id, m)
+            db.add_index(member_id, 'parent', household_id, CHILD)
+            if rand.random() < closed_ratio:
+                db.closed.add(member_id)
+            else:
+                owned_ids.append(member_id)
+            for e in range(extensions):
+                ext_id = '{}-e{}'.format(member_id, e)
+                db.add_index(ext_id, 'host', member_id, EXTENSION)
+                if rand.random() < closed_ratio:
+                    db.closed.add(ext_id)
+    return db, owned_ids
@@ -0,0 +1,171 @@
+import datetime
+from unittest.mock import Mock, patch
+from uuid import uuid4
+
+from django.test import SimpleTestCase, TestCase
+
+from casexml.apps.case import const
+from casexml.apps.case.mock import CaseFactory
+from casexml.apps.case.xml import V1, V2
+from casexml.apps.phone.data_providers.case.livequery import get_xml_for_updates
+from casexml.apps.phone.data_providers.case.utils import CaseSyncUpdate
+from casexml.apps.phone.restore_caching import CaseFragmentCache, invalidate_restore_cache
+from casexml.apps.phone.tests.utils import create_restore_user
+from casexml.apps.phone.utils import MockDevice
+from dimagi.utils.couch.cache.cache_core import get_redis_default_cache
+
+from corehq.apps.domain.shortcuts import create_domain
+from corehq.form_processor.models import CommCareCase
+from corehq.form_processor.tests.utils import sharded
+from corehq.util.test_utils import flag_disabled, flag_enabled
+
+
+class TestCaseFragmentCacheKey(SimpleTestCase):
+    domain = 'fragment-cache'
+
+    def make_update(self, modified=datetime.datetime(2021, 1, 1), updates=None):
+        case = CommCareCase(
+            case_id='case-1',
+            domain=self.domain,
+            type='person',
+            server_modified_on=modified,
+        )
+        return CaseSyncUpdate(case, None, required_updates=updates or [
+            const.CASE_ACTION_CREATE,
+            const.CASE_ACTION_UPDATE,
+        ])
+
+    def test_same_case_same_key(self):
+        cache = CaseFragmentCache(self.domain, V2)
+        self.assertEqual(
+            cache._make_cache_key(self.make_update()),
+            cache._make_cache_key(self.make_update()),
+        )
+
+    def test_modified_case_changes_key(self):
+        cache = CaseFragmentCache(self.domain, V2)
+        self.assertNotEqual(
+            cache._make_cache_key(self.make_update()),
+            cache._make_cache_key(self.make_update(modified=datetime.datetime(2021, 1, 2))),
+        )
+
+    def test_required_updates_change_key(self):
+        cache = CaseFragmentCache(self.domain, V2)
+        self.assertNotEqual(
+            cache._make_cache_key(self.make_update()),
+            cache._make_cache_key(self.make_update(updates=[const.CASE_ACTION_UPDATE])),
+        )
+
+    def test_version_changes_key(self):
+        update = self.make_update()
+        self.assertNotEqual(
+            CaseFragmentCache(self.domain, V1)._make_cache_key(update),
+            CaseFragmentCache(self.domain, V2)._make_cache_key(update),
+        )
+
+
+@flag_enabled('RESTORE_CASE_FRAGMENT_CACHE')
+@patch('casexml.apps.phone.data_providers.case.livequery.get_xml_for_response')
+class TestCaseFragmentCacheUse(SimpleTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.domain = uuid4().hex
+        self.addCleanup(get_redis_default_cache().clear)
+        self.restore_state = Mock(domain=self.domain, version=V2)
+        self.restore_state.get_safe_loadtest_factor.return_value = 1
+
+    def make_update(self, case_id, modified=datetime.datetime(2021, 1, 1)):
+        case = CommCareCase(case_id=case_id, domain=self.domain, type='person', server_modified_on=modified)
+        return CaseSyncUpdate(case, None, required_updates=[const.CASE_ACTION_UPDATE])
+
+    def get_xml(self, updates, render):
+        render.side_effect = lambda update, *args: [
+            '<case id="{}" rendered="{}"/>'.format(update.case.case_id, render.call_count).encode('utf-8')
+        ]
+        return get_xml_for_updates(updates, self.restore_state, len(updates))
+
+    def test_cached_fragments_are_used(self, render):
+        updates = [self.make_update('case-1'), self.make_update('case-2')]
+        first = self.get_xml(updates, render)
+        self.assertEqual(render.call_count, 2)
+
+        second = self.get_xml(updates, render)
+        self.assertEqual(render.call_count, 2)
+        self.assertEqual(second, first)
+
+    def test_modified_case_is_rendered_again(self, render):
+        first = self.get_xml([self.make_update('case-1'), self.make_update('case-2')], render)
+        second = self.get_xml([
+            self.make_update('case-1', modified=datetime.datetime(2021, 1, 2)),
+            self.make_update('case-2'),
+        ], render)
+        self.assertEqual(render.call_count, 3)
+        self.assertNotEqual(second[0], first[0])
+        self.assertEqual(second[1], first[1])
+
+    def test_invalidated_by_domain_restore_cache(self, render):
+        updates = [self.make_update('case-1')]
+        first = self.get_xml(updates, render)
+        invalidate_restore_cache(self.domain)
+        second = self.get_xml(updates, render)
+        self.assertEqual(render.call_count, 2)
+        self.assertNotEqual(second, first)
+
+    def test_load_test_restore_is_not_cached(self, render):
+        self.restore_state.get_safe_loadtest_factor.return_value = 2
+        updates = [self.make_update('case-1')]
+        self.get_xml(updates, render)
+        self.get_xml(updates, render)
+        self.assertEqual(render.call_count, 2)
+
+    @flag_disabled('RESTORE_CASE_FRAGMENT_CACHE')
+    def test_not_cached_when_disabled(self, render):
+        updates = [self.make_update('case-1')]
+        self.get_xml(updates, render)
+        self.get_xml(updates, render)
+        self.assertEqual(render.call_count, 2)
+
+
+@sharded
+@flag_enabled('RESTORE_CASE_FRAGMENT_CACHE')
+class TestCaseFragmentCacheRestore(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.domain = uuid4().hex
+        cls.project = create_domain(cls.domain)
+        cls.addClassCleanup(cls.project.delete)
+        cls.user = create_restore_user(cls.domain, username='fragments')
+        cls.addClassCleanup(cls.user._couch_user.delete, cls.domain, deleted_by=None)
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(get_redis_default_cache().clear)
+        self.factory = CaseFactory(self.domain)
+
+    def restore(self):
+        return MockDevice(self.project, self.user).restore()
+
+    def test_restore_after_case_update(self):
+        case = self.factory.create_case(owner_id=self.user.user_id, update={'prop': 'one'})
+        other = self.factory.create_case(owner_id=self.user.user_id, update={'prop': 'other'})
+        first = self.restore().cases
+        self.assertEqual(first[case.case_id].update['prop'], 'one')
+
+        self.factory.update_case(case.case_id, update={'prop': 'two'})
+        second = self.restore().cases
+        self.assertEqual(second[case.case_id].update['prop'], 'two')
+        self.assertEqual(second[other.case_id].update['prop'], 'other')
+
+    def test_same_restore_as_uncached(self):
+        self.factory.create_case(owner_id=self.user.user_id, update={'prop': 'one'})
+        self.restore()
+        cached = self.restore().cases
+        with flag_disabled('RESTORE_CASE_FRAGMENT_CACHE'):
+            uncached = self.restore().cases
+        self.assertEqual(
+            {case_id: case.as_text() for case_id, case in cached.items()},
+            {case_id: case.as_text() for case_id, case in uncached.items()},
+        )
@@ -0,0 +1,103 @@
+from django.test import SimpleTestCase
+
+from casexml.apps.case.const import CASE_INDEX_CHILD as CHILD
+from casexml.apps.case.const import CASE_INDEX_EXTENSION as EXTENSION
+from casexml.apps.phone.data_providers.case import case_graph, livequery
+from casexml.apps.phone.tests.synthetic_case_db import SyntheticCaseDB, generate_hierarchies
+
+from corehq.util.timer import TimingContext
+
+DOMAIN = 'case-graph'
+
+
+class TestCaseGraph(SimpleTestCase):
+
+    def get_live_ids(self, db, owned_ids):
+        walk_ids, walk_indices, bulk_ids, bulk_indices = self.run_engines(db, owned_ids)
+        self.assertEqual(bulk_ids, walk_ids)
+        self.assertEqual(
+            {case_id: set(indices) for case_id, indices in bulk_indices.items() if indices},
+            {case_id: set(indices) for case_id, indices in walk_indices.items() if indices},
+        )
+        return bulk_ids
+
+    def run_engines(self, db, owned_ids):
+        with db.patch():
+            walk_ids, walk_indices = livequery.get_live_case_ids_and_indices(
+                DOMAIN, owned_ids, TimingContext())
+            bulk_ids, bulk_indices = case_graph.get_live_case_ids_and_indices(
+                DOMAIN, owned_ids, TimingContext())
+        self.assert_references_are_live(bulk_ids, bulk_indices)
+        return walk_ids, walk_indices, bulk_ids, bulk_indices
+
+    def assert_references_are_live(self, live_ids, indices):
+        referenced_ids = {index.referenced_id for case_id in live_ids for index in indices.get(case_id, [])}
+        self.assertEqual(referenced_ids - live_ids, set())
+
+    def test_extension_of_owned_host(self):
+        # a <--ext-- d(owned) >> a b d
+        #   <--ext-- b
+        db = SyntheticCaseDB()
+        db.add_index('d', 'host', 'a', EXTENSION)
+        db.add_index('b', 'host', 'a', EXTENSION)
+        self.assertEqual(self.get_live_ids(db, ['d']), {'a', 'b', 'd'})
+
+    def test_owned_extension_of_closed_host(self):
+        # e(owned) --ext--> a(closed) >> a b e
+        #          --ext--> b
+        db = SyntheticCaseDB()
+        db.add_index('e', 'host1', 'a', EXTENSION)
+        db.add_index('e', 'host2', 'b', EXTENSION)
+        db.closed.add('a')
+        self.assertEqual(self.get_live_ids(db, ['e']), {'a', 'b', 'e'})
+
+    def test_owned_child_with_extension(self):
+        # b(closed) <--chi-- a(owned) >> a b c
+        #           <--ext-- c
+        db = SyntheticCaseDB()
+        db.add_index('a', 'parent', 'b', CHILD)
+        db.add_index('c', 'host', 'a', EXTENSION)
+        db.closed.add('b')
+        self.assertEqual(self.get_live_ids(db, ['a']), {'a', 'b', 'c'})
+
+    def test_extension_chain_with_closed_root(self):
+        # a(closed) <--ext-- b <--ext-- c(owned) >> []
+        db = SyntheticCaseDB()
+        db.add_index('b', 'host', 'a', EXTENSION)
+        db.add_index('c', 'host', 'b', EXTENSION)
+        db.closed.add('a')
+        self.assertEqual(self.get_live_ids(db, ['c']), set())
+
+    def test_deleted_parent(self):
+        db = SyntheticCaseDB()
+        db.add_index('a', 'parent', 'b', CHILD)
+        db.deleted.add('b')
+        self.assertEqual(self.get_live_ids(db, ['a']), {'a'})
+
+    def test_hierarchies(self):
+        db, owned_ids = generate_hierarchies(50, closed_ratio=0.3)
+        self.get_live_ids(db, owned_ids)
+
+    def test_host_of_closed_extension_that_becomes_live_later(self):
+        # a(owned) <--ext-- s --chi--> x(closed) --ext--> h
+        # The graph walk ignores x --ext--> h because x is a closed
+        # extension that is not live when the index is fetched. x becomes
+        # live later, as the parent of s, so h should be live too.
+        db = SyntheticCaseDB()
+        db.add_index('s', 'host', 'a', EXTENSION)
+        db.add_index('s', 'parent', 'x', CHILD)
+        db.add_index('x', 'host', 'h', EXTENSION)
+        db.closed.add('x')
+        walk_ids, walk_indices, bulk_ids, bulk_indices = self.run_engines(db, ['a'])
+        self.assertEqual(walk_ids, {'a', 's', 'x'})
+        self.assertEqual(bulk_ids, {'a', 's', 'x', 'h'})
+
+    def test_long_extension_chain(self):
+        # deep enough to exceed the recursion limit of the graph walk
+        db = SyntheticCaseDB()
+        for num in range(1, 5000):
+            db.add_index('c{}'.format(num), 'host', 'c{}'.format(num - 1), EXTENSION)
+        with db.patch():
+            live_ids, indices = case_graph.get_live_case_ids_and_indices(
+                DOMAIN, ['c4999'], TimingContext())
+        self.assertEqual(len(live_ids), 5000)
@@ -7,7 +7,7 @@ from casexml.apps.case.tests.util import (
     delete_all_sync_logs,
 )
 from casexml.apps.case.mock import CaseBlock
-from casexml.apps.phone.restore import RestoreContent
+from casexml.apps.phone.restore import RestoreContent, StreamingRestoreContent
 from casexml.apps.phone.tests.utils import create_restore_user
 from casexml.apps.phone.utils import MockDevice
 
@@ -73,3 +73,16 @@ class TestRestoreContent(SimpleTestCase):
             response.append(body.encode('utf-8'))
             with response.get_fileobj() as fileobj:
                 self.assertEqual(expected, fileobj.read().decode('utf-8'))
+
+    def test_streaming(self):
+        user = 'user1'
+        body = '<elem>data0</elem><elem>data1</elem>'
+        expected = self._expected(user, body, items=None)
+        with StreamingRestoreContent(user) as response:
+            chunks = [response.get_start_tag()]
+            response.append(b'<elem>data0</elem>')
+            chunks.append(response.flush())
+            self.assertEqual(response.buffered_size, 0)
+            response.append(b'<elem>data1</elem>')
+            chunks.append(response.flush() + response.closing_tag)
+        self.assertEqual(expected, b''.join(chunks).decode('utf-8'))
@@ -0,0 +1,114 @@
+from datetime import datetime, time
+from uuid import uuid4
+
+from django.test import SimpleTestCase, TestCase
+
+from casexml.apps.case.mock import CaseFactory
+from casexml.apps.phone.restore import CachedResponse, RestoreResponse
+from casexml.apps.phone.models import SyncLogSQL
+from casexml.apps.phone.restore_prewarm import (
+    is_prewarm_time,
+    iter_restores_to_prewarm,
+    prewarm_restore,
+)
+from casexml.apps.phone.tests.utils import create_restore_user
+from casexml.apps.phone.utils import MockDevice
+from dimagi.utils.couch.cache.cache_core import get_redis_default_cache
+
+from corehq.apps.domain.models import DayTimeWindow, Domain
+from corehq.apps.domain.shortcuts import create_domain
+from corehq.form_processor.tests.utils import sharded
+from corehq.util.test_utils import flag_enabled
+
+
+class TestIsPrewarmTime(SimpleTestCase):
+
+    def domain(self, *windows):
+        return Domain(
+            name='prewarm',
+            default_timezone='Africa/Nairobi',  # UTC+3
+            restore_prewarm_times=list(windows),
+        )
+
+    def test_no_windows(self):
+        self.assertFalse(is_prewarm_time(self.domain(), datetime(2026, 10, 18, 0, 0)))
+
+    def test_window_in_domain_timezone(self):
+        domain = self.domain(DayTimeWindow(day=-1, start_time=time(1, 0), end_time=time(4, 0)))
+        self.assertFalse(is_prewarm_time(domain, datetime(2026, 10, 18, 1, 30)))
+        self.assertTrue(is_prewarm_time(domain, datetime(2026, 10, 17, 22, 30)))
+
+    def test_window_on_day_of_week(self):
+        # 2026-10-18 is a Sunday
+        domain = self.domain(DayTimeWindow(day=6, start_time=None, end_time=None))
+        self.assertTrue(is_prewarm_time(domain, datetime(2026, 10, 18, 12, 0)))
+        self.assertFalse(is_prewarm_time(domain, datetime(2026, 10, 19, 12, 0)))
+
+
+@sharded
+@flag_enabled('PREWARM_RESTORES')
+class TestPrewarmRestore(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.domain = uuid4().hex
+        cls.project = create_domain(cls.domain)
+        cls.addClassCleanup(cls.project.delete)
+        cls.user = create_restore_user(cls.domain, username='prewarm')
+        cls.addClassCleanup(cls.user._couch_user.delete, cls.domain, deleted_by=None)
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(get_redis_default_cache().clear)
+        self.device = MockDevice(self.project, self.user)
+        self.sync = self.device.sync()
+        self.case_factory = CaseFactory(self.domain, case_defaults={'owner_id': self.user.user_id})
+
+    def prewarm(self):
+        return prewarm_restore(self.domain, self.user.user_id, self.sync.restore_id)
+
+    def test_nothing_to_prewarm(self):
+        self.assertFalse(self.prewarm())
+        self.assertFalse(self.device.get_restore_config().restore_payload_path_cache.exists())
+
+    def test_serve_prewarmed_restore(self):
+        case = self.case_factory.create_case()
+        self.assertTrue(self.prewarm())
+        restore_config = self.device.get_restore_config()
+        self.assertTrue(restore_config.prewarmed_restore_cache.exists())
+
+        payload = restore_config.get_payload()
+        self.assertIsInstance(payload, CachedResponse)
+        self.assertIn(case.case_id, payload.as_string().decode('utf-8'))
+        self.assertFalse(restore_config.prewarmed_restore_cache.exists())
+
+    def test_cases_changed_after_prewarm(self):
+        case = self.case_factory.create_case()
+        self.assertTrue(self.prewarm())
+        self.case_factory.update_case(case.case_id, update={'color': 'purple'})
+
+        restore_config = self.device.get_restore_config()
+        payload = restore_config.get_payload()
+        self.assertIsInstance(payload, RestoreResponse)
+        self.assertIn('purple', payload.as_string().decode('utf-8'))
+        self.assertFalse(restore_config.prewarmed_restore_cache.exists())
+
+    def test_submission_invalidates_prewarmed_restore(self):
+        self.case_factory.create_case()
+        self.assertTrue(self.prewarm())
+        self.device.post_changes(create=True)
+
+        restore_config = self.device.get_restore_config()
+        self.assertFalse(restore_config.restore_payload_path_cache.exists())
+        self.assertFalse(restore_config.prewarmed_restore_cache.exists())
+
+    def test_prewarmed_sync_log_is_not_prewarmed_again(self):
+        self.case_factory.create_case()
+        self.assertEqual(list(iter_restores_to_prewarm(self.domain)), [(self.sync.restore_id, self.user.user_id)])
+        self.assertTrue(self.prewarm())
+        prewarmed = SyncLogSQL.objects.filter(domain=self.domain, is_prewarmed=True)
+        self.assertEqual(len(prewarmed), 1)
+        self.assertEqual(prewarmed[0].previous_synclog_id.hex, self.sync.restore_id)
+        # the user's last sync already has a prewarmed payload
+        self.assertEqual(list(iter_restores_to_prewarm(self.domain)), [])
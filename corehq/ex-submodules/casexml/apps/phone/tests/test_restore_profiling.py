@@ -0,0 +1,40 @@
+from django.test import SimpleTestCase
+
+from casexml.apps.phone.restore import RestoreContent
+from casexml.apps.phone.restore_profiling import RestoreProfile, flatten_timing
+
+from corehq.util.timer import TimingContext
+
+
+class TestRestoreProfiling(SimpleTestCase):
+
+    def test_flatten_timing(self):
+        timing_context = TimingContext('restore')
+        with timing_context:
+            with timing_context('FixtureElementProvider'):
+                with timing_context('fixture:locations'):
+                    pass
+            with timing_context('CasePayloadProvider'):
+                pass
+
+        timers = flatten_timing(timing_context.to_dict())
+        self.assertEqual(
+            [(timer['name'], timer['parent']['name'] if timer['parent'] else None) for timer in timers],
+            [
+                ('restore', None),
+                ('FixtureElementProvider', 'restore'),
+                ('fixture:locations', 'FixtureElementProvider'),
+                ('CasePayloadProvider', 'restore'),
+            ]
+        )
+        self.assertEqual(len({timer['uuid'] for timer in timers}), 4)
+
+    def test_record_provider(self):
+        profile = RestoreProfile(restore_state=None)
+        with RestoreContent('user') as content:
+            with profile.record('SyncElementProvider', content):
+                content.append(b'<Sync/>')
+        [provider] = profile.providers
+        self.assertEqual(provider['name'], 'SyncElementProvider')
+        self.assertEqual(provider['bytes'], len(b'<Sync/>'))
+        self.assertEqual(provider['queries'], 0)
@@ -0,0 +1,104 @@
+from unittest.mock import Mock, patch
+from uuid import uuid4
+
+from django.test import SimpleTestCase, TestCase
+
+from casexml.apps.case.mock import CaseFactory
+from casexml.apps.phone.data_providers.case.livequery import livequery_read_from_standbys
+from casexml.apps.phone.models import get_properly_wrapped_sync_log
+from casexml.apps.phone.restore import CachedResponse, RestoreResponse, StreamingRestoreResponse
+from casexml.apps.phone.tests.utils import create_restore_user
+from casexml.apps.phone.utils import MockDevice
+from dimagi.utils.couch.cache.cache_core import get_redis_default_cache
+
+from corehq.apps.domain.shortcuts import create_domain
+from corehq.form_processor.tests.utils import sharded
+from corehq.sql_db.routers import allow_read_from_plproxy_standby
+from corehq.util.test_utils import flag_disabled, flag_enabled
+
+
+@sharded
+@flag_enabled('STREAMING_RESTORE')
+class TestStreamingRestore(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.domain = uuid4().hex
+        cls.project = create_domain(cls.domain)
+        cls.addClassCleanup(cls.project.delete)
+        cls.user = create_restore_user(cls.domain, username='streaming')
+        cls.addClassCleanup(cls.user._couch_user.delete, cls.domain, deleted_by=None)
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(get_redis_default_cache().clear)
+        self.device = MockDevice(self.project, self.user)
+        self.case = CaseFactory(self.domain).create_case(owner_id=self.user.user_id)
+
+    def test_streamed_restore(self):
+        restore_config = self.device.get_restore_config()
+        payload = restore_config.get_payload()
+        self.assertIsInstance(payload, StreamingRestoreResponse)
+        content = payload.as_string().decode('utf-8')
+        self.assertIn(self.case.case_id, content)
+        self.assertTrue(content.endswith('</OpenRosaResponse>'))
+        get_properly_wrapped_sync_log(restore_config.restore_state.current_sync_log._id)  # saved
+
+    def test_same_cases_as_buffered_restore(self):
+        streamed = self.device.restore()
+        with flag_disabled('STREAMING_RESTORE'):
+            buffered = MockDevice(self.project, self.user).restore()
+        self.assertEqual(set(streamed.cases), {self.case.case_id})
+        self.assertEqual(set(streamed.cases), set(buffered.cases))
+
+    def test_short_restore_is_not_cached(self):
+        restore_config = self.device.get_restore_config()
+        restore_config.get_payload().as_string()
+        self.assertFalse(restore_config.restore_payload_path_cache.exists())
+
+    @patch('casexml.apps.phone.restore.INITIAL_SYNC_CACHE_THRESHOLD', -1)
+    def test_long_restore_is_cached(self):
+        restore_config = self.device.get_restore_config()
+        content = restore_config.get_payload().as_string()
+        self.assertTrue(restore_config.restore_payload_path_cache.exists())
+
+        payload = self.device.get_restore_config().get_payload()
+        self.assertIsInstance(payload, CachedResponse)
+        self.assertEqual(payload.as_string(), content)
+
+    @patch('casexml.apps.phone.restore.INITIAL_SYNC_CACHE_THRESHOLD', -1)
+    def test_long_restore_is_cached_when_client_stops_downloading(self):
+        restore_config = self.device.get_restore_config()
+        content = restore_config.get_payload().content
+        next(content)
+        content.close()
+        get_properly_wrapped_sync_log(restore_config.restore_state.current_sync_log._id)  # saved
+
+        payload = self.device.get_restore_config().get_payload()
+        self.assertIsInstance(payload, CachedResponse)
+        self.assertIn(self.case.case_id, payload.as_string().decode('utf-8'))
+
+    def test_restore_with_item_count_is_not_streamed(self):
+        payload = self.device.get_restore_config(items=True).get_payload()
+        self.assertIsInstance(payload, RestoreResponse)
+        payload.as_string()
+
+
+class TestLivequeryReadFromStandbys(SimpleTestCase):
+
+    @flag_enabled('LIVEQUERY_READ_FROM_STANDBYS')
+    def test_not_reading_from_standbys_between_batches(self):
+        reads = []
+
+        @livequery_read_from_standbys
+        def iter_batches(timing_context, restore_state, response, async_task=None):
+            for batch in range(2):
+                reads.append(allow_read_from_plproxy_standby())
+                yield batch
+
+        batches = []
+        for batch in iter_batches(None, Mock(), None):
+            batches.append((batch, allow_read_from_plproxy_standby()))
+        self.assertEqual(reads, [True, True])
+        self.assertEqual(batches, [(0, False), (1, False)])
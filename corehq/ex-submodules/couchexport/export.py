@@ -7,8 +7,10 @@ from couchexport.models import Format
 from couchexport import writers
 
 
-def get_writer(format, use_formatted_cells=False):
+def get_writer(format, use_formatted_cells=False, streaming_xlsx=False):
     if format == Format.XLS_2007:
+        if streaming_xlsx:
+            return writers.Excel2007StreamingExportWriter(use_formatted_cells=use_formatted_cells)
         return writers.Excel2007ExportWriter(use_formatted_cells=use_formatted_cells)
     try:
         return {
@@ -18,6 +20,7 @@ def get_writer(format, use_formatted_cells=False):
             Format.JSON: writers.JsonExportWriter,
             Format.XLS: writers.Excel2003ExportWriter,
             Format.UNZIPPED_CSV: writers.UnzippedCsvExportWriter,
+            Format.PARQUET: writers.ParquetExportWriter,
             Format.PYTHON_DICT: writers.PythonDictWriter,
         }[format]()
     except KeyError:
@@ -14,6 +14,7 @@ class Format(object):
     JSON = "json"
     PYTHON_DICT = "dict"
     UNZIPPED_CSV = 'unzipped-csv'
+    PARQUET = 'parquet'
 
     FORMAT_DICT = {CSV: {"mimetype": "application/zip",
                          "extension": "zip",
@@ -41,7 +42,10 @@ class Format(object):
                           "download": False},
                    UNZIPPED_CSV: {"mimetype": "text/csv",
                                   "extension": "csv",
-                                  "download": True}}
+                                  "download": True},
+                   PARQUET: {"mimetype": "application/zip",
+                             "extension": "zip",
+                             "download": True}}
 
     VALID_FORMATS = list(FORMAT_DICT)
 
@@ -59,6 +63,20 @@ class Format(object):
         return cls(format, **cls.FORMAT_DICT[format])
 
 
+class ColumnType(object):
+    """
+    The type of the values of a column, for formats with typed columns.
+    These match the ``datatype`` of export items.
+    """
+    STRING = 'string'
+    INTEGER = 'integer'
+    DECIMAL = 'decimal'
+    DATE = 'date'
+    DATETIME = 'datetime'
+
+    ALL = [STRING, INTEGER, DECIMAL, DATE, DATETIME]
+
+
 class IntegrationFormat(object):
     LIVE_GOOGLE_SHEETS = "live_google_sheets"
 
@@ -1,20 +1,31 @@
 from codecs import BOM_UTF8
 from contextlib import closing
+import datetime
 import io
 import os
+import zipfile
 
 from django.test import SimpleTestCase
 from lxml import html, etree
 from unittest.mock import patch, Mock
 
-from couchexport.export import export_from_tables
-from couchexport.models import Format
+import openpyxl
+
+from couchexport.export import FormattedRow, export_from_tables
+from couchexport.models import ColumnType, Format
 from couchexport.writers import (
     MAX_XLS_COLUMNS,
     CsvFileWriter,
+    Excel2007ExportWriter,
+    Excel2007StreamingExportWriter,
+    ParquetExportWriter,
     PythonDictWriter,
     XlsLengthException,
     ZippedExportWriter,
+    _to_date,
+    _to_datetime,
+    _to_decimal,
+    _to_integer,
 )
 
 
@@ -84,6 +95,99 @@ class CsvFileWriterTests(SimpleTestCase):
         self.assertEqual(file_start, BOM_UTF8 + b'100')
 
 
+class TypedValueTests(SimpleTestCase):
+
+    def test_integer(self):
+        self.assertEqual(_to_integer('12'), 12)
+        self.assertEqual(_to_integer(12), 12)
+        for value in ['', '---', '1.5', None, True, str(2 ** 63)]:
+            self.assertIsNone(_to_integer(value), value)
+
+    def test_decimal(self):
+        self.assertEqual(_to_decimal('1.5'), 1.5)
+        self.assertEqual(_to_decimal(2), 2.0)
+        for value in ['', '---', None]:
+            self.assertIsNone(_to_decimal(value), value)
+
+    def test_datetime(self):
+        for value in [
+            '2021-01-02T10:00:00.000000Z',
+            '2021-01-02T12:00:00+02:00',
+            '2021-01-02 10:00:00',
+            datetime.datetime(2021, 1, 2, 10),
+        ]:
+            self.assertEqual(_to_datetime(value), datetime.datetime(2021, 1, 2, 10), value)
+        self.assertEqual(_to_datetime('2021-01-02'), datetime.datetime(2021, 1, 2))
+        for value in ['', '---', 'not a date', None, 3]:
+            self.assertIsNone(_to_datetime(value), value)
+
+    def test_date(self):
+        for value in ['2021-01-02', '2021-01-02T10:00:00.000000Z', datetime.date(2021, 1, 2)]:
+            self.assertEqual(_to_date(value), datetime.date(2021, 1, 2), value)
+        for value in ['', '---', None]:
+            self.assertIsNone(_to_date(value), value)
+
+
+class ParquetExportWriterTests(SimpleTestCase):
+
+    def test_typed_columns(self):
+        try:
+            import pyarrow.parquet
+        except ImportError:
+            self.skipTest("pyarrow is not installed")
+
+        writer = ParquetExportWriter()
+        writer.open(
+            [('table', [['number', 'name', 'count', 'weight', 'dob', 'received']])],
+            io.BytesIO(),
+            column_types={'table': [
+                ColumnType.STRING,
+                ColumnType.STRING,
+                ColumnType.INTEGER,
+                ColumnType.DECIMAL,
+                ColumnType.DATE,
+            ]},
+            archive_basepath='export',
+        )
+        writer.write([('table', [
+            ['0', 'Spam', '3', '1.5', '2021-01-02', 'now'],
+            ['1', None, '---', '', 'not a date'],
+        ])])
+        writer.close()
+
+        with zipfile.ZipFile(writer.file) as archive:
+            self.assertEqual(archive.namelist(), ['export/table.parquet'])
+            table = pyarrow.parquet.read_table(io.BytesIO(archive.read('export/table.parquet')))
+        self.assertEqual(
+            [str(field.type) for field in table.schema],
+            ['string', 'string', 'int64', 'double', 'date32[day]', 'string'],
+        )
+        self.assertEqual(table.to_pylist(), [
+            {'number': '0', 'name': 'Spam', 'count': 3, 'weight': 1.5,
+             'dob': datetime.date(2021, 1, 2), 'received': 'now'},
+            {'number': '1', 'name': '', 'count': None, 'weight': None,
+             'dob': None, 'received': None},
+        ])
+
+    def test_row_groups(self):
+        try:
+            import pyarrow.parquet
+        except ImportError:
+            self.skipTest("pyarrow is not installed")
+
+        writer = ParquetExportWriter()
+        writer.open([('table', [['number']])], io.BytesIO(), archive_basepath='export',
+                    column_types={'table': [ColumnType.INTEGER]})
+        writer.tables['table'].row_group_size = 2
+        writer.write([('table', [[i] for i in range(5)])])
+        writer.close()
+
+        with zipfile.ZipFile(writer.file) as archive:
+            parquet_file = pyarrow.parquet.ParquetFile(io.BytesIO(archive.read('export/table.parquet')))
+        self.assertEqual(parquet_file.metadata.num_row_groups, 3)
+        self.assertEqual(parquet_file.read().column('number').to_pylist(), [0, 1, 2, 3, 4])
+
+
 class HtmlExportWriterTests(SimpleTestCase):
 
     def test_nones_transformed(self):
@@ -121,6 +225,59 @@ class Excel2007ExportWriterTests(SimpleTestCase):
         export_from_tables(tables, file_, format_)
 
 
+class Excel2007StreamingExportWriterTests(SimpleTestCase):
+    headers = ['id', 'name', 'count', 'date', 'link', 'empty']
+    rows = [
+        FormattedRow(
+            ['1', 'Spam ', '3', '2021-01-02', 'https://example.com/?a=1&b=<2>', None],
+            hyperlink_column_indices=[4],
+            skip_excel_formatting=[0],
+        ),
+        FormattedRow(['2', 'Eggs', 4, '---', '', '']),
+    ]
+
+    def _get_workbook(self, writer, rows, headers=None):
+        file_ = io.BytesIO()
+        writer.open([('table', [headers or self.headers])], file_)
+        writer.write([('table', rows)])
+        writer.close()
+        file_.seek(0)
+        return openpyxl.load_workbook(file_)
+
+    def _get_values(self, worksheet):
+        return [[cell.value for cell in row] for row in worksheet.iter_rows()]
+
+    def test_same_as_openpyxl(self):
+        for kwargs in [{}, {'use_formatted_cells': True}, {'format_as_text': True}]:
+            expected = self._get_workbook(Excel2007ExportWriter(**kwargs), self.rows).worksheets[0]
+            for use_shared_strings in [True, False]:
+                worksheet = self._get_workbook(
+                    Excel2007StreamingExportWriter(use_shared_strings=use_shared_strings, **kwargs),
+                    self.rows
+                ).worksheets[0]
+                self.assertEqual(self._get_values(worksheet), self._get_values(expected), kwargs)
+                self.assertEqual(
+                    [[cell.number_format for cell in row] for row in worksheet.iter_rows()],
+                    [[cell.number_format for cell in row] for row in expected.iter_rows()],
+                    kwargs
+                )
+                self.assertEqual(worksheet['E2'].hyperlink.target, 'https://example.com/?a=1&b=<2>')
+
+    def test_split_worksheets(self):
+        writer = Excel2007StreamingExportWriter()
+        writer.max_rows = 3
+        workbook = self._get_workbook(writer, [[str(i)] for i in range(5)], headers=['id'])
+        self.assertEqual(workbook.sheetnames, ['table', 'table (2)', 'table (3)'])
+        self.assertEqual(
+            [self._get_values(worksheet) for worksheet in workbook.worksheets],
+            [
+                [['id'], ['0'], ['1']],
+                [['id'], ['2'], ['3']],
+                [['id'], ['4']],
+            ]
+        )
+
+
 class Excel2003ExportWriterTests(SimpleTestCase):
 
     def test_data_length(self):
@@ -1,12 +1,15 @@
 import io
+import datetime
 from codecs import BOM_UTF8
 import os
 import re
+import shutil
 import tempfile
 import zipfile
 import csv
 import json
 from collections import OrderedDict
+from xml.sax.saxutils import escape, quoteattr
 import openpyxl
 import math
 
@@ -14,13 +17,24 @@ from django.template.loader import render_to_string, get_template
 from django.utils.functional import Promise
 import xlwt
 
-from couchexport.models import Format
+from couchexport.models import ColumnType, Format
 from openpyxl.styles import numbers
 from openpyxl.cell import WriteOnlyCell
+from openpyxl.utils import get_column_letter
+from openpyxl.utils.datetime import to_excel
 
 from couchexport.util import get_excel_format_value, get_legacy_excel_safe_value
 
 MAX_XLS_COLUMNS = 256
+MAX_XLSX_ROWS = 1048576
+MAX_XLSX_CELL_LENGTH = 32767
+# Excel doesn't open worksheets with more hyperlinks
+MAX_XLSX_HYPERLINKS = 65530
+
+_XML_DECLARATION = b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+_XLSX_MAIN_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+_XLSX_RELATIONSHIPS_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+_PACKAGE_RELATIONSHIPS_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
 
 
 class XlsLengthException(Exception):
@@ -125,6 +139,163 @@ class CsvFileWriter(ExportFileWriter):
         self._file.write(buffer.getvalue().encode('utf-8'))
 
 
+def _to_string(value):
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, bytes):
+        return value.decode('utf-8')
+    return str(value)
+
+
+def _to_integer(value):
+    if isinstance(value, bool):
+        return None
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return None
+    if not -2 ** 63 <= value < 2 ** 63:
+        return None
+    return value
+
+
+def _to_decimal(value):
+    if isinstance(value, bool):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_datetime(value):
+    """
+    Return a naive UTC datetime for an ISO 8601 date or datetime, e.g.
+    '2021-01-02', '2021-01-02T10:00:00.000000Z' or, for exports that
+    format dates for Excel, '2021-01-02 10:00:00'
+    """
+    if isinstance(value, datetime.datetime):
+        parsed = value
+    elif isinstance(value, datetime.date):
+        return datetime.datetime(value.year, value.month, value.day)
+    elif isinstance(value, str):
+        if value.endswith('Z'):
+            value = value[:-1] + '+00:00'
+        try:
+            parsed = datetime.datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    else:
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def _to_date(value):
+    if isinstance(value, datetime.date) and not isinstance(value, datetime.datetime):
+        return value
+    value = _to_datetime(value)
+    return value.date() if value is not None else None
+
+
+TYPED_VALUE_CONVERTERS = {
+    ColumnType.STRING: _to_string,
+    ColumnType.INTEGER: _to_integer,
+    ColumnType.DECIMAL: _to_decimal,
+    ColumnType.DATE: _to_date,
+    ColumnType.DATETIME: _to_datetime,
+}
+
+
+class ParquetFileWriter(ExportFileWriter):
+    """
+    Writes a table to a Parquet file.
+
+    The first row is the header row. The values of the other rows are
+    buffered by column, and written as a row group every
+    ``row_group_size`` rows, so memory use doesn't grow with the size
+    of the table. Values that can't be converted to the type of their
+    column, like the empty values of a question that wasn't answered,
+    are written as nulls. Strings are dictionary-encoded.
+
+    :param column_types: A list of ``ColumnType`` values, one for each
+    column. Columns without a type are strings.
+    """
+    row_group_size = 50000
+
+    def __init__(self, column_types=None):
+        super(ParquetFileWriter, self).__init__()
+        self.column_types = list(column_types or [])
+
+    def _open(self):
+        self._parquet_writer = None
+        self._schema = None
+        self._converters = None
+        self._columns = None
+        self._num_buffered_rows = 0
+
+    def write_row(self, row):
+        if self._parquet_writer is None:
+            self._begin_table(row)
+            return
+        row = list(row)
+        row.extend([None] * (len(self._columns) - len(row)))
+        for values, convert, value in zip(self._columns, self._converters, row):
+            values.append(convert(value))
+        self._num_buffered_rows += 1
+        if self._num_buffered_rows >= self.row_group_size:
+            self._write_row_group()
+
+    def _begin_table(self, headers):
+        import pyarrow
+        import pyarrow.parquet
+
+        headers = [_to_string(header) for header in headers]
+        column_types = self.column_types[:len(headers)]
+        column_types += [ColumnType.STRING] * (len(headers) - len(column_types))
+        arrow_types = {
+            ColumnType.STRING: pyarrow.string(),
+            ColumnType.INTEGER: pyarrow.int64(),
+            ColumnType.DECIMAL: pyarrow.float64(),
+            ColumnType.DATE: pyarrow.date32(),
+            ColumnType.DATETIME: pyarrow.timestamp('us'),
+        }
+        self._schema = pyarrow.schema([
+            (header, arrow_types.get(column_type, pyarrow.string()))
+            for header, column_type in zip(headers, column_types)
+        ])
+        self._converters = [TYPED_VALUE_CONVERTERS.get(column_type, _to_string) for column_type in column_types]
+        self._columns = [[] for _ in headers]
+        self._parquet_writer = pyarrow.parquet.ParquetWriter(
+            self._file,
+            self._schema,
+            use_dictionary=[
+                header for header, column_type in zip(headers, column_types)
+                if column_type == ColumnType.STRING
+            ],
+            compression='snappy',
+        )
+
+    def _write_row_group(self):
+        import pyarrow
+
+        if self._num_buffered_rows:
+            table = pyarrow.Table.from_arrays([
+                pyarrow.array(values, type=field.type)
+                for values, field in zip(self._columns, self._schema)
+            ], schema=self._schema)
+            self._parquet_writer.write_table(table, row_group_size=self.row_group_size)
+        self._columns = [[] for _ in self._columns]
+        self._num_buffered_rows = 0
+
+    def _end_file(self):
+        if self._parquet_writer is None:
+            self._begin_table([])
+        self._write_row_group()
+        self._parquet_writer.close()
+
+
 class PartialHtmlFileWriter(ExportFileWriter):
 
     def _write_from_template(self, context):
@@ -160,15 +331,20 @@ class HtmlFileWriter(PartialHtmlFileWriter):
 class ExportWriter(object):
     max_table_name_size = 500
     target_app = 'Excel'  # Where does this writer export to? Export button to say "Export to Excel"
+    has_typed_columns = False  # Does this writer use the column_types passed to open and add_table?
 
-    def open(self, header_table, file, max_column_size=2000, table_titles=None, archive_basepath=''):
+    def open(self, header_table, file, max_column_size=2000, table_titles=None, archive_basepath='',
+             column_types=None):
         """
         Create any initial files, headings, etc necessary.
         :param header_table: tuple of one of the following formats
             tuple(sheet_name, [['col1header', 'col2header', ....]])
             tuple(sheet_name, [FormattedRow])
+        :param column_types: optional dict of sheet_name to a list of the
+            ``ColumnType`` of each column, used by writers of typed formats
         """
         table_titles = table_titles or {}
+        self.column_types = dict(column_types or {})
 
         self._isopen = True
         self.max_column_size = max_column_size
@@ -187,7 +363,7 @@ class ExportWriter(object):
                 table_title=table_titles.get(table_index)
             )
 
-    def add_table(self, table_index, headers, table_title=None):
+    def add_table(self, table_index, headers, table_title=None, column_types=None):
         def _clean_name(name):
             if isinstance(name, bytes):
                 name = name.decode('utf8')
@@ -207,6 +383,8 @@ class ExportWriter(object):
             except AttributeError:
                 headers = [g.next_unique(header) for header in headers]
 
+        if column_types is not None:
+            self.column_types[table_index] = column_types
         self._init_table(table_index, table_title_truncated)
         self.write_row(table_index, headers)
 
@@ -280,11 +458,14 @@ class OnDiskExportWriter(ExportWriter):
         self.table_names = OrderedDict()
 
     def _init_table(self, table_index, table_title):
-        writer = self.writer_class()
+        writer = self._get_file_writer(table_index)
         self.tables[table_index] = writer
         writer.open(table_title)
         self.table_names[table_index] = table_title
 
+    def _get_file_writer(self, table_index):
+        return self.writer_class()
+
     def _write_row(self, sheet_index, row):
 
         def _transform(val):
@@ -321,9 +502,10 @@ class ZippedExportWriter(OnDiskExportWriter):
     Writer that creates a zip file containing a csv for each table.
     """
     table_file_extension = ".csv"
+    compression = zipfile.ZIP_DEFLATED
 
     def _write_final_result(self):
-        archive = zipfile.ZipFile(self.file, 'w', zipfile.ZIP_DEFLATED)
+        archive = zipfile.ZipFile(self.file, 'w', self.compression)
         for index, name in self.table_names.items():
             if isinstance(name, bytes):
                 name = name.decode('utf-8')
@@ -344,6 +526,22 @@ class CsvExportWriter(ZippedExportWriter):
     format = Format.CSV
 
 
+class ParquetExportWriter(ZippedExportWriter):
+    """
+    Writer that creates a zip file containing a Parquet file for each table.
+    """
+    format = Format.PARQUET
+    has_typed_columns = True
+    writer_class = ParquetFileWriter
+    table_file_extension = ".parquet"
+    # Parquet files are already compressed
+    compression = zipfile.ZIP_STORED
+    _write_row_force_to_bytes = False
+
+    def _get_file_writer(self, table_index):
+        return self.writer_class(column_types=self.column_types.get(table_index))
+
+
 class UnzippedCsvExportWriter(OnDiskExportWriter):
     """
     Serve the first table as a csv
@@ -415,6 +613,343 @@ class Excel2007ExportWriter(ExportWriter):
         self.book.save(self.file)
 
 
+class _XlsxWorksheet(object):
+    """
+    The rows and hyperlinks of a worksheet of an Excel2007StreamingExportWriter,
+    kept in temporary files until the workbook is written
+    """
+
+    def __init__(self, title):
+        self.title = title
+        self.num_rows = 0
+        self.num_hyperlinks = 0
+        self._rows_file = tempfile.TemporaryFile()
+        self._hyperlinks_file = None
+        self._relationships_file = None
+
+    def write_row(self, row_xml):
+        self._rows_file.write(row_xml.encode('utf-8'))
+        self.num_rows += 1
+
+    def add_hyperlink(self, ref, target):
+        if self.num_hyperlinks >= MAX_XLSX_HYPERLINKS:
+            return
+        if self._hyperlinks_file is None:
+            self._hyperlinks_file = tempfile.TemporaryFile()
+            self._relationships_file = tempfile.TemporaryFile()
+        self.num_hyperlinks += 1
+        rel_id = 'rId{}'.format(self.num_hyperlinks)
+        self._hyperlinks_file.write('<hyperlink ref="{}" r:id="{}"/>'.format(ref, rel_id).encode('utf-8'))
+        self._relationships_file.write(
+            '<Relationship Id="{}" Type="{}/hyperlink" Target={} TargetMode="External"/>'.format(
+                rel_id, _XLSX_RELATIONSHIPS_NS, quoteattr(target)
+            ).encode('utf-8')
+        )
+
+    def write_xml(self, file):
+        file.write(_XML_DECLARATION)
+        file.write(
+            '<worksheet xmlns="{}" xmlns:r="{}"><sheetData>'.format(
+                _XLSX_MAIN_NS, _XLSX_RELATIONSHIPS_NS
+            ).encode('utf-8')
+        )
+        _copy_temporary_file(self._rows_file, file)
+        file.write(b'</sheetData>')
+        if self._hyperlinks_file is not None:
+            file.write(b'<hyperlinks>')
+            _copy_temporary_file(self._hyperlinks_file, file)
+            file.write(b'</hyperlinks>')
+        file.write(b'</worksheet>')
+
+    def write_relationships_xml(self, file):
+        file.write(_XML_DECLARATION)
+        file.write('<Relationships xmlns="{}">'.format(_PACKAGE_RELATIONSHIPS_NS).encode('utf-8'))
+        _copy_temporary_file(self._relationships_file, file)
+        file.write(b'</Relationships>')
+
+    def close(self):
+        for file in [self._rows_file, self._hyperlinks_file, self._relationships_file]:
+            if file is not None:
+                file.close()
+
+
+def _copy_temporary_file(source, destination):
+    source.seek(0)
+    shutil.copyfileobj(source, destination)
+
+
+class Excel2007StreamingExportWriter(ExportWriter):
+    """
+    Writes an Excel 2007+ file without keeping its worksheets in memory.
+
+    The XML of each worksheet is written to a temporary file as rows
+    arrive, and copied into the zip file of the workbook when the writer
+    is closed. Strings are written inline in their cells, or with
+    ``use_shared_strings`` in a shared strings table, which makes files
+    with many repeated values smaller, but keeps every distinct string
+    in memory. A table with more rows than a worksheet can hold is
+    continued on new worksheets, which repeat its header row.
+
+    Cells are formatted like the cells of Excel2007ExportWriter.
+    """
+    format = Format.XLS_2007
+    max_table_name_size = 31
+    max_rows = MAX_XLSX_ROWS
+
+    def __init__(self, format_as_text=False, use_formatted_cells=False, use_shared_strings=False):
+        super(Excel2007StreamingExportWriter, self).__init__()
+        self.format_as_text = format_as_text
+        self.use_formatted_cells = use_formatted_cells
+        self.use_shared_strings = use_shared_strings
+
+    def _init(self):
+        # all worksheets, in workbook order
+        self.worksheets = []
+        # the current worksheet of each table
+        self.tables = {}
+        self.table_titles = {}
+        self.table_parts = {}
+        self.header_rows = {}
+        self.shared_strings = {}
+        # the index of each cell format, by number format and whether the cell is a hyperlink
+        self.cell_formats = {(numbers.FORMAT_GENERAL, False): 0}
+        self._column_letters = []
+
+    def _init_table(self, table_index, table_title):
+        worksheet = _XlsxWorksheet(table_title)
+        self.worksheets.append(worksheet)
+        self.tables[table_index] = worksheet
+        self.table_titles[table_index] = table_title
+        self.table_parts[table_index] = 1
+
+    def _continue_table(self, table_index):
+        """Start a new worksheet for the table, after its current worksheet"""
+        previous = self.tables[table_index]
+        self.table_parts[table_index] += 1
+        title = self.table_name_generator.next_unique(
+            '{} ({})'.format(self.table_titles[table_index], self.table_parts[table_index])
+        )
+        worksheet = _XlsxWorksheet(title)
+        self.worksheets.insert(self.worksheets.index(previous) + 1, worksheet)
+        self.tables[table_index] = worksheet
+        self._write_row(table_index, self.header_rows[table_index])
+        return worksheet
+
+    def _write_row(self, sheet_index, row):
+        from couchexport.export import FormattedRow
+        worksheet = self.tables[sheet_index]
+        if sheet_index not in self.header_rows:
+            self.header_rows[sheet_index] = row
+        elif worksheet.num_rows >= self.max_rows:
+            worksheet = self._continue_table(sheet_index)
+
+        if isinstance(row, FormattedRow):
+            skip_excel_formatting = row.skip_excel_formatting
+            hyperlink_column_indices = row.hyperlink_column_indices
+        else:
+            skip_excel_formatting = hyperlink_column_indices = ()
+
+        row_number = worksheet.num_rows + 1
+        cells = ['<row r="{}">'.format(row_number)]
+        for col_ind, val in enumerate(row):
+            if (self.use_formatted_cells
+                    and col_ind not in skip_excel_formatting
+                    and not self.format_as_text):
+                number_format, val = get_excel_format_value(val)
+            else:
+                val = get_legacy_excel_safe_value(val)
+                number_format = numbers.FORMAT_TEXT if self.format_as_text else numbers.FORMAT_GENERAL
+
+            ref = '{}{}'.format(self._get_column_letter(col_ind), row_number)
+            is_hyperlink = col_ind in hyperlink_column_indices
+            if is_hyperlink:
+                # the Hyperlink style of Excel2007ExportWriter has the general number format
+                number_format = numbers.FORMAT_GENERAL
+            cells.append(self._get_cell_xml(ref, val, self._get_cell_format(number_format, is_hyperlink)))
+            if is_hyperlink and isinstance(val, str) and val and not _is_formula(val):
+                worksheet.add_hyperlink(ref, val)
+        cells.append('</row>')
+        worksheet.write_row(''.join(cells))
+
+    def _get_column_letter(self, col_ind):
+        while len(self._column_letters) <= col_ind:
+            self._column_letters.append(get_column_letter(len(self._column_letters) + 1))
+        return self._column_letters[col_ind]
+
+    def _get_cell_format(self, number_format, is_hyperlink):
+        key = (number_format, is_hyperlink)
+        try:
+            return self.cell_formats[key]
+        except KeyError:
+            cell_format = self.cell_formats[key] = len(self.cell_formats)
+            return cell_format
+
+    def _get_cell_xml(self, ref, value, cell_format):
+        style = ' s="{}"'.format(cell_format) if cell_format else ''
+        if value is None or value == '':
+            return '<c r="{}"{}/>'.format(ref, style) if style else ''
+        if isinstance(value, bool):
+            return '<c r="{}"{} t="b"><v>{}</v></c>'.format(ref, style, int(value))
+        if isinstance(value, (int, float)) and math.isfinite(value):
+            return '<c r="{}"{}><v>{!r}</v></c>'.format(ref, style, value)
+        if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+            return '<c r="{}"{}><v>{!r}</v></c>'.format(ref, style, to_excel(value))
+
+        value = str(value)[:MAX_XLSX_CELL_LENGTH]
+        if _is_formula(value):
+            return '<c r="{}"{}><f>{}</f></c>'.format(ref, style, escape(value[1:]))
+        if self.use_shared_strings:
+            try:
+                index = self.shared_strings[value]
+            except KeyError:
+                index = self.shared_strings[value] = len(self.shared_strings)
+            return '<c r="{}"{} t="s"><v>{}</v></c>'.format(ref, style, index)
+        return '<c r="{}"{} t="inlineStr"><is>{}</is></c>'.format(ref, style, _get_text_xml(value))
+
+    def _close(self):
+        with zipfile.ZipFile(self.file, 'w', zipfile.ZIP_DEFLATED, allowZip64=True) as archive:
+            archive.writestr('[Content_Types].xml', self._get_content_types_xml())
+            archive.writestr('_rels/.rels', _get_relationships_xml([
+                ('rId1', 'officeDocument', 'xl/workbook.xml'),
+            ]))
+            archive.writestr('xl/workbook.xml', self._get_workbook_xml())
+            archive.writestr('xl/_rels/workbook.xml.rels', self._get_workbook_relationships_xml())
+            archive.writestr('xl/styles.xml', self._get_styles_xml())
+            for sheet_number, worksheet in enumerate(self.worksheets, 1):
+                path = 'xl/worksheets/sheet{}.xml'.format(sheet_number)
+                with archive.open(path, 'w', force_zip64=True) as file:
+                    worksheet.write_xml(file)
+                if worksheet.num_hyperlinks:
+                    path = 'xl/worksheets/_rels/sheet{}.xml.rels'.format(sheet_number)
+                    with archive.open(path, 'w') as file:
+                        worksheet.write_relationships_xml(file)
+                worksheet.close()
+            if self.use_shared_strings:
+                with archive.open('xl/sharedStrings.xml', 'w', force_zip64=True) as file:
+                    self._write_shared_strings_xml(file)
+
+    def _get_content_types_xml(self):
+        overrides = [
+            ('/xl/workbook.xml', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml'),
+            ('/xl/styles.xml', 'application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml'),
+        ] + [
+            ('/xl/worksheets/sheet{}.xml'.format(sheet_number),
+             'application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml')
+            for sheet_number in range(1, len(self.worksheets) + 1)
+        ]
+        if self.use_shared_strings:
+            overrides.append((
+                '/xl/sharedStrings.xml',
+                'application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml'
+            ))
+        return _XML_DECLARATION.decode('utf-8') + (
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '{}</Types>'
+        ).format(''.join(
+            '<Override PartName="{}" ContentType="{}"/>'.format(part_name, content_type)
+            for part_name, content_type in overrides
+        ))
+
+    def _get_workbook_xml(self):
+        sheets = ''.join(
+            '<sheet name={} sheetId="{}" r:id="rId{}"/>'.format(
+                quoteattr(worksheet.title), sheet_number, sheet_number
+            )
+            for sheet_number, worksheet in enumerate(self.worksheets, 1)
+        )
+        return _XML_DECLARATION.decode('utf-8') + (
+            '<workbook xmlns="{}" xmlns:r="{}"><sheets>{}</sheets></workbook>'
+        ).format(_XLSX_MAIN_NS, _XLSX_RELATIONSHIPS_NS, sheets)
+
+    def _get_workbook_relationships_xml(self):
+        num_worksheets = len(self.worksheets)
+        relationships = [
+            ('rId{}'.format(sheet_number), 'worksheet', 'worksheets/sheet{}.xml'.format(sheet_number))
+            for sheet_number in range(1, num_worksheets + 1)
+        ]
+        relationships.append(('rId{}'.format(num_worksheets + 1), 'styles', 'styles.xml'))
+        if self.use_shared_strings:
+            relationships.append(('rId{}'.format(num_worksheets + 2), 'sharedStrings', 'sharedStrings.xml'))
+        return _get_relationships_xml(relationships)
+
+    def _get_styles_xml(self):
+        num_fmts = []
+        num_fmt_ids = {}
+        for number_format, is_hyperlink in self.cell_formats:
+            if number_format in numbers.BUILTIN_FORMATS_REVERSE:
+                num_fmt_ids[number_format] = numbers.BUILTIN_FORMATS_REVERSE[number_format]
+            elif number_format not in num_fmt_ids:
+                num_fmt_ids[number_format] = 164 + len(num_fmts)
+                num_fmts.append('<numFmt numFmtId="{}" formatCode={}/>'.format(
+                    num_fmt_ids[number_format], quoteattr(number_format)
+                ))
+        # cell formats are numbered in the order they were added
+        cell_xfs = [
+            '<xf numFmtId="{}" fontId="{}" fillId="0" borderId="0" xfId="0"{}/>'.format(
+                num_fmt_ids[number_format],
+                1 if is_hyperlink else 0,
+                ' applyNumberFormat="1"' if num_fmt_ids[number_format] else '',
+            )
+            for number_format, is_hyperlink in self.cell_formats
+        ]
+        return _XML_DECLARATION.decode('utf-8') + (
+            '<styleSheet xmlns="{ns}">'
+            '<numFmts count="{num_fmts_count}">{num_fmts}</numFmts>'
+            '<fonts count="2">'
+            '<font><sz val="11"/><name val="Calibri"/><family val="2"/></font>'
+            '<font><u/><sz val="11"/><color rgb="FF0563C1"/><name val="Calibri"/><family val="2"/></font>'
+            '</fonts>'
+            '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+            '<fill><patternFill patternType="gray125"/></fill></fills>'
+            '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+            '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+            '<cellXfs count="{cell_xfs_count}">{cell_xfs}</cellXfs>'
+            '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+            '</styleSheet>'
+        ).format(
+            ns=_XLSX_MAIN_NS,
+            num_fmts_count=len(num_fmts),
+            num_fmts=''.join(num_fmts),
+            cell_xfs_count=len(cell_xfs),
+            cell_xfs=''.join(cell_xfs),
+        )
+
+    def _write_shared_strings_xml(self, file):
+        file.write(_XML_DECLARATION)
+        file.write('<sst xmlns="{}" uniqueCount="{}">'.format(
+            _XLSX_MAIN_NS, len(self.shared_strings)
+        ).encode('utf-8'))
+        # dicts keep insertion order, which is the order of the indices
+        for value in self.shared_strings:
+            file.write('<si>{}</si>'.format(_get_text_xml(value)).encode('utf-8'))
+        file.write(b'</sst>')
+
+
+def _is_formula(value):
+    # like openpyxl, treat strings that start with '=' as formulas
+    return len(value) > 1 and value.startswith('=')
+
+
+def _get_text_xml(value):
+    if value[0].isspace() or value[-1].isspace():
+        return '<t xml:space="preserve">{}</t>'.format(escape(value))
+    return '<t>{}</t>'.format(escape(value))
+
+
+def _get_relationships_xml(relationships):
+    return _XML_DECLARATION.decode('utf-8') + '<Relationships xmlns="{}">{}</Relationships>'.format(
+        _PACKAGE_RELATIONSHIPS_NS,
+        ''.join(
+            '<Relationship Id="{}" Type="{}/{}" Target="{}"/>'.format(
+                rel_id, _XLSX_RELATIONSHIPS_NS, rel_type, target
+            )
+            for rel_id, rel_type, target in relationships
+        )
+    )
+
+
 class Excel2003ExportWriter(ExportWriter):
     format = Format.XLS
     max_table_name_size = 31
@@ -1,4 +1,6 @@
 import sys
+import time
+from collections import defaultdict
 from datetime import datetime
 
 from memoized import memoized
@@ -6,21 +8,26 @@ from memoized import memoized
 from corehq.apps.change_feed.data_sources import get_document_store
 from corehq.apps.change_feed.producer import producer as kafka_producer
 from corehq.apps.change_feed.topics import get_topic_for_doc_type
+from corehq.util.metrics import metrics_counter
+from dimagi.utils.chunked import chunked
 from dimagi.utils.logging import notify_error
 from pillow_retry import const
 from pillow_retry.models import PillowError
 from pillowtop.exceptions import PillowNotFoundError
 from pillowtop.feed.couch import CouchChangeFeed
+from pillowtop.logger import pillow_logging
 from pillowtop.utils import get_pillow_by_name
 
+# number of errors retried together if the pillow has no processor chunk size
+RETRY_CHUNK_SIZE = 100
+
 
 @memoized
 def _get_pillow(pillow_name_or_class):
     return get_pillow_by_name(pillow_name_or_class)
 
 
-def process_pillow_retry(error_doc, producer=None):
-    producer = producer or kafka_producer
+def _get_pillow_or_notify(error_doc):
     pillow_name_or_class = error_doc.pillow
     try:
         pillow = _get_pillow(pillow_name_or_class)
@@ -37,7 +44,15 @@ def process_pillow_retry(error_doc, producer=None):
             error_doc.total_attempts = const.PILLOW_RETRY_MULTI_ATTEMPTS_CUTOFF + 1
             error_doc.save()
         finally:
-            return
+            return None
+    return pillow
+
+
+def process_pillow_retry(error_doc, producer=None):
+    producer = producer or kafka_producer
+    pillow = _get_pillow_or_notify(error_doc)
+    if not pillow:
+        return
 
     try:
         if isinstance(pillow.get_change_feed(), CouchChangeFeed):
@@ -50,7 +65,104 @@ def process_pillow_retry(error_doc, producer=None):
         error_doc.save()
 
 
-def _process_couch_change(pillow, error):
+def process_pillow_retries(errors, producer=None):
+    """Retry errors in chunks through the batch processors of their pillows
+
+    Errors are grouped by pillow, and each pillow processes its errors'
+    changes in chunks of its processor chunk size, as it would process
+    changes from its change feed. Only the latest error of each document
+    is retried. Errors whose changes are processed successfully are
+    deleted, and errors whose changes fail again have their attempts
+    updated by the pillow.
+
+    Errors of pillows that do not save errors, and errors without change
+    metadata, are retried one at a time with `process_pillow_retry`.
+
+    :returns: Number of errors retried.
+    """
+    errors_by_pillow = defaultdict(list)
+    for error in _deduplicate_errors(errors):
+        errors_by_pillow[error.pillow].append(error)
+
+    count = 0
+    for pillow_name, pillow_errors in errors_by_pillow.items():
+        pillow = _get_pillow_or_notify(pillow_errors[0])
+        if not pillow:
+            continue
+        if not pillow.retry_errors:
+            for error in pillow_errors:
+                process_pillow_retry(error, producer=producer)
+            count += len(pillow_errors)
+            continue
+        chunk_size = pillow.processor_chunk_size or RETRY_CHUNK_SIZE
+        for chunk in chunked(pillow_errors, chunk_size, list):
+            count += _process_errors_chunk(pillow, chunk, producer)
+    return count
+
+
+def _deduplicate_errors(errors):
+    """Keep the error with the latest change of each document of each pillow
+
+    Superseded errors are deleted.
+    """
+    latest = {}
+    superseded = []
+    for error in errors:
+        key = (error.pillow, error.doc_id)
+        if key in latest:
+            older, error = sorted([latest[key], error], key=lambda e: e.date_created)
+            superseded.append(older.id)
+        latest[key] = error
+    if superseded:
+        PillowError.objects.filter(id__in=superseded).delete()
+    return list(latest.values())
+
+
+def _process_errors_chunk(pillow, errors, producer):
+    with_metadata = [error for error in errors if error.change_metadata]
+    for error in errors:
+        if not error.change_metadata:
+            process_pillow_retry(error, producer=producer)
+    if not with_metadata:
+        return len(errors)
+
+    start = time.time()
+    retry_start = datetime.utcnow()
+    changes = [_get_change(error) for error in with_metadata]
+    for change in changes:
+        # keep retries out of the pillow's change lag metrics
+        change.metadata.publish_timestamp = retry_start
+    try:
+        pillow.process_changes_chunk(changes)
+    except Exception:
+        ex_type, ex_value, ex_tb = sys.exc_info()
+        for error in with_metadata:
+            error.add_attempt(ex_value, ex_tb)
+            error.save()
+        failed = len(with_metadata)
+    else:
+        # errors of changes that failed again were updated by the pillow
+        succeeded = (
+            PillowError.objects
+            .filter(id__in=[error.id for error in with_metadata], date_last_attempt__lt=retry_start)
+            .delete()[0]
+        )
+        failed = len(with_metadata) - succeeded
+    duration = time.time() - start
+
+    tags = {'pillow_name': pillow.get_name()}
+    metrics_counter('commcare.pillowtop.retry.changes', len(with_metadata) - failed,
+                    tags={**tags, 'result': 'success'})
+    metrics_counter('commcare.pillowtop.retry.changes', failed, tags={**tags, 'result': 'failure'})
+    metrics_counter('commcare.pillowtop.retry.processing_time', duration, tags=tags)
+    pillow_logging.info(
+        "[%s] Retried %s errors in %.1fs (%.1f per second), %s failed",
+        pillow.get_name(), len(with_metadata), duration, len(with_metadata) / (duration or 1), failed,
+    )
+    return len(errors)
+
+
+def _get_change(error):
     change = error.change_object
     change_metadata = change.metadata
     if change_metadata:
@@ -61,7 +173,11 @@ def _process_couch_change(pillow, error):
             load_source="pillow_retry",
         )
         change.document_store = document_store
-    pillow.process_change(change)
+    return change
+
+
+def _process_couch_change(pillow, error):
+    pillow.process_change(_get_change(error))
     error.delete()
 
 
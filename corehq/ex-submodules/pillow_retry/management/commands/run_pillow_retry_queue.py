@@ -8,7 +8,7 @@ import pytz
 from psycopg2._psycopg import InterfaceError
 
 from dimagi.utils.logging import notify_exception
-from pillow_retry.api import process_pillow_retry
+from pillow_retry.api import process_pillow_retries, process_pillow_retry
 from pillow_retry.models import PillowError
 
 from corehq.apps.change_feed.producer import ChangeProducer
@@ -22,7 +22,16 @@ producer = ChangeProducer(auto_flush=False)
 class PillowRetryEnqueuingOperation(BaseCommand):
     help = "Runs the Pillow Retry Queue"
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--bulk',
+            action='store_true',
+            default=False,
+            help="Retry errors in chunks through the batch processors of their pillows.",
+        )
+
     def handle(self, **options):
+        self.bulk = options['bulk']
         while True:
             try:
                 num_processed = self.process_queue()
@@ -36,8 +45,11 @@ class PillowRetryEnqueuingOperation(BaseCommand):
     def process_queue(self):
         utcnow = datetime.utcnow()
         errors = self.get_items_to_be_processed(utcnow)
-        for error in errors:
-            process_pillow_retry(error, producer=producer)
+        if self.bulk:
+            process_pillow_retries(errors, producer=producer)
+        else:
+            for error in errors:
+                process_pillow_retry(error, producer=producer)
         producer.flush()
         return len(errors)
 
@@ -11,10 +11,10 @@ from corehq.apps.change_feed.pillow import get_change_feed_pillow_for_db
 from corehq.pillows.mappings.case_mapping import CASE_INDEX_INFO
 from corehq.util.elastic import ensure_index_deleted
 from corehq.util.test_utils import trap_extra_setup
-from pillow_retry.api import process_pillow_retry
+from pillow_retry.api import process_pillow_retries, process_pillow_retry
 from pillow_retry.models import PillowError
 from pillowtop.feed.couch import populate_change_metadata
-from pillowtop.feed.interface import Change
+from pillowtop.feed.interface import Change, ChangeMeta
 from pillowtop.pillow.interface import ConstructedPillow
 from pillowtop.processors.sample import CountingProcessor
 from testapps.test_pillowtop.utils import process_pillow_changes
@@ -157,3 +157,50 @@ class KakfaPillowRetryProcessingTest(TestCase, TestMixin):
             self.assertEqual(0, len(errors))
 
             self.assertEqual(1, self.processor.count)
+
+
+class FailingProcessor(CountingProcessor):
+
+    def process_change(self, change):
+        if change.id == 'bad-id':
+            raise TestException('bad change')
+        super().process_change(change)
+
+
+class BulkPillowRetryProcessingTest(TestCase):
+
+    def setUp(self):
+        self.processor = FailingProcessor()
+        self.pillow = ConstructedPillow(
+            name='test-bulk-retry-feed',
+            checkpoint=None,
+            change_feed=KafkaChangeFeed(
+                topics=[topics.CASE_SQL], client_id='test-bulk-retry-feed'
+            ),
+            processor=self.processor
+        )
+        patcher = patch('pillow_retry.api._get_pillow', return_value=self.pillow)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        PillowError.objects.all().delete()
+
+    def _create_error(self, doc_id):
+        change = Change(id=doc_id, sequence_id=None, metadata=ChangeMeta(
+            data_source_type=SOURCE_COUCH, data_source_name='test_commcarehq', document_id=doc_id,
+            domain='bulk-retry-test',
+        ))
+        error = PillowError.get_or_create(change, self.pillow)
+        error.add_attempt(TestException('error'), None)
+        error.save()
+        return error
+
+    def test_process_pillow_retries(self):
+        errors = [self._create_error(doc_id) for doc_id in ['id-1', 'bad-id', 'id-2']]
+        self.assertEqual(process_pillow_retries(errors), 3)
+
+        self.assertEqual(self.processor.count, 2)
+        error, = PillowError.objects.filter(pillow=self.pillow.pillow_id)
+        self.assertEqual(error.doc_id, 'bad-id')
+        self.assertEqual(error.total_attempts, 2)
@@ -2,3 +2,5 @@
 CHECKPOINT_FREQUENCY = 100
 CHECKPOINT_MIN_WAIT = 300
 DEFAULT_PROCESSOR_CHUNK_SIZE = 10
+# chunk size of pillows that coalesce changes but have no processor chunk size
+MAX_COALESCED_CHUNK_SIZE = 1000
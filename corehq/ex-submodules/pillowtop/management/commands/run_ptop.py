@@ -78,6 +78,15 @@ class Command(BaseCommand):
             help="The batch size for this pillow. Some pillows process changes in bulk, "
             "setting this value to 1 will process each change as it comes in.",
         )
+        parser.add_argument(
+            '--max-processor-chunk-size',
+            action='store',
+            dest='max_processor_chunk_size',
+            default=None,
+            type=int,
+            help="Set to adapt the batch size of this pillow to its lag, from --processor-chunk-size "
+            "when it is near the head of its change feed up to this size when it has a backlog.",
+        )
         parser.add_argument(
             '--dedicated-migration-process',
             action='store_true',
@@ -102,6 +111,7 @@ class Command(BaseCommand):
         num_processes = options['num_processes']
         process_number = options['process_number']
         processor_chunk_size = options['processor_chunk_size']
+        max_processor_chunk_size = options['max_processor_chunk_size']
         dedicated_migration_process = options['dedicated_migration_process']
         exclude_ucrs = options['exclude_ucrs']
         assert 0 <= process_number < num_processes
@@ -131,6 +141,8 @@ class Command(BaseCommand):
             other_options = {}
             if exclude_ucrs:
                 other_options = {'exclude_ucrs': exclude_ucrs.split(",")}
+            if max_processor_chunk_size:
+                other_options['max_processor_chunk_size'] = max_processor_chunk_size
             pillow = get_pillow_by_name(pillow_name, num_processes=num_processes, process_num=process_number,
             processor_chunk_size=processor_chunk_size, dedicated_migration_process=dedicated_migration_process,
             **other_options)
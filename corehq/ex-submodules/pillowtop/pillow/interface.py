@@ -1,6 +1,7 @@
 import time
 from abc import ABCMeta, abstractproperty, abstractmethod
 from collections import Counter, defaultdict
+from contextlib import nullcontext
 from datetime import datetime
 
 from django.conf import settings
@@ -10,16 +11,22 @@ import sys
 
 from sentry_sdk import configure_scope
 
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
 from corehq.util.metrics import metrics_counter, metrics_gauge
 from corehq.util.metrics.const import MPM_MAX
 from corehq.util.timer import TimingContext
 from dimagi.utils.logging import notify_exception
 from kafka.common import TopicPartition
-from pillowtop.const import CHECKPOINT_MIN_WAIT
+from pillowtop.const import CHECKPOINT_MIN_WAIT, MAX_COALESCED_CHUNK_SIZE
 from pillowtop.dao.exceptions import DocumentMissingError
 from pillowtop.utils import force_seq_int
-from pillowtop.exceptions import PillowtopCheckpointReset
+from pillowtop.exceptions import PillowConfigError, PillowtopCheckpointReset
 from pillowtop.logger import pillow_logging
+from pillowtop.pillow.stage_times import TOTAL, StageTimes
 
 
 def _topic_for_ddog(topic):
@@ -45,6 +52,53 @@ class PillowRuntimeContext(object):
         self.changes_seen = 0
 
 
+class AdaptiveChunkSize(object):
+    """Processor chunk size that adapts to how far a pillow is behind
+
+    The chunk size doubles (up to `max_size`) while the changes being
+    processed are more than `HIGH_LAG` seconds old, so a pillow with a
+    backlog processes fewer, larger chunks. It halves (down to
+    `min_size`) when they are less than `LOW_LAG` seconds old, so a
+    pillow near the head of its feed does not wait to fill large
+    chunks. It also halves when a chunk takes more than
+    `MAX_PROCESSING_TIME` seconds to process or the process uses more
+    than `max_memory` bytes of memory. Checking memory use requires
+    psutil.
+    """
+    HIGH_LAG = 60
+    LOW_LAG = 10
+    MAX_PROCESSING_TIME = 30
+
+    def __init__(self, min_size, max_size, max_memory=None):
+        assert 0 < min_size <= max_size, (min_size, max_size)
+        if max_memory and psutil is None:
+            raise PillowConfigError("PILLOW_MAX_MEMORY is set but psutil is not installed")
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_memory = max_memory
+        self.size = min_size
+
+    def update(self, lag, processing_time):
+        """Update the chunk size after processing a chunk
+
+        :param lag: Age in seconds of the last change in the chunk.
+        :param processing_time: Seconds taken to process the chunk.
+        :returns: The new chunk size.
+        """
+        if processing_time > self.MAX_PROCESSING_TIME or self._is_memory_exceeded():
+            self.size = max(self.size // 2, self.min_size)
+        elif lag > self.HIGH_LAG:
+            self.size = min(self.size * 2, self.max_size)
+        elif lag < self.LOW_LAG:
+            self.size = max(self.size // 2, self.min_size)
+        return self.size
+
+    def _is_memory_exceeded(self):
+        if not self.max_memory:
+            return False
+        return psutil.Process().memory_info().rss > self.max_memory
+
+
 class PillowBase(metaclass=ABCMeta):
     """
     This defines the external pillowtop API. Everything else should be considered a specialization
@@ -55,6 +109,13 @@ class PillowBase(metaclass=ABCMeta):
     retry_errors = True
     # this will be the batch size for processors that support batch processing
     processor_chunk_size = 0
+    # AdaptiveChunkSize used to adjust processor_chunk_size, if any
+    adaptive_chunk_size = None
+    # StageTimes of the processors, if any
+    stage_times = None
+    # seconds to collect changes for, so that multiple changes to the
+    # same document are processed once, or None to not coalesce changes
+    coalesce_window = None
 
     @abstractproperty
     def pillow_id(self):
@@ -146,14 +207,18 @@ class PillowBase(metaclass=ABCMeta):
             Processes changes serially on serial processors, and in batches on
             batch processors. If there are batch processors, checkpoint is updated
             at the end of the batch, otherwise is updated for every change.
+
+            If the pillow coalesces changes, changes are processed in chunks
+            collected over `coalesce_window` seconds, even if there are no
+            batch processors.
         """
         context = PillowRuntimeContext(changes_seen=0)
-        min_wait_seconds = 30
+        min_wait_seconds = self.coalesce_window or 30
 
         def process_offset_chunk(chunk, context):
             if not chunk:
                 return
-            self._batch_process_with_error_handling(chunk)
+            self._process_changes_chunk(chunk)
             self._update_checkpoint(chunk[-1], context)
 
         # keep track of chunk for batch processors
@@ -164,15 +229,16 @@ class PillowBase(metaclass=ABCMeta):
             for change in self.get_change_feed().iter_changes(since=since or None, forever=forever):
                 context.changes_seen += 1
                 if change:
-                    if self.batch_processors:
+                    if self.batch_processors or self.coalesce_window:
                         # Queue and process in chunks for both batch
                         #   and serial processors
                         changes_chunk.append(change)
-                        chunk_full = len(changes_chunk) == self.processor_chunk_size
-                        time_elapsed = (datetime.utcnow() - last_process_time).seconds > min_wait_seconds
+                        chunk_size = self.processor_chunk_size or MAX_COALESCED_CHUNK_SIZE
+                        chunk_full = len(changes_chunk) >= chunk_size
+                        time_elapsed = (datetime.utcnow() - last_process_time).total_seconds() > min_wait_seconds
                         if chunk_full or time_elapsed:
                             last_process_time = datetime.utcnow()
-                            self._batch_process_with_error_handling(changes_chunk)
+                            self._process_changes_chunk(changes_chunk)
                             # update checkpoint for just the latest change
                             self._update_checkpoint(changes_chunk[-1], context)
                             # reset for next chunk
@@ -181,6 +247,7 @@ class PillowBase(metaclass=ABCMeta):
                         # process all changes one by one
                         processing_time = self.process_with_error_handling(change)
                         self._record_change_in_datadog(change, processing_time)
+                        self._record_stage_times([change])
                         self._update_checkpoint(change, context)
                 else:
                     self._update_checkpoint(None, None)
@@ -192,6 +259,26 @@ class PillowBase(metaclass=ABCMeta):
             if context.changes_seen and change:
                 self._update_checkpoint(change, context)
 
+    def process_changes_chunk(self, changes_chunk):
+        """Process changes that did not come from the change feed
+
+        The changes are processed in one chunk by batch processors, and
+        errors are handled as they are for changes from the change feed.
+        The checkpoint is not updated.
+        """
+        self._batch_process_with_error_handling(changes_chunk)
+
+    def _process_changes_chunk(self, changes_chunk):
+        start = time.monotonic()
+        self._batch_process_with_error_handling(changes_chunk)
+        if self.adaptive_chunk_size and changes_chunk[-1].metadata is not None:
+            lag = (datetime.utcnow() - changes_chunk[-1].metadata.publish_timestamp).total_seconds()
+            self.processor_chunk_size = self.adaptive_chunk_size.update(lag, time.monotonic() - start)
+            tags = {'pillow_name': self.get_name()}
+            metrics_gauge('commcare.change_feed.chunk_size', self.processor_chunk_size, tags=tags,
+                multiprocess_mode=MPM_MAX)
+            metrics_gauge('commcare.change_feed.chunk_lag', lag, tags=tags, multiprocess_mode=MPM_MAX)
+
     def _batch_process_with_error_handling(self, changes_chunk):
         """
         Process given chunk in batch mode first on batch-processors
@@ -210,15 +297,26 @@ class PillowBase(metaclass=ABCMeta):
             for change in chunk:
                 self.process_with_error_handling(change, processor)
 
-        for processor in self.batch_processors:
-            if not changes_chunk:
-                return set(), 0
-
+        if not changes_chunk:
+            return
+        if self.coalesce_window:
+            unique_changes = self._deduplicate_changes(changes_chunk)
+            if len(unique_changes) < len(changes_chunk):
+                metrics_counter(
+                    'commcare.change_feed.changes.coalesced', len(changes_chunk) - len(unique_changes),
+                    tags={'pillow_name': self.get_name()},
+                )
+            changes_chunk = unique_changes
+        elif self.batch_processors:
+            # serial processors get the same changes as batch processors
             changes_chunk = self._deduplicate_changes(changes_chunk)
+
+        for processor in self.batch_processors:
             timer = TimingContext()
             with timer:
                 try:
-                    retry_changes, change_exceptions = processor.process_changes_chunk(changes_chunk)
+                    with self._time_processor(processor):
+                        retry_changes, change_exceptions = processor.process_changes_chunk(changes_chunk)
                 except Exception as ex:
                     notify_exception(
                         None,
@@ -242,6 +340,7 @@ class PillowBase(metaclass=ABCMeta):
         for change in changes_chunk:
             processing_time += self.process_with_error_handling(change)
         self._record_datadog_metrics(changes_chunk, processing_time)
+        self._record_stage_times(changes_chunk)
 
     def process_with_error_handling(self, change, processor=None):
         # process given change on all serial processors or given processor.
@@ -251,7 +350,8 @@ class PillowBase(metaclass=ABCMeta):
         try:
             with timer:
                 if processor:
-                    processor.process_change(change)
+                    with self._time_processor(processor):
+                        processor.process_change(change)
                 else:
                     # process on serial processors
                     self.process_change(change, serial_only=True)
@@ -268,6 +368,15 @@ class PillowBase(metaclass=ABCMeta):
             self._record_change_success_in_datadog(change)
         return timer.duration
 
+    def _time_processor(self, processor):
+        if self.stage_times is None:
+            return nullcontext()
+        return self.stage_times.timer(processor, TOTAL)
+
+    def _record_stage_times(self, changes):
+        if self.stage_times is not None:
+            self.stage_times.record(changes)
+
     @abstractmethod
     def process_change(self, change, serial_only=False):
         pass
@@ -429,15 +538,29 @@ class ConstructedPillow(PillowBase):
 
     def __init__(self, name, checkpoint, change_feed, processor, process_num=0,
                  change_processed_event_handler=None, processor_chunk_size=0,
-                 is_dedicated_migration_process=False):
+                 is_dedicated_migration_process=False, max_processor_chunk_size=None,
+                 coalesce_window=None):
         self._name = name
         self._checkpoint = checkpoint
         self._change_feed = change_feed
+        self.process_num = process_num
         self.processor_chunk_size = processor_chunk_size
+        if processor_chunk_size and max_processor_chunk_size and max_processor_chunk_size > processor_chunk_size:
+            self.adaptive_chunk_size = AdaptiveChunkSize(
+                processor_chunk_size,
+                max_processor_chunk_size,
+                max_memory=getattr(settings, 'PILLOW_MAX_MEMORY', None),
+            )
         if isinstance(processor, list):
             self.processors = processor
         else:
             self.processors = [processor]
+        self.stage_times = StageTimes(name, process_num)
+        for processor in self.processors:
+            processor.stage_times = self.stage_times
+        if coalesce_window is None:
+            coalesce_window = getattr(settings, 'PILLOW_COALESCE_WINDOWS', {}).get(name)
+        self.coalesce_window = coalesce_window
 
         self._change_processed_event_handler = change_processed_event_handler
         self.is_dedicated_migration_process = is_dedicated_migration_process
@@ -466,7 +589,8 @@ class ConstructedPillow(PillowBase):
     def process_change(self, change, serial_only=False):
         processors = self.serial_processors if serial_only else self.processors
         for processor in processors:
-            processor.process_change(change)
+            with self._time_processor(processor):
+                processor.process_change(change)
 
     def update_checkpoint(self, change, context):
         if self._change_processed_event_handler is not None:
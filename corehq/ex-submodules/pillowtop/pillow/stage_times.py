@@ -0,0 +1,130 @@
+"""Processing time of each stage of each processor of a pillow
+
+Processors time the stages of processing a change or a chunk of changes
+(typically 'extract' for fetching documents, 'transform' and 'load' for
+writing) with `PillowProcessor.time_stage`. The pillow also times each
+processor as a whole, as the 'total' stage.
+
+Stage times are reported in the
+`commcare.change_feed.processor.stage_time` histogram after each chunk
+(or each change, for pillows that do not process changes in chunks).
+They are also summarized per pillow process over `SUMMARY_WINDOW` and
+saved in redis for the pillow status admin page.
+"""
+import json
+import os
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+
+from dimagi.utils.couch import get_redis_client
+from dimagi.utils.parsing import json_format_datetime
+from pillowtop.logger import pillow_logging
+
+from corehq.util.metrics import metrics_histogram
+
+TOTAL = 'total'
+# seconds over which stage times are summarized
+SUMMARY_WINDOW = 5 * 60
+# summaries of processes that stop are discarded after this many seconds
+SUMMARY_TIMEOUT = 60 * 60
+STAGE_TIME_BUCKETS = (.01, .03, .1, .3, 1, 3, 10, 30)
+
+
+class StageTimes(object):
+    """Stage times of the processors of one pillow process"""
+
+    def __init__(self, pillow_name, process_num=0):
+        self.pillow_name = pillow_name
+        self.process_num = process_num
+        self.times = defaultdict(float)
+        self._reset_summary()
+
+    def _reset_summary(self):
+        self.summary_start = time.time()
+        self.summary_times = defaultdict(float)
+        self.summary_changes = 0
+        self.summary_partitions = set()
+
+    @contextmanager
+    def timer(self, processor, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.times[(_get_processor_name(processor), stage)] += time.perf_counter() - start
+
+    def record(self, changes):
+        """Report the stage times of processing the given changes"""
+        for (processor, stage), seconds in self.times.items():
+            metrics_histogram(
+                'commcare.change_feed.processor.stage_time', seconds,
+                bucket_tag='duration', buckets=STAGE_TIME_BUCKETS, bucket_unit='s',
+                tags={'pillow_name': self.pillow_name, 'processor': processor, 'stage': stage},
+            )
+            self.summary_times[(processor, stage)] += seconds
+        self.times.clear()
+        self.summary_changes += len(changes)
+        self.summary_partitions.update(
+            (change.topic, change.partition) for change in changes if change.partition is not None
+        )
+        if time.time() - self.summary_start >= SUMMARY_WINDOW:
+            self._save_summary()
+            self._reset_summary()
+
+    def _save_summary(self):
+        duration = time.time() - self.summary_start
+        summary = {
+            'process_num': self.process_num,
+            'pid': os.getpid(),
+            'updated': json_format_datetime(datetime.utcnow()),
+            'duration': duration,
+            'changes': self.summary_changes,
+            'rate': self.summary_changes / duration,
+            'partitions': sorted('{},{}'.format(*partition) for partition in self.summary_partitions),
+            'stages': [
+                {'processor': processor, 'stage': stage, 'seconds': seconds}
+                for (processor, stage), seconds in sorted(self.summary_times.items())
+            ],
+        }
+        key = _get_summary_key(self.pillow_name)
+        try:
+            client = _get_client()
+            client.hset(key, str(self.process_num), json.dumps(summary))
+            client.expire(key, SUMMARY_TIMEOUT)
+        except Exception:
+            # the summary is only for the status page; don't stop the pillow
+            pillow_logging.exception("Unable to save stage time summary of %s", self.pillow_name)
+
+
+def get_stage_time_summaries(pillow_name):
+    """Get the latest stage time summary of each process of a pillow
+
+    :returns: List of summaries ordered by process number. Each stage
+    has the 'percent' of the summary window spent in it, and each
+    summary has a 'slowest_stage' item with the stage (other than
+    'total') that took the most time, or None if no stages were timed.
+    """
+    summaries = [
+        json.loads(summary)
+        for summary in _get_client().hgetall(_get_summary_key(pillow_name)).values()
+    ]
+    for summary in summaries:
+        for stage in summary['stages']:
+            stage['percent'] = stage['seconds'] / summary['duration'] * 100
+        stages = [stage for stage in summary['stages'] if stage['stage'] != TOTAL]
+        summary['slowest_stage'] = max(stages, key=lambda stage: stage['seconds']) if stages else None
+    return sorted(summaries, key=lambda summary: summary['process_num'])
+
+
+def _get_processor_name(processor):
+    return processor.__class__.__name__
+
+
+def _get_summary_key(pillow_name):
+    return 'pillow-stage-times:{}'.format(pillow_name)
+
+
+def _get_client():
+    return get_redis_client().client.get_client()
@@ -1,5 +1,6 @@
 import math
 import time
+from contextlib import contextmanager
 
 from django.conf import settings
 
@@ -116,14 +117,18 @@ class ElasticProcessor(PillowProcessor):
             delete=True
         )
 
+    @contextmanager
     def _datadog_timing(self, step):
-        return metrics_histogram_timer(
+        timer = metrics_histogram_timer(
             'commcare.change_feed.processor.timing',
             timing_buckets=(.03, .1, .3, 1, 3, 10),
             tags={
                 'action': step,
                 'index': self.index_info.alias,
             })
+        # bulk and serial steps are reported as the same stage
+        with timer, self.time_stage(step.replace('bulk_', '')):
+            yield
 
 
 class BulkElasticProcessor(ElasticProcessor, BulkPillowProcessor):
@@ -159,7 +164,7 @@ class BulkElasticProcessor(ElasticProcessor, BulkPillowProcessor):
             error_collector = ErrorCollector()
             es_actions = build_bulk_payload(
                 list(changes_to_process.values()),
-                self.doc_transform_fn,
+                self.get_chunk_doc_transform_fn(),
                 error_collector,
             )
             error_changes = error_collector.errors
@@ -183,6 +188,13 @@ class BulkElasticProcessor(ElasticProcessor, BulkPillowProcessor):
                 error_changes.append((changes_to_process[change_id], BulkDocException(error_msg)))
         return retry_changes, error_changes
 
+    def get_chunk_doc_transform_fn(self):
+        """Get the function used to transform the documents of one chunk
+
+        Override to share lookups between the documents of a chunk.
+        """
+        return self.doc_transform_fn
+
 
 def send_to_elasticsearch(index_info, doc_type, doc_id, es_getter, name, data=None,
                           delete=False, es_merge_update=False):
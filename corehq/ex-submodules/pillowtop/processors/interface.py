@@ -1,8 +1,11 @@
 from abc import ABCMeta, abstractmethod
+from contextlib import nullcontext
 
 
 class PillowProcessor(metaclass=ABCMeta):
     supports_batch_processing = False
+    # StageTimes of the pillow running this processor, set by the pillow
+    stage_times = None
 
     @abstractmethod
     def process_change(self, change):
@@ -14,6 +17,15 @@ class PillowProcessor(metaclass=ABCMeta):
     def bootstrap_if_needed(self):
         pass
 
+    def time_stage(self, stage):
+        """Time a stage of processing for the pillow's stage time metrics
+
+        Usage: `with self.time_stage('transform'): ...`
+        """
+        if self.stage_times is None:
+            return nullcontext()
+        return self.stage_times.timer(self, stage)
+
 
 class BulkPillowProcessor(PillowProcessor):
     # To make the pillow process in chunks, create and use a processor
@@ -1,3 +1,6 @@
+import argparse
+import subprocess
+import time
 from abc import ABCMeta, abstractmethod
 
 from corehq.util.es.elasticsearch import BulkIndexError, TransportError
@@ -19,10 +22,13 @@ from corehq.util.doc_processor.interface import (
     BaseDocProcessor,
     BulkDocProcessor,
 )
+from corehq.util.doc_processor.progress import get_merged_progress
 
 MAX_TRIES = 3
 RETRY_TIME_DELAY_FACTOR = 15
 MAX_PAYLOAD_SIZE = 10 ** 7  # ~10 MB
+WORKER_POLL_INTERVAL = 5  # seconds
+PROGRESS_LOG_INTERVAL = 5 * 60  # seconds
 
 
 class Reindexer(metaclass=ABCMeta):
@@ -98,6 +104,35 @@ class ReindexerFactory(metaclass=ABCMeta):
             help="Limit the reindexer to only a specific SQL database. Allows running multiple in parallel."
         )
 
+    @staticmethod
+    def parallel_reindexer_args(parser):
+        parser.add_argument(
+            '--processes',
+            type=int,
+            dest='processes',
+            help='Reindex SQL databases in parallel with this many worker processes. '
+                 'Each database is reindexed with its own resumable progress.'
+        )
+        parser.add_argument(
+            '--status',
+            action='store_true',
+            dest='status',
+            help='Show the progress of a parallel reindex and exit'
+        )
+        parser.add_argument(
+            '--max-docs-per-second',
+            type=float,
+            dest='max_docs_per_second',
+            help='Throttle the reindex to process at most this many docs per second '
+                 '(shared between worker processes)'
+        )
+        parser.add_argument(
+            '--skip-index-setup',
+            action='store_true',
+            dest='skip_index_setup',
+            help=argparse.SUPPRESS,  # used by parallel reindex worker processes
+        )
+
     @staticmethod
     def domain_arg(parser):
         parser.add_argument(
@@ -239,7 +274,7 @@ class ResumableBulkElasticPillowReindexer(Reindexer):
 
     def __init__(self, doc_provider, elasticsearch, index_info,
                  doc_filter=None, doc_transform=None, chunk_size=1000, pillow=None,
-                 reset=False, in_place=False):
+                 reset=False, in_place=False, max_docs_per_second=None, skip_index_setup=False):
         self.reset = reset
         self.in_place = in_place
         self.doc_provider = doc_provider
@@ -250,10 +285,19 @@ class ResumableBulkElasticPillowReindexer(Reindexer):
             self.es, self.index_info, doc_filter, doc_transform, process_deletes=self.in_place
         )
         self.pillow = pillow
+        self.max_docs_per_second = max_docs_per_second
+        # index setup is done by the parent of parallel reindex workers
+        self.skip_index_setup = skip_index_setup
 
     def clean(self):
         clean_index(self.es, self.index_info)
 
+    def get_document_iterator(self):
+        return self.doc_provider.get_document_iterator(self.chunk_size)
+
+    def has_started(self):
+        return bool(self.get_document_iterator().get_iterator_detail('progress'))
+
     def reindex(self):
         if not self.es.indices.exists(self.index_info.index):
             self.reset = True  # if the index doesn't exist always reset the processing
@@ -263,8 +307,13 @@ class ResumableBulkElasticPillowReindexer(Reindexer):
             self.doc_processor,
             reset=self.reset,
             chunk_size=self.chunk_size,
+            max_docs_per_second=self.max_docs_per_second,
         )
 
+        if self.skip_index_setup:
+            processor.run()
+            return
+
         if not self.in_place and (self.reset or not processor.has_started()):
             prepare_index_for_reindex(self.es, self.index_info)
             if self.pillow:
@@ -280,3 +329,94 @@ class ResumableBulkElasticPillowReindexer(Reindexer):
                 'you can fix this by running ./manage.py ptop_reindexer_v2 [index-name] --reset or '
                 './manage.py ptop_preindex --reset.'
             )
+
+
+class ParallelResumableReindexer(Reindexer):
+    """Reindex SQL databases in parallel worker processes
+
+    Each database is reindexed by a worker process with its own
+    resumable reindexer, so each has its own progress record and a
+    stopped or failed reindex resumes where it left off when it is run
+    again. At most `processes` workers run at a time. Index setup is
+    done once by this reindexer rather than by each worker.
+
+    :param reindexers: Dict of ``ResumableBulkElasticPillowReindexer``
+    objects by database alias, each limited to its database.
+    :param get_worker_command: Function that takes a database alias and
+    whether to reset the reindex, and returns the command line of a
+    process that runs the reindexer of that database with
+    ``skip_index_setup=True``.
+    :param processes: Maximum number of worker processes.
+    """
+
+    def __init__(self, reindexers, get_worker_command, processes, reset=False, in_place=False):
+        assert reindexers, "no databases to reindex"
+        self.reindexers = reindexers
+        self.get_worker_command = get_worker_command
+        self.processes = processes
+        self.reset = reset
+        self.in_place = in_place
+        reindexer = next(iter(reindexers.values()))
+        self.es = reindexer.es
+        self.index_info = reindexer.index_info
+        self.pillow = reindexer.pillow
+
+    def clean(self):
+        clean_index(self.es, self.index_info)
+
+    def get_progress(self):
+        """Get the combined progress of all databases
+
+        See ``corehq.util.doc_processor.progress.get_merged_progress``
+        """
+        return get_merged_progress({
+            db_alias: reindexer.get_document_iterator()
+            for db_alias, reindexer in self.reindexers.items()
+        })
+
+    def reindex(self):
+        if not self.es.indices.exists(self.index_info.index):
+            self.reset = True
+        if not self.in_place and (
+                self.reset or not any(r.has_started() for r in self.reindexers.values())):
+            prepare_index_for_reindex(self.es, self.index_info)
+            if self.pillow:
+                _set_checkpoint(self.pillow)
+
+        failed = self._run_workers()
+        if failed:
+            raise Exception(
+                'Reindex failed for databases: {}. Run the reindex again to resume.'.format(', '.join(failed))
+            )
+        prepare_index_for_usage(self.es, self.index_info)
+
+    def _run_workers(self):
+        pending = list(self.reindexers)
+        running = {}
+        failed = []
+        next_progress_log = time.monotonic() + PROGRESS_LOG_INTERVAL
+        try:
+            while pending or running:
+                while pending and len(running) < self.processes:
+                    db_alias = pending.pop(0)
+                    pillow_logging.info("Starting reindex of %s", db_alias)
+                    running[db_alias] = subprocess.Popen(self.get_worker_command(db_alias, self.reset))
+                time.sleep(WORKER_POLL_INTERVAL)
+                for db_alias, process in list(running.items()):
+                    returncode = process.poll()
+                    if returncode is None:
+                        continue
+                    del running[db_alias]
+                    if returncode:
+                        pillow_logging.error("Reindex of %s failed with exit code %s", db_alias, returncode)
+                        failed.append(db_alias)
+                    else:
+                        pillow_logging.info("Finished reindex of %s", db_alias)
+                if time.monotonic() > next_progress_log:
+                    progress = self.get_progress()
+                    pillow_logging.info("Reindexed %s of ~%s docs", progress['visited'], progress['total'])
+                    next_progress_log = time.monotonic() + PROGRESS_LOG_INTERVAL
+        finally:
+            for process in running.values():
+                process.terminate()
+        return failed
@@ -0,0 +1,46 @@
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from pillowtop.exceptions import PillowConfigError
+from pillowtop.pillow.interface import AdaptiveChunkSize
+
+
+class TestAdaptiveChunkSize(SimpleTestCase):
+
+    def test_grows_with_lag(self):
+        chunk_size = AdaptiveChunkSize(10, 50)
+        self.assertEqual(chunk_size.size, 10)
+        self.assertEqual(chunk_size.update(lag=120, processing_time=1), 20)
+        self.assertEqual(chunk_size.update(lag=120, processing_time=1), 40)
+        self.assertEqual(chunk_size.update(lag=120, processing_time=1), 50)
+
+    def test_shrinks_near_head_of_feed(self):
+        chunk_size = AdaptiveChunkSize(10, 80)
+        chunk_size.size = 80
+        self.assertEqual(chunk_size.update(lag=1, processing_time=1), 40)
+        self.assertEqual(chunk_size.update(lag=1, processing_time=1), 20)
+        self.assertEqual(chunk_size.update(lag=1, processing_time=1), 10)
+        self.assertEqual(chunk_size.update(lag=1, processing_time=1), 10)
+
+    def test_unchanged_with_moderate_lag(self):
+        chunk_size = AdaptiveChunkSize(10, 80)
+        chunk_size.size = 40
+        self.assertEqual(chunk_size.update(lag=30, processing_time=1), 40)
+
+    def test_shrinks_when_processing_is_slow(self):
+        chunk_size = AdaptiveChunkSize(10, 80)
+        chunk_size.size = 80
+        self.assertEqual(chunk_size.update(lag=120, processing_time=60), 40)
+
+    def test_shrinks_when_memory_is_exceeded(self):
+        chunk_size = AdaptiveChunkSize(10, 80, max_memory=1000)
+        chunk_size.size = 80
+        with patch.object(AdaptiveChunkSize, '_is_memory_exceeded', return_value=True):
+            self.assertEqual(chunk_size.update(lag=120, processing_time=1), 40)
+
+    def test_max_memory_requires_psutil(self):
+        with patch('pillowtop.pillow.interface.psutil', None):
+            with self.assertRaises(PillowConfigError):
+                AdaptiveChunkSize(10, 80, max_memory=1000)
+            AdaptiveChunkSize(10, 80)  # no error without max_memory
@@ -20,8 +20,10 @@ from corehq.util.es.interface import ElasticsearchInterface
 from corehq.util.test_utils import trap_extra_setup, create_and_save_a_case
 from pillowtop.es_utils import initialize_index_and_mapping
 from pillowtop.feed.interface import Change, ChangeMeta
-from pillowtop.pillow.interface import PillowBase
+from pillowtop.feed.mock import MockChangeFeed
+from pillowtop.pillow.interface import ConstructedPillow, PillowBase
 from pillowtop.processors.elastic import BulkElasticProcessor
+from pillowtop.processors.sample import ChunkedCountProcessor, TestProcessor
 from pillowtop.tests.utils import TEST_INDEX_INFO
 from pillowtop.utils import bulk_fetch_changes_docs, get_errors_with_ids
 
@@ -43,6 +45,79 @@ class BulkTest(SimpleTestCase):
             [(3, 'a'), (2, 'b'), (4, 'a'), (1, 'b')]
         )
 
+    @patch('pillowtop.pillow.interface.metrics_counter')
+    def test_coalesce_changes(self, metrics_counter):
+        changes = [
+            Change(doc_id, seq, metadata=ChangeMeta(
+                document_id=doc_id, data_source_type=SOURCE_COUCH, data_source_name='test'
+            ))
+            for seq, doc_id in enumerate(['a', 'b', 'a', 'c', 'a', 'b'])
+        ]
+        processor = TestProcessor()
+        pillow = ConstructedPillow(
+            name='test-coalesce-changes',
+            checkpoint=None,
+            change_feed=MockChangeFeed(changes),
+            processor=processor,
+            coalesce_window=60,
+        )
+        pillow.process_changes(since=0, forever=False)
+        self.assertEqual(
+            [(change.id, change.sequence_id) for change in processor.changes_seen],
+            [('c', 3), ('a', 4), ('b', 5)]
+        )
+        metrics_counter.assert_any_call(
+            'commcare.change_feed.changes.coalesced', 3, tags={'pillow_name': 'test-coalesce-changes'}
+        )
+
+    @patch('pillowtop.pillow.interface.metrics_counter')
+    def test_serial_processors_get_every_change_without_coalesce_window(self, metrics_counter):
+        changes = self._get_changes(['a', 'b', 'a', 'c', 'a', 'b'])
+        processor = TestProcessor()
+        pillow = ConstructedPillow(
+            name='test-no-coalesce-window',
+            checkpoint=None,
+            change_feed=MockChangeFeed(changes),
+            processor=[ChunkedCountProcessor(), processor],
+            processor_chunk_size=3,
+        )
+        pillow.process_changes(since=0, forever=False)
+        # as before coalescing: serial processors get the changes of each
+        # chunk that the batch processors get, deduplicated by chunk
+        self.assertEqual(
+            [(change.id, change.sequence_id) for change in processor.changes_seen],
+            [('b', 1), ('a', 2), ('c', 3), ('a', 4), ('b', 5)]
+        )
+        coalesced_calls = [
+            call for call in metrics_counter.call_args_list
+            if call.args[0] == 'commcare.change_feed.changes.coalesced'
+        ]
+        self.assertEqual(coalesced_calls, [])
+
+    def test_serial_processors_without_batch_processors_or_coalesce_window(self):
+        changes = self._get_changes(['a', 'b', 'a'])
+        processor = TestProcessor()
+        pillow = ConstructedPillow(
+            name='test-serial-processors',
+            checkpoint=None,
+            change_feed=MockChangeFeed(changes),
+            processor=processor,
+            processor_chunk_size=3,
+        )
+        pillow.process_changes(since=0, forever=False)
+        self.assertEqual(
+            [(change.id, change.sequence_id) for change in processor.changes_seen],
+            [('a', 0), ('b', 1), ('a', 2)]
+        )
+
+    def _get_changes(self, doc_ids):
+        return [
+            Change(doc_id, seq, metadata=ChangeMeta(
+                document_id=doc_id, data_source_type=SOURCE_COUCH, data_source_name='test'
+            ))
+            for seq, doc_id in enumerate(doc_ids)
+        ]
+
     def test_get_errors_with_ids(self):
         errors = get_errors_with_ids([
             {'index': {'_id': 1, 'status': 500, 'error': 'e1'}},
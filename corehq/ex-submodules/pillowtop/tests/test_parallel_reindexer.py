@@ -0,0 +1,79 @@
+from unittest.mock import Mock, call, patch
+
+from django.test import SimpleTestCase
+
+from pillowtop.reindexer.reindexer import ParallelResumableReindexer
+
+
+@patch('pillowtop.reindexer.reindexer.WORKER_POLL_INTERVAL', 0)
+@patch('pillowtop.reindexer.reindexer.prepare_index_for_usage')
+@patch('pillowtop.reindexer.reindexer.prepare_index_for_reindex')
+@patch('pillowtop.reindexer.reindexer.subprocess.Popen')
+class ParallelResumableReindexerTest(SimpleTestCase):
+
+    def get_reindexer(self, index_exists=True, has_started=False, reset=False, processes=2):
+        self.es = Mock()
+        self.es.indices.exists.return_value = index_exists
+        reindexers = {
+            db_alias: Mock(es=self.es, index_info=Mock(), pillow=None, **{
+                'has_started.return_value': has_started,
+            })
+            for db_alias in ['p1', 'p2', 'p3']
+        }
+        self.get_worker_command = Mock(side_effect=lambda db_alias, reset: ['reindex', db_alias])
+        return ParallelResumableReindexer(reindexers, self.get_worker_command, processes, reset=reset)
+
+    def test_new_reindex(self, Popen, prepare_index_for_reindex, prepare_index_for_usage):
+        Popen.return_value.poll.return_value = 0
+        self.get_reindexer().reindex()
+        prepare_index_for_reindex.assert_called_once()
+        prepare_index_for_usage.assert_called_once()
+        self.assertEqual(self.get_worker_command.call_args_list, [
+            call('p1', False),
+            call('p2', False),
+            call('p3', False),
+        ])
+        self.assertEqual(Popen.call_args_list, [
+            call(['reindex', 'p1']),
+            call(['reindex', 'p2']),
+            call(['reindex', 'p3']),
+        ])
+
+    def test_resumed_reindex(self, Popen, prepare_index_for_reindex, prepare_index_for_usage):
+        Popen.return_value.poll.return_value = 0
+        self.get_reindexer(has_started=True).reindex()
+        prepare_index_for_reindex.assert_not_called()
+        self.assertEqual([args.args[1] for args in self.get_worker_command.call_args_list], [False] * 3)
+
+    def test_reset_when_index_is_missing(self, Popen, prepare_index_for_reindex, prepare_index_for_usage):
+        Popen.return_value.poll.return_value = 0
+        self.get_reindexer(index_exists=False, has_started=True).reindex()
+        prepare_index_for_reindex.assert_called_once()
+        self.assertEqual([args.args[1] for args in self.get_worker_command.call_args_list], [True] * 3)
+
+    def test_reset(self, Popen, prepare_index_for_reindex, prepare_index_for_usage):
+        Popen.return_value.poll.return_value = 0
+        self.get_reindexer(has_started=True, reset=True).reindex()
+        prepare_index_for_reindex.assert_called_once()
+        self.assertEqual([args.args[1] for args in self.get_worker_command.call_args_list], [True] * 3)
+
+    def test_at_most_processes_workers(self, Popen, prepare_index_for_reindex, prepare_index_for_usage):
+        running = []
+
+        def start_worker(command):
+            process = Mock()
+            process.poll.side_effect = lambda: running.remove(process) or 0
+            running.append(process)
+            self.assertLessEqual(len(running), 2)
+            return process
+
+        Popen.side_effect = start_worker
+        self.get_reindexer(processes=2).reindex()
+        self.assertEqual(Popen.call_count, 3)
+
+    def test_failed_worker(self, Popen, prepare_index_for_reindex, prepare_index_for_usage):
+        processes = {'p1': 0, 'p2': 1, 'p3': 0}
+        Popen.side_effect = lambda command: Mock(**{'poll.return_value': processes[command[1]]})
+        with self.assertRaisesRegex(Exception, 'Reindex failed for databases: p2'):
+            self.get_reindexer().reindex()
+        prepare_index_for_usage.assert_not_called()
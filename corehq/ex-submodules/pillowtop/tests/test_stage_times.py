@@ -0,0 +1,88 @@
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from pillowtop.feed.interface import Change
+from pillowtop.feed.mock import MockChangeFeed
+from pillowtop.pillow.interface import ConstructedPillow
+from pillowtop.pillow.stage_times import (
+    TOTAL,
+    StageTimes,
+    _get_client,
+    _get_summary_key,
+    get_stage_time_summaries,
+)
+from pillowtop.processors.sample import CountingProcessor, TestProcessor
+
+PILLOW_NAME = 'test-stage-times-pillow'
+
+
+class TestStageTimes(SimpleTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(_get_client().delete, _get_summary_key(PILLOW_NAME))
+        self.processor = CountingProcessor()
+        self.stage_times = StageTimes(PILLOW_NAME, process_num=1)
+        self.processor.stage_times = self.stage_times
+
+    def process(self, change):
+        with self.stage_times.timer(self.processor, TOTAL):
+            with self.processor.time_stage('extract'):
+                pass
+            with self.processor.time_stage('load'):
+                pass
+
+    def test_time_stage_without_pillow(self):
+        with CountingProcessor().time_stage('extract'):
+            pass
+
+    @patch('pillowtop.pillow.stage_times.metrics_histogram')
+    def test_record(self, metrics_histogram):
+        change = Change(id='abc', sequence_id=None, topic='case-sql', partition=3)
+        self.process(change)
+        self.stage_times.record([change])
+        self.assertEqual(
+            sorted(call.kwargs['tags']['stage'] for call in metrics_histogram.call_args_list),
+            ['extract', 'load', TOTAL],
+        )
+        self.assertEqual(self.stage_times.times, {})
+        self.assertEqual(get_stage_time_summaries(PILLOW_NAME), [])
+
+    @patch('pillowtop.pillow.stage_times.metrics_histogram')
+    @patch('pillowtop.pillow.stage_times.SUMMARY_WINDOW', 0)
+    def test_summary(self, metrics_histogram):
+        changes = [
+            Change(id='abc', sequence_id=None, topic='case-sql', partition=3),
+            Change(id='def', sequence_id=None, topic='case-sql', partition=4),
+        ]
+        for change in changes:
+            self.process(change)
+        self.stage_times.record(changes)
+
+        summary, = get_stage_time_summaries(PILLOW_NAME)
+        self.assertEqual(summary['process_num'], 1)
+        self.assertEqual(summary['changes'], 2)
+        self.assertEqual(summary['partitions'], ['case-sql,3', 'case-sql,4'])
+        self.assertEqual(
+            [(stage['processor'], stage['stage']) for stage in summary['stages']],
+            [('CountingProcessor', 'extract'), ('CountingProcessor', 'load'), ('CountingProcessor', TOTAL)],
+        )
+        self.assertIn(summary['slowest_stage']['stage'], ['extract', 'load'])
+
+    @patch('pillowtop.pillow.stage_times.metrics_histogram')
+    @patch('pillowtop.pillow.stage_times.SUMMARY_WINDOW', 0)
+    def test_summary_redis_error(self, metrics_histogram):
+        changes = [Change(id=doc_id, sequence_id=seq) for seq, doc_id in enumerate(['abc', 'def'])]
+        processor = TestProcessor()
+        pillow = ConstructedPillow(
+            name=PILLOW_NAME,
+            checkpoint=None,
+            change_feed=MockChangeFeed(changes),
+            processor=processor,
+        )
+        with patch('pillowtop.pillow.stage_times._get_client') as get_client:
+            get_client.return_value.hset.side_effect = ConnectionError
+            pillow.process_changes(since=0, forever=False)
+        self.assertEqual([change.id for change in processor.changes_seen], ['abc', 'def'])
+        self.assertEqual(get_client.return_value.hset.call_count, 2)
@@ -145,12 +145,16 @@ def safe_force_seq_int(seq, default=None):
         return default
 
 
-def get_all_pillows_json(active_only=True):
+def _get_pillow_configs(active_only):
     pillow_configs = get_all_pillow_configs()
     active_pillows = getattr(settings, 'ACTIVE_PILLOW_NAMES', None)
     if active_only and active_pillows:
         pillow_configs = [config for config in pillow_configs if config.name in active_pillows]
+    return pillow_configs
+
 
+def get_all_pillows_json(active_only=True):
+    pillow_configs = _get_pillow_configs(active_only)
     consumer = get_kafka_consumer()
     with consumer:
         return [get_pillow_json(pillow_config, consumer) for pillow_config in pillow_configs]
@@ -211,6 +215,64 @@ def get_pillow_json(pillow_config, consumer=None):
     }
 
 
+def get_all_pillows_status(active_only=True):
+    pillow_configs = _get_pillow_configs(active_only)
+    consumer = get_kafka_consumer()
+    with consumer:
+        return [get_pillow_status(pillow_config, consumer) for pillow_config in pillow_configs]
+
+
+def get_pillow_status(pillow_config, consumer):
+    """Get the offset lag of each Kafka partition of a pillow, and the
+    processing rate and stage times of each of its processes
+
+    Partitions are processed by the process whose stage time summary
+    lists them, if any.
+    """
+    from kafka.common import TopicPartition
+    from pillowtop.models import KafkaCheckpoint
+    from pillowtop.pillow.stage_times import get_stage_time_summaries
+
+    pillow = pillow_config.get_instance()
+    processes = get_stage_time_summaries(pillow.get_name())
+    process_nums = {
+        partition: summary['process_num']
+        for summary in processes
+        for partition in summary['partitions']
+    }
+
+    checkpoints = []
+    if pillow.checkpoint is not None and pillow.checkpoint.sequence_format == 'json':
+        checkpoints = list(
+            KafkaCheckpoint.objects
+            .filter(checkpoint_id=pillow.checkpoint.checkpoint_id)
+            .order_by('topic', 'partition')
+        )
+    latest_offsets = consumer.end_offsets([
+        TopicPartition(checkpoint.topic, checkpoint.partition) for checkpoint in checkpoints
+    ]) if checkpoints else {}
+
+    partitions = []
+    for checkpoint in checkpoints:
+        latest_offset = latest_offsets.get(TopicPartition(checkpoint.topic, checkpoint.partition))
+        partitions.append({
+            'topic': checkpoint.topic,
+            'partition': checkpoint.partition,
+            'offset': checkpoint.offset,
+            'latest_offset': latest_offset,
+            'lag': max(latest_offset - checkpoint.offset, 0) if latest_offset is not None else None,
+            'last_modified': checkpoint.last_modified,
+            'process_num': process_nums.get('{},{}'.format(checkpoint.topic, checkpoint.partition)),
+        })
+    return {
+        'name': pillow_config.name,
+        'lag': sum(partition['lag'] or 0 for partition in partitions),
+        'rate': sum(summary['rate'] for summary in processes),
+        'partitions': partitions,
+        'processes': processes,
+    }
+
+
 ChangeError = namedtuple('ChangeError', 'change exception')
 
 
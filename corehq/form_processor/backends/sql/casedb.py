@@ -1,7 +1,12 @@
+import redis
+
 from casexml.apps.case.exceptions import IllegalCaseId
 from corehq.form_processor.backends.sql.update_strategy import SqlCaseUpdateStrategy
+from corehq.form_processor.case_locks import record_case_lock_wait
 from corehq.form_processor.casedb_base import AbstractCaseDbCache
 from corehq.form_processor.models import CommCareCase
+from corehq.util.metrics import metrics_counter
+from dimagi.utils.couch import acquire_lock, release_lock
 
 
 class CaseDbCacheSQL(AbstractCaseDbCache):
@@ -25,7 +30,15 @@ class CaseDbCacheSQL(AbstractCaseDbCache):
 
     def get_cases_for_saving(self, now):
         cases = self.get_changed()
+        self.check_cases_not_modified(cases)
+        for case in cases:
+            case.server_modified_on = now
+        return cases
 
+    def check_cases_not_modified(self, cases):
+        """Check that saved cases have not been modified by another process
+        since they were loaded
+        """
         saved_case_ids = [case.case_id for case in cases if case.is_saved()]
         cases_modified_on = CommCareCase.objects.get_last_modified_dates(self.domain, saved_case_ids)
         for case in cases:
@@ -35,8 +48,47 @@ class CaseDbCacheSQL(AbstractCaseDbCache):
                     "Aborting because the case has been modified by another process: "
                     "case={}, {} != {}".format(case.case_id, case.server_modified_on, modified_on)
                 )
-            case.server_modified_on = now
-        return cases
+
+    def mark_new_cases(self, case_ids):
+        """Check in bulk which of the given cases do not exist in any
+        domain, so that `get` returns None for them without locking or
+        fetching them one by one
+
+        Locking a case that does not exist does not protect it, since
+        the lock is released as soon as the case is not found.
+        """
+        case_ids = set(case_ids) - set(self.cache) - self._new_case_ids
+        if case_ids:
+            existing_ids = CommCareCase.objects.get_case_ids_that_exist(None, list(case_ids))
+            self._new_case_ids.update(case_ids.difference(existing_ids))
+            metrics_counter('commcare.case_lock.skipped_new_cases', len(case_ids) - len(existing_ids))
+
+    def lock_and_populate(self, case_ids):
+        """Lock and load a set of cases in bulk
+
+        Like `get` with `lock=True`, only existing cases are locked, and
+        cases are loaded without a lock if it cannot be acquired. Locks
+        are acquired in sorted order to avoid deadlocks between
+        processes locking overlapping sets of cases.
+        """
+        assert self.lock
+        self.mark_new_cases(case_ids)
+        case_ids = sorted(set(case_ids) - set(self.cache) - self._new_case_ids)
+        locks = []
+        try:
+            for case_id in case_ids:
+                lock = CommCareCase.get_obj_lock_by_id(case_id)
+                try:
+                    with record_case_lock_wait(self.domain, case_id):
+                        locks.append(acquire_lock(lock, degrade_gracefully=False, blocking=True))
+                except redis.RedisError:
+                    pass
+            self.populate(case_ids)
+        except Exception:
+            for lock in locks:
+                release_lock(lock, degrade_gracefully=True)
+            raise
+        self.locks.extend(locks)
 
     def get_reverse_indexed_cases(self, case_ids, case_types=None, is_closed=None):
         return CommCareCase.objects.get_reverse_indexed_cases(
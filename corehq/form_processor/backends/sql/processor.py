@@ -11,9 +11,10 @@ from lxml import etree
 from casexml.apps.case import const
 from casexml.apps.case.xform import get_case_updates
 from corehq.form_processor.backends.sql.update_strategy import SqlCaseUpdateStrategy
+from corehq.form_processor.case_locks import get_locked_case
 from corehq.form_processor.backends.sql.dbaccessors import LedgerAccessorSQL
 from corehq.form_processor.change_publishers import (
-    publish_form_saved, publish_case_saved, publish_ledger_v2_saved)
+    publish_form_saved, publish_case_saved, publish_forms_and_cases_saved, publish_ledger_v2_saved)
 from corehq.form_processor.exceptions import CaseNotFound, KafkaPublishingError
 from corehq.form_processor.interfaces.processor import CaseUpdateMetadata
 from corehq.form_processor.models import (
@@ -129,10 +130,7 @@ class FormProcessorSQL(object):
                         if SqlCaseUpdateStrategy(case).reconcile_transactions_if_necessary():
                             case.save(with_tracked_models=True)
         except DatabaseError:
-            for model in all_models:
-                setattr(model, model._meta.pk.attname, None)
-                for tracked in model.create_models:
-                    setattr(tracked, tracked._meta.pk.attname, None)
+            _clear_primary_keys(all_models)
             raise
 
         try:
@@ -140,6 +138,37 @@ class FormProcessorSQL(object):
         except Exception as e:
             raise KafkaPublishingError(e)
 
+    @classmethod
+    def save_new_forms_and_cases(cls, forms, cases):
+        """Save a batch of new forms and the cases they updated
+
+        All models are saved in one transaction on each database, and
+        changes are published to Kafka together.
+        """
+        db_names = {form.db for form in forms} | {case.db for case in cases}
+        try:
+            with ExitStack() as stack:
+                for db_name in db_names:
+                    stack.enter_context(transaction.atomic(db_name))
+                for form in forms:
+                    XFormInstance.objects.save_new_form(form)
+                for case in cases:
+                    case.save(with_tracked_models=True)
+
+            if cases and toggles.SORT_OUT_OF_ORDER_FORM_SUBMISSIONS_SQL.enabled(
+                    forms[0].domain, toggles.NAMESPACE_DOMAIN):
+                for case in cases:
+                    if SqlCaseUpdateStrategy(case).reconcile_transactions_if_necessary():
+                        case.save(with_tracked_models=True)
+        except DatabaseError:
+            _clear_primary_keys(chain(forms, cases))
+            raise
+
+        try:
+            publish_forms_and_cases_saved(forms, cases)
+        except Exception as e:
+            raise KafkaPublishingError(e)
+
     @staticmethod
     def publish_changes_to_kafka(processed_forms, cases, stock_result):
         publish_form_saved(processed_forms.submitted)
@@ -249,7 +278,9 @@ class FormProcessorSQL(object):
                     )
         else:
             xform = xforms[0]
-            for case_update in get_case_updates(xform):
+            case_updates = get_case_updates(xform)
+            case_db.mark_new_cases([update.id for update in case_updates if update.creates_case()])
+            for case_update in case_updates:
                 case_update_meta = case_db.get_case_from_case_update(case_update, xform)
                 if case_update_meta.case:
                     case_id = case_update_meta.case.case_id
@@ -272,7 +303,7 @@ class FormProcessorSQL(object):
             # only record metric if locking since otherwise it has been
             # (most likley) recorded elsewhere
             case_load_counter("rebuild_case", domain)()
-        case, lock_obj = FormProcessorSQL.get_case_with_lock(case_id, lock=lock)
+        case, lock_obj = FormProcessorSQL.get_case_with_lock(case_id, lock=lock, domain=domain)
         found = bool(case)
         if not found:
             case = CommCareCase(case_id=case_id, domain=domain)
@@ -321,11 +352,11 @@ class FormProcessorSQL(object):
         return CaseTransaction.objects.exists_for_form(form_id)
 
     @staticmethod
-    def get_case_with_lock(case_id, lock=False, wrap=False):
+    def get_case_with_lock(case_id, lock=False, wrap=False, domain=None):
         try:
             if lock:
                 try:
-                    return CommCareCase.get_locked_obj(_id=case_id)
+                    return get_locked_case(case_id, domain)
                 except redis.RedisError:
                     case = CommCareCase.objects.get_case(case_id)
             else:
@@ -334,3 +365,10 @@ class FormProcessorSQL(object):
             return None, None
 
         return case, None
+
+
+def _clear_primary_keys(models):
+    for model in models:
+        setattr(model, model._meta.pk.attname, None)
+        for tracked in model.create_models:
+            setattr(tracked, tracked._meta.pk.attname, None)
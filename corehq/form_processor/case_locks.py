@@ -0,0 +1,106 @@
+"""Case lock contention tracking
+
+Form processing locks each existing case updated by a form. The time
+spent waiting for case locks is recorded in the
+``commcare.case_lock.wait_time`` histogram. Cases with a lock that took
+longer than `HOT_CASE_WAIT_THRESHOLD` to acquire are counted per domain
+in redis, so the most contended ("hot") cases of a domain can be listed
+with the ``hot_cases`` management command.
+"""
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+from dimagi.utils.couch import LockManager, acquire_lock, get_redis_client, release_lock
+
+from corehq.util.metrics import metrics_histogram
+
+from .models import CommCareCase
+
+# lock waits longer than this (in seconds) are recorded as contention
+HOT_CASE_WAIT_THRESHOLD = 0.5
+# hot cases are tracked for this long (in seconds) after the last
+# contended lock in the domain
+HOT_CASES_TIMEOUT = 7 * 24 * 60 * 60  # 1 week
+# maximum number of hot cases tracked per domain
+HOT_CASES_LIMIT = 1000
+
+HotCase = namedtuple('HotCase', 'case_id contended_count total_wait')
+
+
+def get_locked_case(case_id, domain=None):
+    """Lock and get a case, recording the time spent waiting for the lock
+
+    Same as `CommCareCase.get_locked_obj(_id=case_id)`.
+
+    :returns: `LockManager(case, lock)`
+    :raises: `CaseNotFound`, `RedisError` if the lock is not acquired.
+    """
+    lock = CommCareCase.get_obj_lock_by_id(case_id)
+    with record_case_lock_wait(domain, case_id):
+        lock = acquire_lock(lock, degrade_gracefully=False, blocking=True)
+    try:
+        return LockManager(CommCareCase.objects.get_case(case_id), lock)
+    except:  # noqa: E722
+        release_lock(lock, degrade_gracefully=False)
+        raise
+
+
+@contextmanager
+def record_case_lock_wait(domain, case_id):
+    start = time.time()
+    try:
+        yield
+    finally:
+        wait = time.time() - start
+        metrics_histogram(
+            'commcare.case_lock.wait_time', wait,
+            bucket_tag='duration', buckets=[0.01, 0.1, 0.5, 1, 5, 10, 30], bucket_unit='s',
+            tags={'domain': domain or 'unknown'},
+        )
+        if domain and wait >= HOT_CASE_WAIT_THRESHOLD:
+            record_hot_case(domain, case_id, wait)
+
+
+def record_hot_case(domain, case_id, wait):
+    count_key, wait_key = _get_hot_case_keys(domain)
+    client = get_redis_client().client.get_client()
+    pipeline = client.pipeline()
+    pipeline.zincrby(count_key, 1, case_id)
+    pipeline.zincrby(wait_key, wait, case_id)
+    for key in [count_key, wait_key]:
+        # keep only the most contended cases
+        pipeline.zremrangebyrank(key, 0, -HOT_CASES_LIMIT - 1)
+        pipeline.expire(key, HOT_CASES_TIMEOUT)
+    pipeline.execute()
+
+
+def get_hot_cases(domain, limit=20):
+    """Get the cases of a domain with the most lock wait time
+
+    :returns: List of `HotCase`, most contended first.
+    """
+    count_key, wait_key = _get_hot_case_keys(domain)
+    client = get_redis_client().client.get_client()
+    total_waits = client.zrevrange(wait_key, 0, limit - 1, withscores=True)
+    if not total_waits:
+        return []
+    pipeline = client.pipeline()
+    for case_id, total_wait in total_waits:
+        pipeline.zscore(count_key, case_id)
+    counts = pipeline.execute()
+    return [
+        HotCase(case_id.decode('utf-8'), int(count or 0), total_wait)
+        for (case_id, total_wait), count in zip(total_waits, counts)
+    ]
+
+
+def clear_hot_cases(domain):
+    get_redis_client().client.get_client().delete(*_get_hot_case_keys(domain))
+
+
+def _get_hot_case_keys(domain):
+    return (
+        'hot-cases:count:{}'.format(domain),
+        'hot-cases:wait:{}'.format(domain),
+    )
@@ -52,6 +52,8 @@ class AbstractCaseDbCache(metaclass=ABCMeta):
             raise ValueError('Currently locking only supports explicitly wrapping cases!')
         self.locks = []
         self._changed = set()
+        # ids of cases known not to exist (see `mark_new_cases`)
+        self._new_case_ids = set()
         # this is used to allow casedb to be re-entrant. Each new context pushes the parent context locks
         # onto this stack and restores them when the context exits
         self.lock_stack = []
@@ -91,6 +93,8 @@ class AbstractCaseDbCache(metaclass=ABCMeta):
             raise IllegalCaseId('case_id must not be empty')
         if case_id in self.cache:
             return self.cache[case_id]
+        if case_id in self._new_case_ids:
+            return None
 
         case, lock = self.processor_interface.get_case_with_lock(case_id, self.lock, self.wrap)
         if lock:
@@ -20,6 +20,17 @@ def change_meta_from_sql_form(form):
     )
 
 
+def publish_forms_and_cases_saved(forms, cases):
+    """Publish changes for a batch of saved forms and cases
+
+    Case post-save signals are not sent.
+    """
+    producer.send_changes(
+        [(topics.FORM_SQL, change_meta_from_sql_form(form)) for form in forms]
+        + [(topics.CASE_SQL, change_meta_from_sql_case(case)) for case in cases]
+    )
+
+
 def publish_form_deleted(domain, form_id):
     producer.send_change(topics.FORM_SQL, ChangeMeta(
         document_id=form_id,
@@ -0,0 +1,239 @@
+"""Bloom filter of form ids used to skip duplicate form lookups
+
+Every submitted form is checked for an existing form with the same id,
+which is a query on a partitioned database, although very few
+submissions are duplicates. The form id filter is a Bloom filter in
+redis containing the id of every saved form. If it does not contain a
+form id then there is no form with that id and the query is skipped.
+If it does, the form may exist and the database is queried.
+
+The filter covers all domains because duplicate form ids are checked
+across domains. It is enabled by setting `FORM_ID_FILTER_CAPACITY` to
+the expected number of forms, and is only used once it has been built
+with the ``rebuild_form_id_filter`` management command. Form ids are
+added to the filter whenever a form is saved with a new id. If a form id
+cannot be added to the filter it is no longer used until it is rebuilt.
+
+The filter is stored in the cache redis, so its keys can be evicted. All
+slice keys are created when the filter is built. A form id whose slice
+key is missing is treated as if the filter were unavailable, and a
+missing slice key found when adding form ids disables the filter until
+it is rebuilt.
+"""
+import hashlib
+import logging
+import math
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db.models import Q
+
+from redis.exceptions import RedisError
+
+from dimagi.utils.chunked import chunked
+from dimagi.utils.couch import get_redis_client
+
+from corehq.sql_db.util import paginate_query_across_partitioned_databases
+from corehq.util.metrics import metrics_counter
+
+# rate of false positives when the filter contains FORM_ID_FILTER_CAPACITY form ids
+ERROR_RATE = 0.01
+# the filter is split into this many redis keys
+NUM_SLICES = 256
+# forms saved this long before a rebuild started are added again after the
+# rebuild, in case they were saved in a transaction that was still open
+REBUILD_MARGIN = timedelta(hours=1)
+
+FILTER_KEY_PREFIX = 'form-id-filter'
+READY_KEY = 'form-id-filter:ready'
+
+log = logging.getLogger(__name__)
+
+
+def might_contain(form_id):
+    """Check if a form id may be in the filter
+
+    :returns: False if there is no form with the given id, True if
+    there may be one, or None if the filter cannot be used.
+    """
+    capacity, slice_bits, num_hashes = _get_config()
+    if not capacity:
+        return None
+    key, positions = _get_positions(form_id, slice_bits, num_hashes)
+    try:
+        pipeline = _get_client().pipeline(transaction=False)
+        pipeline.get(READY_KEY)
+        pipeline.exists(key)
+        for position in positions:
+            pipeline.getbit(key, position)
+        ready, key_exists, *bits = pipeline.execute()
+    except RedisError:
+        log.warning('Redis error checking form id filter for %s', form_id)
+        return None
+    if ready != str(capacity).encode('utf-8'):
+        return None
+    if not key_exists:
+        log.warning('Form id filter key %s is missing, the filter must be rebuilt', key)
+        return None
+    return all(bits)
+
+
+def is_duplicate(form_id, domain, check_database):
+    """Check if a form is a duplicate, skipping the database if possible
+
+    :param check_database: Function that returns true if the form exists
+    in the database.
+    """
+    filter_result = might_contain(form_id)
+    if filter_result is False:
+        _count_lookup(domain, 'skipped')
+        return False
+    exists = check_database()
+    if filter_result is None:
+        _count_lookup(domain, 'unavailable')
+    else:
+        _count_lookup(domain, 'duplicate' if exists else 'false_positive')
+    return exists
+
+
+def get_duplicate_ids(form_ids, domain, get_existing_ids):
+    """Get the ids of forms that exist, skipping the database if possible
+
+    :param get_existing_ids: Function that takes a list of form ids and
+    returns the ids of those that exist in the database. It is not
+    called with the ids that are not in the filter.
+    :returns: Set of form ids.
+    """
+    filter_results = {form_id: might_contain(form_id) for form_id in form_ids}
+    maybe_ids = [form_id for form_id, result in filter_results.items() if result is not False]
+    existing_ids = set(get_existing_ids(maybe_ids)) if maybe_ids else set()
+    for form_id, result in filter_results.items():
+        if result is False:
+            _count_lookup(domain, 'skipped')
+        elif result is None:
+            _count_lookup(domain, 'unavailable')
+        else:
+            _count_lookup(domain, 'duplicate' if form_id in existing_ids else 'false_positive')
+    return existing_ids
+
+
+def add_form_ids(form_ids):
+    capacity, slice_bits, num_hashes = _get_config()
+    if not capacity:
+        return
+    positions_by_key = defaultdict(list)
+    for form_id in form_ids:
+        key, positions = _get_positions(form_id, slice_bits, num_hashes)
+        positions_by_key[key].extend(positions)
+    if not positions_by_key:
+        return
+    try:
+        # a transaction, so keys are not evicted between being checked and set
+        pipeline = _get_client().pipeline(transaction=True)
+        pipeline.get(READY_KEY)
+        pipeline.exists(*positions_by_key)
+        for key, positions in positions_by_key.items():
+            for position in positions:
+                pipeline.setbit(key, position, 1)
+        ready, num_existing, *bits = pipeline.execute()
+    except RedisError:
+        log.warning('Redis error adding form ids to filter, the filter must be rebuilt')
+        _disable()
+        return
+    if ready is not None and num_existing < len(positions_by_key):
+        # setbit recreated evicted keys without the bits they had
+        log.warning('Form id filter keys are missing, the filter must be rebuilt')
+        _disable()
+
+
+def rebuild_filter(chunk_size=10000):
+    """Add the ids of all forms to a new filter
+
+    Forms saved while the filter is rebuilt are added to the new filter
+    when they are saved.
+
+    :returns: Number of form ids added.
+    """
+    capacity, slice_bits, num_hashes = _get_config()
+    assert capacity, "FORM_ID_FILTER_CAPACITY is not set"
+    client = _get_client()
+    pipeline = client.pipeline(transaction=True)
+    pipeline.delete(READY_KEY, *_get_slice_keys())
+    _create_slices(pipeline, slice_bits)
+    pipeline.execute()
+    start = datetime.utcnow()
+    count = _add_form_ids_matching(Q(), chunk_size)
+    _add_form_ids_matching(Q(server_modified_on__gte=start - REBUILD_MARGIN), chunk_size)
+    client.set(READY_KEY, str(capacity))
+    return count
+
+
+def _add_form_ids_matching(q_expression, chunk_size):
+    count = 0
+    form_ids = (row[0] for row in paginate_query_across_partitioned_databases(
+        _get_form_model(), q_expression, values=['form_id'], load_source='rebuild_form_id_filter'))
+    for chunk in chunked(form_ids, chunk_size):
+        add_form_ids(chunk)
+        count += len(chunk)
+    return count
+
+
+def _create_slices(pipeline, slice_bits):
+    """Create the slice keys that do not exist
+
+    Every slice key is created when the filter is built, so a missing
+    key means that it was evicted.
+    """
+    empty_slice = bytes(math.ceil(slice_bits / 8))
+    for key in _get_slice_keys():
+        pipeline.set(key, empty_slice, nx=True)
+
+
+def _disable():
+    try:
+        _get_client().delete(READY_KEY)
+    except RedisError:
+        log.error('Redis error disabling form id filter, the filter must be rebuilt')
+
+
+def _get_form_model():
+    from corehq.form_processor.models import XFormInstance
+    return XFormInstance
+
+
+def _count_lookup(domain, result):
+    metrics_counter('commcare.form_id_filter.lookups', tags={
+        'domain': domain or 'unknown',
+        'result': result,
+    })
+
+
+def _get_config():
+    """Get filter size for the configured capacity
+
+    :returns: `(capacity, slice_bits, num_hashes)`
+    """
+    capacity = getattr(settings, 'FORM_ID_FILTER_CAPACITY', None)
+    if not capacity:
+        return None, None, None
+    bits = math.ceil(-capacity * math.log(ERROR_RATE) / math.log(2) ** 2)
+    num_hashes = max(1, round(bits / capacity * math.log(2)))
+    return capacity, math.ceil(bits / NUM_SLICES), num_hashes
+
+
+def _get_positions(form_id, slice_bits, num_hashes):
+    """Get the filter key and bit positions of a form id"""
+    digest = hashlib.md5(form_id.encode('utf-8')).digest()
+    key = '{}:{}'.format(FILTER_KEY_PREFIX, digest[0] % NUM_SLICES)
+    hash1 = int.from_bytes(digest[1:8], 'big')
+    hash2 = int.from_bytes(digest[8:16], 'big') | 1
+    return key, [(hash1 + i * hash2) % slice_bits for i in range(num_hashes)]
+
+
+def _get_slice_keys():
+    return ['{}:{}'.format(FILTER_KEY_PREFIX, i) for i in range(NUM_SLICES)]
+
+
+def _get_client():
+    return get_redis_client().client.get_client()
@@ -13,6 +13,7 @@ from corehq.form_processor.exceptions import (
     XFormQuestionValueNotFound,
 )
 from memoized import memoized
+from .. import form_id_filter
 from ..models import XFormInstance
 from ..system_action import system_action
 
@@ -110,7 +111,11 @@ class FormProcessorInterface(object):
         Check if there is already a form with the given ID. If domain is specified only check for
         duplicates within that domain.
         """
-        return self.processor.is_duplicate(xform_id, domain=domain)
+        return form_id_filter.is_duplicate(
+            xform_id,
+            self.domain,
+            lambda: self.processor.is_duplicate(xform_id, domain=domain),
+        )
 
     def new_xform(self, form_json):
         return self.processor.new_xform(form_json)
@@ -215,7 +220,7 @@ class FormProcessorInterface(object):
         :return: tuple(case, lock). Either could be None
         :raises: IllegalCaseId
         """
-        return self.processor.get_case_with_lock(case_id, lock, wrap)
+        return self.processor.get_case_with_lock(case_id, lock, wrap, domain=self.domain)
 
 
 def _list_to_processed_forms_tuple(forms):
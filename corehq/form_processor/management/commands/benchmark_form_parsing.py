@@ -0,0 +1,90 @@
+import time
+import tracemalloc
+import uuid
+from types import SimpleNamespace
+
+from django.core.management import BaseCommand
+
+from lxml import etree
+
+from casexml.apps.case.mock import CaseBlock
+from casexml.apps.case.xform import extract_case_blocks
+from casexml.apps.stock.const import COMMTRACK_REPORT_XMLNS
+
+from corehq.form_processor.parsers.iterparse import iterparse_form
+from corehq.form_processor.parsers.ledgers.form import _get_ledger_blocks
+from corehq.form_processor.utils import convert_xform_to_json, get_simple_form_xml
+
+
+class Command(BaseCommand):
+    """Compare time and memory used to parse large forms with xml2json and iterparse
+
+    The generated form has a repeat group with a case block in each
+    entry, and a ledger block. Each mode parses the form as it is
+    parsed during form processing: xml2json parses the XML once to
+    create the form, once for `form.form_data`, and once to find ledger
+    blocks. Peak memory is measured with tracemalloc, which does not
+    include memory allocated by libxml2 for the XML tree.
+
+    Usage: ./manage.py benchmark_form_parsing --repeats 5000 --ledger-entries 1000
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeats', type=int, default=2000)
+        parser.add_argument('--ledger-entries', type=int, default=500)
+        parser.add_argument('--iterations', type=int, default=5)
+
+    def handle(self, repeats, ledger_entries, iterations, **options):
+        xml = get_large_form_xml(repeats, ledger_entries)
+        print("form size: {:.1f} MB".format(len(xml) / 1024 / 1024))
+        for name, parse in [('xml2json', _parse_xml2json), ('iterparse', _parse_iterparse)]:
+            start = time.perf_counter()
+            for x in range(iterations):
+                parse(xml)
+            duration = (time.perf_counter() - start) / iterations
+            tracemalloc.start()
+            parse(xml)
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print("{:<9} {:>8.3f}s per form {:>8.1f} MB peak".format(name, duration, peak / 1024 / 1024))
+
+
+def _parse_xml2json(xml):
+    convert_xform_to_json(xml)
+    form = SimpleNamespace(
+        form_data=convert_xform_to_json(xml),
+        get_xml_element=lambda: etree.fromstring(xml),
+    )
+    return extract_case_blocks(form), _get_ledger_blocks(form)
+
+
+def _parse_iterparse(xml):
+    parsed = iterparse_form(xml)
+    form = SimpleNamespace(
+        form_data=parsed.form_json,
+        _case_block_keys=parsed.case_block_keys,
+        _ledger_blocks=parsed.ledger_blocks,
+    )
+    return extract_case_blocks(form), _get_ledger_blocks(form)
+
+
+def get_large_form_xml(repeats, ledger_entries):
+    entries = ''.join(
+        '<child><name>child {i}</name><age>{age}</age>{case}</child>'.format(
+            i=i,
+            age=i % 18,
+            case=CaseBlock(uuid.uuid4().hex, create=True, case_type='child').as_text(),
+        )
+        for i in range(repeats)
+    )
+    ledger = (
+        '<balance xmlns="{xmlns}" entity-id="{case_id}" date="2026-10-18" section-id="stock">'
+        '{entries}</balance>'
+    )
+    ledger = ledger.format(
+        xmlns=COMMTRACK_REPORT_XMLNS,
+        case_id=uuid.uuid4().hex,
+        entries=''.join('<entry id="product-{}" quantity="{}"/>'.format(i, i) for i in range(ledger_entries)),
+    )
+    xml = get_simple_form_xml(uuid.uuid4().hex, case_id=uuid.uuid4().hex)
+    return xml.replace('</data>', '<children>{}</children>{}</data>'.format(entries, ledger))
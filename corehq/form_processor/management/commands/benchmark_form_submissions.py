@@ -0,0 +1,66 @@
+import time
+import uuid
+
+from django.core.management import BaseCommand
+
+from casexml.apps.case.mock import CaseBlock
+
+from corehq.apps.hqcase.utils import submit_case_block_batch, submit_case_blocks
+from corehq.apps.users.util import SYSTEM_USER_ID
+from corehq.form_processor.models import CommCareCase
+
+CASE_TYPE = 'submission-benchmark'
+
+
+class Command(BaseCommand):
+    """Compare throughput of single and batched system form submissions
+
+    Each form creates a case, then updates it. Forms are submitted to
+    the given domain and the created cases are hard deleted afterwards.
+    Do not run this on a production domain.
+
+    Usage: ./manage.py benchmark_form_submissions my-test-domain --forms 1000
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('domain')
+        parser.add_argument('--forms', type=int, default=500)
+        parser.add_argument('--batch-size', type=int, default=100)
+
+    def handle(self, domain, forms, batch_size, **options):
+        case_ids = []
+        try:
+            for name, submit in [('single', _submit_single), ('batch', _submit_batch)]:
+                blocks = _get_case_block_lists(forms)
+                case_ids.extend(block[0].case_id for block in blocks)
+                start = time.perf_counter()
+                submit(domain, blocks, batch_size)
+                duration = time.perf_counter() - start
+                print("{:<6} {:>6} forms {:>8.2f}s {:>8.1f} forms/s".format(
+                    name, forms, duration, forms / duration))
+        finally:
+            CommCareCase.objects.hard_delete_cases(domain, case_ids)
+
+
+def _get_case_block_lists(num_forms):
+    """Half of the forms create a case, the other half update one"""
+    case_ids = [uuid.uuid4().hex for x in range((num_forms + 1) // 2)]
+    blocks = [CaseBlock(case_id, create=True, case_type=CASE_TYPE, owner_id=SYSTEM_USER_ID)
+              for case_id in case_ids]
+    blocks.extend(CaseBlock(case_id, update={'visits': '1'}) for case_id in case_ids)
+    return [[block] for block in blocks[:num_forms]]
+
+
+def _submit_single(domain, case_block_lists, batch_size):
+    for case_blocks in case_block_lists:
+        submit_case_blocks([block.as_text() for block in case_blocks], domain, max_wait=None)
+
+
+def _submit_batch(domain, case_block_lists, batch_size):
+    for start in range(0, len(case_block_lists), batch_size):
+        submit_case_block_batch(
+            [[block.as_text() for block in case_blocks]
+             for case_blocks in case_block_lists[start:start + batch_size]],
+            domain,
+            max_wait=None,
+        )
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from corehq.form_processor.case_locks import (
+    HOT_CASE_WAIT_THRESHOLD,
+    clear_hot_cases,
+    get_hot_cases,
+)
+from corehq.form_processor.models import CommCareCase
+
+
+class Command(BaseCommand):
+    help = (
+        "List the cases in a domain with the most case lock contention during "
+        "form processing. A lock is contended if it took longer than "
+        "{} seconds to acquire.".format(HOT_CASE_WAIT_THRESHOLD)
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('domain')
+        parser.add_argument('--limit', type=int, default=20)
+        parser.add_argument('--clear', action='store_true', help='Reset contention counts for the domain.')
+
+    def handle(self, domain, limit, clear, **options):
+        if clear:
+            clear_hot_cases(domain)
+            return
+        hot_cases = get_hot_cases(domain, limit)
+        if not hot_cases:
+            print('No case lock contention recorded for {}'.format(domain))
+            return
+        case_types = {
+            case.case_id: case.type
+            for case in CommCareCase.objects.get_cases([hot.case_id for hot in hot_cases], domain)
+        }
+        print('case_id\t\t\t\t\tcase_type\tcontended\ttotal wait (s)')
+        for hot in hot_cases:
+            print('{}\t{}\t{}\t\t{:.1f}'.format(
+                hot.case_id, case_types.get(hot.case_id, '?'), hot.contended_count, hot.total_wait))
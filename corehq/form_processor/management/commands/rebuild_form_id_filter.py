@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from corehq.form_processor.form_id_filter import rebuild_filter
+
+
+class Command(BaseCommand):
+    help = (
+        "Build the Bloom filter of form ids used to skip duplicate form "
+        "lookups during form processing. Duplicate checks use the database "
+        "until the filter has been built. Rebuild it after changing "
+        "FORM_ID_FILTER_CAPACITY."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=10000)
+
+    def handle(self, chunk_size, **options):
+        if not getattr(settings, 'FORM_ID_FILTER_CAPACITY', None):
+            raise CommandError('FORM_ID_FILTER_CAPACITY is not set')
+        count = rebuild_filter(chunk_size)
+        print('Added {} form ids to the filter'.format(count))
+        if count > settings.FORM_ID_FILTER_CAPACITY:
+            print('WARNING: there are more forms than FORM_ID_FILTER_CAPACITY, '
+                  'so more duplicate lookups will be false positives')
@@ -126,12 +126,15 @@ class CommCareCaseManager(RequireDBManager):
         return cases[0]
 
     def get_case_ids_that_exist(self, domain, case_ids):
+        """Get the subset of the given case ids that exist in the domain,
+        or in any domain if ``domain`` is None
+        """
         result = []
         for db_name, case_ids_chunk in split_list_by_db_partition(case_ids):
-            result.extend(CommCareCase.objects
-                          .using(db_name)
-                          .filter(domain=domain, case_id__in=case_ids_chunk)
-                          .values_list('case_id', flat=True))
+            query = CommCareCase.objects.using(db_name).filter(case_id__in=case_ids_chunk)
+            if domain is not None:
+                query = query.filter(domain=domain)
+            result.extend(query.values_list('case_id', flat=True))
         return result
 
     def get_case_ids_in_domain(self, domain, type=None):
@@ -37,6 +37,7 @@ from ..exceptions import (
     XFormNotFound,
     XFormSaveError,
 )
+from ..form_id_filter import add_form_ids
 from ..submission_process_tracker import unfinished_archive
 from ..system_action import system_action
 from ..track_related import TrackRelatedChanges
@@ -72,6 +73,15 @@ class XFormInstanceManager(RequireDBManager):
             query = query.filter(domain=domain)
         return query.exists()
 
+    def get_form_ids_that_exist(self, form_ids):
+        """Get the subset of the given form ids that exist in any domain"""
+        result = []
+        for db_name, form_ids_chunk in split_list_by_db_partition(form_ids):
+            result.extend(self.using(db_name)
+                          .filter(form_id__in=form_ids_chunk)
+                          .values_list('form_id', flat=True))
+        return result
+
     def get_forms(self, form_ids, domain=None, ordered=False):
         """
         :param form_ids: list of form_ids to fetch
@@ -500,6 +510,13 @@ class XFormInstance(PartitionedModel, models.Model, RedisLockableMixIn,
     def form_id_updated(self):
         return self.__original_form_id != self.form_id
 
+    def save(self, *args, **kw):
+        if not self.is_saved() or self.form_id_updated():
+            # before saving so that a duplicate is found if the form is
+            # submitted again before the transaction is committed
+            add_form_ids([self.form_id])
+        super().save(*args, **kw)
+
     @property
     def original_form_id(self):
         """Form ID before it was updated"""
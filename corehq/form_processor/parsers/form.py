@@ -8,7 +8,10 @@ from django.conf import settings
 from corehq.form_processor.exceptions import MissingFormXml
 from corehq.form_processor.interfaces.processor import FormProcessorInterface
 from corehq.form_processor.models import Attachment, XFormInstance
+from corehq.form_processor.parsers.iterparse import iterparse_form
 from corehq.form_processor.utils import convert_xform_to_json, adjust_datetimes
+from corehq.form_processor.utils.metadata import scrub_form_meta
+from corehq.toggles import ITERPARSE_FORMS
 from corehq.util.soft_assert.api import soft_assert
 from couchforms import XMLSyntaxError
 from couchforms.exceptions import MissingXMLNSError
@@ -96,7 +99,12 @@ def _create_new_xform(domain, instance_xml, attachments=None, auth_context=None)
     interface = FormProcessorInterface(domain)
 
     assert attachments is not None
-    form_data = convert_xform_to_json(instance_xml)
+    if ITERPARSE_FORMS.enabled(domain):
+        parsed_form = iterparse_form(instance_xml)
+        form_data = parsed_form.form_json
+    else:
+        parsed_form = None
+        form_data = convert_xform_to_json(instance_xml)
     if not form_data.get('@xmlns'):
         raise MissingXMLNSError("Form is missing a required field: XMLNS")
 
@@ -105,6 +113,9 @@ def _create_new_xform(domain, instance_xml, attachments=None, auth_context=None)
     xform = interface.new_xform(form_data)
     xform.domain = domain
     xform.auth_context = auth_context
+    if parsed_form is not None:
+        scrub_form_meta(xform.form_id, form_data)
+        parsed_form.prime(xform)
 
     # Maps all attachments to uniform format and adds form.xml to list before storing
     attachments = [
@@ -0,0 +1,107 @@
+"""Parse form XML in a single streaming pass
+
+`convert_xform_to_json` builds the complete lxml tree of a form before
+converting it to JSON. Form processing then parses the XML again to get
+`form.form_data`, walks all of the form JSON to find case blocks, and
+parses the XML a third time to find ledger blocks.
+
+`iterparse_form` converts each top level node of the form to JSON as
+soon as it has been parsed and then discards its XML, so at most one
+top level node of the form is held as XML at a time. Case and ledger
+blocks are found in the same pass. `ParsedForm.prime` caches the results
+on the new form, so the form is not parsed again while it is processed.
+"""
+from collections import namedtuple
+from io import BytesIO
+
+from lxml import etree
+from xml2json.lib import convert_xml_to_json
+
+from casexml.apps.case.const import CASE_TAG
+from casexml.apps.stock.const import COMMTRACK_REPORT_XMLNS
+
+from corehq.form_processor.parsers.ledgers.form import LEDGER_NODE_NAMES
+
+
+class ParsedForm(namedtuple('ParsedForm', 'form_json case_block_keys ledger_blocks')):
+    """Result of `iterparse_form`
+
+    :param form_json: Form JSON, same as `convert_xform_to_json()`.
+    :param case_block_keys: Top level keys of `form_json` that contain
+    case blocks.
+    :param ledger_blocks: List of `(report_type, ledger_json)` tuples,
+    one for each ledger block in the form.
+    """
+
+    def prime(self, xform):
+        """Cache parse results on a form created from `form_json`
+
+        `form_json` must have been processed in the same way as
+        `xform.form_data` (datetimes adjusted and meta scrubbed).
+        """
+        type(xform).form_data.fget.get_cache(xform)[()] = self.form_json
+        xform._case_block_keys = self.case_block_keys
+        xform._ledger_blocks = self.ledger_blocks
+
+
+def iterparse_form(xml_string):
+    """Convert form XML to JSON, finding case and ledger blocks
+
+    :returns: `ParsedForm`
+    :raises: `couchforms.XMLSyntaxError` if the XML is not valid.
+    """
+    if isinstance(xml_string, str):
+        xml_string = xml_string.encode('utf-8')
+    try:
+        return _iterparse_form(BytesIO(xml_string))
+    except etree.XMLSyntaxError as e:
+        from couchforms import XMLSyntaxError
+        raise XMLSyntaxError('Invalid XML: %s' % e)
+
+
+def _iterparse_form(source):
+    root = root_xmlns = None
+    depth = 0
+    ledger_depth = None
+    has_case_block = False
+    nodes = []
+    case_block_keys = []
+    ledger_blocks = []
+    events = etree.iterparse(source, events=('start', 'end'), resolve_entities=False)
+    for event, elem in events:
+        if event == 'start':
+            depth += 1
+            if root is None:
+                root = elem
+                root_xmlns = etree.QName(elem).namespace
+            elif ledger_depth is None and elem.tag in LEDGER_NODE_NAMES:
+                ledger_depth = depth
+            elif etree.QName(elem).localname == CASE_TAG:
+                has_case_block = True
+            continue
+
+        if depth == ledger_depth:
+            ledger_blocks.append(convert_xml_to_json(elem, last_xmlns=COMMTRACK_REPORT_XMLNS))
+            ledger_depth = None
+        if depth == 2:
+            name, value = convert_xml_to_json(elem, last_xmlns=root_xmlns)
+            nodes.append((name, value))
+            if has_case_block and name not in case_block_keys:
+                case_block_keys.append(name)
+            has_case_block = False
+            elem.clear()
+            root.remove(elem)
+        depth -= 1
+
+    name, form_json = convert_xml_to_json(root)
+    if not isinstance(form_json, dict):
+        form_json = {'#text': form_json} if form_json else {}
+    for key, value in nodes:
+        if key not in form_json:
+            form_json[key] = value
+        elif isinstance(form_json[key], list):
+            form_json[key].append(value)
+        else:
+            form_json[key] = [form_json[key], value]
+    form_json['#type'] = name
+    return ParsedForm(form_json, case_block_keys, ledger_blocks)
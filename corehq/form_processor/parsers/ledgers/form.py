@@ -1,4 +1,5 @@
 from collections import namedtuple
+from copy import deepcopy
 import datetime
 from decimal import Decimal
 import logging
@@ -19,6 +20,12 @@ from corehq.form_processor.utils.xform import adjust_text_to_datetime
 from xml2json.lib import convert_xml_to_json
 
 
+LEDGER_NODE_NAMES = (
+    '{%s}balance' % COMMTRACK_REPORT_XMLNS,
+    '{%s}transfer' % COMMTRACK_REPORT_XMLNS,
+)
+
+
 class LedgerFormat(object):
     """This object is just used to represent these two constants"""
     INDIVIDUAL = object()
@@ -112,29 +119,39 @@ def get_all_stock_report_helpers_from_form(xform):
     Given an instance of an XFormInstance, extract the ledger actions and convert
     them to StockReportHelper objects.
     """
-    form_xml = xform.get_xml_element()
-    commtrack_node_names = ('{%s}balance' % COMMTRACK_REPORT_XMLNS,
-                            '{%s}transfer' % COMMTRACK_REPORT_XMLNS)
+    for report_type, ledger_json in _get_ledger_blocks(xform):
+        if ledger_json.get('@date'):
+            try:
+                ledger_json['@date'] = adjust_text_to_datetime(ledger_json['@date'])
+            except iso8601.ParseError:
+                pass
+        yield _ledger_json_to_stock_report_helper(xform, report_type, ledger_json)
+
+
+def _get_ledger_blocks(xform):
+    """
+    Returns (report_type, ledger_json) tuples for the ledger blocks in the form.
+    """
+    ledger_blocks = getattr(xform, '_ledger_blocks', None)
+    if ledger_blocks is not None:
+        # found while parsing the form (see corehq.form_processor.parsers.iterparse)
+        return deepcopy(ledger_blocks)
 
     def _extract_ledger_nodes_from_xml(node):
         """
         Goes through a parsed XML document and recursively pulls out any ledger XML blocks.
         """
         for child in node:
-            if child.tag in commtrack_node_names:
+            if child.tag in LEDGER_NODE_NAMES:
                 yield child
             else:
                 for e in _extract_ledger_nodes_from_xml(child):
                     yield e
 
-    for elem in _extract_ledger_nodes_from_xml(form_xml):
-        report_type, ledger_json = convert_xml_to_json(elem, last_xmlns=COMMTRACK_REPORT_XMLNS)
-        if ledger_json.get('@date'):
-            try:
-                ledger_json['@date'] = adjust_text_to_datetime(ledger_json['@date'])
-            except iso8601.ParseError:
-                pass
-        yield _ledger_json_to_stock_report_helper(xform, report_type, ledger_json)
+    return [
+        convert_xml_to_json(elem, last_xmlns=COMMTRACK_REPORT_XMLNS)
+        for elem in _extract_ledger_nodes_from_xml(xform.get_xml_element())
+    ]
 
 
 def _ledger_json_to_stock_report_helper(form, report_type, ledger_json):
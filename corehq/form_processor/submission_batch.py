@@ -0,0 +1,262 @@
+"""Process a batch of form submissions together
+
+Integrations like the case importer and SMS surveys submit many system
+forms in quick succession. `SubmissionBatch` processes such forms
+together rather than one at a time with `SubmissionPost`:
+
+- forms are checked for duplicates together, using the form id filter
+  like `SubmissionPost` and one query per shard for the forms that may
+  be duplicates,
+- the cases updated by the forms in a round are locked and loaded in
+  bulk,
+- the forms and cases of a round are saved in one transaction per
+  shard, and
+- changes are published to Kafka without waiting for each message to
+  be acknowledged.
+
+Forms are processed in submission order. A new round is started before
+a form that updates a case updated by an earlier form in the round, so
+each case is updated by at most one form per round. Forms that need
+special handling (duplicates and edits, unparsable forms, system
+actions, device logs and ledger updates) are processed with
+`SubmissionPost` between rounds. If anything goes wrong while processing
+a round, nothing in the round is saved and its forms are processed one
+at a time with `SubmissionPost`, so the outcome for each form is the
+same as if the forms were submitted one by one.
+"""
+import logging
+from datetime import datetime
+
+from django.db import DatabaseError
+
+from casexml.apps.case.xform import get_case_ids_from_form, process_cases_with_casedb
+from couchforms.const import DEVICE_LOG_XMLNS
+from couchforms.models import UnfinishedSubmissionStub
+from dimagi.utils.couch import release_lock
+
+from corehq.apps.domain_migration_flags.api import any_migrations_in_progress
+from corehq.apps.receiverwrapper.rate_limiter import report_case_usage, report_submission_usage
+from corehq.form_processor.exceptions import KafkaPublishingError, PostSaveError, XFormLockError
+from corehq.form_processor.interfaces.processor import FormProcessorInterface
+from corehq.form_processor.parsers.form import process_xform_xml
+from corehq.form_processor.parsers.ledgers.form import get_case_ids_from_stock_transactions
+from corehq.form_processor.submission_post import SubmissionPost, notify_submission_error
+from corehq.form_processor.system_action import SYSTEM_ACTION_XMLNS
+from corehq.util.metrics import metrics_counter
+from corehq.util.timer import TimingContext
+from couchforms.openrosa_response import ResponseNature
+
+# maximum number of forms saved in one transaction
+MAX_ROUND_SIZE = 100
+
+POST_SAVE_ERROR = "Error performing post save operations"
+
+
+class SubmissionBatch(object):
+    """Process form submissions to a domain as a batch
+
+    :param instances: List of form XML instances.
+    :param kwargs: Other `SubmissionPost` arguments. These apply to all
+    forms in the batch.
+    """
+
+    def __init__(self, domain, instances, timing_context=None, **kwargs):
+        assert not kwargs.get('case_db'), "case_db is not supported"
+        self.domain = domain
+        self.posts = [SubmissionPost(instance=instance, domain=domain, **kwargs) for instance in instances]
+        self.interface = FormProcessorInterface(domain)
+        self.timing_context = timing_context or TimingContext()
+
+    def run(self):
+        """Process all forms in the batch
+
+        :returns: List of `FormProcessingResult`, one for each form in
+        submission order.
+        """
+        if not self.posts:
+            return []
+        if any_migrations_in_progress(self.domain) or not self.posts[0].auth_context.is_valid():
+            # SubmissionPost responds with the appropriate error
+            return [post.run() for post in self.posts]
+
+        with self.timing_context("process_xml"):
+            forms = [self._get_batchable_form(post) for post in self.posts]
+        with self.timing_context("check_duplicates"):
+            seen_ids = SubmissionPost.get_duplicate_form_ids(
+                self.domain, [form.form_id for form in forms if form is not None])
+
+        results = []
+        round_ = []
+        round_case_ids = set()
+        for post, form in zip(self.posts, forms):
+            if form is None or form.form_id in seen_ids:
+                results.extend(self._process_round(round_))
+                round_, round_case_ids = [], set()
+                results.append(self._process_single(post))
+                continue
+            seen_ids.add(form.form_id)
+            case_ids = get_case_ids_from_form(form)
+            if len(round_) >= MAX_ROUND_SIZE or not round_case_ids.isdisjoint(case_ids):
+                results.extend(self._process_round(round_))
+                round_, round_case_ids = [], set()
+            round_.append((post, form))
+            round_case_ids.update(case_ids)
+        results.extend(self._process_round(round_))
+        return results
+
+    def _get_batchable_form(self, post):
+        """Parse the submitted form
+
+        :returns: The new form, or None if the form must be processed
+        with `SubmissionPost`.
+        """
+        result = process_xform_xml(self.domain, post.instance, post.attachments, post.auth_context.to_json())
+        form = result.submitted_form
+        if (
+            form.is_submission_error_log
+            or form.xmlns in (SYSTEM_ACTION_XMLNS, DEVICE_LOG_XMLNS)
+            or get_case_ids_from_stock_transactions(form)
+        ):
+            return None
+        return form
+
+    def _process_single(self, post):
+        metrics_counter('commcare.submission_batch.forms', tags={'domain': self.domain, 'path': 'single'})
+        return post.run()
+
+    def _process_round(self, round_):
+        if not round_:
+            return []
+        try:
+            with self.timing_context("process_round"):
+                results = _BatchRound(self.domain, self.interface, round_).process()
+        except _RoundFailed as e:
+            logging.info('Processing %s forms one at a time: %s', len(round_), e)
+            return [self._process_single(post) for post, form in round_]
+        metrics_counter('commcare.submission_batch.forms', len(round_), tags={
+            'domain': self.domain,
+            'path': 'batch',
+        })
+        return results
+
+
+class _RoundFailed(Exception):
+    pass
+
+
+class _BatchRound(object):
+    """Forms of a batch that do not update the same cases
+
+    :param round_: List of `(post, form)` tuples.
+    """
+
+    def __init__(self, domain, interface, round_):
+        self.domain = domain
+        self.interface = interface
+        self.posts = [post for post, form in round_]
+        self.forms = [form for post, form in round_]
+
+    def process(self):
+        form_locks = []
+        try:
+            for form in self.forms:
+                form_locks.append(self.interface.acquire_lock_for_xform(form.form_id))
+            if SubmissionPost.get_duplicate_form_ids(self.domain, [form.form_id for form in self.forms]):
+                raise _RoundFailed("form submitted concurrently")
+            return self._process_locked_forms()
+        except XFormLockError as e:
+            raise _RoundFailed("form locked: {}".format(e))
+        finally:
+            for lock in form_locks:
+                release_lock(lock, degrade_gracefully=True)
+
+    def _process_locked_forms(self):
+        case_db = self.interface.casedb_cache(
+            domain=self.domain, lock=True, deleted_ok=True,
+            xforms=list(self.forms), load_src="form_submission_batch",
+        )
+        with case_db:
+            case_db.lock_and_populate(set().union(*(get_case_ids_from_form(form) for form in self.forms)))
+            cases_by_form = self._process_cases(case_db)
+            all_cases = [case for cases in cases_by_form for case in cases]
+            stubs = self._create_unfinished_submission_stubs()
+            error_message = None
+            try:
+                self.interface.processor.save_new_forms_and_cases(self.forms, all_cases)
+            except DatabaseError as e:
+                UnfinishedSubmissionStub.objects.filter(id__in=[stub.id for stub in stubs]).delete()
+                raise _RoundFailed("error saving forms: {}".format(e))
+            except KafkaPublishingError:
+                for form in self.forms:
+                    notify_submission_error(form, 'Error publishing to Kafka')
+                error_message = POST_SAVE_ERROR
+            UnfinishedSubmissionStub.objects.filter(id__in=[stub.id for stub in stubs]).update(saved=True)
+            for post in self.posts:
+                post.track_load()
+                report_submission_usage(self.domain)
+            report_case_usage(self.domain, len(all_cases))
+
+            results = []
+            for post, form, stub, cases in zip(self.posts, self.forms, stubs, cases_by_form):
+                form_error = error_message or self._do_post_save_actions(case_db, form, cases)
+                if not form_error:
+                    stub.delete()
+                results.append(self._get_result(post, form, cases, form_error))
+        return results
+
+    def _process_cases(self, case_db):
+        """Apply case updates of each form
+
+        :returns: List of updated cases for each form.
+        """
+        cases_by_form = []
+        try:
+            for post, form in zip(self.posts, self.forms):
+                post.prepare_form(form)
+                post.log_form_details(form)
+                process_cases_with_casedb([form], case_db)
+                cases_by_form.append(case_db.get_changed())
+                case_db.clear_changed()
+            case_db.check_cases_not_modified([case for cases in cases_by_form for case in cases])
+        except Exception as e:
+            raise _RoundFailed("error processing cases: {!r}".format(e))
+        for form, cases in zip(self.forms, cases_by_form):
+            form.initial_processing_complete = True
+            for case in cases:
+                case.server_modified_on = form.received_on
+        return cases_by_form
+
+    def _create_unfinished_submission_stubs(self):
+        """Create unfinished submission stubs for the forms in the round"""
+        now = datetime.utcnow()
+        return UnfinishedSubmissionStub.objects.bulk_create([
+            UnfinishedSubmissionStub(
+                xform_id=form.form_id,
+                timestamp=now,
+                saved=False,
+                domain=form.domain,
+            )
+            for form in self.forms
+        ])
+
+    @staticmethod
+    def _do_post_save_actions(case_db, form, cases):
+        """Do the post save actions of a form in the round
+
+        :returns: Error message or None.
+        """
+        try:
+            SubmissionPost.do_form_post_save_actions(case_db, form, cases)
+        except PostSaveError:
+            return POST_SAVE_ERROR
+        return None
+
+    @staticmethod
+    def _get_result(post, form, cases, error_message):
+        openrosa_kwargs = {}
+        if error_message:
+            openrosa_kwargs['error_message'] = error_message
+            openrosa_kwargs['error_nature'] = ResponseNature.POST_PROCESSING_FAILURE
+        else:
+            openrosa_kwargs['success_message'] = post.get_success_message(form, cases=cases)
+        return post.get_result(form, 'normal', cases, **openrosa_kwargs)
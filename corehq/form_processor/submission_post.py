@@ -14,7 +14,11 @@ from django.utils.translation import gettext as _
 import sys
 
 from casexml.apps.case.xform import close_extension_cases
-from casexml.apps.phone.restore_caching import AsyncRestoreTaskIdCache, RestorePayloadPathCache
+from casexml.apps.phone.restore_caching import (
+    AsyncRestoreTaskIdCache,
+    PrewarmedRestoreCache,
+    RestorePayloadPathCache,
+)
 import couchforms
 from casexml.apps.case.exceptions import PhoneDateValueError, IllegalCaseId, UsesReferrals, InvalidCaseIndex, \
     CaseValueError
@@ -28,6 +32,7 @@ from corehq.apps.domain_migration_flags.api import any_migrations_in_progress
 from corehq.apps.es.client import BulkActionItem
 from corehq.apps.users.models import CouchUser
 from corehq.apps.users.permissions import has_permission_to_view_report
+from corehq.form_processor import form_id_filter
 from corehq.form_processor.exceptions import PostSaveError, XFormSaveError
 from corehq.form_processor.interfaces.processor import FormProcessorInterface
 from corehq.form_processor.models import XFormInstance
@@ -143,7 +148,26 @@ class SubmissionPost(object):
         found_old = scrub_meta(xform)
         legacy_notification_assert(not found_old, 'Form with old metadata submitted', xform.form_id)
 
-    def _get_success_message(self, instance, cases=None):
+    def prepare_form(self, xform):
+        """Prepare a newly parsed form for processing
+
+        Sets the properties of the submission on the form and invalidates
+        the cached restores of the user who submitted it.
+        """
+        self._post_process_form(xform)
+        self._invalidate_caches(xform)
+
+    @staticmethod
+    def get_duplicate_form_ids(domain, form_ids):
+        """Get the ids of the given forms that already exist
+
+        Like the duplicate check of `run`, the database is only queried
+        for forms that may be in the form id filter.
+        """
+        return form_id_filter.get_duplicate_ids(
+            form_ids, domain, XFormInstance.objects.get_form_ids_that_exist)
+
+    def get_success_message(self, instance, cases=None):
         '''
         Formplayer requests get a detailed success message pointing to the form/case affected.
         All other requests get a generic message.
@@ -224,8 +248,7 @@ class SubmissionPost(object):
             result = process_xform_xml(self.domain, self.instance, self.attachments, self.auth_context.to_json())
             submitted_form = result.submitted_form
 
-            self._post_process_form(submitted_form)
-            self._invalidate_caches(submitted_form)
+            self.prepare_form(submitted_form)
 
             if submitted_form.is_submission_error_log:
                 logging.info('Processing form %s as a submission error', submitted_form.form_id)
@@ -259,7 +282,7 @@ class SubmissionPost(object):
                 return self.process_device_log(submitted_form)
 
         # Begin Normal Form Processing
-        self._log_form_details(submitted_form)
+        self.log_form_details(submitted_form)
 
         cases = []
         ledgers = []
@@ -330,16 +353,23 @@ class SubmissionPost(object):
                         cases = case_stock_result.case_models
                         ledgers = case_stock_result.stock_result.models_to_save
                         report_case_usage(self.domain, len(cases))
-                        openrosa_kwargs['success_message'] = self._get_success_message(instance, cases=cases)
+                        openrosa_kwargs['success_message'] = self.get_success_message(instance, cases=cases)
                 elif instance.is_error:
                     submission_type = 'error'
 
-            self._log_form_completion(instance, submission_type)
+            return self.get_result(instance, submission_type, cases, ledgers, **openrosa_kwargs)
 
-            response = self._get_open_rosa_response(instance, **openrosa_kwargs)
-            return FormProcessingResult(response, instance, cases, ledgers, submission_type)
+    def get_result(self, instance, submission_type, cases=None, ledgers=None, **openrosa_kwargs):
+        """Log the completion of processing a form and get the result
+
+        :param openrosa_kwargs: Success or error message and error nature
+        of the response.
+        """
+        self._log_form_completion(instance, submission_type)
+        response = self._get_open_rosa_response(instance, **openrosa_kwargs)
+        return FormProcessingResult(response, instance, cases or [], ledgers or [], submission_type)
 
-    def _log_form_details(self, form):
+    def log_form_details(self, form):
         attachments = form.attachments if hasattr(form, 'attachments') else {}
 
         logging.info('Received Form %s with %d attachments',
@@ -376,13 +406,14 @@ class SubmissionPost(object):
 
     def _invalidate_restore_payload_path_cache(self, xform, device_id):
         """invalidate cached initial restores"""
-        restore_payload_path_cache = RestorePayloadPathCache(
-            domain=self.domain,
-            user_id=xform.user_id,
-            sync_log_id=xform.last_sync_token,
-            device_id=device_id,
-        )
-        restore_payload_path_cache.invalidate()
+        for cache_class in [RestorePayloadPathCache, PrewarmedRestoreCache]:
+            cache = cache_class(
+                domain=self.domain,
+                user_id=xform.user_id,
+                sync_log_id=xform.last_sync_token,
+                device_id=device_id,
+            )
+            cache.invalidate()
 
     def _invalidate_async_restore_task_id_cache(self, xform, device_id):
         async_restore_task_id_cache = AsyncRestoreTaskIdCache(
@@ -426,18 +457,28 @@ class SubmissionPost(object):
     @staticmethod
     @tracer.wrap(name='submission.post_save_actions')
     def do_post_save_actions(case_db, xforms, case_stock_result):
-        instance = xforms[0]
         case_db.clear_changed()
+        SubmissionPost.do_form_post_save_actions(
+            case_db, xforms[0], case_stock_result.case_models, case_stock_result.stock_result)
+
+    @staticmethod
+    def do_form_post_save_actions(case_db, instance, cases, stock_result=None):
+        """Post save actions of a saved form and the cases it updated
+
+        :param stock_result: Ledger processing result of the form, if any.
+        :raises PostSaveError: if any action fails.
+        """
         try:
-            case_stock_result.stock_result.finalize()
+            if stock_result is not None:
+                stock_result.finalize()
 
-            SubmissionPost.index_case_search(instance, case_stock_result.case_models)
+            SubmissionPost.index_case_search(instance, cases)
 
-            SubmissionPost._fire_post_save_signals(instance, case_stock_result.case_models)
+            SubmissionPost._fire_post_save_signals(instance, cases)
 
             close_extension_cases(
                 case_db,
-                case_stock_result.case_models,
+                cases,
                 "SubmissionPost-%s-close_extensions" % instance.form_id,
                 instance.last_sync_token
             )
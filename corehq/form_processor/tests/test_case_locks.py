@@ -0,0 +1,58 @@
+import uuid
+
+from django.test import SimpleTestCase, TestCase
+
+from casexml.apps.case.mock import CaseBlock
+
+from corehq.apps.hqcase.utils import submit_case_blocks
+from corehq.form_processor.backends.sql.casedb import CaseDbCacheSQL
+from corehq.form_processor.case_locks import (
+    HOT_CASES_LIMIT,
+    clear_hot_cases,
+    get_hot_cases,
+    record_hot_case,
+)
+from corehq.form_processor.tests.utils import sharded
+
+DOMAIN = 'case-locks'
+
+
+class HotCasesTest(SimpleTestCase):
+
+    def tearDown(self):
+        clear_hot_cases(DOMAIN)
+        super().tearDown()
+
+    def test_get_hot_cases(self):
+        record_hot_case(DOMAIN, 'a', 1.0)
+        record_hot_case(DOMAIN, 'b', 5.0)
+        record_hot_case(DOMAIN, 'a', 2.5)
+        self.assertEqual(
+            [tuple(hot) for hot in get_hot_cases(DOMAIN)],
+            [('b', 1, 5.0), ('a', 2, 3.5)],
+        )
+        self.assertEqual(get_hot_cases('other-domain'), [])
+
+    def test_limit(self):
+        for num in range(HOT_CASES_LIMIT + 5):
+            record_hot_case(DOMAIN, str(num), num + 1)
+        hot_cases = get_hot_cases(DOMAIN, limit=HOT_CASES_LIMIT + 10)
+        self.assertEqual(len(hot_cases), HOT_CASES_LIMIT)
+        self.assertEqual(hot_cases[-1].case_id, '5')
+
+
+@sharded
+class NewCasesTest(TestCase):
+
+    def test_mark_new_cases(self):
+        existing_id = uuid.uuid4().hex
+        new_id = uuid.uuid4().hex
+        submit_case_blocks([CaseBlock(existing_id, create=True).as_text()], DOMAIN)
+
+        case_db = CaseDbCacheSQL(domain=DOMAIN, lock=True)
+        with case_db:
+            case_db.mark_new_cases([existing_id, new_id])
+            self.assertEqual(case_db._new_case_ids, {new_id})
+            self.assertIsNone(case_db.get(new_id))
+            self.assertEqual(case_db.get(existing_id).case_id, existing_id)
+            self.assertEqual(len(case_db.locks), 1)
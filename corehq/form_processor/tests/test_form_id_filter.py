@@ -0,0 +1,144 @@
+import uuid
+from unittest.mock import Mock
+
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from dimagi.utils.couch import get_redis_client
+
+from corehq.apps.hqcase.utils import submit_case_blocks
+from corehq.form_processor.form_id_filter import (
+    READY_KEY,
+    _create_slices,
+    _get_config,
+    _get_positions,
+    _get_slice_keys,
+    add_form_ids,
+    get_duplicate_ids,
+    is_duplicate,
+    might_contain,
+    rebuild_filter,
+)
+from corehq.form_processor.tests.utils import FormProcessorTestUtils, sharded
+
+DOMAIN = 'form-id-filter'
+
+
+def _clear_filter():
+    get_redis_client().client.get_client().delete(READY_KEY, *_get_slice_keys())
+
+
+@override_settings(FORM_ID_FILTER_CAPACITY=1000)
+class FormIdFilterTest(SimpleTestCase):
+
+    def setUp(self):
+        super().setUp()
+        _clear_filter()
+        self.addCleanup(_clear_filter)
+
+    def set_ready(self):
+        client = get_redis_client().client.get_client()
+        capacity, slice_bits, num_hashes = _get_config()
+        pipeline = client.pipeline()
+        _create_slices(pipeline, slice_bits)
+        pipeline.set(READY_KEY, '1000')
+        pipeline.execute()
+
+    def evict_slice(self, form_id):
+        capacity, slice_bits, num_hashes = _get_config()
+        key, positions = _get_positions(form_id, slice_bits, num_hashes)
+        get_redis_client().client.get_client().delete(key)
+
+    def test_not_used_until_ready(self):
+        add_form_ids(['abc'])
+        self.assertIsNone(might_contain('abc'))
+        self.assertIsNone(might_contain('def'))
+
+    @override_settings(FORM_ID_FILTER_CAPACITY=None)
+    def test_disabled(self):
+        self.set_ready()
+        self.assertIsNone(might_contain('abc'))
+
+    def test_might_contain(self):
+        form_ids = [uuid.uuid4().hex for x in range(100)]
+        add_form_ids(form_ids)
+        self.set_ready()
+        self.assertTrue(all(might_contain(form_id) for form_id in form_ids))
+        false_positives = sum(bool(might_contain(uuid.uuid4().hex)) for x in range(100))
+        self.assertLess(false_positives, 5)
+
+    def test_capacity_change_disables_filter(self):
+        add_form_ids(['abc'])
+        self.set_ready()
+        with override_settings(FORM_ID_FILTER_CAPACITY=2000):
+            self.assertIsNone(might_contain('abc'))
+
+    def test_is_duplicate_skips_database(self):
+        self.set_ready()
+        check_database = Mock(return_value=True)
+        self.assertFalse(is_duplicate('abc', DOMAIN, check_database))
+        check_database.assert_not_called()
+
+        add_form_ids(['abc'])
+        self.assertTrue(is_duplicate('abc', DOMAIN, check_database))
+        check_database.assert_called_once_with()
+
+    def test_evicted_slice_is_unavailable(self):
+        self.set_ready()
+        self.assertFalse(might_contain('abc'))
+        self.evict_slice('abc')
+        self.assertIsNone(might_contain('abc'))
+
+    def test_adding_to_evicted_slice_disables_filter(self):
+        self.set_ready()
+        self.evict_slice('abc')
+        add_form_ids(['abc'])
+        self.assertIsNone(might_contain('abc'))
+        self.assertIsNone(might_contain('def'))
+
+    def test_get_duplicate_ids_skips_database(self):
+        self.set_ready()
+        get_existing_ids = Mock(return_value=[])
+        self.assertEqual(get_duplicate_ids(['abc', 'def'], DOMAIN, get_existing_ids), set())
+        get_existing_ids.assert_not_called()
+
+        add_form_ids(['abc'])
+        get_existing_ids.return_value = ['abc']
+        self.assertEqual(get_duplicate_ids(['abc', 'def'], DOMAIN, get_existing_ids), {'abc'})
+        get_existing_ids.assert_called_once_with(['abc'])
+
+    def test_get_duplicate_ids_without_filter(self):
+        get_existing_ids = Mock(return_value=['abc'])
+        self.assertEqual(get_duplicate_ids(['abc', 'def'], DOMAIN, get_existing_ids), {'abc'})
+        get_existing_ids.assert_called_once_with(['abc', 'def'])
+
+
+@sharded
+@override_settings(FORM_ID_FILTER_CAPACITY=1000)
+class RebuildFormIdFilterTest(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        _clear_filter()
+        self.addCleanup(_clear_filter)
+
+    def tearDown(self):
+        FormProcessorTestUtils.delete_all_cases_forms_ledgers(DOMAIN)
+        super().tearDown()
+
+    def test_rebuild(self):
+        form_id = submit_case_blocks([], DOMAIN)[0].form_id
+        self.assertIsNone(might_contain(form_id))
+        self.assertGreaterEqual(rebuild_filter(), 1)
+        self.assertTrue(might_contain(form_id))
+
+    def test_saved_forms_are_added(self):
+        rebuild_filter()
+        form_id = submit_case_blocks([], DOMAIN)[0].form_id
+        self.assertTrue(might_contain(form_id))
+
+    def test_duplicate_submission(self):
+        rebuild_filter()
+        form_id = uuid.uuid4().hex
+        submit_case_blocks([], DOMAIN, form_id=form_id)
+        form = submit_case_blocks([], DOMAIN, form_id=form_id)[0]
+        self.assertTrue(form.is_duplicate)
@@ -0,0 +1,112 @@
+import uuid
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from django.test import SimpleTestCase, TestCase
+
+from lxml import etree
+
+from casexml.apps.case.mock import CaseBlock, CaseFactory
+from casexml.apps.case.xform import extract_case_blocks
+from couchforms import XMLSyntaxError
+
+from corehq.apps.commtrack.helpers import make_product
+from corehq.apps.commtrack.tests.util import get_single_balance_block
+from corehq.apps.hqcase.utils import submit_case_blocks
+from corehq.form_processor.backends.sql.dbaccessors import LedgerAccessorSQL
+from corehq.form_processor.models import CommCareCase
+from corehq.form_processor.parsers.iterparse import iterparse_form
+from corehq.form_processor.parsers.ledgers.form import _get_ledger_blocks
+from corehq.form_processor.tests.utils import FormProcessorTestUtils, sharded
+from corehq.form_processor.utils import convert_xform_to_json, get_simple_form_xml
+from corehq.util.test_utils import flag_enabled
+
+DOMAIN = 'iterparse-tests'
+
+LEDGER_XML = """
+<ns0:balance xmlns:ns0="http://commcarehq.org/ledger/v1" entity-id="{case_id}" date="2026-10-18"
+        section-id="stock">
+    <ns0:entry id="product-a" quantity="10"/>
+    <ns0:entry id="product-b" quantity="5"/>
+</ns0:balance>
+"""
+
+
+class IterparseFormTest(SimpleTestCase):
+
+    def get_form_xml(self, extra=''):
+        xml = get_simple_form_xml(uuid.uuid4().hex, case_id=uuid.uuid4().hex)
+        return xml.replace('</data>', extra + '</data>')
+
+    def assert_same_as_xml2json(self, xml):
+        parsed = iterparse_form(xml)
+        self.assertEqual(parsed.form_json, convert_xform_to_json(xml))
+        form = SimpleNamespace(form_data=parsed.form_json, _case_block_keys=parsed.case_block_keys)
+        self.assertEqual(extract_case_blocks(form), extract_case_blocks(parsed.form_json))
+        return parsed
+
+    def test_simple_form(self):
+        parsed = self.assert_same_as_xml2json(self.get_form_xml())
+        self.assertEqual(parsed.case_block_keys, ['case'])
+        self.assertEqual(parsed.ledger_blocks, [])
+
+    def test_repeat_group(self):
+        parsed = self.assert_same_as_xml2json(self.get_form_xml(''.join(
+            '<child id="{0}"><name>child {0}</name>{1}</child>'.format(
+                i, CaseBlock(uuid.uuid4().hex, create=True).as_text())
+            for i in range(3)
+        ) + '<other><question>answer</question></other>'))
+        self.assertEqual(parsed.case_block_keys, ['case', 'child'])
+
+    def test_text_and_attributes(self):
+        self.assert_same_as_xml2json(self.get_form_xml(
+            '<q1 a="1">text</q1><q2/><q2>two</q2><group><q3 b="2"/></group>'))
+
+    def test_ledger_blocks(self):
+        case_id = uuid.uuid4().hex
+        xml = self.get_form_xml(
+            LEDGER_XML.format(case_id=case_id) + '<group>{}</group>'.format(LEDGER_XML.format(case_id=case_id)))
+        parsed = self.assert_same_as_xml2json(xml)
+        form = SimpleNamespace(get_xml_element=lambda: etree.fromstring(xml.encode('utf-8')))
+        self.assertEqual(len(parsed.ledger_blocks), 2)
+        self.assertEqual(parsed.ledger_blocks, _get_ledger_blocks(form))
+
+    def test_invalid_xml(self):
+        with self.assertRaises(XMLSyntaxError):
+            iterparse_form('<data><unclosed></data>')
+
+
+@sharded
+@flag_enabled('ITERPARSE_FORMS')
+class IterparseSubmissionTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.product = make_product(DOMAIN, 'A Product', 'prodcode_a')
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.product.delete()
+        FormProcessorTestUtils.delete_all_cases_forms_ledgers(DOMAIN)
+        super().tearDownClass()
+
+    def test_submit_form(self):
+        case = CaseFactory(domain=DOMAIN).create_case()
+        not_parsed_again = AssertionError("form XML was parsed again")
+        with patch('corehq.form_processor.parsers.form.convert_xform_to_json', side_effect=not_parsed_again), \
+                patch('corehq.form_processor.utils.convert_xform_to_json', side_effect=not_parsed_again), \
+                patch('corehq.form_processor.parsers.ledgers.form.convert_xml_to_json',
+                      side_effect=not_parsed_again):
+            xform, cases = submit_case_blocks([
+                CaseBlock(case.case_id, update={'color': 'blue'}).as_text(),
+                get_single_balance_block(case.case_id, self.product._id, 25),
+            ], DOMAIN)
+
+        self.assertFalse(xform.is_error, xform.problem)
+        self.assertEqual(xform._case_block_keys, ['case'])
+        self.assertEqual(len(xform._ledger_blocks), 1)
+        self.assertEqual([c.case_id for c in cases], [case.case_id])
+        self.assertEqual(CommCareCase.objects.get_case(case.case_id, DOMAIN).get_case_property('color'), 'blue')
+        ledger_value = LedgerAccessorSQL.get_ledger_value(case.case_id, 'stock', self.product._id)
+        self.assertEqual(ledger_value.balance, 25)
@@ -0,0 +1,97 @@
+import uuid
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+
+from casexml.apps.case.mock import CaseBlock
+from dimagi.utils.couch import get_redis_client
+
+from corehq.apps.hqcase.utils import submit_case_block_batch, submit_case_blocks
+from corehq.form_processor.form_id_filter import READY_KEY, _get_slice_keys, rebuild_filter
+from corehq.form_processor.models import CommCareCase, XFormInstance
+from corehq.form_processor.submission_batch import SubmissionBatch
+from corehq.form_processor.tests.utils import FormProcessorTestUtils, sharded
+from corehq.form_processor.utils import get_simple_form_xml
+
+DOMAIN = 'submission-batch'
+
+
+@sharded
+class SubmissionBatchTest(TestCase):
+
+    def tearDown(self):
+        FormProcessorTestUtils.delete_all_cases_forms_ledgers(DOMAIN)
+        super().tearDown()
+
+    def test_batch(self):
+        case_ids = [uuid.uuid4().hex for x in range(3)]
+        results = submit_case_block_batch(
+            [[CaseBlock(case_id, create=True, case_type='batch').as_text()] for case_id in case_ids],
+            DOMAIN,
+        )
+        self.assertEqual([[case.case_id for case in cases] for form, cases in results], [[i] for i in case_ids])
+        for form, cases in results:
+            form = XFormInstance.objects.get_form(form.form_id, DOMAIN)
+            self.assertTrue(form.is_normal)
+            self.assertTrue(form.initial_processing_complete)
+        self.assertEqual(len(CommCareCase.objects.get_case_ids_that_exist(DOMAIN, case_ids)), 3)
+
+    def test_forms_updating_same_case_are_processed_in_order(self):
+        case_id = uuid.uuid4().hex
+        results = submit_case_block_batch([
+            [CaseBlock(case_id, create=True, update={'prop': 'one'}).as_text()],
+            [CaseBlock(case_id, update={'prop': 'two'}).as_text()],
+            [CaseBlock(case_id, update={'prop': 'three'}).as_text()],
+        ], DOMAIN)
+        case = CommCareCase.objects.get_case(case_id, DOMAIN)
+        self.assertEqual(case.get_case_property('prop'), 'three')
+        self.assertEqual(
+            [tx.form_id for tx in case.get_form_transactions()],
+            [form.form_id for form, cases in results],
+        )
+
+    def test_duplicate_form(self):
+        form_id = uuid.uuid4().hex
+        submit_case_blocks([], DOMAIN, form_id=form_id)
+        results = SubmissionBatch(DOMAIN, [
+            get_simple_form_xml(form_id),
+            get_simple_form_xml(uuid.uuid4().hex),
+        ]).run()
+        self.assertEqual(
+            [(result.submission_type, result.xform.is_duplicate) for result in results],
+            [('duplicate', True), ('normal', False)],
+        )
+
+    @override_settings(FORM_ID_FILTER_CAPACITY=1000)
+    def test_duplicate_check_uses_form_id_filter(self):
+        client = get_redis_client().client.get_client()
+        self.addCleanup(client.delete, READY_KEY, *_get_slice_keys())
+        rebuild_filter()
+        form_id = uuid.uuid4().hex
+        submit_case_blocks([], DOMAIN, form_id=form_id)
+        new_form_id = uuid.uuid4().hex
+        with patch.object(XFormInstance.objects, 'get_form_ids_that_exist',
+                          wraps=XFormInstance.objects.get_form_ids_that_exist) as get_form_ids_that_exist:
+            results = SubmissionBatch(DOMAIN, [
+                get_simple_form_xml(form_id),
+                get_simple_form_xml(new_form_id),
+            ]).run()
+        self.assertEqual([result.submission_type for result in results], ['duplicate', 'normal'])
+        checked_ids = {i for call in get_form_ids_that_exist.call_args_list for i in call.args[0]}
+        self.assertNotIn(new_form_id, checked_ids)
+
+    def test_error_processing_round_falls_back_to_single_forms(self):
+        case_id = uuid.uuid4().hex
+        form_ids = [uuid.uuid4().hex, uuid.uuid4().hex]
+        with patch('corehq.form_processor.submission_batch.process_cases_with_casedb',
+                   side_effect=Exception("boom")):
+            results = SubmissionBatch(DOMAIN, [
+                get_simple_form_xml(form_ids[0], case_id),
+                get_simple_form_xml(form_ids[1]),
+            ]).run()
+        self.assertEqual([r.submission_type for r in results], ['normal', 'normal'])
+        self.assertEqual(
+            set(XFormInstance.objects.get_form_ids_that_exist(form_ids)),
+            set(form_ids),
+        )
+        self.assertEqual(CommCareCase.objects.get_case(case_id, DOMAIN).case_id, case_id)
@@ -65,7 +65,8 @@ class CaseMessagingSyncProcessor(BulkPillowProcessor):
 
 def get_case_messaging_sync_pillow(pillow_id='case_messaging_sync_pillow', topics=None,
                          num_processes=1, process_num=0,
-                         processor_chunk_size=DEFAULT_PROCESSOR_CHUNK_SIZE, **kwargs):
+                         processor_chunk_size=DEFAULT_PROCESSOR_CHUNK_SIZE, max_processor_chunk_size=None,
+                         **kwargs):
     """Pillow for synchronizing messaging data with case data.
 
         Processors:
@@ -87,5 +88,6 @@ def get_case_messaging_sync_pillow(pillow_id='case_messaging_sync_pillow', topic
         checkpoint=checkpoint,
         change_processed_event_handler=event_handler,
         processor=[CaseMessagingSyncProcessor()],
-        processor_chunk_size=processor_chunk_size
+        processor_chunk_size=processor_chunk_size,
+        max_processor_chunk_size=max_processor_chunk_size
     )
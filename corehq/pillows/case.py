@@ -78,11 +78,11 @@ def get_case_to_elasticsearch_pillow(pillow_id='CaseToElasticsearchPillow', num_
 
 
 def get_case_pillow(
-        pillow_id='case-pillow', ucr_division=None,
+        pillow_id='case-pillow', ucr_division=None, ucr_cost_division=None,
         include_ucrs=None, exclude_ucrs=None,
         num_processes=1, process_num=0, ucr_configs=None, skip_ucr=False,
-        processor_chunk_size=DEFAULT_PROCESSOR_CHUNK_SIZE, topics=None,
-        dedicated_migration_process=False, **kwargs):
+        processor_chunk_size=DEFAULT_PROCESSOR_CHUNK_SIZE, max_processor_chunk_size=None, topics=None,
+        dedicated_migration_process=False, prefetch_workers=0, **kwargs):
     """Return a pillow that processes cases. The processors include, UCR and elastic processors
 
     Processors:
@@ -96,7 +96,7 @@ def get_case_pillow(
     topics = topics or CASE_TOPICS
     change_feed = KafkaChangeFeed(
         topics, client_id=pillow_id, num_processes=num_processes, process_num=process_num,
-        dedicated_migration_process=dedicated_migration_process
+        dedicated_migration_process=dedicated_migration_process, prefetch_workers=prefetch_workers,
     )
     run_migrations = (process_num == 0)  # only first process runs migrations
     ucr_processor = get_ucr_processor(
@@ -105,6 +105,8 @@ def get_case_pillow(
             StaticDataSourceProvider('CommCareCase')
         ],
         ucr_division=ucr_division,
+        ucr_cost_division=ucr_cost_division,
+        pillow_name=pillow_id,
         include_ucrs=include_ucrs,
         exclude_ucrs=exclude_ucrs,
         run_migrations=run_migrations,
@@ -142,6 +144,7 @@ def get_case_pillow(
         change_processed_event_handler=event_handler,
         processor=processors,
         processor_chunk_size=processor_chunk_size,
+        max_processor_chunk_size=max_processor_chunk_size,
         process_num=process_num,
         is_dedicated_migration_process=dedicated_migration_process and run_migrations
     )
@@ -153,6 +156,7 @@ class SqlCaseReindexerFactory(ReindexerFactory):
         ReindexerFactory.resumable_reindexer_args,
         ReindexerFactory.elastic_reindexer_args,
         ReindexerFactory.limit_db_args,
+        ReindexerFactory.parallel_reindexer_args,
         ReindexerFactory.domain_arg,
         ReindexerFactory.server_modified_on_arg,
     ]
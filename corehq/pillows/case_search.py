@@ -1,4 +1,5 @@
 from datetime import datetime
+from functools import partial
 
 from django.core.mail import mail_admins
 from django.db import ProgrammingError
@@ -41,13 +42,14 @@ from corehq.util.soft_assert import soft_assert
 from couchforms.geopoint import GeoPoint
 from dimagi.utils.parsing import json_format_datetime
 from jsonobject.exceptions import BadValueError
+from pillowtop.const import DEFAULT_PROCESSOR_CHUNK_SIZE
 from pillowtop.checkpoints.manager import (
     get_checkpoint_for_elasticsearch_pillow,
 )
 from pillowtop.es_utils import initialize_index_and_mapping, ElasticsearchIndexInfo
 from pillowtop.feed.interface import Change
 from pillowtop.pillow.interface import ConstructedPillow
-from pillowtop.processors.elastic import ElasticProcessor
+from pillowtop.processors.elastic import BulkElasticProcessor, ElasticProcessor
 from pillowtop.reindexer.change_providers.case import (
     get_domain_case_change_provider,
 )
@@ -73,7 +75,12 @@ def domain_needs_search_index(domain):
     return domain in domains_needing_search_index()
 
 
-def transform_case_for_elasticsearch(doc_dict):
+def transform_case_for_elasticsearch(doc_dict, gps_properties_getter=None):
+    """Transform a case for the case search index
+
+    :param gps_properties_getter: Optional function with the signature
+    of `get_gps_properties`, used to share lookups between cases.
+    """
     doc = {
         desired_property: doc_dict.get(desired_property)
         for desired_property in CASE_SEARCH_MAPPING['properties'].keys()
@@ -81,7 +88,7 @@ def transform_case_for_elasticsearch(doc_dict):
     }
     doc['_id'] = doc_dict.get('_id')
     doc[INDEXED_ON] = json_format_datetime(datetime.utcnow())
-    doc['case_properties'] = _get_case_properties(doc_dict)
+    doc['case_properties'] = _get_case_properties(doc_dict, gps_properties_getter)
     return doc
 
 
@@ -95,7 +102,7 @@ def _format_property(key, value, case_id):
     }
 
 
-def _get_case_properties(doc_dict):
+def _get_case_properties(doc_dict, gps_properties_getter=None):
     domain = doc_dict.get('domain')
     case_id = doc_dict.get('_id')
     assert domain
@@ -107,16 +114,16 @@ def _get_case_properties(doc_dict):
                           for key, value in doc_dict['case_json'].items()]
 
     if USH_CASE_CLAIM_UPDATES.enabled(domain):
-        _add_smart_types(dynamic_properties, domain, doc_dict['type'])
+        gps_properties_getter = gps_properties_getter or get_gps_properties
+        _add_smart_types(dynamic_properties, gps_properties_getter(domain, doc_dict['type']))
 
     return base_case_properties + dynamic_properties
 
 
-def _add_smart_types(dynamic_properties, domain, case_type):
+def _add_smart_types(dynamic_properties, gps_props):
     # Properties are stored in a dict like {"key": "dob", "value": "1900-01-01"}
     # `value` is a multi-field property that duck types numeric and date values
     # We can't do that for geo_points in ES v2, as `ignore_malformed` is broken
-    gps_props = get_gps_properties(domain, case_type)
     for prop in dynamic_properties:
         if prop['key'] in gps_props:
             try:
@@ -132,17 +139,46 @@ class CaseSearchPillowProcessor(ElasticProcessor):
         if self.change_filter_fn and self.change_filter_fn(change):
             return
 
-        if change.metadata is not None:
-            # Comes from KafkaChangeFeed (i.e. running pillowtop)
-            domain = change.metadata.domain
-        else:
-            # comes from ChangeProvider (i.e reindexing)
-            domain = change.get_document()['domain']
-
-        if domain and domain_needs_search_index(domain):
+        if _needs_search_index(change):
             super(CaseSearchPillowProcessor, self).process_change(change)
 
 
+class BulkCaseSearchPillowProcessor(CaseSearchPillowProcessor, BulkElasticProcessor):
+    """Case search processor that processes a chunk of changes at a time
+
+    The cases of a chunk are fetched together and sent to Elasticsearch
+    in one bulk request, and GPS properties are looked up once for each
+    domain and case type in the chunk rather than once for each case.
+    """
+
+    def process_changes_chunk(self, changes_chunk):
+        changes_chunk = [change for change in changes_chunk if _needs_search_index(change)]
+        if not changes_chunk:
+            return [], []
+        return super(BulkCaseSearchPillowProcessor, self).process_changes_chunk(changes_chunk)
+
+    def get_chunk_doc_transform_fn(self):
+        gps_properties = {}
+
+        def get_chunk_gps_properties(domain, case_type):
+            key = (domain, case_type)
+            if key not in gps_properties:
+                gps_properties[key] = get_gps_properties(domain, case_type)
+            return gps_properties[key]
+
+        return partial(self.doc_transform_fn, gps_properties_getter=get_chunk_gps_properties)
+
+
+def _needs_search_index(change):
+    if change.metadata is not None:
+        # Comes from KafkaChangeFeed (i.e. running pillowtop)
+        domain = change.metadata.domain
+    else:
+        # comes from ChangeProvider (i.e reindexing)
+        domain = change.get_document()['domain']
+    return bool(domain) and domain_needs_search_index(domain)
+
+
 def get_case_search_processor():
     """Case Search
 
@@ -152,7 +188,7 @@ def get_case_search_processor():
     Writes to:
       - Case Search ES index
     """
-    return CaseSearchPillowProcessor(
+    return BulkCaseSearchPillowProcessor(
         elasticsearch=get_es_new(),
         index_info=CASE_SEARCH_INDEX_INFO,
         doc_prep_fn=transform_case_for_elasticsearch,
@@ -219,11 +255,12 @@ class CaseSearchReindexerFactory(ReindexerFactory):
 
 
 def get_case_search_to_elasticsearch_pillow(pillow_id='CaseSearchToElasticsearchPillow', num_processes=1,
-                                            process_num=0, **kwargs):
+                                            process_num=0, processor_chunk_size=DEFAULT_PROCESSOR_CHUNK_SIZE,
+                                            max_processor_chunk_size=None, **kwargs):
     """Populates the `case search` Elasticsearch index.
 
         Processors:
-          - :py:class:`corehq.pillows.case_search.CaseSearchPillowProcessor`
+          - :py:class:`corehq.pillows.case_search.BulkCaseSearchPillowProcessor`
     """
     index_info = CASE_SEARCH_INDEX_INFO
     if 'index_name' in kwargs and 'index_alias' in kwargs:
@@ -236,7 +273,7 @@ def get_case_search_to_elasticsearch_pillow(pillow_id='CaseSearchToElasticsearch
         index_info.alias = kwargs['index_alias']
 
     checkpoint = get_checkpoint_for_elasticsearch_pillow(pillow_id, index_info, topics.CASE_TOPICS)
-    case_processor = CaseSearchPillowProcessor(
+    case_processor = BulkCaseSearchPillowProcessor(
         elasticsearch=get_es_new(),
         index_info=index_info,
         doc_prep_fn=transform_case_for_elasticsearch
@@ -252,6 +289,8 @@ def get_case_search_to_elasticsearch_pillow(pillow_id='CaseSearchToElasticsearch
         change_processed_event_handler=KafkaCheckpointEventHandler(
             checkpoint=checkpoint, checkpoint_frequency=100, change_feed=change_feed,
         ),
+        processor_chunk_size=processor_chunk_size,
+        max_processor_chunk_size=max_processor_chunk_size,
     )
 
 
@@ -265,6 +304,7 @@ class ResumableCaseSearchReindexerFactory(ReindexerFactory):
         ReindexerFactory.resumable_reindexer_args,
         ReindexerFactory.elastic_reindexer_args,
         ReindexerFactory.limit_db_args,
+        ReindexerFactory.parallel_reindexer_args,
     ]
 
     @classmethod
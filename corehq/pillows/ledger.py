@@ -74,18 +74,22 @@ class LedgerProcessor(PillowProcessor):
         if change.deleted:
             return
 
-        ledger = change.get_document()
-        from corehq.apps.commtrack.models import CommtrackConfig
-        commtrack_config = CommtrackConfig.for_domain(ledger['domain'])
+        with self.time_stage('extract'):
+            ledger = change.get_document()
 
-        if commtrack_config and commtrack_config.use_auto_consumption:
-            daily_consumption = _get_daily_consumption_for_ledger(ledger)
-            ledger['daily_consumption'] = daily_consumption
+        with self.time_stage('transform'):
+            from corehq.apps.commtrack.models import CommtrackConfig
+            commtrack_config = CommtrackConfig.for_domain(ledger['domain'])
 
-        if not ledger.get('location_id') and ledger.get('case_id'):
-            ledger['location_id'] = _location_id_for_case(ledger['case_id'])
+            if commtrack_config and commtrack_config.use_auto_consumption:
+                daily_consumption = _get_daily_consumption_for_ledger(ledger)
+                ledger['daily_consumption'] = daily_consumption
 
-        _update_ledger_section_entry_combinations(ledger)
+            if not ledger.get('location_id') and ledger.get('case_id'):
+                ledger['location_id'] = _location_id_for_case(ledger['case_id'])
+
+        with self.time_stage('load'):
+            _update_ledger_section_entry_combinations(ledger)
 
 
 def get_ledger_to_elasticsearch_pillow(pillow_id='LedgerToElasticsearchPillow', num_processes=1,
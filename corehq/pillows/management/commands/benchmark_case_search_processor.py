@@ -0,0 +1,82 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from pillowtop.feed.interface import Change
+
+from corehq.apps.change_feed.data_sources import (
+    CASE_SQL,
+    SOURCE_SQL,
+    get_document_store,
+)
+from corehq.elastic import get_es_new
+from corehq.form_processor.change_publishers import change_meta_from_sql_case
+from corehq.form_processor.models import CommCareCase
+from corehq.pillows.case_search import (
+    BulkCaseSearchPillowProcessor,
+    CaseSearchPillowProcessor,
+    domain_needs_search_index,
+    transform_case_for_elasticsearch,
+)
+from corehq.pillows.mappings.case_search_mapping import CASE_SEARCH_INDEX_INFO
+
+
+class Command(BaseCommand):
+    """Compare the throughput of the serial and bulk case search processors
+
+    Cases of the domain are (re)indexed in the case search index, once
+    with each processor. Changes are created without their documents,
+    so each processor fetches the cases as it would when processing
+    changes from Kafka.
+
+    Usage: ./manage.py benchmark_case_search_processor my-domain --limit 5000 --chunk-size 100
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('domain')
+        parser.add_argument('--limit', type=int, default=1000)
+        parser.add_argument('--chunk-size', type=int, default=100)
+
+    def handle(self, domain, limit, chunk_size, **options):
+        if not domain_needs_search_index(domain):
+            raise CommandError("{} does not have case search enabled".format(domain))
+        case_ids = CommCareCase.objects.get_case_ids_in_domain(domain)[:limit]
+        metas = [change_meta_from_sql_case(case) for case in CommCareCase.objects.iter_cases(case_ids, domain)]
+        print("{} cases, chunk size {}".format(len(metas), chunk_size))
+
+        for name, processor_class in [
+            ('serial', CaseSearchPillowProcessor),
+            ('bulk', BulkCaseSearchPillowProcessor),
+        ]:
+            processor = processor_class(
+                elasticsearch=get_es_new(),
+                index_info=CASE_SEARCH_INDEX_INFO,
+                doc_prep_fn=transform_case_for_elasticsearch,
+            )
+            changes = _get_changes(domain, metas)
+            start = time.perf_counter()
+            for i in range(0, len(changes), chunk_size):
+                _process_chunk(processor, changes[i:i + chunk_size])
+            duration = time.perf_counter() - start
+            print("{:<6} {:>8.2f}s {:>8.1f} cases/s".format(name, duration, len(changes) / duration))
+
+
+def _get_changes(domain, metas):
+    document_store = get_document_store(SOURCE_SQL, CASE_SQL, domain, load_source='benchmark')
+    return [
+        Change(id=meta.document_id, sequence_id=None, metadata=meta, document_store=document_store)
+        for meta in metas
+    ]
+
+
+def _process_chunk(processor, changes):
+    if not processor.supports_batch_processing:
+        for change in changes:
+            processor.process_change(change)
+        return
+    retry_changes, error_changes = processor.process_changes_chunk(changes)
+    for change in retry_changes:
+        processor.process_change(change)
+    if error_changes:
+        change, exception = error_changes[0]
+        raise CommandError("Error processing {}: {}".format(change.id, exception))
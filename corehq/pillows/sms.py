@@ -22,7 +22,8 @@ from corehq.util.doc_processor.sql import SqlDocumentProvider
 
 
 def get_sql_sms_pillow(pillow_id='SqlSMSPillow', num_processes=1, process_num=0,
-                       processor_chunk_size=DEFAULT_PROCESSOR_CHUNK_SIZE, **kwargs):
+                       processor_chunk_size=DEFAULT_PROCESSOR_CHUNK_SIZE, max_processor_chunk_size=None,
+                       **kwargs):
     """SMS Pillow
 
     Processors:
@@ -47,7 +48,8 @@ def get_sql_sms_pillow(pillow_id='SqlSMSPillow', num_processes=1, process_num=0,
         change_processed_event_handler=KafkaCheckpointEventHandler(
             checkpoint=checkpoint, checkpoint_frequency=100, change_feed=change_feed
         ),
-        processor_chunk_size=processor_chunk_size
+        processor_chunk_size=processor_chunk_size,
+        max_processor_chunk_size=max_processor_chunk_size
     )
 
 
@@ -146,7 +146,8 @@ def get_user_pillow_old(pillow_id='UserPillow', num_processes=1, process_num=0,
 
 
 def get_user_pillow(pillow_id='user-pillow', num_processes=1, dedicated_migration_process=False, process_num=0,
-        skip_ucr=False, processor_chunk_size=DEFAULT_PROCESSOR_CHUNK_SIZE, **kwargs):
+        skip_ucr=False, processor_chunk_size=DEFAULT_PROCESSOR_CHUNK_SIZE, max_processor_chunk_size=None,
+        **kwargs):
     """Processes users and sends them to ES and UCRs.
 
     Processors:
@@ -177,6 +178,7 @@ def get_user_pillow(pillow_id='user-pillow', num_processes=1, dedicated_migratio
             checkpoint=checkpoint, checkpoint_frequency=100, change_feed=change_feed
         ),
         processor_chunk_size=processor_chunk_size,
+        max_processor_chunk_size=max_processor_chunk_size,
         process_num=process_num,
         is_dedicated_migration_process=dedicated_migration_process and (process_num == 0)
     )
@@ -167,11 +167,12 @@ def get_xform_to_elasticsearch_pillow(pillow_id='XFormToElasticsearchPillow', nu
     )
 
 
-def get_xform_pillow(pillow_id='xform-pillow', ucr_division=None,
+def get_xform_pillow(pillow_id='xform-pillow', ucr_division=None, ucr_cost_division=None,
                      include_ucrs=None, exclude_ucrs=None,
                      num_processes=1, process_num=0, ucr_configs=None, skip_ucr=False,
-                     processor_chunk_size=DEFAULT_PROCESSOR_CHUNK_SIZE,
-                     topics=None, dedicated_migration_process=False, **kwargs):
+                     processor_chunk_size=DEFAULT_PROCESSOR_CHUNK_SIZE, max_processor_chunk_size=None,
+                     topics=None, dedicated_migration_process=False, prefetch_workers=0,
+                     **kwargs):
     """Generic XForm change processor
 
     Processors:
@@ -188,7 +189,7 @@ def get_xform_pillow(pillow_id='xform-pillow', ucr_division=None,
     topics = topics or FORM_TOPICS
     change_feed = KafkaChangeFeed(
         topics, client_id=pillow_id, num_processes=num_processes, process_num=process_num,
-        dedicated_migration_process=dedicated_migration_process
+        dedicated_migration_process=dedicated_migration_process, prefetch_workers=prefetch_workers,
     )
 
     ucr_processor = get_ucr_processor(
@@ -197,6 +198,8 @@ def get_xform_pillow(pillow_id='xform-pillow', ucr_division=None,
             StaticDataSourceProvider('XFormInstance')
         ],
         ucr_division=ucr_division,
+        ucr_cost_division=ucr_cost_division,
+        pillow_name=pillow_id,
         include_ucrs=include_ucrs,
         exclude_ucrs=exclude_ucrs,
         run_migrations=(process_num == 0),  # only first process runs migrations
@@ -236,6 +239,7 @@ def get_xform_pillow(pillow_id='xform-pillow', ucr_division=None,
         change_processed_event_handler=event_handler,
         processor=processors,
         processor_chunk_size=processor_chunk_size,
+        max_processor_chunk_size=max_processor_chunk_size,
         process_num=process_num,
         is_dedicated_migration_process=dedicated_migration_process and (process_num == 0)
     )
@@ -247,6 +251,7 @@ class SqlFormReindexerFactory(ReindexerFactory):
         ReindexerFactory.resumable_reindexer_args,
         ReindexerFactory.elastic_reindexer_args,
         ReindexerFactory.limit_db_args,
+        ReindexerFactory.parallel_reindexer_args,
         ReindexerFactory.domain_arg,
     ]
 
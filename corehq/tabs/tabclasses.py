@@ -44,7 +44,7 @@ from corehq.apps.hqadmin.reports import (
     UserAuditReport,
     UserListReport,
 )
-from corehq.apps.hqadmin.views.system import GlobalThresholds
+from corehq.apps.hqadmin.views.system import GlobalThresholds, PillowStatusView
 from corehq.apps.hqwebapp.models import GaTracker
 from corehq.apps.hqwebapp.view_permissions import user_can_view_reports
 from corehq.apps.integration.views import (
@@ -2354,6 +2354,9 @@ class AdminTab(UITab):
                 {'title': _('Branches on Staging'),
                  'url': reverse('branches_on_staging'),
                  'icon': 'fa fa-tree'},
+                {'title': PillowStatusView.page_title,
+                 'url': reverse(PillowStatusView.urlname),
+                 'icon': 'fa fa-tachometer'},
                 {'title': GlobalThresholds.page_title,
                  'url': reverse(GlobalThresholds.urlname),
                  'icon': 'fa fa-fire'},
@@ -1957,6 +1957,23 @@ LIVEQUERY_READ_FROM_STANDBYS = DynamicallyPredictablyRandomToggle(
     """
 )
 
+LIVEQUERY_BULK_CASE_GRAPH = DynamicallyPredictablyRandomToggle(
+    'livequery_bulk_case_graph',
+    'Compute live cases for restores by loading the case index graph in bulk',
+    TAG_INTERNAL,
+    [NAMESPACE_DOMAIN],
+    description="""
+    Use the bulk case graph engine to compute the cases to sync in a
+    restore. It loads the case status of the whole index graph in bulk
+    and computes live cases over an integer-id graph, which is faster
+    than the incremental graph walk for users owning many cases.
+    Restores can include more cases than with the graph walk: the host
+    of a closed extension case is synced whenever the extension is
+    synced, which the graph walk misses when the extension becomes live
+    after its index was fetched.
+    """
+)
+
 ACCOUNTING_TESTING_TOOLS = StaticToggle(
     'accounting_testing_tools',
     'Enable Accounting Testing Tools',
@@ -2371,3 +2388,140 @@ EMBED_TABLEAU_REPORT_BY_USER = StaticToggle(
                 'Turn on this flag to instead send "HQ/{the user\'s HQ username}", i.e. "HQ/jdoe@dimagi.com", '
                 'to Tableau to get the embedded report.',
 )
+
+RESTORE_CASE_FRAGMENT_CACHE = StaticToggle(
+    'restore_case_fragment_cache',
+    'Cache serialized case XML between restores and only re-serialize modified cases',
+    TAG_INTERNAL,
+    namespaces=[NAMESPACE_DOMAIN],
+    description="""
+    Serialized case blocks are cached per case and server modified date
+    so that restores for users with many cases only need to render the
+    cases that changed since they were last rendered.
+    """
+)
+
+STREAMING_RESTORE = StaticToggle(
+    'streaming_restore',
+    'Send restore payloads to the phone while they are being generated',
+    TAG_INTERNAL,
+    namespaces=[NAMESPACE_DOMAIN],
+    description="""
+    Synchronous restores are streamed to the phone in chunks as cases
+    are loaded rather than being written to a temporary file first.
+    Restores that request an item count or are cached are not streamed.
+    """
+)
+
+RESTORE_PROFILING = StaticToggle(
+    'restore_profiling',
+    'Record per-provider timing, query and payload size profiles of restores',
+    TAG_INTERNAL,
+    namespaces=[NAMESPACE_DOMAIN],
+    description="""
+    The most recent restore profiles of each user can be viewed in the
+    restore profiles admin page. Superusers can also profile a single
+    restore by adding ?profile=true to the restore URL.
+    """
+)
+
+PREWARM_RESTORES = StaticToggle(
+    'prewarm_restores',
+    'Pre-generate restores for recently synced users during off-peak hours',
+    TAG_INTERNAL,
+    namespaces=[NAMESPACE_DOMAIN],
+    description="""
+    During the project's restore prewarm windows, restores are generated
+    and cached for users whose cases have changed since their last sync,
+    so their next sync is served from the cache.
+    """
+)
+
+ITERPARSE_FORMS = StaticToggle(
+    'iterparse_forms',
+    'Parse submitted form XML in a single streaming pass',
+    TAG_INTERNAL,
+    namespaces=[NAMESPACE_DOMAIN],
+    description="""
+    Form XML is converted to JSON one top level node at a time, and case
+    and ledger blocks are found in the same pass, so large forms are not
+    parsed again while they are processed.
+    """
+)
+
+QUEUE_FORM_SUBMISSIONS = StaticToggle(
+    'queue_form_submissions',
+    'Queue form submissions to be processed after responding to the phone',
+    TAG_INTERNAL,
+    namespaces=[NAMESPACE_DOMAIN],
+    description="""
+    Submissions are saved and acknowledged with a receipt id, and are
+    processed by background workers. Processing results can be checked
+    with the submission status URL. Submissions are rate limited before
+    they are queued.
+    """
+)
+
+COMPILED_UCR_EXPRESSIONS = StaticToggle(
+    'compiled_ucr_expressions',
+    'Evaluate UCR data source filters and indicators with compiled expressions',
+    TAG_INTERNAL,
+    namespaces=[NAMESPACE_DOMAIN],
+    description="""
+    Data source filters, named expressions and indicators are compiled
+    into closures, and expressions that are used more than once by a
+    data source are only evaluated once for each row.
+    """
+)
+
+COLUMNAR_EXPORTS = StaticToggle(
+    'columnar_exports',
+    'Build export rows a page of documents and a column at a time',
+    TAG_INTERNAL,
+    namespaces=[NAMESPACE_DOMAIN],
+    description="""
+    The paths and transforms of export columns are compiled once per
+    export, and the rows of each page of documents are built one column
+    at a time and written to the export file together.
+    """
+)
+
+INCREMENTAL_DAILY_SAVED_EXPORTS = StaticToggle(
+    'incremental_daily_saved_exports',
+    'Only rebuild the months of form and case daily saved exports that changed',
+    TAG_INTERNAL,
+    namespaces=[NAMESPACE_DOMAIN],
+    description="""
+    The rows of daily saved exports are stored by month of form submission
+    or case opening, and a month is only exported again when its documents
+    were modified, archived or deleted, or when the export changed. Values
+    looked up from other documents, like usernames, are not updated in
+    months that did not change.
+    """
+)
+
+PARQUET_EXPORTS = StaticToggle(
+    'parquet_exports',
+    'Offer Parquet as a file type for form and case exports',
+    TAG_INTERNAL,
+    namespaces=[NAMESPACE_DOMAIN],
+    description="""
+    Parquet exports are a zip file of a Parquet file for each table. The
+    columns of questions with a date, datetime, integer or decimal data
+    type, row numbers and GPS coordinates are typed, and values that are
+    not of the type of their column are empty.
+    """
+)
+
+STREAMING_XLSX_EXPORTS = StaticToggle(
+    'streaming_xlsx_exports',
+    'Write Excel 2007+ exports without keeping worksheets in memory',
+    TAG_INTERNAL,
+    namespaces=[NAMESPACE_DOMAIN],
+    description="""
+    The XML of each worksheet is written to a temporary file as rows are
+    exported, with strings inline in their cells, instead of building the
+    workbook with openpyxl. Tables with more rows than an Excel worksheet
+    can hold are continued on new worksheets.
+    """
+)
@@ -1,3 +1,4 @@
+import time
 import weakref
 from abc import ABCMeta, abstractmethod
 
@@ -175,9 +176,11 @@ class BulkDocProcessor(DocumentProcessorController):
     records being processed are very large and the default chunk size of
     100 would exceed available memory.
     :param progress_logger: A ``ProcessorProgressLogger`` object to notify of progress events.
+    :param max_docs_per_second: Optional limit on the average number of
+    documents processed per second.
     """
     def __init__(self, document_provider, doc_processor, reset=False, max_retry=2,
-                 chunk_size=100, progress_logger=None):
+                 chunk_size=100, progress_logger=None, max_docs_per_second=None):
 
         event_handler = BulkDocProcessorEventHandler(self)
         super(BulkDocProcessor, self).__init__(
@@ -185,6 +188,7 @@ class BulkDocProcessor(DocumentProcessorController):
             event_handler, progress_logger
         )
         self.changes = []
+        self.throttle = Throttle(max_docs_per_second) if max_docs_per_second else None
 
     def _process_doc(self, doc):
         if self.doc_processor.should_process(doc):
@@ -195,6 +199,30 @@ class BulkDocProcessor(DocumentProcessorController):
         ok = self.doc_processor.process_bulk_docs(self.changes, self.progress.logger)
         if ok:
             self.progress.add(len(self.changes))
+            if self.throttle:
+                self.throttle.wait(len(self.changes))
             self.changes = []
         else:
             raise BulkProcessingFailed("Processing batch failed")
+
+
+class Throttle(object):
+    """Limit the average rate at which items are processed
+
+    :param max_per_second: Maximum number of items per second.
+    """
+
+    def __init__(self, max_per_second):
+        self.interval = 1 / max_per_second
+        self.next_time = time.monotonic()
+
+    def wait(self, num_items):
+        """Wait until enough time has passed to process `num_items`
+
+        Call after processing items. Time spent processing slower than
+        the maximum rate is not saved up to process later items faster.
+        """
+        now = time.monotonic()
+        self.next_time = max(self.next_time, now - num_items * self.interval) + num_items * self.interval
+        if self.next_time > now:
+            time.sleep(self.next_time - now)
@@ -151,3 +151,26 @@ class ProcessorProgressLogger(object):
             f" ({previously_visited} previously processed).",
             file=self.stream
         )
+
+
+def get_merged_progress(iterators):
+    """Combine the progress of several resumable iterations
+
+    :param iterators: Dict of ``ResumableFunctionIterator`` objects by name.
+    :returns: Dict with "visited" and "total" counts of all iterations
+    combined, and "iterations", a dict of the progress of each iteration
+    by name.
+    """
+    iterations = {}
+    for name, iterator in iterators.items():
+        progress = iterator.get_iterator_detail('progress') or {}
+        iterations[name] = {
+            "visited": progress.get("visited", 0),
+            "total": progress.get("total", 0),
+            "updated": iterator.state.timestamp if progress else None,
+        }
+    return {
+        "visited": sum(p["visited"] for p in iterations.values()),
+        "total": sum(p["total"] for p in iterations.values()),
+        "iterations": iterations,
+    }
@@ -1,4 +1,5 @@
 import uuid
+from unittest.mock import patch
 
 from couchdbkit import ResourceConflict, ResourceNotFound
 from django.test import TestCase
@@ -18,6 +19,7 @@ from corehq.util.doc_processor.interface import (
     BulkDocProcessor,
     BulkProcessingFailed,
     DocumentProcessorController,
+    Throttle,
     UnhandledDocumentError,
 )
 from corehq.util.doc_processor.sql import resumable_sql_model_iterator
@@ -568,3 +570,30 @@ class TestBulkDocProcessor(BaseCouchDocProcessorTest):
             {'bar-{}'.format(ident) for ident in range(4)} | {'foo-{}'.format(ident) for ident in range(4)},
             doc_processor.docs_processed
         )
+
+
+@patch('corehq.util.doc_processor.interface.time')
+class TestThrottle(SimpleTestCase):
+
+    def test_wait_when_fast(self, mock_time):
+        mock_time.monotonic.return_value = 100
+        throttle = Throttle(max_per_second=10)
+        mock_time.monotonic.return_value = 101
+        throttle.wait(20)
+        mock_time.sleep.assert_called_once_with(1)
+
+    def test_no_wait_when_slow(self, mock_time):
+        mock_time.monotonic.return_value = 100
+        throttle = Throttle(max_per_second=10)
+        mock_time.monotonic.return_value = 105
+        throttle.wait(20)
+        mock_time.sleep.assert_not_called()
+
+    def test_slow_processing_is_not_saved_up(self, mock_time):
+        mock_time.monotonic.return_value = 100
+        throttle = Throttle(max_per_second=10)
+        mock_time.monotonic.return_value = 110
+        throttle.wait(10)
+        mock_time.monotonic.return_value = 110.5
+        throttle.wait(10)
+        mock_time.sleep.assert_called_once_with(0.5)
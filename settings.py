@@ -621,6 +621,7 @@ CELERY_HEARTBEAT_THRESHOLDS = {
     "saved_exports_queue": 6 * 60 * 60,
     "send_report_throttled": 6 * 60 * 60,
     "sms_queue": 5 * 60,
+    "submission_queue": 15 * 60,
     "submission_reprocessing_queue": 60 * 60,
     "sumologic_logs_queue": 6 * 60 * 60,
     "ucr_indicator_queue": None,
@@ -811,6 +812,12 @@ RUN_FORM_META_PILLOW = True
 RUN_CASE_SEARCH_PILLOW = True
 RUN_UNKNOWN_USER_PILLOW = True
 RUN_DEDUPLICATION_PILLOW = True
+# pillows with adaptive processor chunk sizes use smaller chunks while
+# their process uses more than this many bytes of memory
+PILLOW_MAX_MEMORY = None
+# pillow name: seconds to collect changes for before processing them,
+# so that multiple changes to the same document are processed once
+PILLOW_COALESCE_WINDOWS = {}
 
 # Repeaters in the order in which they should appear in "Data Forwarding"
 REPEATER_CLASSES = [
@@ -961,6 +968,12 @@ USE_PARTITIONED_DATABASE = False
 # number of days since last access after which a saved export is considered unused
 SAVED_EXPORT_ACCESS_CUTOFF = 35
 
+# domain: number of processes that build the rows of each of its exports
+# (see corehq/apps/export/multiprocess.py)
+EXPORT_PROCESSES_BY_DOMAIN = {}
+# bytes of memory that each of those processes may use, None for no limit
+EXPORT_PROCESS_MAX_MEMORY = None
+
 # override for production
 DEFAULT_PROTOCOL = 'http'
 
@@ -1042,6 +1055,11 @@ AUTHPROXY_CERT = None
 ASYNC_INDICATORS_TO_QUEUE = 10000
 ASYNC_INDICATOR_QUEUE_TIMES = None
 DAYS_TO_KEEP_DEVICE_LOGS = 60
+
+# expected number of forms in the form id Bloom filter used to skip
+# duplicate form lookups (see corehq/form_processor/form_id_filter.py)
+# None disables the filter
+FORM_ID_FILTER_CAPACITY = None
 NO_DEVICE_LOG_ENVS = list(ICDS_ENVS) + ['production']
 
 UCR_COMPARISONS = {}
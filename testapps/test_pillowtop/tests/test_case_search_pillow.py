@@ -4,6 +4,7 @@ from unittest.mock import MagicMock, patch
 from django.test import TestCase
 
 from pillowtop.es_utils import initialize_index_and_mapping
+from pillowtop.reindexer.change_providers.case import _sql_case_to_change
 
 from corehq.apps.case_search.const import SPECIAL_CASE_PROPERTIES_MAP
 from corehq.apps.case_search.exceptions import CaseSearchNotEnabledException
@@ -15,6 +16,7 @@ from corehq.apps.change_feed.consumer.feed import (
 from corehq.apps.change_feed.tests.utils import get_test_kafka_consumer
 from corehq.apps.change_feed.topics import get_topic_offset
 from corehq.apps.data_dictionary.models import CaseProperty, CaseType
+from corehq.apps.data_dictionary.util import get_gps_properties
 from corehq.apps.es import CaseSearchES
 from corehq.apps.es.tests.utils import es_test
 from corehq.elastic import get_es_new
@@ -24,6 +26,7 @@ from corehq.pillows.case_search import (
     CaseSearchReindexerFactory,
     delete_case_search_cases,
     domains_needing_search_index,
+    get_case_search_processor,
 )
 from corehq.pillows.mappings.case_search_mapping import (
     CASE_SEARCH_INDEX,
@@ -162,6 +165,31 @@ class CaseSearchPillowTest(TestCase):
             {'key': 'not_coords', 'value': '-33.8561 151.2152 0 0'},
         )
 
+    @flag_enabled('USH_CASE_CLAIM_UPDATES')
+    def test_bulk_processor(self):
+        CaseSearchConfig.objects.get_or_create(pk=self.domain, enabled=True)
+        domains_needing_search_index.clear()
+        self._make_data_dictionary(gps_properties=['coords'])
+        cases = [self._make_case(case_properties={'coords': '-33.8561 151.2152'}) for x in range(3)]
+        other_domain_case = self._make_case(domain='yunkai')
+        changes = [_sql_case_to_change(case) for case in cases + [other_domain_case]]
+
+        processor = get_case_search_processor()
+        with patch('corehq.pillows.case_search.get_gps_properties',
+                   wraps=get_gps_properties) as gps_properties:
+            retry_changes, error_changes = processor.process_changes_chunk(changes)
+        self.assertEqual((retry_changes, error_changes), ([], []))
+        gps_properties.assert_called_once_with(self.domain, self.case_type)
+
+        self.elasticsearch.indices.refresh(CASE_SEARCH_INDEX)
+        es_cases = CaseSearchES().run().hits
+        self.assertItemsEqual([es_case['_id'] for es_case in es_cases], [case.case_id for case in cases])
+        for es_case in es_cases:
+            self.assertEqual(
+                self._get_prop(es_case['case_properties'], 'coords')['geopoint_value'],
+                {'lat': -33.8561, 'lon': 151.2152},
+            )
+
     def _make_data_dictionary(self, gps_properties):
         case_type = CaseType.objects.create(name=self.case_type, domain=self.domain)
         for prop in gps_properties: